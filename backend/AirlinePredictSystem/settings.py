@@ -151,3 +151,90 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.JSONRenderer',
     ],
 }
+
+# 预测模型文件进程内缓存（predict.predictive_algorithm.model_cache）
+MODEL_ARTIFACT_CACHE = {
+    'MAX_ENTRIES': 256,                 # 最多缓存的模型数
+    'MAX_BYTES': 512 * 1024 * 1024,     # 缓存文件总大小上限（字节）
+}
+
+# 异步训练任务执行器（python manage.py run_training_jobs）
+TRAINING_JOBS = {
+    'WORKERS': 2,                       # 并行执行进程数
+    'POLL_INTERVAL': 2.0,               # 轮询排队任务的间隔（秒）
+    'LEASE_SECONDS': 300,               # 任务租约时长（秒），执行器每轮轮询续期；过期未续期的任务被其他执行器回收
+    'MAX_ATTEMPTS': 3,                  # 租约过期后重新排队的最大领取次数，超过后标记为失败
+    'SEARCH_WORKERS': 2,                # 超参数搜索任务内部的试验进程数（在执行进程之外另起）
+}
+
+# 批量预测执行池（predict.forecast_service）
+FORECAST_EXECUTOR = {
+    'KIND': 'thread',                   # thread：共享进程内模型缓存；process：多进程，绕开 GIL
+    'WORKERS': 8,                       # 并发执行的预测数
+    'TASK_TIMEOUT': 120,                # 单个预测任务超时（秒，从提交时计时）；超时后已开始的预测仍在执行池中运行至结束
+    'MAX_STUCK': 4,                     # 超时后仍在运行的预测达到此数时回收并重建执行池（默认 WORKERS 的一半）
+}
+
+# 机场目录进程内缓存（show.airport_directory）
+AIRPORT_DIRECTORY = {
+    'TTL': 300,                         # 缓存有效期（秒），其他进程修改 AirportInfo 后最迟在此时间后生效
+}
+
+# 航线数据列式存储（predict.predictive_algorithm.route_store），由导入脚本刷新
+ROUTE_DATA_STORE = {
+    'ENABLED': True,                    # 训练加载时优先读取列式存储
+    'ROOT': BASE_DIR / 'AirlineModels' / 'route_store',
+}
+
+# 按月增量导入 OAG 数据（python manage.py ingest_month）
+DATA_INGESTION = {
+    'AIRPORT_FILE': BASE_DIR / 'data_utils' / '中国机场代码.xlsx',     # 国内机场三字码表
+    'ECONOMY_FILE': BASE_DIR / 'data_utils' / '城市经济数据.csv',       # 城市经济数据
+    'WORK_DIR': BASE_DIR / 'AirlineModels' / 'ingest',                # 清洗中间文件目录（每次导入使用独立子目录，完成后删除）
+}
+
+# Django 缓存：forecasts 为预测结果缓存（文件缓存，多个进程 / 执行池共享）
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'forecasts': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'AirlineModels' / 'forecast_cache',
+        'TIMEOUT': 7 * 24 * 3600,
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+# 预测结果缓存（predict.forecast_cache），模型重新训练或模型文件变化后自动失效
+FORECAST_RESULT_CACHE = {
+    'ENABLED': True,
+    'ALIAS': 'forecasts',               # 使用的 CACHES 别名
+    'TIMEOUT': 7 * 24 * 3600,           # 结果有效期（秒）
+}
+
+# 正式训练后预计算预测快照（predict.forecast_snapshots，作为训练任务由 run_training_jobs 执行），forecast_route_view 参数一致时直接返回
+FORECAST_SNAPSHOTS = {
+    'ENABLED': True,
+    'HORIZONS': {                       # 各目标粒度的标准预测期数
+        'monthly': [12, 24, 36],
+        'quarterly': [4, 8],
+        'yearly': [3],
+    },
+    'RECONCILE_ALGOS': ['linear'],      # 层级对齐快照使用的对齐算法（linear / mint / mint_structural）
+}
+
+# 单文件模型包（predict.predictive_algorithm.model_bundle），旧模型用 python manage.py convert_model_bundles 转换
+MODEL_BUNDLE = {
+    'WRITE_ON_TRAIN': True,             # 正式训练时写入 model.bundle 并让 RouteModelInfo 指向它（旧格式文件仍保留）
+}
+
+# 正式训练时预先拟合尾部外推模型（predict.predictive_algorithm.fromal_train_single_route）
+TAIL_MODEL_PREFIT = {
+    'ENABLED': False,                   # True：为模型使用的无尾部缺失特征列各拟合一次外推模型，预测时签名一致则复用（增加训练耗时）
+}
+
+# 递推预测中 TS_Forecast 特征的时间序列模型（predict.predictive_algorithm.recursive_forecast）
+TS_FORECAST_FEATURE = {
+    'REFIT_EVERY': 0,                   # 0：冻结训练时拟合的模型，只扩展预测步数；k：每 k 步在已知 + 已预测序列上重新训练（1 为旧版每步训练）
+}
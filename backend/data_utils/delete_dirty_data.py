@@ -20,13 +20,17 @@ def delete_dirty_year_months(target_year_months: list[str]) -> int:
 	django.setup()
 
 	from predict.models import FlightMarketRecord  # noqa: WPS433 – django import after setup
+	from predict.predictive_algorithm.route_store import refresh_routes  # noqa: WPS433
 
 	queryset = FlightMarketRecord.objects.filter(year_month__in=target_year_months)
 	to_delete_count = queryset.count()
 	if to_delete_count == 0:
 		return 0
+	affected_routes = list(queryset.values_list("origin", "destination").distinct())
 	# queryset.delete() returns (num_deleted, {"app.Model": count, ...})
 	deleted_count, _ = queryset.delete()
+	# Keep the columnar route store in sync with the deleted rows.
+	refresh_routes(affected_routes)
 	return deleted_count
 
 
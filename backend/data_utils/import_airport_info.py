@@ -12,6 +12,7 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "AirlinePredictSystem.settings")
 django.setup()
 
 from show.models import AirportInfo
+from show.rollups import rebuild_all_rollups
 
 # JSON 文件路径
 JSON_PATH = "./iata_city_airport_mapping.json"
@@ -35,3 +36,6 @@ for code, info in airport_data.items():
         count_updated += 1
 
 print(f"✅ 导入完成，新建 {count_new} 条，更新 {count_updated} 条")
+
+# 城市映射可能变化，重建看板城市对汇总表
+rebuild_all_rollups()
@@ -1,4 +1,3 @@
-
 import os
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -21,83 +20,21 @@ django.setup()
 
 from django.db import transaction, close_old_connections
 from predict.models import FlightMarketRecord
+from predict.market_loader import (
+    COLUMN_MAP, USECOLS, DEC_FIELDS, BOOL_FIELDS, STR_FIELDS, UNIQUE_KEY,
+    normalize_frame, upsert_market_frame,
+)
+from predict.predictive_algorithm.route_store import refresh_routes
 
 # ================= 配置 =================
 CSV_PATH = Path(r"D:\desk\Airlinepredict\final_data_0729.csv")
 
+IMPORT_MODE = "bulk"          # bulk：向量化清洗 + 数据库原生批量加载（按唯一键覆盖）；parallel：逐行清洗 + 多线程 bulk_create
 WORKERS = 8
 BATCH_SIZE = 5000
 IGNORE_CONFLICTS = True       # 方案A：遇到唯一键冲突静默跳过
 PROGRESS_STEP = 100           # 每写入100条刷新一次进度
 
-# CSV 列名 -> 模型字段名（请保持与CSV一致）
-COLUMN_MAP = {
-    "YearMonth": "year_month",       # 原始格式如 '2017/3/1'，导入时转为 'YYYY-MM'
-    "Origin": "origin",
-    "Destination": "destination",
-    "Equipment": "equipment",
-    "Distance (KM)": "distance_km",
-    "International Flight": "international_flight",
-    "Equipment_Total_Flights": "equipment_total_flights",
-    "Equipment_Total_Seats": "equipment_total_seats",
-    "Route_Total_Flights": "route_total_flights",
-    "Route_Total_Seats": "route_total_seats",
-    "Route_Total_Flight_Time": "route_total_flight_time",
-    "Route_Avg_Flight_Time": "route_avg_flight_time",
-    "Con Total Est. Pax": "con_total_est_pax",
-    "First": "first",
-    "Business": "business",
-    "Premium": "premium",
-    "Full Y": "full_y",
-    "Disc Y": "disc_y",
-    "Avg yield": "avg_yield",
-    "Avg First": "avg_first",
-    "Avg Business": "avg_business",
-    "Avg Premium": "avg_premium",
-    "Avg Full Y": "avg_full_y",
-    "Avg Disc Y": "avg_disc_y",
-    "Region": "region",
-    "Total Est. Pax": "total_est_pax",
-    "Local Est. Pax": "local_est_pax",
-    "Behind Est. Pax": "behind_est_pax",
-    "Bridge Est. Pax": "bridge_est_pax",
-    "Beyond Est. Pax": "beyond_est_pax",
-    "Avg Fare (USD)": "avg_fare_usd",
-    "Local Fare": "local_fare",
-    "Behind Fare": "behind_fare",
-    "Bridge Fare": "bridge_fare",
-    "Beyond Fare": "beyond_fare",
-    "O_GDP": "o_gdp",
-    "O_Population": "o_population",
-    "Third_Industry_x": "third_industry_x",
-    "O_Revenue": "o_revenue",
-    "O_Retail": "o_retail",
-    "O_Labor": "o_labor",
-    "O_Air_Traffic": "o_air_traffic",
-    "D_GDP": "d_gdp",
-    "D_Population": "d_population",
-    "Third_Industry_y": "third_industry_y",
-    "D_Revenue": "d_revenue",
-    "D_Retail": "d_retail",
-    "D_Labor": "d_labor",
-    "D_Air_Traffic": "d_air_traffic",
-}
-USECOLS = list(COLUMN_MAP.keys())
-
-# ========= 类型分组（模型里整数已改为 DecimalField）=========
-DEC_FIELDS = {
-    "distance_km", "equipment_total_flights", "equipment_total_seats",
-    "route_total_flights", "route_total_seats",
-    "route_total_flight_time", "route_avg_flight_time",
-    "con_total_est_pax", "first", "business", "premium", "full_y", "disc_y",
-    "avg_yield", "avg_first", "avg_business", "avg_premium", "avg_full_y", "avg_disc_y",
-    "total_est_pax", "local_est_pax", "behind_est_pax", "bridge_est_pax", "beyond_est_pax",
-    "avg_fare_usd", "local_fare", "behind_fare", "bridge_fare", "beyond_fare",
-    "o_gdp", "o_population", "third_industry_x", "o_revenue", "o_retail", "o_labor", "o_air_traffic",
-    "d_gdp", "d_population", "third_industry_y", "d_revenue", "d_retail", "d_labor", "d_air_traffic",
-}
-BOOL_FIELDS = {"international_flight"}
-STR_FIELDS  = {"origin", "destination", "equipment", "region"}  # year_month 单独处理
 
 # ----------- 工具函数 -----------
 def to_decimal(v: object) -> Optional[Decimal]:
@@ -178,6 +115,7 @@ def import_data_50():
 
     FlightMarketRecord.objects.bulk_create(records, batch_size=1000, ignore_conflicts=IGNORE_CONFLICTS)
     print("成功导入 50 条数据！")
+    refresh_routes({(r.origin, r.destination) for r in records if r.origin and r.destination})
 
 # ============== 并行全量导入（进度） ==============
 def _process_part(part_df: pd.DataFrame, batch_size: int,
@@ -245,10 +183,42 @@ def import_data_parallel(workers: int = WORKERS, batch_size: int = BATCH_SIZE):
     print()  # 换行
     print("全部导入完成！")
 
+    # 刷新本次涉及航线的列式存储（训练加载使用）
+    routes = df[["Origin", "Destination"]].dropna().drop_duplicates()
+    routes = [(str(o).strip(), str(d).strip()) for o, d in routes.itertuples(index=False, name=None)]
+    refresh_routes(routes)
+
+# ============== 批量加载（向量化清洗 + 原生批量加载） ==============
+
+def import_data_bulk(csv_path: Path = CSV_PATH):
+    """
+    全量/增量批量加载：向量化清洗后用数据库原生批量加载写入，唯一键（航线+机型+周期）冲突时覆盖为新值
+    - MySQL：LOAD DATA LOCAL INFILE 到临时表，再 INSERT ... ON DUPLICATE KEY UPDATE（服务器需开启 local_infile）
+    - PostgreSQL：COPY 到临时表，再 INSERT ... ON CONFLICT DO UPDATE
+    - 其他（SQLite）：单事务 executemany + ON CONFLICT DO UPDATE
+    （实现见 predict.market_loader）
+    """
+    df = pd.read_csv(csv_path, usecols=USECOLS, dtype=str, low_memory=False)
+    total = len(df)
+    print(f"总共有 {total} 条数据，开始向量化清洗...")
+
+    frame = upsert_market_frame(normalize_frame(df))
+    print(f"批量加载完成：有效 {len(frame)} 条（缺少唯一键或重复的 {total - len(frame)} 条已跳过）")
+    if frame.empty:
+        return 0
+
+    # 刷新本次涉及航线的列式存储（训练加载使用）
+    routes = frame[["origin", "destination"]].drop_duplicates()
+    refresh_routes(list(routes.itertuples(index=False, name=None)))
+    return len(frame)
+
 # ================= 入口 =================
 if __name__ == "__main__":
     # 小样本
     # import_data_50()
 
     # 全量
-    import_data_parallel()
+    if IMPORT_MODE == "bulk":
+        import_data_bulk()
+    else:
+        import_data_parallel()
@@ -12,6 +12,7 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "AirlinePredictSystem.settings")
 django.setup()
 
 from show.models import RouteMonthlyStat
+from show.rollups import refresh_monthly_rollups
 
 # 导入未导入的数据
 
@@ -33,6 +34,7 @@ def import_bulk(csv_path, batch_size=1000):
     ))
 
     to_create = []
+    touched_periods = set()  # 本次新增数据涉及的年月，导入后增量刷新看板汇总表
     failed_rows = []
     success_count = 0
 
@@ -59,6 +61,7 @@ def import_bulk(csv_path, batch_size=1000):
                 Route_Total_Flights=safe_int(row.get('Route_Total_Flights')),
             )
             to_create.append(obj)
+            touched_periods.add((year, month))
             success_count += 1
 
             # 到达批次大小就入库
@@ -76,6 +79,9 @@ def import_bulk(csv_path, batch_size=1000):
         RouteMonthlyStat.objects.bulk_create(to_create)
         print(f"✅ 最后批次导入成功，共导入 {success_count} 条")
 
+    if touched_periods:
+        refresh_monthly_rollups(touched_periods)
+
     # 失败数据保存
     if failed_rows:
         pd.DataFrame(failed_rows).to_csv("failed_bulk_rows.csv", index=False)
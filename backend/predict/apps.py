@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PredictConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'predict'
+
+    def ready(self):
+        from . import signals  # noqa: F401  注册 RouteModelInfo 变更信号（预测缓存失效）
@@ -0,0 +1,135 @@
+"""
+预测结果缓存
+
+同一模型、同一预测参数的预测结果缓存在 Django 缓存（settings.FORECAST_RESULT_CACHE['ALIAS']，
+默认文件缓存，多进程共享）中，重复请求不再运行模型：
+
+- 键：model_id + 时间粒度 + 预测期数 + 经济列尾部填充方式 + 经济增长率 + TS_Forecast 重新训练间隔 + 模型文件版本 + 模型代数
+- 模型文件版本：五个文件的 (mtime, size)，文件被重写后旧结果自动不再命中
+- 模型代数：RouteModelInfo.cache_generation，保存后换成新的随机值（见 predict.signals），使该模型的全部缓存结果失效；
+  代数存在数据库中，不会像缓存条目那样被淘汰后回退，旧代数的结果键不会重新生效
+"""
+import json
+import uuid
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .predictive_algorithm.model_cache import file_signature
+from .predictive_algorithm.predict_single_route import model_file_paths
+from .predictive_algorithm.recursive_forecast import ts_refit_every
+
+
+def _conf():
+    conf = getattr(settings, 'FORECAST_RESULT_CACHE', {}) or {}
+    return {
+        'ENABLED': conf.get('ENABLED', True),
+        'ALIAS': conf.get('ALIAS', 'default'),
+        'TIMEOUT': conf.get('TIMEOUT', None),
+    }
+
+
+def _cache():
+    return caches[_conf()['ALIAS']]
+
+
+def _new_generation():
+    return uuid.uuid4().hex
+
+
+def get_generation(model_id):
+    from .models import RouteModelInfo
+
+    return RouteModelInfo.objects.filter(model_id=model_id).values_list('cache_generation', flat=True).first() or ''
+
+
+def invalidate_model(model_id):
+    """使指定模型的全部缓存预测结果失效（更换模型代数，旧键不再被读取，随过期时间淘汰），返回新的代数"""
+    from .models import RouteModelInfo
+
+    generation = _new_generation()
+    # update() 不触发 post_save，不会递归
+    RouteModelInfo.objects.filter(model_id=model_id).update(cache_generation=generation)
+    return generation
+
+
+def clear_all():
+    """使全部缓存的预测结果失效；只有使用独立缓存别名时才清空缓存本身，不波及 default 缓存中的其它数据"""
+    from .models import RouteModelInfo
+
+    RouteModelInfo.objects.update(cache_generation=_new_generation())
+    alias = _conf()['ALIAS']
+    if alias != 'default':
+        caches[alias].clear()
+
+
+def _normalize_growth_rate(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def forecast_cache_key(prediction_request, model_info=None):
+    """
+    计算预测请求的缓存键；模型不存在或文件缺失时返回 None（不缓存，交给预测流程报错）
+    """
+    from .models import RouteModelInfo
+
+    model_id = prediction_request.get('model_id')
+    if model_info is None:
+        model_info = RouteModelInfo.objects.filter(model_id=model_id).first()
+    if model_info is None:
+        return None
+    try:
+        signature, _ = file_signature(model_file_paths(model_info))
+    except OSError:
+        return None
+
+    parts = [
+        model_id,
+        prediction_request.get('origin_airport', '').upper(),
+        prediction_request.get('destination_airport', '').upper(),
+        prediction_request.get('time_granularity'),
+        prediction_request.get('prediction_periods'),
+        (prediction_request.get('economic_tail_method') or '').strip().lower(),
+        _normalize_growth_rate(prediction_request.get('economic_growth_rate')),
+        ts_refit_every(),
+        signature,
+        model_info.cache_generation,
+    ]
+    digest = hashlib.sha1(json.dumps(parts, default=str).encode('utf-8')).hexdigest()
+    return f"forecast:{model_id}:{digest}"
+
+
+def cached_forecast(prediction_request, compute):
+    """
+    读取缓存的预测结果，未命中时调用 compute(prediction_request) 计算并写入缓存
+
+    Returns:
+        (结果, 是否命中缓存)
+    """
+    conf = _conf()
+    if not conf['ENABLED']:
+        return compute(prediction_request), False
+
+    try:
+        key = forecast_cache_key(prediction_request)
+    except Exception as e:
+        print(f"⚠️ 预测缓存键计算失败，跳过缓存: {e}")
+        key = None
+    if key is None:
+        return compute(prediction_request), False
+
+    cache = _cache()
+    result = cache.get(key)
+    if result is not None:
+        return result, True
+
+    result = compute(prediction_request)
+    try:
+        cache.set(key, result, conf['TIMEOUT'])
+    except Exception as e:
+        print(f"⚠️ 预测结果写入缓存失败: {e}")
+    return result, False
@@ -0,0 +1,483 @@
+import time
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pandas as pd
+from django.db import close_old_connections
+
+from .worker import create_process_pool, terminate_process_pool
+from .forecast_cache import cached_forecast
+from .predictive_algorithm.predict_single_route import predict_single_route
+from .predictive_algorithm.hierarchical_alignment import (
+    aggregate_quarterly_to_year_by_blocks,
+    linear_reconcile_monthly_to_quarterly,
+    mint_reconcile_monthly_to_quarterly,
+)
+from .predictive_algorithm.reconciliation import mint_reconcile_batch, linear_reconcile_batch
+
+
+_executor = None
+_executor_lock = threading.Lock()
+# 当前执行池中已超时但仍在运行的预测（完成后自动移除）
+_stuck = set()
+
+
+def _executor_conf():
+    from django.conf import settings
+    conf = getattr(settings, 'FORECAST_EXECUTOR', {}) or {}
+    return {
+        'KIND': conf.get('KIND', 'thread'),
+        'WORKERS': conf.get('WORKERS', 8),
+        'TASK_TIMEOUT': conf.get('TASK_TIMEOUT', 120),
+        'MAX_STUCK': conf.get('MAX_STUCK') or max(1, conf.get('WORKERS', 8) // 2),
+    }
+
+
+def get_forecast_executor():
+    """
+    获取进程级预测执行池（settings.FORECAST_EXECUTOR）
+
+    - KIND='thread'：线程池，共享进程内模型缓存，适合常规部署
+    - KIND='process'：进程池，绕开 GIL，适合 CPU 密集的大批量预测
+    - 超时后仍在运行的预测达到 MAX_STUCK 个时回收旧池并新建：进程池终止全部子进程；
+      线程无法强制终止，旧线程运行结束后退出，新请求不再排在它们后面
+    """
+    global _executor
+    with _executor_lock:
+        conf = _executor_conf()
+        if _executor is not None and len(_stuck) >= conf['MAX_STUCK']:
+            print(f"⚠️ 预测执行池中 {len(_stuck)} 个超时任务仍在运行，回收并重建执行池")
+            old, _executor = _executor, None
+            _stuck.clear()
+            if conf['KIND'] == 'process':
+                terminate_process_pool(old)
+            else:
+                old.shutdown(wait=False, cancel_futures=True)
+        if _executor is None:
+            if conf['KIND'] == 'process':
+                _executor = create_process_pool(conf['WORKERS'])
+            else:
+                _executor = ThreadPoolExecutor(max_workers=conf['WORKERS'], thread_name_prefix='forecast')
+    return _executor
+
+
+def _mark_stuck(futures):
+    """记录超时后仍在运行的预测，完成时自动移除"""
+    with _executor_lock:
+        for future in futures:
+            if not future.done():
+                _stuck.add(future)
+                future.add_done_callback(_stuck.discard)
+
+
+def _run_forecast_unit(prediction_request):
+    """执行单次模型预测（在执行池中运行，结束后释放本线程的数据库连接）；相同模型和参数的结果直接读取预测缓存"""
+    close_old_connections()
+    try:
+        result, _ = cached_forecast(prediction_request, predict_single_route)
+        return result
+    finally:
+        close_old_connections()
+
+
+def build_forecast_units(pred, months, q_periods):
+    """
+    校验单个预测任务并拆分为需要执行的模型预测请求
+
+    Returns:
+        list: hierarchy_reconcile=0 时为 [请求]，=1 时为 [月度请求, 季度请求]
+    """
+    hierarchy_reconcile = int(pred.get('hierarchy_reconcile', 0))
+
+    if hierarchy_reconcile == 0:
+        # === 非对齐预测逻辑 ===
+        required_fields = ['origin_airport', 'destination_airport', 'time_granularity', 'prediction_periods', 'model_id']
+        missing_fields = [field for field in required_fields if field not in pred]
+        if missing_fields:
+            raise ValueError(f'缺少字段: {", ".join(missing_fields)}')
+
+        if pred['time_granularity'] not in ['yearly', 'quarterly', 'monthly']:
+            raise ValueError('time_granularity 必须是 yearly, quarterly 或 monthly 之一')
+
+        if not isinstance(pred['prediction_periods'], int) or pred['prediction_periods'] <= 0:
+            raise ValueError('prediction_periods 必须是正整数')
+
+        return [pred]
+
+    # === 层级对齐逻辑 ===
+    for f in ['origin_airport', 'destination_airport', 'prediction_periods', 'monthly_model_id', 'quarterly_model_id']:
+        if f not in pred:
+            raise ValueError(f'缺少字段: {f}（hierarchy_reconcile=1 时必填）')
+
+    if not isinstance(pred['prediction_periods'], int) or pred['prediction_periods'] <= 0:
+        raise ValueError('prediction_periods 必须是正整数')
+
+    base = {
+        'origin_airport': pred['origin_airport'],
+        'destination_airport': pred['destination_airport'],
+    }
+
+    monthly_req = {
+        **base,
+        'time_granularity': 'monthly',
+        'prediction_periods': months,
+        'model_id': pred['monthly_model_id'],
+        # 透传经济尾部处理参数（可选）
+        'economic_tail_method': pred.get('economic_tail_method'),
+        'economic_growth_rate': pred.get('economic_growth_rate'),
+    }
+    quarterly_req = {
+        **base,
+        'time_granularity': 'quarterly',
+        'prediction_periods': q_periods,
+        'model_id': pred['quarterly_model_id'],
+        # 透传经济尾部处理参数（可选）
+        'economic_tail_method': pred.get('economic_tail_method'),
+        'economic_growth_rate': pred.get('economic_growth_rate'),
+    }
+    return [monthly_req, quarterly_req]
+
+
+# reconcile_algo → MinT 方法
+MINT_ALGOS = {'mint': 'ols', 'mint_ols': 'ols', 'mint_structural': 'structural'}
+
+
+def _monthly_frame(monthly_resp):
+    pm = monthly_resp.get('prediction_results', {})
+    hist_m = pm.get('historical_data', []) or []
+    futu_m = pm.get('future_predictions', []) or []
+    return pd.DataFrame(
+        [{'YearMonth': h['time_point'], 'Predicted': h['value'], 'Set': 'History'} for h in hist_m] +
+        [{'YearMonth': f['time_point'], 'Predicted': f['value'], 'Set': 'Future'} for f in futu_m],
+        columns=['YearMonth', 'Predicted', 'Set']
+    )
+
+
+def _quarterly_frame(quarterly_resp):
+    pq = quarterly_resp.get('prediction_results', {})
+    q_all = (pq.get('historical_data', []) or []) + (pq.get('future_predictions', []) or [])
+    return pd.DataFrame(
+        [{'YearMonth': r['time_point'], 'Predicted': r['value']} for r in q_all],
+        columns=['YearMonth', 'Predicted']
+    )
+
+
+def reconcile_monthly(pred, monthly_resp, quarterly_resp):
+    """单个任务的月度 → 季度对齐"""
+    algo = (pred.get('reconcile_algo') or 'linear').lower()
+    df_m = _monthly_frame(monthly_resp)
+    df_q = _quarterly_frame(quarterly_resp)
+    if algo in MINT_ALGOS:
+        return mint_reconcile_monthly_to_quarterly(df_m, df_q, method=MINT_ALGOS[algo])
+    return linear_reconcile_monthly_to_quarterly(df_m, df_q)
+
+
+def reconcile_tasks_batch(items):
+    """
+    多个层级对齐任务按算法分组，每组一次向量化计算
+
+    Args:
+        items (list): [(task_index, pred, monthly_resp, quarterly_resp), ...]
+    Returns:
+        dict: task_index -> 对齐后的月度表
+    """
+    by_method = {}
+    for i, pred, monthly_resp, quarterly_resp in items:
+        algo = (pred.get('reconcile_algo') or 'linear').lower()
+        method = MINT_ALGOS.get(algo, 'linear')
+        by_method.setdefault(method, []).append((i, monthly_resp, quarterly_resp))
+
+    reconciled = {}
+    for method, group in by_method.items():
+        df_m = pd.concat([_monthly_frame(m).assign(task_index=i) for i, m, _ in group], ignore_index=True)
+        df_q = pd.concat([_quarterly_frame(q).assign(task_index=i) for i, _, q in group], ignore_index=True)
+        if method == 'linear':
+            df_rec = linear_reconcile_batch(df_m, df_q, key_cols=('task_index',))
+        else:
+            df_rec = mint_reconcile_batch(df_m, df_q, key_cols=('task_index',), method=method)
+        for i, part in df_rec.groupby('task_index', sort=False):
+            reconciled[i] = part.drop(columns=['task_index']).reset_index(drop=True)
+    return reconciled
+
+
+def reconcile_task_result(pred, monthly_resp, quarterly_resp, target_granularity, df_m_rec=None):
+    """层级对齐：月度预测按季度预测对齐，并按目标粒度返回（df_m_rec 为已批量对齐的月度表）"""
+    if df_m_rec is None:
+        df_m_rec = reconcile_monthly(pred, monthly_resp, quarterly_resp)
+    else:
+        df_m_rec = df_m_rec.copy()
+
+    pq = quarterly_resp.get('prediction_results', {})
+    q_hist = pq.get('historical_data', []) or []
+    q_futu = pq.get('future_predictions', []) or []
+
+    # 1. 拆分历史和未来（月度）
+    df_m_rec['YearMonth'] = pd.to_datetime(df_m_rec['YearMonth'], errors='coerce', format='%Y-%m')
+    hist_out_m = [
+        {'time_point': t.strftime('%Y-%m'), 'value': int(v) if pd.notna(v) else None}
+        for t, v in zip(
+            df_m_rec.loc[df_m_rec['Set'] == 'History', 'YearMonth'],
+            df_m_rec.loc[df_m_rec['Set'] == 'History', 'Predicted']
+        ) if pd.notna(t)
+    ]
+    futu_out_m = [
+        {'time_point': t.strftime('%Y-%m'), 'value': int(round(v)) if pd.notna(v) else None}
+        for t, v in zip(
+            df_m_rec.loc[df_m_rec['Set'] == 'Future', 'YearMonth'],
+            df_m_rec.loc[df_m_rec['Set'] == 'Future', 'Predicted_Reconciled']
+        ) if pd.notna(t)
+    ]
+
+    # 2. 年度聚合（基于季度）
+    yearly_hist, yearly_futu = aggregate_quarterly_to_year_by_blocks(q_hist, q_futu)
+
+    # 3. 构造结构 —— 只返回目标粒度
+    if target_granularity == 'monthly':
+        return {
+            'model_info': {
+                **(monthly_resp.get('model_info') or {}),
+                'time_granularity': 'monthly',
+                'model_id': pred['monthly_model_id']
+            },
+            'prediction_results': {
+                'historical_data': hist_out_m,
+                'future_predictions': futu_out_m
+            }
+        }
+
+    if target_granularity == 'quarterly':
+        return {
+            'model_info': {
+                **(quarterly_resp.get('model_info') or {}),
+                'time_granularity': 'quarterly',
+                'model_id': pred['quarterly_model_id']
+            },
+            'prediction_results': {
+                'historical_data': q_hist,
+                'future_predictions': q_futu
+            }
+        }
+
+    return {
+        'model_info': {
+            **(quarterly_resp.get('model_info') or {}),
+            'time_granularity': 'yearly',
+            'model_id': pred['quarterly_model_id']  # 因为年是从季聚合来的
+        },
+        'prediction_results': {
+            'historical_data': yearly_hist,
+            'future_predictions': yearly_futu
+        }
+    }
+
+
+def _task_error(i, pred, exc, tb=None):
+    return {
+        'task_index': i,
+        'error_message': str(exc),
+        'error_type': type(exc).__name__,
+        'traceback': tb or traceback.format_exc(),
+        'request': pred
+    }
+
+
+def run_forecast_tasks(predictions, target_granularity, months, q_periods, task_timeout=None, use_snapshots=True):
+    """
+    并发执行批量预测任务
+
+    - 与预测快照（ForecastSnapshot）参数一致的任务直接返回快照结果
+    - 其余任务（含层级对齐的月度/季度两次预测）一次性提交到执行池并发运行
+    - 结果按 task_index 顺序返回，单个任务失败或超时不影响其他任务
+    - 超时从任务提交时计时（各任务的截止时间互相独立，整批请求最多阻塞约 task_timeout 秒）；
+      超时任务中尚未开始的预测被取消，已开始执行的预测无法中止，记为卡住的任务；
+      卡住的任务达到 FORECAST_EXECUTOR['MAX_STUCK'] 个时，下次请求回收并重建执行池（见 get_forecast_executor）
+
+    Args:
+        predictions (list): 预测任务列表
+        target_granularity (str): 目标粒度
+        months (int): 月度预测期数
+        q_periods (int): 季度预测期数
+        task_timeout (float): 单任务超时秒数，默认读取 settings.FORECAST_EXECUTOR['TASK_TIMEOUT']
+        use_snapshots (bool): 是否读取预测快照（计算快照时为 False）
+    Returns:
+        list: 与 predictions 顺序一致的结果
+    """
+    from .forecast_snapshots import find_snapshots
+
+    if task_timeout is None:
+        task_timeout = _executor_conf()['TASK_TIMEOUT']
+    executor = get_forecast_executor()
+
+    snapshots = {}
+    if use_snapshots:
+        try:
+            snapshots = find_snapshots(predictions, target_granularity, months)
+        except Exception:
+            traceback.print_exc()
+
+    # 1. 校验并提交（命中快照的任务不再执行）
+    submitted = []
+    for i, pred in enumerate(predictions):
+        if i in snapshots:
+            continue
+        try:
+            units = build_forecast_units(pred, months, q_periods)
+            deadline = time.monotonic() + task_timeout
+            futures = [executor.submit(_run_forecast_unit, unit) for unit in units]
+            submitted.append((i, pred, futures, deadline, None))
+        except Exception as e:
+            submitted.append((i, pred, None, None, _task_error(i, pred, e)))
+
+    # 2. 收集各预测结果：每个任务只等待到自己的截止时间
+    collected = []
+    for i, pred, futures, deadline, error in submitted:
+        if error is not None:
+            collected.append((i, pred, None, error))
+            continue
+        _, not_done = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+        if not_done:
+            # 只能取消尚未开始的预测，已在运行的记为卡住，累计过多时回收执行池
+            for future in not_done:
+                future.cancel()
+            _mark_stuck(not_done)
+            collected.append((i, pred, None, _task_error(
+                i, pred, TimeoutError(f'预测任务超时（{task_timeout} 秒）'), tb=''
+            )))
+            continue
+        try:
+            responses = [future.result() for future in futures]
+            collected.append((i, pred, responses, None))
+        except Exception as e:
+            collected.append((i, pred, None, _task_error(i, pred, e)))
+
+    # 3. 层级对齐任务合并为批量计算；批量失败时退回逐任务计算，错误只影响对应任务
+    reconcile_items = [
+        (i, pred, responses[0], responses[1])
+        for i, pred, responses, error in collected
+        if error is None and int(pred.get('hierarchy_reconcile', 0)) != 0
+    ]
+    reconciled = {}
+    if reconcile_items:
+        try:
+            reconciled = reconcile_tasks_batch(reconcile_items)
+        except Exception:
+            traceback.print_exc()
+
+    # 4. 按 task_index 顺序组装结果
+    results = [
+        {'task_index': i, 'hierarchy_reconcile': 1 if int(predictions[i].get('hierarchy_reconcile', 0)) else 0, 'data': data}
+        for i, data in snapshots.items()
+    ]
+    for i, pred, responses, error in collected:
+        if error is not None:
+            results.append(error)
+            continue
+        try:
+            hierarchy_reconcile = int(pred.get('hierarchy_reconcile', 0))
+            if hierarchy_reconcile == 0:
+                data = responses[0]
+            else:
+                data = reconcile_task_result(
+                    pred, responses[0], responses[1], target_granularity, df_m_rec=reconciled.get(i)
+                )
+            results.append({
+                'task_index': i,
+                'hierarchy_reconcile': 1 if hierarchy_reconcile else 0,
+                'data': data
+            })
+        except Exception as e:
+            results.append(_task_error(i, pred, e))
+
+    results.sort(key=lambda r: r['task_index'])
+    return results
+
+
+# ================== 多航线批量预测 ==================
+
+def resolve_batch_routes(routes, time_granularity, prediction_periods):
+    """
+    为批量预测的航线匹配模型并构建预测请求
+
+    Args:
+        routes (list|None): [{"origin_airport", "destination_airport", "model_id"(可选)}]；
+            未指定 model_id 时使用该航线该粒度下最新训练的模型；为 None 时取该粒度下所有已有模型的航线
+        time_granularity (str): 时间粒度
+        prediction_periods (int): 预测期数
+    Returns:
+        list: 与航线顺序一致的 (航线, 预测请求或 None, 错误信息或 None)
+    """
+    from .models import RouteModelInfo
+
+    if routes is None:
+        wanted = None
+        routes = []
+    else:
+        wanted = {(r['origin_airport'].upper(), r['destination_airport'].upper()) for r in routes}
+
+    # 显式指定的模型一次查询
+    explicit_ids = [r['model_id'] for r in routes if r.get('model_id')]
+    explicit = RouteModelInfo.objects.in_bulk(explicit_ids) if explicit_ids else {}
+
+    # 各航线最新模型：按航线 + 训练时间倒序，取每条航线的第一条
+    latest = {}
+    qs = RouteModelInfo.objects.filter(time_granularity=time_granularity).order_by(
+        'origin_airport', 'destination_airport', '-train_datetime'
+    )
+    if wanted is not None:
+        qs = qs.filter(
+            origin_airport__in={o for o, _ in wanted},
+            destination_airport__in={d for _, d in wanted},
+        )
+    for info in qs.iterator(chunk_size=2000):
+        key = (info.origin_airport, info.destination_airport)
+        if key not in latest and (wanted is None or key in wanted):
+            latest[key] = info
+
+    if wanted is None:
+        routes = [{'origin_airport': o, 'destination_airport': d} for o, d in latest]
+
+    resolved = []
+    for r in routes:
+        route = {'origin_airport': r['origin_airport'].upper(), 'destination_airport': r['destination_airport'].upper()}
+        key = (route['origin_airport'], route['destination_airport'])
+        if r.get('model_id'):
+            info = explicit.get(r['model_id'])
+            if info is None:
+                resolved.append((route, None, f"未找到模型ID: {r['model_id']}"))
+                continue
+        else:
+            info = latest.get(key)
+            if info is None:
+                resolved.append((route, None, f"航线 {key[0]}-{key[1]} 没有 {time_granularity} 粒度的模型"))
+                continue
+        resolved.append((route, {
+            **route,
+            'time_granularity': time_granularity,
+            'prediction_periods': prediction_periods,
+            'model_id': info.model_id,
+            'model_info': info,
+        }, None))
+    return resolved
+
+
+def run_batch_forecast(routes, time_granularity, prediction_periods):
+    """
+    多航线批量预测（按预测步同步推进全部航线，见 predictive_algorithm.batch_forecast）
+
+    Returns:
+        list: [{"route": {...}, "success": bool, "data" | "error": ...}]，与航线顺序一致
+    """
+    from .predictive_algorithm.batch_forecast import predict_routes_batch
+
+    resolved = resolve_batch_routes(routes, time_granularity, prediction_periods)
+    requests = [req for _, req, _ in resolved if req is not None]
+    outputs = iter(predict_routes_batch(requests))
+
+    results = []
+    for route, req, error in resolved:
+        if req is None:
+            results.append({'route': route, 'success': False, 'error': error})
+        else:
+            results.append({'route': route, **next(outputs)})
+    return results
@@ -0,0 +1,227 @@
+"""
+预测快照
+
+正式训练生成 RouteModelInfo 后，按 settings.FORECAST_SNAPSHOTS['HORIZONS'] 预先计算标准预测期，写入 ForecastSnapshot：
+- 模型自身粒度的非对齐预测（如月度模型 12/24/36 个月）
+- 与同航线最新的另一粒度模型（月度 <-> 季度）配对的层级对齐结果，按月度/季度/年度三个目标粒度分别保存
+
+forecast_route_view 的任务参数与快照一致（且未指定经济尾部参数）时直接返回快照，不再运行模型。
+模型文件不会被原地改写（重新训练生成新的 model_id），删除模型时快照随外键级联删除。
+
+训练后的计算作为 TrainingJob（job_type=snapshot）提交，由 run_training_jobs 执行器运行，
+进度、失败和重启后的重新领取与训练任务相同；补算或重建使用 build_forecast_snapshots 命令同步执行。
+"""
+import math
+import traceback
+from collections import defaultdict
+
+from django.conf import settings
+
+from .forecast_service import run_forecast_tasks, MINT_ALGOS
+
+
+# 各目标粒度一期对应的月数
+GRANULARITY_MONTHS = {'monthly': 1, 'quarterly': 3, 'yearly': 12}
+
+
+def _conf():
+    conf = getattr(settings, 'FORECAST_SNAPSHOTS', {}) or {}
+    return {
+        'ENABLED': conf.get('ENABLED', False),
+        'HORIZONS': conf.get('HORIZONS', {'monthly': [12, 24, 36], 'quarterly': [4, 8], 'yearly': [3]}),
+        'RECONCILE_ALGOS': conf.get('RECONCILE_ALGOS', ['linear']),
+    }
+
+
+def snapshot_key(origin, destination, model_id, target_granularity, prediction_periods,
+                 paired_model_id='', reconcile_method=''):
+    return '|'.join([
+        f"{origin}-{destination}", str(model_id), str(paired_model_id or ''), reconcile_method,
+        target_granularity, str(prediction_periods),
+    ])
+
+
+def _default_economics(pred):
+    """快照只按默认经济尾部处理计算"""
+    return not (pred.get('economic_tail_method') or '').strip() and pred.get('economic_growth_rate') in (None, '')
+
+
+def request_snapshot_key(pred, target_granularity, months):
+    """
+    预测任务对应的快照键；任务指定了经济尾部参数或参数不完整时返回 None
+
+    Args:
+        pred: forecast_route_view 的单个预测任务
+        target_granularity / months: 与 run_forecast_tasks 的参数一致
+    """
+    if not _default_economics(pred):
+        return None
+    origin = str(pred.get('origin_airport', '')).upper()
+    destination = str(pred.get('destination_airport', '')).upper()
+
+    if int(pred.get('hierarchy_reconcile', 0)) == 0:
+        periods = pred.get('prediction_periods')
+        if not pred.get('model_id') or not isinstance(periods, int):
+            return None
+        return snapshot_key(origin, destination, pred['model_id'], pred.get('time_granularity'), periods)
+
+    factor = GRANULARITY_MONTHS.get(target_granularity)
+    if not factor or not pred.get('monthly_model_id') or not pred.get('quarterly_model_id') or months % factor:
+        return None
+    method = MINT_ALGOS.get((pred.get('reconcile_algo') or 'linear').lower(), 'linear')
+    return snapshot_key(origin, destination, pred['monthly_model_id'], target_granularity, months // factor,
+                        pred['quarterly_model_id'], method)
+
+
+def find_snapshots(predictions, target_granularity, months):
+    """
+    一次查询命中快照的任务
+
+    Returns:
+        dict: task_index -> 快照中的预测结果
+    """
+    from .models import ForecastSnapshot
+
+    if not _conf()['ENABLED']:
+        return {}
+
+    keys = {}
+    for i, pred in enumerate(predictions):
+        try:
+            key = request_snapshot_key(pred, target_granularity, months)
+        except (TypeError, ValueError, AttributeError):
+            key = None
+        if key:
+            keys[i] = key
+    if not keys:
+        return {}
+
+    found = dict(
+        ForecastSnapshot.objects.filter(snapshot_key__in=set(keys.values())).values_list('snapshot_key', 'data')
+    )
+    return {i: found[key] for i, key in keys.items() if key in found}
+
+
+def _snapshot_tasks(route_model_info, conf):
+    """需要预计算的 (任务, 目标粒度, 预测期数, 配对模型)"""
+    from .models import RouteModelInfo
+
+    horizons = conf['HORIZONS']
+    origin = route_model_info.origin_airport
+    destination = route_model_info.destination_airport
+    granularity = route_model_info.time_granularity
+    base = {'origin_airport': origin, 'destination_airport': destination}
+
+    tasks = []
+    # 1. 模型自身粒度
+    for periods in horizons.get(granularity, []):
+        tasks.append(({
+            **base,
+            'hierarchy_reconcile': 0,
+            'time_granularity': granularity,
+            'prediction_periods': periods,
+            'model_id': route_model_info.model_id,
+        }, granularity, periods, None))
+
+    # 2. 层级对齐：与同航线最新的另一粒度模型配对
+    if granularity not in ('monthly', 'quarterly'):
+        return tasks
+    other = 'quarterly' if granularity == 'monthly' else 'monthly'
+    partner = RouteModelInfo.objects.filter(
+        origin_airport=origin, destination_airport=destination, time_granularity=other
+    ).order_by('-train_datetime').first()
+    if partner is None:
+        return tasks
+    monthly, quarterly = (route_model_info, partner) if granularity == 'monthly' else (partner, route_model_info)
+
+    for target, periods_list in horizons.items():
+        if target not in GRANULARITY_MONTHS:
+            continue
+        for periods in periods_list:
+            for algo in conf['RECONCILE_ALGOS']:
+                tasks.append(({
+                    **base,
+                    'hierarchy_reconcile': 1,
+                    'time_granularity': target,
+                    'prediction_periods': periods,
+                    'monthly_model_id': monthly.model_id,
+                    'quarterly_model_id': quarterly.model_id,
+                    'reconcile_algo': algo,
+                }, target, periods, (monthly, quarterly)))
+    return tasks
+
+
+def build_model_snapshots(route_model_info, progress_callback=None):
+    """
+    为模型预计算标准预测期快照（相同目标粒度 + 预测期数的任务合并为一次 run_forecast_tasks 并发执行）
+
+    Args:
+        progress_callback: 可选，每完成一组调用 progress_callback(进度, 说明)（训练任务执行器用于写进度和续租）
+
+    Returns:
+        dict: {'built': 写入的快照数, 'failed': 失败的任务数}
+    """
+    from .models import ForecastSnapshot
+
+    conf = _conf()
+    groups = defaultdict(list)
+    for pred, target, periods, pair in _snapshot_tasks(route_model_info, conf):
+        groups[(target, periods)].append((pred, pair))
+
+    built = failed = 0
+    for done, ((target, periods), items) in enumerate(groups.items()):
+        if progress_callback:
+            progress_callback(int(done * 100 / len(groups)), f"计算 {target} {periods} 期预测快照")
+        months = periods * GRANULARITY_MONTHS[target]
+        q_periods = max(1, math.ceil(months / 3))
+        results = run_forecast_tasks([pred for pred, _ in items], target, months, q_periods, use_snapshots=False)
+
+        for (pred, pair), result in zip(items, results):
+            if 'data' not in result:
+                failed += 1
+                print(f"⚠️ 预测快照计算失败 {pred}: {result.get('error_message')}")
+                continue
+            route_model, paired_model = pair if pair else (route_model_info, None)
+            hierarchy_reconcile = pair is not None
+            ForecastSnapshot.objects.update_or_create(
+                snapshot_key=request_snapshot_key(pred, target, months),
+                defaults={
+                    'route_model': route_model,
+                    'paired_model': paired_model,
+                    'origin_airport': route_model_info.origin_airport,
+                    'destination_airport': route_model_info.destination_airport,
+                    'hierarchy_reconcile': hierarchy_reconcile,
+                    'reconcile_method': MINT_ALGOS.get(pred['reconcile_algo'].lower(), 'linear')
+                    if hierarchy_reconcile else '',
+                    'target_granularity': target,
+                    'prediction_periods': periods,
+                    'data': result['data'],
+                }
+            )
+            built += 1
+
+    print(f"模型 {route_model_info.model_id} 预测快照完成：写入 {built} 个，失败 {failed} 个")
+    return {'built': built, 'failed': failed}
+
+
+def precompute_after_training(route_model_info):
+    """
+    正式训练后的可选阶段（settings.FORECAST_SNAPSHOTS['ENABLED']）：提交预测快照任务，失败不影响训练结果
+
+    Returns:
+        TrainingJob: 提交的任务；未启用或提交失败时为 None
+    """
+    if not _conf()['ENABLED']:
+        return None
+
+    from .models import TrainingJob
+    from .jobs import submit_job
+
+    try:
+        return submit_job(
+            TrainingJob.JOB_SNAPSHOT, {'model_id': route_model_info.model_id}, route_model=route_model_info
+        )
+    except Exception:
+        print(f"⚠️ 模型 {route_model_info.model_id} 预测快照任务提交失败")
+        traceback.print_exc()
+        return None
@@ -0,0 +1,230 @@
+"""
+OAG 数据按月增量导入
+
+新月份数据到达时只处理该月的 capacity / connection / mix 文件：
+    清洗（DataCleaner.process_month） -> 覆盖写入 FlightMarketRecord / RouteMonthlyStat
+    -> 删除该月已不存在的旧数据 -> 刷新看板汇总表与航线列式存储 -> 记录水位线（MonthlyIngestion）
+
+- 同一月份、同一批源文件（内容哈希一致）重复执行时直接跳过；文件有修正时整月覆盖，结果与首次导入一致
+- 所有数据库操作只涉及该月的数据，耗时与单月数据量成正比
+"""
+import os
+import re
+import hashlib
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from show.models import RouteMonthlyStat
+from show.rollups import refresh_monthly_rollups
+from .models import FlightMarketRecord, MonthlyIngestion
+from .market_loader import USECOLS, normalize_frame, upsert_market_frame
+from .predictive_algorithm.DataCleaner import DataCleaner
+from .predictive_algorithm.route_store import refresh_routes
+
+
+_YEAR_MONTH_PAT = re.compile(r'^(\d{4})-(\d{2})$')
+
+
+def parse_year_month(value):
+    """'YYYY-MM' -> (year, month)，格式错误时抛出 ValueError"""
+    m = _YEAR_MONTH_PAT.match(str(value).strip())
+    if not m or not 1 <= int(m.group(2)) <= 12:
+        raise ValueError(f"月份格式应为 YYYY-MM: {value}")
+    return int(m.group(1)), int(m.group(2))
+
+
+def get_watermark():
+    """已成功导入的最新月份（'YYYY-MM'），尚未导入过时返回 None"""
+    return (MonthlyIngestion.objects
+            .filter(status=MonthlyIngestion.STATUS_SUCCESS)
+            .order_by('-year_month')
+            .values_list('year_month', flat=True)
+            .first())
+
+
+def _file_digest(path, chunk_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def describe_sources(capacity_files, connection_files, mix_files):
+    """源文件列表（类别、文件名、内容哈希）及整体校验和"""
+    sources = []
+    for kind, paths in (('capacity', capacity_files), ('connection', connection_files), ('mix', mix_files)):
+        for path in sorted(paths):
+            sources.append({'kind': kind, 'name': os.path.basename(path), 'sha256': _file_digest(path)})
+    checksum = hashlib.sha256(
+        '\n'.join(f"{s['kind']}:{s['name']}:{s['sha256']}" for s in sources).encode('utf-8')
+    ).hexdigest()
+    return sources, checksum
+
+
+def _ingestion_conf():
+    return getattr(settings, 'DATA_INGESTION', {}) or {}
+
+
+def clean_month(year_month, capacity_files, connection_files, mix_files, airport_file=None, economy_file=None):
+    """在独立的临时目录中清洗单月数据，返回该月的最终数据（CSV 列名）"""
+    conf = _ingestion_conf()
+    airport_file = airport_file or conf.get('AIRPORT_FILE')
+    economy_file = economy_file or conf.get('ECONOMY_FILE')
+    work_root = conf.get('WORK_DIR')
+    if work_root:
+        Path(work_root).mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(prefix=f"ingest_{year_month}_", dir=work_root) as work_dir:
+        cleaner = DataCleaner(
+            airport_file=str(airport_file),
+            economy_file=str(economy_file),
+            capacity_input_folder=None,
+            connection_input_folder=None,
+            mix_input_folder=None,
+            final_output_file=None,
+            capacity_output_folder=os.path.join(work_dir, 'capacity'),
+            connection_output_folder=os.path.join(work_dir, 'connection'),
+            mix_output_folder=os.path.join(work_dir, 'mix'),
+        )
+        df = cleaner.process_month(year_month, capacity_files, connection_files, mix_files)
+    return df[df['YearMonth'].astype(str) == year_month].reset_index(drop=True)
+
+
+def _delete_stale_market_rows(year_month, written, chunk_size=1000):
+    """删除该月数据库中存在、但本次数据中已没有的（航线, 机型）记录"""
+    keep = set(written[['origin', 'destination', 'equipment']].itertuples(index=False, name=None))
+    stale_ids, stale_routes = [], set()
+    existing = FlightMarketRecord.objects.filter(year_month=year_month).values_list(
+        'id', 'origin', 'destination', 'equipment'
+    )
+    for pk, origin, destination, equipment in existing:
+        if (origin, destination, equipment) not in keep:
+            stale_ids.append(pk)
+            stale_routes.add((origin, destination))
+    for i in range(0, len(stale_ids), chunk_size):
+        FlightMarketRecord.objects.filter(id__in=stale_ids[i:i + chunk_size]).delete()
+    return len(stale_ids), stale_routes
+
+
+def _safe_float(val):
+    return float(val) if pd.notna(val) else None
+
+
+def _safe_int(val):
+    return int(val) if pd.notna(val) else None
+
+
+def upsert_route_stats(year, month, df, batch_size=1000):
+    """
+    覆盖写入该月的 RouteMonthlyStat（与 data_utils/import_routes.py 取值一致：每条航线取第一行的航线级指标），
+    并删除该月本次数据中已没有的航线
+
+    :return: (写入行数, 删除行数)
+    """
+    df = df[pd.notna(df['Origin']) & pd.notna(df['Destination'])]
+    df = df.drop_duplicates(subset=['Origin', 'Destination'])
+
+    objs = [
+        RouteMonthlyStat(
+            origin_code=str(row['Origin']).strip(),
+            destination_code=str(row['Destination']).strip(),
+            year=year,
+            month=month,
+            passenger_volume=_safe_float(row.get('Con Total Est. Pax')),
+            Route_Total_Seats=_safe_float(row.get('Route_Total_Seats')),
+            Route_Total_Flights=_safe_int(row.get('Route_Total_Flights')),
+        )
+        for _, row in df.iterrows()
+    ]
+
+    # MySQL 的 ON DUPLICATE KEY UPDATE 不能指定冲突列，其他数据库必须指定
+    conflict_kwargs = {}
+    if connection.features.supports_update_conflicts_with_target:
+        conflict_kwargs['unique_fields'] = ['origin_code', 'destination_code', 'year', 'month']
+    RouteMonthlyStat.objects.bulk_create(
+        objs,
+        batch_size=batch_size,
+        update_conflicts=True,
+        update_fields=['passenger_volume', 'Route_Total_Seats', 'Route_Total_Flights'],
+        **conflict_kwargs,
+    )
+
+    keep = {(o.origin_code, o.destination_code) for o in objs}
+    stale_ids = [
+        pk for pk, origin, destination in
+        RouteMonthlyStat.objects.filter(year=year, month=month).values_list('id', 'origin_code', 'destination_code')
+        if (origin, destination) not in keep
+    ]
+    for i in range(0, len(stale_ids), batch_size):
+        RouteMonthlyStat.objects.filter(id__in=stale_ids[i:i + batch_size]).delete()
+    return len(objs), len(stale_ids)
+
+
+def ingest_month(year_month, capacity_files, connection_files, mix_files,
+                 airport_file=None, economy_file=None, force=False):
+    """
+    导入单月数据
+
+    :param year_month: 'YYYY-MM'
+    :param force: 源文件未变化时也重新导入
+    :return: MonthlyIngestion 记录
+    """
+    year, month = parse_year_month(year_month)
+    year_month = f"{year:04d}-{month:02d}"
+    sources, checksum = describe_sources(capacity_files, connection_files, mix_files)
+
+    record, _ = MonthlyIngestion.objects.get_or_create(year_month=year_month)
+    if (not force and record.status == MonthlyIngestion.STATUS_SUCCESS
+            and record.source_checksum == checksum):
+        print(f"⏭️ {year_month} 已使用相同源文件导入过，跳过（使用 force 重新导入）")
+        return record
+
+    record.status = MonthlyIngestion.STATUS_RUNNING
+    record.source_files = sources
+    record.source_checksum = checksum
+    record.error = None
+    record.started_at = timezone.now()
+    record.finished_at = None
+    record.save()
+
+    try:
+        print(f"🧹 清洗 {year_month} 数据...")
+        df = clean_month(year_month, capacity_files, connection_files, mix_files, airport_file, economy_file)
+        if df.empty:
+            raise ValueError(f"{year_month} 清洗后没有数据")
+
+        print(f"📦 写入航线市场数据：{len(df)} 条")
+        written = upsert_market_frame(normalize_frame(df.reindex(columns=USECOLS)))
+        market_removed, stale_routes = _delete_stale_market_rows(year_month, written)
+
+        print("📦 写入航线月度统计...")
+        route_rows, route_removed = upsert_route_stats(year, month, df)
+
+        # 刷新下游：看板汇总表（该月）、航线列式存储（本月涉及的航线）
+        refresh_monthly_rollups({(year, month)})
+        routes = set(written[['origin', 'destination']].itertuples(index=False, name=None)) | stale_routes
+        refresh_routes(sorted(routes))
+    except Exception as e:
+        record.status = MonthlyIngestion.STATUS_FAILED
+        record.error = str(e)
+        record.finished_at = timezone.now()
+        record.save(update_fields=['status', 'error', 'finished_at'])
+        raise
+
+    record.status = MonthlyIngestion.STATUS_SUCCESS
+    record.market_rows = len(written)
+    record.market_removed = market_removed
+    record.route_rows = route_rows
+    record.route_removed = route_removed
+    record.finished_at = timezone.now()
+    record.save()
+    print(f"🎉 {year_month} 导入完成：航线市场数据 {len(written)} 条（删除 {market_removed} 条），"
+          f"航线月度统计 {route_rows} 条（删除 {route_removed} 条）")
+    return record
@@ -0,0 +1,369 @@
+import os
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import TrainingJob, PretrainRecord, RouteModelInfo
+from .training_service import (
+    clean_nan_values, run_pretrain, run_formal_train, create_route_model_info, run_hyperparameter_search
+)
+from .forecast_snapshots import precompute_after_training, build_model_snapshots
+from .predictive_algorithm.pretrain_single_route import TrainingCancelled
+
+
+def _lease_conf():
+    conf = getattr(settings, 'TRAINING_JOBS', {}) or {}
+    return {
+        'LEASE_SECONDS': conf.get('LEASE_SECONDS', 300),
+        'MAX_ATTEMPTS': conf.get('MAX_ATTEMPTS', 3),
+    }
+
+
+# 超参数搜索任务 payload 中传给 run_hyperparameter_search 的参数
+SEARCH_OPTIONS = ('strategy', 'space', 'n_trials', 'workers', 'eta', 'min_resource', 'metric', 'seed', 'max_grid_trials')
+
+
+def _search_workers():
+    conf = getattr(settings, 'TRAINING_JOBS', {}) or {}
+    return conf.get('SEARCH_WORKERS', 2)
+
+
+def _lease_deadline():
+    return timezone.now() + timedelta(seconds=_lease_conf()['LEASE_SECONDS'])
+
+
+def submit_job(job_type, payload, pretrain_record=None, route_model=None):
+    """
+    创建排队中的训练任务
+
+    Args:
+        job_type (str): TrainingJob.JOB_PRETRAIN / JOB_FORMAL / JOB_SNAPSHOT / JOB_SEARCH
+        payload (dict): 任务参数
+        pretrain_record (PretrainRecord): 正式训练使用的预训练记录
+        route_model (RouteModelInfo): 预测快照任务计算的模型
+    Returns:
+        TrainingJob
+    """
+    return TrainingJob.objects.create(
+        job_type=job_type,
+        payload=payload,
+        pretrain_record=pretrain_record,
+        route_model=route_model,
+        message="排队中"
+    )
+
+
+def cancel_job(job):
+    """
+    取消训练任务：排队中的任务直接取消，运行中的任务在下一个进度检查点中止
+
+    Returns:
+        TrainingJob: 刷新后的任务
+    """
+    now = timezone.now()
+    cancelled = TrainingJob.objects.filter(id=job.id, status=TrainingJob.STATUS_PENDING).update(
+        status=TrainingJob.STATUS_CANCELLED,
+        cancel_requested=True,
+        message="任务已取消",
+        finished_at=now
+    )
+    if not cancelled:
+        TrainingJob.objects.filter(id=job.id, status=TrainingJob.STATUS_RUNNING).update(
+            cancel_requested=True,
+            message="正在取消"
+        )
+    job.refresh_from_db()
+    return job
+
+
+def claim_jobs(limit):
+    """
+    按创建时间顺序领取排队中的任务（条件更新保证多个执行进程不会重复领取），领取时写入租约
+
+    Returns:
+        list: 领取到的任务ID
+    """
+    if limit <= 0:
+        return []
+    candidates = TrainingJob.objects.filter(
+        status=TrainingJob.STATUS_PENDING
+    ).order_by('created_at').values_list('id', flat=True)[:limit]
+
+    claimed = []
+    for job_id in list(candidates):
+        updated = TrainingJob.objects.filter(
+            id=job_id, status=TrainingJob.STATUS_PENDING, cancel_requested=False
+        ).update(
+            status=TrainingJob.STATUS_RUNNING,
+            started_at=timezone.now(),
+            lease_until=_lease_deadline(),
+            attempts=F('attempts') + 1,
+            message="等待执行"
+        )
+        if updated:
+            claimed.append(job_id)
+    return claimed
+
+
+def renew_leases(job_ids):
+    """为本执行器正在运行的任务续期（执行器主循环每轮调用一次，作为心跳）"""
+    if not job_ids:
+        return 0
+    return TrainingJob.objects.filter(
+        id__in=list(job_ids), status=TrainingJob.STATUS_RUNNING
+    ).update(lease_until=_lease_deadline())
+
+
+def reclaim_expired_jobs():
+    """
+    回收租约已过期的运行中任务（执行器崩溃或被杀死后不再续期）
+
+    - 已请求取消的任务标记为已取消
+    - 领取次数达到 TRAINING_JOBS['MAX_ATTEMPTS'] 的任务标记为失败，避免反复拖垮执行器
+    - 其余任务重新排队，由任一执行器再次领取
+
+    Returns:
+        int: 回收的任务数
+    """
+    conf = _lease_conf()
+    now = timezone.now()
+    # 没有租约的运行中任务（租约字段加入前领取的）按开始时间判断
+    expired = TrainingJob.objects.filter(status=TrainingJob.STATUS_RUNNING).filter(
+        Q(lease_until__lt=now) |
+        Q(lease_until__isnull=True, started_at__lt=now - timedelta(seconds=conf['LEASE_SECONDS']))
+    ).values_list('id', 'lease_until', 'attempts', 'cancel_requested')
+
+    reclaimed = 0
+    for job_id, lease_until, attempts, cancel_requested in list(expired):
+        if cancel_requested:
+            updates = {'status': TrainingJob.STATUS_CANCELLED, 'message': '任务已取消', 'finished_at': now}
+        elif attempts >= conf['MAX_ATTEMPTS']:
+            message = f'执行器租约过期，已领取 {attempts} 次，不再重试'
+            updates = {'status': TrainingJob.STATUS_FAILED, 'message': message, 'error': message, 'finished_at': now}
+        else:
+            updates = {'status': TrainingJob.STATUS_PENDING, 'message': '执行器租约过期，重新排队', 'progress': 0}
+        # 条件更新：租约在此期间被续期（执行器仍在运行）时不回收
+        reclaimed += TrainingJob.objects.filter(
+            id=job_id, status=TrainingJob.STATUS_RUNNING, lease_until=lease_until
+        ).update(lease_until=None, worker_pid=None, **updates)
+    return reclaimed
+
+
+def fail_job(job_id, message, error=None):
+    """将任务标记为失败（用于执行进程异常退出等无法在任务内部处理的情况）"""
+    TrainingJob.objects.filter(id=job_id).exclude(
+        status__in=TrainingJob.FINISHED_STATUSES
+    ).update(
+        status=TrainingJob.STATUS_FAILED,
+        message=message,
+        error=error or message,
+        finished_at=timezone.now()
+    )
+
+
+def _make_progress_callback(job_id, attempt):
+    """
+    进度回调：写入进度并续租；若任务已被请求取消，或租约过期后已被回收（领取次数变化），则抛出 TrainingCancelled
+    """
+    def callback(progress, message):
+        updated = TrainingJob.objects.filter(
+            id=job_id, status=TrainingJob.STATUS_RUNNING, attempts=attempt, cancel_requested=False
+        ).update(
+            progress=progress,
+            message=message,
+            lease_until=_lease_deadline()
+        )
+        if not updated:
+            raise TrainingCancelled(f"训练任务 {job_id} 已被取消或已被回收")
+    return callback
+
+
+def _execute_pretrain(job, progress_callback):
+    payload = job.payload or {}
+    origin = payload.get('origin', '')
+    destination = payload.get('destination', '')
+    config = payload.get('config', {})
+
+    pretrain_record, success, result = run_pretrain(origin, destination, config, progress_callback=progress_callback)
+
+    if success:
+        cleaned_result = clean_nan_values(result) if isinstance(result, dict) else result
+        return {
+            'status': TrainingJob.STATUS_SUCCESS,
+            'progress': 100,
+            'message': f'航线 {origin}-{destination} 模型训练成功',
+            'pretrain_record': pretrain_record,
+            'result': {'record_id': pretrain_record.id, 'training_result': cleaned_result}
+        }
+    return {
+        'status': TrainingJob.STATUS_FAILED,
+        'message': f'航线 {origin}-{destination} 模型训练失败',
+        'error': str(result),
+        'pretrain_record': pretrain_record,
+        'result': {'record_id': pretrain_record.id}
+    }
+
+
+def _execute_formal(job, progress_callback):
+    payload = job.payload or {}
+    pretrain_record = job.pretrain_record
+    if pretrain_record is None:
+        pretrain_record = PretrainRecord.objects.get(id=payload.get('pretrain_record_id'))
+    origin = pretrain_record.origin
+    destination = pretrain_record.destination
+
+    success, result = run_formal_train(pretrain_record, progress_callback=progress_callback)
+
+    if not success:
+        return {
+            'status': TrainingJob.STATUS_FAILED,
+            'message': f'航线 {origin}-{destination} 正式训练失败',
+            'error': str(result)
+        }
+
+    route_model_info = create_route_model_info(pretrain_record, payload.get('remark', ''), result)
+    # 可选：提交预测快照任务（失败不影响任务结果）
+    snapshot_job = precompute_after_training(route_model_info)
+    return {
+        'status': TrainingJob.STATUS_SUCCESS,
+        'progress': 100,
+        'message': f'航线 {origin}-{destination} 正式训练成功',
+        'route_model': route_model_info,
+        'result': {
+            'model_id': route_model_info.model_id,
+            'route_model_info_id': route_model_info.model_id,
+            'pretrain_record_updated': True,
+            'snapshot_job_id': snapshot_job.id if snapshot_job else None
+        }
+    }
+
+
+def _execute_snapshot(job, progress_callback):
+    route_model_info = job.route_model
+    if route_model_info is None:
+        route_model_info = RouteModelInfo.objects.get(model_id=(job.payload or {}).get('model_id'))
+
+    stats = build_model_snapshots(route_model_info, progress_callback=progress_callback)
+
+    message = f"模型 {route_model_info.model_id} 预测快照：写入 {stats['built']} 个，失败 {stats['failed']} 个"
+    if stats['failed'] and not stats['built']:
+        return {'status': TrainingJob.STATUS_FAILED, 'message': message, 'error': message, 'result': stats}
+    return {'status': TrainingJob.STATUS_SUCCESS, 'progress': 100, 'message': message, 'result': stats}
+
+
+def _clean_nested(value):
+    """逐层清理嵌套结构中的 nan / inf 和 numpy 数值（搜索摘要中含各试验的指标字典）"""
+    if isinstance(value, dict):
+        return clean_nan_values({key: _clean_nested(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return [_clean_nested(item) for item in value]
+    return value
+
+
+def _execute_search(job, progress_callback):
+    payload = job.payload or {}
+    origin = payload.get('origin', '')
+    destination = payload.get('destination', '')
+    options = {key: payload[key] for key in SEARCH_OPTIONS if payload.get(key) is not None}
+    options.setdefault('workers', _search_workers())
+
+    try:
+        summary = run_hyperparameter_search(
+            origin, destination, payload.get('config', {}), progress_callback=progress_callback, **options
+        )
+    except ValueError as e:
+        return {
+            'status': TrainingJob.STATUS_FAILED,
+            'message': f'航线 {origin}-{destination} 超参数搜索失败',
+            'error': str(e)
+        }
+
+    best_record = PretrainRecord.objects.filter(id=summary['best_record_id']).first() \
+        if summary['best_record_id'] else None
+    if summary['best'] is None:
+        return {
+            'status': TrainingJob.STATUS_FAILED,
+            'message': f'航线 {origin}-{destination} 超参数搜索全部试验失败',
+            'error': f"{summary['failed']}/{summary['evaluations']} 次试验失败",
+            'result': _clean_nested(summary)
+        }
+    return {
+        'status': TrainingJob.STATUS_SUCCESS,
+        'progress': 100,
+        'message': f"航线 {origin}-{destination} 超参数搜索完成，最佳 {summary['metric']}={summary['best']['value']}",
+        'pretrain_record': best_record,
+        'result': _clean_nested(summary)
+    }
+
+
+def execute_job(job_id):
+    """
+    在执行进程中运行一个已领取的训练任务，结果写回 TrainingJob
+
+    Returns:
+        tuple: (job_id, 最终状态)
+    """
+    close_old_connections()
+    job = TrainingJob.objects.select_related('pretrain_record', 'route_model').get(id=job_id)
+    # 本次领取的序号：任务被回收并重新领取后，本进程的进度和结果不再写回
+    attempt = job.attempts
+    TrainingJob.objects.filter(id=job_id, attempts=attempt).update(worker_pid=os.getpid(), message="开始训练")
+    print(f"执行训练任务 #{job_id} [{job.job_type}] (pid={os.getpid()})")
+
+    progress_callback = _make_progress_callback(job_id, attempt)
+    try:
+        if job.job_type == TrainingJob.JOB_PRETRAIN:
+            updates = _execute_pretrain(job, progress_callback)
+        elif job.job_type == TrainingJob.JOB_FORMAL:
+            updates = _execute_formal(job, progress_callback)
+        elif job.job_type == TrainingJob.JOB_SNAPSHOT:
+            updates = _execute_snapshot(job, progress_callback)
+        elif job.job_type == TrainingJob.JOB_SEARCH:
+            updates = _execute_search(job, progress_callback)
+        else:
+            updates = {
+                'status': TrainingJob.STATUS_FAILED,
+                'message': '未知的任务类型',
+                'error': f'未知的任务类型: {job.job_type}'
+            }
+    except TrainingCancelled:
+        updates = {'status': TrainingJob.STATUS_CANCELLED, 'message': '任务已取消'}
+    except Exception as e:
+        traceback.print_exc()
+        updates = {
+            'status': TrainingJob.STATUS_FAILED,
+            'message': f'任务执行异常: {str(e)}',
+            'error': traceback.format_exc()
+        }
+
+    updates['finished_at'] = timezone.now()
+    updates['lease_until'] = None
+    TrainingJob.objects.filter(id=job_id, status=TrainingJob.STATUS_RUNNING, attempts=attempt).update(**updates)
+    print(f"训练任务 #{job_id} 结束: {updates['status']}")
+    close_old_connections()
+    return job_id, updates['status']
+
+
+def job_to_dict(job):
+    """序列化训练任务"""
+    return {
+        'job_id': job.id,
+        'job_type': job.job_type,
+        'status': job.status,
+        'progress': job.progress,
+        'message': job.message,
+        'payload': job.payload,
+        'result': job.result,
+        'error': job.error,
+        'cancel_requested': job.cancel_requested,
+        'attempts': job.attempts,
+        'pretrain_record_id': job.pretrain_record_id,
+        'route_model_id': job.route_model_id,
+        'created_at': job.created_at.strftime('%Y-%m-%d %H:%M:%S') if job.created_at else None,
+        'started_at': job.started_at.strftime('%Y-%m-%d %H:%M:%S') if job.started_at else None,
+        'finished_at': job.finished_at.strftime('%Y-%m-%d %H:%M:%S') if job.finished_at else None,
+    }
@@ -0,0 +1,61 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+class Command(BaseCommand):
+    help = "多航线批量预测（全网展望），默认预测该粒度下所有已有模型的航线"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--granularity', default='monthly', choices=['monthly', 'quarterly', 'yearly'],
+                            help='时间粒度')
+        parser.add_argument('--periods', type=int, default=12, help='预测期数')
+        parser.add_argument('--routes', nargs='*', default=None,
+                            help='仅预测指定航线，格式 ORIGIN-DESTINATION（如 PEK-SHA），使用各航线最新模型')
+        parser.add_argument('--output', default=None,
+                            help='结果输出文件（.json 为完整结果，.csv 为 航线/时间点/预测值 明细），不指定时只输出汇总')
+
+    def handle(self, *args, **options):
+        from predict.forecast_service import run_batch_forecast
+
+        if options['periods'] <= 0:
+            raise CommandError("--periods 必须是正整数")
+
+        routes = None
+        if options['routes']:
+            routes = []
+            for value in options['routes']:
+                parts = value.upper().split('-')
+                if len(parts) != 2 or not all(parts):
+                    raise CommandError(f"航线格式应为 ORIGIN-DESTINATION: {value}")
+                routes.append({'origin_airport': parts[0], 'destination_airport': parts[1]})
+
+        results = run_batch_forecast(routes, options['granularity'], options['periods'])
+        failed = [r for r in results if not r['success']]
+        for r in failed:
+            route = r['route']
+            self.stderr.write(f"  {route['origin_airport']}-{route['destination_airport']}: {r['error']}")
+
+        output = options['output']
+        if output:
+            if output.lower().endswith('.csv'):
+                with open(output, 'w', encoding='utf-8-sig', newline='') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(['origin_airport', 'destination_airport', 'model_id', 'time_point', 'value'])
+                    for r in results:
+                        if not r['success']:
+                            continue
+                        model_id = r['data']['model_info']['model_id']
+                        for point in r['data']['prediction_results']['future_predictions']:
+                            writer.writerow([r['route']['origin_airport'], r['route']['destination_airport'],
+                                             model_id, point['time_point'], point['value']])
+            else:
+                with open(output, 'w', encoding='utf-8') as f:
+                    json.dump(results, f, ensure_ascii=False, cls=DjangoJSONEncoder)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"批量预测完成: {len(results) - len(failed)}/{len(results)} 条航线成功"
+            + (f"，结果已写入 {output}" if output else "")
+        ))
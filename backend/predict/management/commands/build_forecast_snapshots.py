@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "为已有模型预计算预测快照（settings.FORECAST_SNAPSHOTS['HORIZONS']），用于补算或重建"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-ids', nargs='*', default=None, help='仅计算指定模型，默认全部模型')
+        parser.add_argument('--granularity', default=None, choices=['monthly', 'quarterly', 'yearly'],
+                            help='仅计算该粒度的模型')
+
+    def handle(self, *args, **options):
+        from predict.models import RouteModelInfo
+        from predict.forecast_snapshots import build_model_snapshots
+
+        qs = RouteModelInfo.objects.all()
+        if options['model_ids']:
+            qs = qs.filter(model_id__in=options['model_ids'])
+        if options['granularity']:
+            qs = qs.filter(time_granularity=options['granularity'])
+        models = list(qs)
+        if not models:
+            raise CommandError("没有符合条件的模型")
+
+        built = failed = 0
+        for info in models:
+            stats = build_model_snapshots(info)
+            built += stats['built']
+            failed += stats['failed']
+
+        self.stdout.write(self.style.SUCCESS(
+            f"预测快照计算完成: {len(models)} 个模型，写入 {built} 个快照，失败 {failed} 个"
+        ))
@@ -0,0 +1,105 @@
+import os
+import csv
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "多航线批量预训练：批量加载航线数据，进程池并行训练，批量写入 PretrainRecord"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--routes-file', type=str, default=None,
+                            help='航线列表文件（CSV 含 origin,destination 列，或 JSON 数组）')
+        parser.add_argument('--origins', nargs='*', default=None,
+                            help='按起点筛选 FlightMarketRecord 中的航线')
+        parser.add_argument('--destinations', nargs='*', default=None,
+                            help='按终点筛选 FlightMarketRecord 中的航线')
+        parser.add_argument('--all-routes', action='store_true',
+                            help='对 FlightMarketRecord 中的全部航线预训练')
+        parser.add_argument('--min-records', type=int, default=None,
+                            help='筛选航线时要求的最少记录数')
+        parser.add_argument('--time-granularity', type=str, default='monthly',
+                            choices=['yearly', 'quarterly', 'monthly'])
+        parser.add_argument('--model-type', type=str, default='lgb', choices=['lgb', 'xgb'])
+        parser.add_argument('--config', type=str, default=None,
+                            help='额外训练配置（JSON 字符串），覆盖默认配置')
+        parser.add_argument('--skip-existing', action='store_true',
+                            help='跳过已有相同粒度成功预训练记录的航线')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='并行进程数（默认读取 settings.TRAINING_JOBS["WORKERS"]）')
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='PretrainRecord 批量写入条数')
+        parser.add_argument('--load-chunk-size', type=int, default=200,
+                            help='每次从数据库加载的航线数（同时驻留内存的航线数据上限）')
+        parser.add_argument('--max-in-flight', type=int, default=None,
+                            help='同时提交到进程池的最大航线数（默认 并行进程数 * 2）')
+
+    def _read_routes_file(self, path):
+        if not os.path.exists(path):
+            raise CommandError(f"航线列表文件不存在: {path}")
+        if path.lower().endswith('.json'):
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            return [
+                {'origin': row.get('origin') or row.get('Origin'),
+                 'destination': row.get('destination') or row.get('Destination')}
+                for row in csv.DictReader(f)
+            ]
+
+    def handle(self, *args, **options):
+        from predict.models import PretrainRecord
+        from predict.training_service import resolve_bulk_routes, bulk_pretrain
+
+        default_config = {
+            'time_granularity': options['time_granularity'],
+            'model_type': options['model_type'],
+        }
+        if options['config']:
+            try:
+                default_config.update(json.loads(options['config']))
+            except json.JSONDecodeError as e:
+                raise CommandError(f"--config 不是有效的JSON: {e}")
+
+        routes = self._read_routes_file(options['routes_file']) if options['routes_file'] else None
+
+        route_filter = None
+        if options['origins'] or options['destinations'] or options['all_routes']:
+            route_filter = {
+                'origins': options['origins'],
+                'destinations': options['destinations'],
+                'min_records': options['min_records'],
+            }
+
+        if routes is None and route_filter is None:
+            raise CommandError("请通过 --routes-file、--origins/--destinations 或 --all-routes 指定航线")
+
+        tasks = resolve_bulk_routes(routes=routes, route_filter=route_filter, default_config=default_config)
+
+        if options['skip_existing']:
+            existing = set(PretrainRecord.objects.filter(success=True).values_list(
+                'origin', 'destination', 'time_granularity'
+            ))
+            tasks = [
+                (origin, destination, config) for origin, destination, config in tasks
+                if (origin, destination, config.get('time_granularity', 'monthly')) not in existing
+            ]
+
+        conf = getattr(settings, 'TRAINING_JOBS', {}) or {}
+        workers = options['workers'] or conf.get('WORKERS') or max(1, (os.cpu_count() or 2) // 2)
+
+        self.stdout.write(f"待预训练航线: {len(tasks)} 条，并行进程: {workers}")
+        summary = bulk_pretrain(
+            tasks,
+            workers=workers,
+            batch_size=options['batch_size'],
+            load_chunk_size=options['load_chunk_size'],
+            max_in_flight=options['max_in_flight'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"批量预训练完成: 共 {summary['total']} 条，成功 {summary['success']}，失败 {summary['failed']}，"
+            f"无数据 {summary['no_data']}，写入记录 {summary['records_created']} 条"
+        ))
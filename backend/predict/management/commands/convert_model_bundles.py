@@ -0,0 +1,70 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "把 AirlineModels/Existing_Models 下旧格式的模型目录（五个文件）转换为单文件模型包，并让 RouteModelInfo 指向模型包"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-ids', nargs='*', default=None, help='仅处理指定模型，默认处理全部模型目录')
+        parser.add_argument('--overwrite', action='store_true', help='重新生成已存在的模型包')
+        parser.add_argument('--no-update-db', action='store_true', help='只生成模型包，不修改 RouteModelInfo')
+        parser.add_argument('--revert', action='store_true',
+                            help='回退：RouteModelInfo 重新指向旧格式的 model.pkl（模型包文件保留）')
+
+    def handle(self, *args, **options):
+        from predict.models import RouteModelInfo
+        from predict.predictive_algorithm.model_bundle import (
+            BUNDLE_FILENAME, LEGACY_FILES, convert_model_dir, is_bundle_path
+        )
+        from predict.predictive_algorithm.predict_single_route import existing_models_dir
+
+        base_dir = existing_models_dir()
+        model_ids = set(options['model_ids'] or [])
+        infos = RouteModelInfo.objects.all()
+        if model_ids:
+            infos = infos.filter(model_id__in=model_ids)
+
+        if options['revert']:
+            reverted = 0
+            for info in infos.iterator():
+                if is_bundle_path(info.model_file_path):
+                    legacy = os.path.join(os.path.dirname(info.model_file_path), LEGACY_FILES[0])
+                    if os.path.exists(os.path.join(base_dir, legacy)):
+                        RouteModelInfo.objects.filter(model_id=info.model_id).update(model_file_path=legacy)
+                        reverted += 1
+            self.stdout.write(self.style.SUCCESS(f"已回退 {reverted} 个模型到旧格式"))
+            return
+
+        # 1. 转换模型目录（目录名即 model_id）
+        converted = skipped = failed = 0
+        for root, _dirs, files in os.walk(base_dir):
+            if not all(name in files for name in LEGACY_FILES):
+                continue
+            if model_ids and os.path.basename(root) not in model_ids:
+                continue
+            try:
+                if convert_model_dir(root, overwrite=options['overwrite']):
+                    converted += 1
+                else:
+                    skipped += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"  转换失败 {os.path.relpath(root, base_dir)}: {e}")
+
+        # 2. RouteModelInfo 指向模型包（不触发模型变更信号：模型本身未变化，预测快照仍然有效）
+        updated = 0
+        if not options['no_update_db']:
+            for info in infos.iterator():
+                if is_bundle_path(info.model_file_path):
+                    continue
+                bundle = os.path.join(os.path.dirname(info.model_file_path), BUNDLE_FILENAME)
+                if os.path.exists(os.path.join(base_dir, bundle)):
+                    RouteModelInfo.objects.filter(model_id=info.model_id).update(model_file_path=bundle)
+                    updated += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"模型包转换完成: 新生成 {converted} 个，已存在 {skipped} 个，失败 {failed} 个；"
+            f"更新 {updated} 条 RouteModelInfo"
+        ))
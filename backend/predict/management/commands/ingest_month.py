@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "按月增量导入 OAG 数据：只清洗并写入指定月份，刷新看板汇总表与航线列式存储，记录水位线"
+
+    def add_arguments(self, parser):
+        parser.add_argument('month', nargs='?', help='数据月份，格式 YYYY-MM')
+        parser.add_argument('--capacity', nargs='+', default=[], help='该月的 capacity 文件')
+        parser.add_argument('--connection', nargs='+', default=[], help='该月的 connection 文件（文件名形如 x-REGION-YYYYMM_...）')
+        parser.add_argument('--mix', nargs='+', default=[], help='该月的 mix 文件（文件名形如 x-REGION-YYYYMM_...）')
+        parser.add_argument('--airport-file', default=None, help='国内机场三字码表，默认取 settings.DATA_INGESTION')
+        parser.add_argument('--economy-file', default=None, help='城市经济数据，默认取 settings.DATA_INGESTION')
+        parser.add_argument('--force', action='store_true', help='源文件未变化时也重新导入')
+        parser.add_argument('--status', action='store_true', help='只显示当前水位线和最近的导入记录')
+
+    def handle(self, *args, **options):
+        from predict.ingestion import ingest_month, get_watermark, parse_year_month
+        from predict.models import MonthlyIngestion
+
+        if options['status']:
+            self.stdout.write(f"当前水位线: {get_watermark() or '无'}")
+            for record in MonthlyIngestion.objects.all()[:12]:
+                self.stdout.write(
+                    f"  {record.year_month}  {record.status:<8} 航线市场数据 {record.market_rows} 条，"
+                    f"航线月度统计 {record.route_rows} 条  {record.finished_at or ''}"
+                )
+            return
+
+        if not options['month']:
+            raise CommandError("请指定数据月份（YYYY-MM）")
+        try:
+            year, month = parse_year_month(options['month'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        year_month = f"{year:04d}-{month:02d}"
+        if not options['capacity']:
+            raise CommandError("请通过 --capacity 指定该月的 capacity 文件")
+
+        watermark = get_watermark()
+        if watermark and year_month < watermark:
+            self.stdout.write(self.style.WARNING(f"{year_month} 早于当前水位线 {watermark}，按补录处理"))
+
+        try:
+            record = ingest_month(
+                year_month,
+                capacity_files=options['capacity'],
+                connection_files=options['connection'],
+                mix_files=options['mix'],
+                airport_file=options['airport_file'],
+                economy_file=options['economy_file'],
+                force=options['force'],
+            )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{record.year_month} 导入状态: {record.status}，当前水位线: {get_watermark()}"
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "刷新航线数据列式存储（训练加载使用），默认按数据库全部航线重建"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--routes', nargs='*', default=None,
+                            help='仅刷新指定航线，格式 ORIGIN-DESTINATION（如 PEK-SHA）')
+        parser.add_argument('--chunk-size', type=int, default=200,
+                            help='每次查询包含的航线数')
+
+    def handle(self, *args, **options):
+        from predict.predictive_algorithm.route_store import refresh_routes, rebuild_store
+
+        if options['routes']:
+            routes = []
+            for value in options['routes']:
+                parts = value.upper().split('-')
+                if len(parts) != 2 or not all(parts):
+                    raise CommandError(f"航线格式应为 ORIGIN-DESTINATION: {value}")
+                routes.append(tuple(parts))
+            stats = refresh_routes(routes, chunk_size=options['chunk_size'])
+        else:
+            stats = rebuild_store(chunk_size=options['chunk_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"列式存储刷新完成: 写入 {stats['routes']} 条航线 / {stats['rows']} 行，移除 {stats['removed']} 条航线"
+        ))
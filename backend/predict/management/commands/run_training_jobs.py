@@ -0,0 +1,84 @@
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from predict.worker import create_process_pool
+
+
+class Command(BaseCommand):
+    help = "后台执行排队中的训练任务（预训练 / 正式训练 / 预测快照 / 超参数搜索），多进程并行"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='并行执行进程数（默认读取 settings.TRAINING_JOBS["WORKERS"]）')
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help='轮询排队任务的间隔秒数')
+        parser.add_argument('--once', action='store_true',
+                            help='处理完当前排队任务后退出')
+        parser.add_argument('--recover', action='store_true',
+                            help='启动时将遗留的运行中任务标记为失败（仅在没有其他执行进程时使用；'
+                                 '未使用时租约过期的任务也会被自动回收并重新排队）')
+
+    def handle(self, *args, **options):
+        from predict.models import TrainingJob
+        from predict.jobs import claim_jobs, execute_job, fail_job, renew_leases, reclaim_expired_jobs
+
+        conf = getattr(settings, 'TRAINING_JOBS', {}) or {}
+        workers = options['workers'] or conf.get('WORKERS') or max(1, (os.cpu_count() or 2) // 2)
+        poll_interval = options['poll_interval'] or conf.get('POLL_INTERVAL', 2.0)
+
+        if options['recover']:
+            stale = TrainingJob.objects.filter(status=TrainingJob.STATUS_RUNNING).values_list('id', flat=True)
+            for job_id in list(stale):
+                fail_job(job_id, '执行进程已退出，任务中断')
+            self.stdout.write(f"已回收 {len(stale)} 个中断任务")
+
+        self.stdout.write(f"训练任务执行器启动: workers={workers}, poll_interval={poll_interval}s")
+        pool = create_process_pool(workers)
+        running = {}  # future -> job_id
+        try:
+            while True:
+                pool_broken = False
+                for future in [f for f in running if f.done()]:
+                    job_id = running.pop(future)
+                    try:
+                        _, job_status = future.result()
+                        self.stdout.write(f"任务 #{job_id} 完成: {job_status}")
+                    except BrokenProcessPool as e:
+                        pool_broken = True
+                        fail_job(job_id, '执行进程异常退出', str(e))
+                        self.stderr.write(f"任务 #{job_id} 执行进程异常退出")
+                    except Exception as e:
+                        fail_job(job_id, f'任务执行异常: {str(e)}')
+                        self.stderr.write(f"任务 #{job_id} 执行异常: {e}")
+
+                if pool_broken:
+                    # 进程池损坏后其余任务也会失败，重建进程池继续处理后续任务
+                    for future, job_id in running.items():
+                        fail_job(job_id, '执行进程异常退出')
+                    running.clear()
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = create_process_pool(workers)
+
+                # 心跳：为本执行器运行中的任务续租；回收其他执行器崩溃后遗留的过期任务
+                renew_leases(running.values())
+                reclaimed = reclaim_expired_jobs()
+                if reclaimed:
+                    self.stdout.write(f"已回收 {reclaimed} 个租约过期的任务")
+
+                for job_id in claim_jobs(workers - len(running)):
+                    running[pool.submit(execute_job, job_id)] = job_id
+                    self.stdout.write(f"任务 #{job_id} 已提交执行")
+
+                if options['once'] and not running and \
+                        not TrainingJob.objects.filter(status=TrainingJob.STATUS_PENDING).exists():
+                    break
+
+                time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            self.stdout.write("收到中断信号，等待运行中的任务结束...")
+        finally:
+            pool.shutdown(wait=True)
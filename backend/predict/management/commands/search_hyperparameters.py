@@ -0,0 +1,113 @@
+import os
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+class Command(BaseCommand):
+    help = "单条航线超参数搜索（网格 / 随机 / 逐次减半），进程池并行试验，每次试验和最佳配置写入 PretrainRecord"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--origin', required=True, help='起点三字码')
+        parser.add_argument('--destination', required=True, help='终点三字码')
+        parser.add_argument('--time-granularity', type=str, default='monthly',
+                            choices=['yearly', 'quarterly', 'monthly'])
+        parser.add_argument('--model-type', type=str, default='lgb', choices=['lgb', 'xgb'])
+        parser.add_argument('--config', type=str, default=None,
+                            help='额外训练配置（JSON 字符串），覆盖默认配置')
+        parser.add_argument('--strategy', type=str, default='random', choices=['grid', 'random', 'halving'],
+                            help='搜索策略')
+        parser.add_argument('--space', type=str, default=None,
+                            help='参数空间（JSON 字符串或 .json 文件），如 {"max_depth": [3, 5], '
+                                 '"learning_rate": {"low": 0.01, "high": 0.2, "log": true}, "arima_order": [[1, 1, 1]]}；'
+                                 'grid 只接受候选值列表，不指定时使用内置的小规模网格')
+        parser.add_argument('--trials', type=int, default=20, help='random / halving 的候选组数')
+        parser.add_argument('--eta', type=int, default=3, help='逐次减半每轮保留 1/eta')
+        parser.add_argument('--min-resource', type=int, default=None, help='逐次减半第一轮的 n_estimators')
+        parser.add_argument('--metric', type=str, default='rmse', choices=['rmse', 'mae', 'mape', 'r2'],
+                            help='选择最佳配置的指标（有测试集时取测试集）')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--max-grid-trials', type=int, default=500, help='网格组合数上限')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='并行进程数（默认读取 settings.TRAINING_JOBS["WORKERS"]）')
+        parser.add_argument('--async', dest='submit_job', action='store_true',
+                            help='只提交超参数搜索任务（由 run_training_jobs 执行，可通过任务接口查询进度）后立即返回')
+
+    def _load_json(self, value, name):
+        try:
+            if value.lower().endswith('.json'):
+                if not os.path.exists(value):
+                    raise CommandError(f"{name} 文件不存在: {value}")
+                with open(value, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            return json.loads(value)
+        except json.JSONDecodeError as e:
+            raise CommandError(f"{name} 不是有效的JSON: {e}")
+
+    def handle(self, *args, **options):
+        from predict.training_service import run_hyperparameter_search
+
+        if options['trials'] <= 0:
+            raise CommandError("--trials 必须是正整数")
+
+        config = {
+            'time_granularity': options['time_granularity'],
+            'model_type': options['model_type'],
+        }
+        if options['config']:
+            config.update(self._load_json(options['config'], '--config'))
+        space = self._load_json(options['space'], '--space') if options['space'] else None
+
+        conf = getattr(settings, 'TRAINING_JOBS', {}) or {}
+        workers = options['workers'] or conf.get('WORKERS') or max(1, (os.cpu_count() or 2) // 2)
+
+        origin = options['origin'].upper()
+        destination = options['destination'].upper()
+        if options['submit_job']:
+            from predict.models import TrainingJob
+            from predict.jobs import submit_job
+
+            payload = {
+                'origin': origin,
+                'destination': destination,
+                'config': config,
+                'strategy': options['strategy'],
+                'space': space,
+                'n_trials': options['trials'],
+                'workers': options['workers'],
+                'eta': options['eta'],
+                'min_resource': options['min_resource'],
+                'metric': options['metric'],
+                'seed': options['seed'],
+                'max_grid_trials': options['max_grid_trials'],
+            }
+            job = submit_job(TrainingJob.JOB_SEARCH, {k: v for k, v in payload.items() if v is not None})
+            self.stdout.write(self.style.SUCCESS(f"超参数搜索任务已提交: 任务 #{job.id}"))
+            return
+
+        try:
+            summary = run_hyperparameter_search(
+                origin, destination, config,
+                strategy=options['strategy'],
+                space=space,
+                n_trials=options['trials'],
+                workers=workers,
+                eta=options['eta'],
+                min_resource=options['min_resource'],
+                metric=options['metric'],
+                seed=options['seed'],
+                max_grid_trials=options['max_grid_trials'],
+                log=self.stdout.write,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if summary['best'] is not None:
+            self.stdout.write(json.dumps(summary['best'], ensure_ascii=False, indent=2, cls=DjangoJSONEncoder))
+        self.stdout.write(self.style.SUCCESS(
+            f"超参数搜索完成: 试验 {summary['evaluations']} 次（失败 {summary['failed']}），"
+            f"试验记录 {len(summary['trial_record_ids'])} 条，最佳配置记录 ID {summary['best_record_id']}，"
+            f"元数据目录 {summary['search_dir']}"
+        ))
@@ -0,0 +1,232 @@
+"""
+航线市场数据（FlightMarketRecord）分页查询与流式导出
+
+- 键集分页：按 (year_month, id) 排序，游标记录上一页最后一行，翻页代价与页码无关
+- 流式导出：逐批键集查询 + iterator(chunk_size)，边查边写 NDJSON / CSV，不在内存中拼装完整结果
+  （MySQL 驱动不支持服务端游标，单次查询结果会整体读入，因此按批键集查询控制每批内存）
+- 列投影：fields 参数只查询需要的列
+- 机场信息走进程内机场目录（show.airport_directory），不逐行查询 AirportInfo
+"""
+import io
+import csv
+import json
+import base64
+from typing import Optional
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from show.airport_directory import build_info
+from .models import FlightMarketRecord
+
+
+# 默认返回列（与 query_flight_market 原有返回字段一致）
+DEFAULT_FIELDS = [
+    "year_month",
+    "origin", "destination",
+    "distance_km",
+    "route_total_flights", "route_total_seats",
+    "route_total_flight_time", "route_avg_flight_time",
+    "con_total_est_pax", "first", "business", "premium",
+    "full_y", "disc_y",
+    "avg_yield", "avg_first", "avg_business", "avg_premium",
+    "avg_full_y", "avg_disc_y",
+    "region",
+    "total_est_pax", "local_est_pax", "behind_est_pax",
+    "bridge_est_pax", "beyond_est_pax",
+    "avg_fare_usd", "local_fare", "behind_fare",
+    "bridge_fare", "beyond_fare",
+    "o_gdp", "o_population", "third_industry_x",
+    "o_revenue", "o_retail", "o_labor", "o_air_traffic",
+    "d_gdp", "d_population", "third_industry_y",
+    "d_revenue", "d_retail", "d_labor", "d_air_traffic",
+]
+
+# 允许投影的列：模型全部业务字段（不含主键和时间戳技术字段）
+ALLOWED_FIELDS = [
+    f.name for f in FlightMarketRecord._meta.concrete_fields
+    if f.name not in ("id", "created_at", "updated_at")
+]
+
+MAX_PAGE_SIZE = 5000
+
+
+def _to_year_month(s: Optional[str]):
+    if not s:
+        return None
+    s = s.strip()
+    return s[:7] if len(s) >= 7 else s
+
+
+def _split_codes(value):
+    return [x.strip().upper() for x in value.split(",") if x.strip()]
+
+
+def parse_fields(value):
+    """解析 fields 参数（逗号分隔），未传时返回默认列；存在未知列时抛出 ValueError"""
+    if not value:
+        return list(DEFAULT_FIELDS)
+    fields = [x.strip() for x in value.split(",") if x.strip()]
+    unknown = [f for f in fields if f not in ALLOWED_FIELDS]
+    if unknown:
+        raise ValueError(f"未知字段: {', '.join(unknown)}")
+    return fields
+
+
+def build_market_queryset(params):
+    """
+    按请求参数构建过滤后的 FlightMarketRecord 查询集
+
+    支持参数（均可选）：origin / destination（逗号分隔三字码）、start_date / end_date（YYYY-MM[-DD]）、region
+    """
+    qs = FlightMarketRecord.objects.all()
+
+    origin = params.get("origin")
+    destination = params.get("destination")
+    region = params.get("region")
+    if origin:
+        qs = qs.filter(origin__in=_split_codes(origin))
+    if destination:
+        qs = qs.filter(destination__in=_split_codes(destination))
+    if region:
+        qs = qs.filter(region=region)
+
+    start_month = _to_year_month(params.get("start_date"))
+    end_month = _to_year_month(params.get("end_date"))
+    if start_month:
+        qs = qs.filter(year_month__gte=start_month)
+    if end_month:
+        qs = qs.filter(year_month__lte=end_month)
+    return qs
+
+
+# ---- 键集游标 ----
+
+def encode_cursor(year_month, pk):
+    raw = json.dumps([year_month, pk], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """游标 -> (year_month, id)，格式错误时抛出 ValueError"""
+    try:
+        year_month, pk = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+        return str(year_month), int(pk)
+    except Exception:
+        raise ValueError("无效的分页游标")
+
+
+def _after_cursor(qs, cursor):
+    if not cursor:
+        return qs
+    year_month, pk = cursor
+    return qs.filter(Q(year_month__gt=year_month) | Q(year_month=year_month, id__gt=pk))
+
+
+def fetch_page(qs, fields, cursor=None, page_size=1000):
+    """
+    取一页数据
+
+    :return: (rows, next_cursor)，rows 为字典列表（不含 id），没有下一页时 next_cursor 为 None
+    """
+    select = ["id", "year_month"] + [f for f in fields if f != "year_month"]
+    page = list(
+        _after_cursor(qs, cursor)
+        .order_by("year_month", "id")
+        .values(*select)[:page_size + 1]
+    )
+    has_more = len(page) > page_size
+    page = page[:page_size]
+    next_cursor = None
+    if has_more and page:
+        last = page[-1]
+        next_cursor = encode_cursor(last["year_month"], last["id"])
+
+    for r in page:
+        r.pop("id")
+        if "year_month" not in fields:
+            r.pop("year_month")
+    return page, next_cursor
+
+
+def iter_market_rows(qs, fields, batch_size=2000):
+    """按键集分批遍历查询结果，逐行产出 (值元组)，每批使用 iterator(chunk_size) 读取"""
+    select = ["id", *fields] + ([] if "year_month" in fields else ["year_month"])
+    ym_pos = select.index("year_month")
+    end = 1 + len(fields)
+    cursor = None
+    while True:
+        batch = (
+            _after_cursor(qs, cursor)
+            .order_by("year_month", "id")
+            .values_list(*select)[:batch_size]
+        )
+        count = 0
+        last = None
+        for row in batch.iterator(chunk_size=batch_size):
+            count += 1
+            last = row
+            yield row[1:end]
+        if count < batch_size:
+            return
+        cursor = (last[ym_pos], last[0])
+
+
+# ---- 输出格式 ----
+
+def attach_airport_info(row):
+    """将 origin / destination 三字码替换为机场信息（与 query_flight_market 返回格式一致）"""
+    if "origin" in row:
+        row["origin"] = build_info(row["origin"])
+    if "destination" in row:
+        row["destination"] = build_info(row["destination"])
+    return row
+
+
+def stream_ndjson(qs, fields, airport_info=True, batch_size=2000):
+    """逐行产出 NDJSON 文本"""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    buf = []
+    for values in iter_market_rows(qs, fields, batch_size=batch_size):
+        row = dict(zip(fields, values))
+        if airport_info:
+            attach_airport_info(row)
+        buf.append(encoder.encode(row))
+        if len(buf) >= 500:
+            yield "\n".join(buf) + "\n"
+            buf = []
+    if buf:
+        yield "\n".join(buf) + "\n"
+
+
+def stream_csv(qs, fields, airport_info=True, batch_size=2000):
+    """逐批产出 CSV 文本（首行为表头，带 BOM 便于 Excel 识别中文）；airport_info 时追加城市/机场名列"""
+    extra = []
+    if airport_info:
+        extra = [c for c in ("origin", "destination") if c in fields]
+    header = list(fields)
+    for c in extra:
+        header += [f"{c}_city", f"{c}_airport"]
+
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(header)
+    yield "\ufeff" + out.getvalue()
+    out.seek(0)
+    out.truncate(0)
+
+    positions = [fields.index(c) for c in extra]
+    n = 0
+    for values in iter_market_rows(qs, fields, batch_size=batch_size):
+        row = list(values)
+        for pos in positions:
+            info = build_info(values[pos])
+            row += [info["city"], info["airport"]]
+        writer.writerow(row)
+        n += 1
+        if n % 500 == 0:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate(0)
+    if out.tell():
+        yield out.getvalue()
@@ -0,0 +1,271 @@
+"""
+航线市场数据（FlightMarketRecord）批量写入
+
+向量化清洗 + 数据库原生批量加载，唯一键（航线+机型+周期）冲突时覆盖为新值：
+- MySQL：LOAD DATA LOCAL INFILE 到临时表，再 INSERT ... ON DUPLICATE KEY UPDATE（服务器需开启 local_infile）
+- PostgreSQL：COPY 到临时表，再 INSERT ... ON CONFLICT DO UPDATE
+- 其他（SQLite）：单事务 executemany + ON CONFLICT DO UPDATE
+
+全量导入脚本（data_utils/import_flightmarket_data.py）与按月增量导入（predict.ingestion）共用
+"""
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import FlightMarketRecord
+
+
+BULK_CHUNK_ROWS = 200_000     # 每次写入暂存文件的行数
+
+# CSV 列名 -> 模型字段名（请保持与CSV一致）
+COLUMN_MAP = {
+    "YearMonth": "year_month",       # 原始格式如 '2017/3/1'，导入时转为 'YYYY-MM'
+    "Origin": "origin",
+    "Destination": "destination",
+    "Equipment": "equipment",
+    "Distance (KM)": "distance_km",
+    "International Flight": "international_flight",
+    "Equipment_Total_Flights": "equipment_total_flights",
+    "Equipment_Total_Seats": "equipment_total_seats",
+    "Route_Total_Flights": "route_total_flights",
+    "Route_Total_Seats": "route_total_seats",
+    "Route_Total_Flight_Time": "route_total_flight_time",
+    "Route_Avg_Flight_Time": "route_avg_flight_time",
+    "Con Total Est. Pax": "con_total_est_pax",
+    "First": "first",
+    "Business": "business",
+    "Premium": "premium",
+    "Full Y": "full_y",
+    "Disc Y": "disc_y",
+    "Avg yield": "avg_yield",
+    "Avg First": "avg_first",
+    "Avg Business": "avg_business",
+    "Avg Premium": "avg_premium",
+    "Avg Full Y": "avg_full_y",
+    "Avg Disc Y": "avg_disc_y",
+    "Region": "region",
+    "Total Est. Pax": "total_est_pax",
+    "Local Est. Pax": "local_est_pax",
+    "Behind Est. Pax": "behind_est_pax",
+    "Bridge Est. Pax": "bridge_est_pax",
+    "Beyond Est. Pax": "beyond_est_pax",
+    "Avg Fare (USD)": "avg_fare_usd",
+    "Local Fare": "local_fare",
+    "Behind Fare": "behind_fare",
+    "Bridge Fare": "bridge_fare",
+    "Beyond Fare": "beyond_fare",
+    "O_GDP": "o_gdp",
+    "O_Population": "o_population",
+    "Third_Industry_x": "third_industry_x",
+    "O_Revenue": "o_revenue",
+    "O_Retail": "o_retail",
+    "O_Labor": "o_labor",
+    "O_Air_Traffic": "o_air_traffic",
+    "D_GDP": "d_gdp",
+    "D_Population": "d_population",
+    "Third_Industry_y": "third_industry_y",
+    "D_Revenue": "d_revenue",
+    "D_Retail": "d_retail",
+    "D_Labor": "d_labor",
+    "D_Air_Traffic": "d_air_traffic",
+}
+USECOLS = list(COLUMN_MAP.keys())
+
+# 类型分组（模型里整数已改为 DecimalField）
+DEC_FIELDS = {
+    "distance_km", "equipment_total_flights", "equipment_total_seats",
+    "route_total_flights", "route_total_seats",
+    "route_total_flight_time", "route_avg_flight_time",
+    "con_total_est_pax", "first", "business", "premium", "full_y", "disc_y",
+    "avg_yield", "avg_first", "avg_business", "avg_premium", "avg_full_y", "avg_disc_y",
+    "total_est_pax", "local_est_pax", "behind_est_pax", "bridge_est_pax", "beyond_est_pax",
+    "avg_fare_usd", "local_fare", "behind_fare", "bridge_fare", "beyond_fare",
+    "o_gdp", "o_population", "third_industry_x", "o_revenue", "o_retail", "o_labor", "o_air_traffic",
+    "d_gdp", "d_population", "third_industry_y", "d_revenue", "d_retail", "d_labor", "d_air_traffic",
+}
+BOOL_FIELDS = {"international_flight"}
+STR_FIELDS  = {"origin", "destination", "equipment", "region"}  # year_month 单独处理
+
+
+UNIQUE_KEY = ["origin", "destination", "equipment", "year_month"]
+
+
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    按列向量化清洗（与导入脚本中 normalize_value 逐格处理的结果一致）：
+    CSV 列名 -> 模型字段名，YearMonth -> 'YYYY-MM'，布尔列 -> 0/1，
+    数值列 -> 去掉千分位的原始数字文本（不经过 float64，原值精确写入，由数据库按字段小数位舍入）
+    """
+    out = pd.DataFrame(index=df.index)
+    null_tokens = {"", "nan", "none", "null"}
+
+    for col, field in COLUMN_MAP.items():
+        raw = df[col].astype("string").str.strip()
+        raw = raw.mask(raw.str.lower().isin(null_tokens))
+
+        if field == "year_month":
+            parsed = pd.to_datetime(raw, format="%Y/%m/%d", errors="coerce").dt.strftime("%Y-%m")
+            # 兜底：已经是 'YYYY-M' / 'YYYY-MM(-DD)' 的值，补零规范化
+            m = raw.str.extract(r"^(\d{4})-(\d{1,2})")
+            fallback = m[0] + "-" + m[1].str.zfill(2)
+            out[field] = parsed.fillna(fallback)
+        elif field in DEC_FIELDS:
+            text = raw.str.replace(",", "", regex=False)
+            # 只用数值解析判断是否为有限数字，写入的仍是原始文本
+            numeric = pd.to_numeric(text, errors="coerce").astype("float64")
+            out[field] = text.where(np.isfinite(numeric.to_numpy()))
+        elif field in BOOL_FIELDS:
+            lowered = raw.str.lower()
+            truthy = lowered.isin({"1", "true", "t", "yes", "y"})
+            falsy = lowered.isin({"0", "false", "f", "no", "n"})
+            numeric = pd.to_numeric(raw, errors="coerce").fillna(0) != 0
+            out[field] = (truthy | (~falsy & numeric)).astype("int8")
+        else:
+            out[field] = raw
+
+    return out
+
+
+def _load_text_column(series: pd.Series, field: str) -> pd.Series:
+    """转换为 MySQL LOAD DATA / PostgreSQL COPY 文本格式的一列（\\N 表示 NULL，反斜杠转义）"""
+    if field in DEC_FIELDS:
+        return series.astype(str).where(series.notna(), r"\N")
+    if field in BOOL_FIELDS:
+        return series.astype(str)
+    text = series.astype("string")
+    escaped = (text.str.replace("\\", "\\\\", regex=False)
+                   .str.replace("\t", "\\t", regex=False)
+                   .str.replace("\n", "\\n", regex=False)
+                   .str.replace("\r", "\\r", regex=False))
+    return escaped.fillna(r"\N").astype(str)
+
+
+def _write_stage_file(frame: pd.DataFrame, columns: list, path: str, chunk_rows: int = BULK_CHUNK_ROWS):
+    """将清洗后的数据分块写为制表符分隔的暂存文件"""
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        for start in range(0, len(frame), chunk_rows):
+            part = frame.iloc[start:start + chunk_rows]
+            cols = [_load_text_column(part[c], c) for c in columns]
+            lines = cols[0].str.cat(cols[1:], sep="\t")
+            f.write("\n".join(lines.tolist()))
+            f.write("\n")
+
+
+def _mysql_load_params() -> dict:
+    """
+    LOAD DATA LOCAL 使用的连接参数：与 Django 默认连接相同（含 OPTIONS 中的 charset / ssl / init_command 等），
+    额外开启客户端 local_infile
+    """
+    params = connection.get_connection_params()
+    params["local_infile"] = True
+    return params
+
+
+def _bulk_load_mysql(frame: pd.DataFrame, table: str, columns: list, update_cols: list):
+    stage = f"{table}_stage"
+    col_sql = ", ".join(f"`{c}`" for c in columns)
+    update_sql = ", ".join(f"`{c}` = VALUES(`{c}`)" for c in update_cols)
+
+    fd, path = tempfile.mkstemp(suffix=".tsv")
+    os.close(fd)
+    # LOAD DATA LOCAL 需要客户端开启 local_infile：按 Django 连接参数另开一个连接，不修改默认连接
+    conn = connection.Database.connect(**_mysql_load_params())
+    try:
+        _write_stage_file(frame, columns, path)
+        cur = conn.cursor()
+        cur.execute(f"DROP TEMPORARY TABLE IF EXISTS `{stage}`")
+        cur.execute(f"CREATE TEMPORARY TABLE `{stage}` LIKE `{table}`")
+        cur.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE `{stage}` CHARACTER SET utf8mb4 "
+            f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({col_sql})",
+            [path],
+        )
+        print(f"暂存表载入 {cur.rowcount} 行，开始按唯一键合并...")
+        cur.execute(
+            f"INSERT INTO `{table}` ({col_sql}) SELECT {col_sql} FROM `{stage}` "
+            f"ON DUPLICATE KEY UPDATE {update_sql}"
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+        os.remove(path)
+
+
+def _bulk_load_postgresql(frame: pd.DataFrame, table: str, columns: list, update_cols: list):
+    stage = f"{table}_stage"
+    col_sql = ", ".join(f'"{c}"' for c in columns)
+    key_sql = ", ".join(f'"{c}"' for c in UNIQUE_KEY)
+    update_sql = ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in update_cols)
+
+    fd, path = tempfile.mkstemp(suffix=".tsv")
+    os.close(fd)
+    try:
+        _write_stage_file(frame, columns, path)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'CREATE TEMP TABLE "{stage}" (LIKE "{table}" INCLUDING DEFAULTS) ON COMMIT DROP')
+            with open(path, "r", encoding="utf-8") as f:
+                cursor.cursor.copy_expert(f'COPY "{stage}" ({col_sql}) FROM STDIN', f)
+            cursor.execute(
+                f'INSERT INTO "{table}" ({col_sql}) SELECT {col_sql} FROM "{stage}" '
+                f"ON CONFLICT ({key_sql}) DO UPDATE SET {update_sql}"
+            )
+    finally:
+        os.remove(path)
+
+
+def _bulk_load_executemany(frame: pd.DataFrame, table: str, columns: list, update_cols: list):
+    """SQLite 等：单事务 executemany + ON CONFLICT 覆盖"""
+    qn = connection.ops.quote_name
+    col_sql = ", ".join(qn(c) for c in columns)
+    key_sql = ", ".join(qn(c) for c in UNIQUE_KEY)
+    update_sql = ", ".join(f"{qn(c)} = excluded.{qn(c)}" for c in update_cols)
+    placeholders = ", ".join(["%s"] * len(columns))
+    sql = (f"INSERT INTO {qn(table)} ({col_sql}) VALUES ({placeholders}) "
+           f"ON CONFLICT ({key_sql}) DO UPDATE SET {update_sql}")
+
+    values = frame[columns].astype(object).where(frame[columns].notna(), None)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(values), BULK_CHUNK_ROWS):
+            part = values.iloc[start:start + BULK_CHUNK_ROWS]
+            cursor.executemany(sql, list(part.itertuples(index=False, name=None)))
+
+
+
+def upsert_market_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    写入 normalize_frame 清洗后的数据（缺少唯一键的行跳过，重复键保留最后一行）
+
+    :return: 实际写入的数据（模型字段名），调用方可据此统计航线 / 周期
+    """
+    frame = frame.dropna(subset=UNIQUE_KEY)
+    frame = frame.drop_duplicates(subset=UNIQUE_KEY, keep="last")
+    if frame.empty:
+        return frame
+    written = frame
+
+    frame = frame.copy()
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    frame["created_at"] = now
+    frame["updated_at"] = now
+
+    table = FlightMarketRecord._meta.db_table
+    columns = [FlightMarketRecord._meta.get_field(f).column for f in list(COLUMN_MAP.values()) + ["created_at", "updated_at"]]
+    frame.columns = [FlightMarketRecord._meta.get_field(f).column for f in frame.columns]
+    update_cols = [c for c in columns if c not in UNIQUE_KEY and c != "created_at"]
+
+    loaders = {
+        "mysql": _bulk_load_mysql,
+        "postgresql": _bulk_load_postgresql,
+    }
+    loader = loaders.get(connection.vendor, _bulk_load_executemany)
+    print(f"使用 {connection.vendor} 批量加载...")
+    loader(frame, table, columns, update_cols)
+    return written
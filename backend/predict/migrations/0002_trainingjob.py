@@ -0,0 +1,41 @@
+# Generated by Django 4.2.23 on 2026-10-17 10:00
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predict', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_type', models.CharField(choices=[('pretrain', '预训练'), ('formal', '正式训练')], max_length=16, verbose_name='任务类型')),
+                ('status', models.CharField(choices=[('pending', '排队中'), ('running', '运行中'), ('success', '成功'), ('failed', '失败'), ('cancelled', '已取消')], default='pending', max_length=16, verbose_name='任务状态')),
+                ('payload', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='任务参数')),
+                ('progress', models.IntegerField(default=0, verbose_name='进度（0-100）')),
+                ('message', models.CharField(blank=True, default='', max_length=255, verbose_name='当前阶段说明')),
+                ('result', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='训练结果')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='错误信息')),
+                ('cancel_requested', models.BooleanField(default=False, verbose_name='是否请求取消')),
+                ('worker_pid', models.IntegerField(blank=True, null=True, verbose_name='执行进程PID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='结束时间')),
+                ('pretrain_record', models.ForeignKey(blank=True, help_text='预训练任务产生的记录 / 正式训练任务使用的记录', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='training_jobs', to='predict.pretrainrecord')),
+                ('route_model', models.ForeignKey(blank=True, help_text='正式训练任务产生的模型', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='training_jobs', to='predict.routemodelinfo')),
+            ],
+            options={
+                'verbose_name': '训练任务',
+                'verbose_name_plural': '训练任务',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='predict_tra_status_b89d42_idx'), models.Index(fields=['job_type'], name='predict_tra_job_typ_5e84b6_idx')],
+            },
+        ),
+    ]
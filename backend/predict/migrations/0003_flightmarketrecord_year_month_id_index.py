@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predict', '0002_trainingjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='flightmarketrecord',
+            index=models.Index(fields=['year_month', 'id'], name='predict_fli_year_mo_197fef_idx'),
+        ),
+    ]
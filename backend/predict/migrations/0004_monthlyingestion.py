@@ -0,0 +1,37 @@
+# Generated by Django 4.2.23 on 2026-10-17 10:00
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predict', '0003_flightmarketrecord_year_month_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyIngestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year_month', models.CharField(max_length=7, unique=True, verbose_name='数据月份（YYYY-MM）')),
+                ('status', models.CharField(choices=[('running', '导入中'), ('success', '成功'), ('failed', '失败')], default='running', max_length=16, verbose_name='导入状态')),
+                ('source_files', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='源文件列表')),
+                ('source_checksum', models.CharField(blank=True, default='', max_length=64, verbose_name='源文件校验和')),
+                ('market_rows', models.IntegerField(default=0, verbose_name='写入航线市场数据行数')),
+                ('market_removed', models.IntegerField(default=0, verbose_name='删除的过期航线市场数据行数')),
+                ('route_rows', models.IntegerField(default=0, verbose_name='写入航线月度统计行数')),
+                ('route_removed', models.IntegerField(default=0, verbose_name='删除的过期航线月度统计行数')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='错误信息')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+            ],
+            options={
+                'verbose_name': '按月导入记录',
+                'verbose_name_plural': '按月导入记录',
+                'ordering': ['-year_month'],
+                'indexes': [models.Index(fields=['status', 'year_month'], name='predict_mon_status_08b842_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.23 on 2026-10-17 12:00
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predict', '0004_monthlyingestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('snapshot_key', models.CharField(max_length=255, unique=True, verbose_name='快照键')),
+                ('origin_airport', models.CharField(max_length=10, verbose_name='起点机场三字码')),
+                ('destination_airport', models.CharField(max_length=10, verbose_name='终点机场三字码')),
+                ('hierarchy_reconcile', models.BooleanField(default=False, verbose_name='是否层级对齐')),
+                ('reconcile_method', models.CharField(blank=True, default='', max_length=16, verbose_name='对齐方法')),
+                ('target_granularity', models.CharField(choices=[('yearly', '年度'), ('quarterly', '季度'), ('monthly', '月度')], max_length=10, verbose_name='目标粒度')),
+                ('prediction_periods', models.IntegerField(verbose_name='预测期数（目标粒度）')),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='预测结果')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('paired_model', models.ForeignKey(blank=True, help_text='层级对齐时的季度模型', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='paired_forecast_snapshots', to='predict.routemodelinfo')),
+                ('route_model', models.ForeignKey(help_text='预测使用的模型（层级对齐时为月度模型）', on_delete=django.db.models.deletion.CASCADE, related_name='forecast_snapshots', to='predict.routemodelinfo')),
+            ],
+            options={
+                'verbose_name': '预测快照',
+                'verbose_name_plural': '预测快照',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['origin_airport', 'destination_airport'], name='predict_for_origin__a2240b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predict', '0005_forecastsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='routemodelinfo',
+            name='cache_generation',
+            field=models.CharField(blank=True, default='', help_text='预测结果缓存代数', max_length=32),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.23 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predict', '0006_routemodelinfo_cache_generation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingjob',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='租约到期时间'),
+        ),
+        migrations.AddField(
+            model_name='trainingjob',
+            name='attempts',
+            field=models.IntegerField(default=0, verbose_name='已领取次数'),
+        ),
+        migrations.AddIndex(
+            model_name='trainingjob',
+            index=models.Index(fields=['status', 'lease_until'], name='predict_tra_status_2035f7_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.23 on 2026-10-17 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predict', '0007_trainingjob_lease'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trainingjob',
+            name='job_type',
+            field=models.CharField(choices=[('pretrain', '预训练'), ('formal', '正式训练'), ('snapshot', '预测快照')], max_length=16, verbose_name='任务类型'),
+        ),
+        migrations.AlterField(
+            model_name='trainingjob',
+            name='route_model',
+            field=models.ForeignKey(blank=True, help_text='正式训练任务产生的模型 / 预测快照任务计算的模型', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='training_jobs', to='predict.routemodelinfo'),
+        ),
+    ]
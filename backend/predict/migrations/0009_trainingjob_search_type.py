@@ -0,0 +1,24 @@
+# Generated by Django 4.2.23 on 2026-10-17 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predict', '0008_trainingjob_snapshot_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trainingjob',
+            name='job_type',
+            field=models.CharField(choices=[('pretrain', '预训练'), ('formal', '正式训练'), ('snapshot', '预测快照'), ('search', '超参数搜索')], max_length=16, verbose_name='任务类型'),
+        ),
+        migrations.AlterField(
+            model_name='trainingjob',
+            name='pretrain_record',
+            field=models.ForeignKey(blank=True, help_text='预训练任务产生的记录 / 正式训练任务使用的记录 / 超参数搜索推荐的最佳配置记录', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='training_jobs', to='predict.pretrainrecord'),
+        ),
+    ]
@@ -4,6 +4,7 @@ from django.db import models
 from datetime import datetime
 from django.utils import timezone
 from django.db import models, IntegrityError, transaction
+from django.core.serializers.json import DjangoJSONEncoder
 # from .model_registry.model_registry import get_model  # 临时注释，避免pandas导入问题
 # Create your models here.
 
@@ -63,6 +64,9 @@ class RouteModelInfo(models.Model):
     remark = models.TextField(null=True, blank=True)   # 备注信息，可以记录模型的训练环境信息等
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # 预测结果缓存代数（predict.forecast_cache）：每次保存后换成新的随机值，使旧的缓存结果不再命中
+    cache_generation = models.CharField(max_length=32, blank=True, default='', help_text="预测结果缓存代数")
+
     # 外键关联预训练记录
     pretrain_record = models.ForeignKey(
         "PretrainRecord",
@@ -161,6 +165,7 @@ class FlightMarketRecord(models.Model):
         verbose_name_plural = "航线市场统计记录"
         indexes = [
             models.Index(fields=["origin", "destination", "year_month"]),  # 常用查询索引：起终点+周期
+            models.Index(fields=["year_month", "id"]),  # 键集分页 / 流式导出的排序索引
         ]
         unique_together = (("origin", "destination", "equipment",  "year_month"),)  # 同一周期/机型/航线唯一
 
@@ -242,3 +247,169 @@ class PretrainRecord(models.Model):
 
     def __str__(self):
         return f"{self.origin}-{self.destination} [{self.time_granularity}] @ {self.train_datetime:%Y-%m-%d %H:%M}"
+
+
+# 训练任务表（异步预训练 / 正式训练）
+class TrainingJob(models.Model):
+    JOB_PRETRAIN = "pretrain"
+    JOB_FORMAL = "formal"
+    JOB_SNAPSHOT = "snapshot"
+    JOB_SEARCH = "search"
+    JOB_TYPE_CHOICES = [
+        (JOB_PRETRAIN, "预训练"),
+        (JOB_FORMAL, "正式训练"),
+        (JOB_SNAPSHOT, "预测快照"),
+        (JOB_SEARCH, "超参数搜索"),
+    ]
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCESS = "success"
+    STATUS_FAILED = "failed"
+    STATUS_CANCELLED = "cancelled"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "排队中"),
+        (STATUS_RUNNING, "运行中"),
+        (STATUS_SUCCESS, "成功"),
+        (STATUS_FAILED, "失败"),
+        (STATUS_CANCELLED, "已取消"),
+    ]
+    FINISHED_STATUSES = (STATUS_SUCCESS, STATUS_FAILED, STATUS_CANCELLED)
+
+    job_type = models.CharField(max_length=16, choices=JOB_TYPE_CHOICES, verbose_name="任务类型")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name="任务状态")
+
+    # 请求参数：预训练为 origin/destination/config，正式训练为 pretrain_record_id/remark，
+    # 预测快照为 model_id，超参数搜索为 origin/destination/config 和 run_hyperparameter_search 的搜索参数
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder, verbose_name="任务参数")
+
+    progress = models.IntegerField(default=0, verbose_name="进度（0-100）")
+    message = models.CharField(max_length=255, blank=True, default="", verbose_name="当前阶段说明")
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name="训练结果")
+    error = models.TextField(null=True, blank=True, verbose_name="错误信息")
+
+    cancel_requested = models.BooleanField(default=False, verbose_name="是否请求取消")
+    worker_pid = models.IntegerField(null=True, blank=True, verbose_name="执行进程PID")
+
+    # 租约：执行器运行期间定期续期，过期说明执行器已退出，其他执行器可重新领取
+    lease_until = models.DateTimeField(null=True, blank=True, verbose_name="租约到期时间")
+    attempts = models.IntegerField(default=0, verbose_name="已领取次数")
+
+    # 任务产出
+    pretrain_record = models.ForeignKey(
+        "PretrainRecord",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="training_jobs",
+        help_text="预训练任务产生的记录 / 正式训练任务使用的记录 / 超参数搜索推荐的最佳配置记录"
+    )
+    route_model = models.ForeignKey(
+        "RouteModelInfo",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="training_jobs",
+        help_text="正式训练任务产生的模型 / 预测快照任务计算的模型"
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="开始时间")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="结束时间")
+
+    class Meta:
+        verbose_name = "训练任务"
+        verbose_name_plural = "训练任务"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+            models.Index(fields=["job_type"]),
+            models.Index(fields=["status", "lease_until"]),
+        ]
+
+    def __str__(self):
+        return f"TrainingJob#{self.id} [{self.job_type}] {self.status}"
+
+
+# 按月增量导入记录（水位线）
+class MonthlyIngestion(models.Model):
+    STATUS_RUNNING = "running"
+    STATUS_SUCCESS = "success"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, "导入中"),
+        (STATUS_SUCCESS, "成功"),
+        (STATUS_FAILED, "失败"),
+    ]
+
+    year_month = models.CharField(max_length=7, unique=True, verbose_name="数据月份（YYYY-MM）")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_RUNNING, verbose_name="导入状态")
+
+    # 源文件（文件名 + 内容哈希），用于判断重复导入
+    source_files = models.JSONField(default=list, encoder=DjangoJSONEncoder, verbose_name="源文件列表")
+    source_checksum = models.CharField(max_length=64, blank=True, default="", verbose_name="源文件校验和")
+
+    market_rows = models.IntegerField(default=0, verbose_name="写入航线市场数据行数")
+    market_removed = models.IntegerField(default=0, verbose_name="删除的过期航线市场数据行数")
+    route_rows = models.IntegerField(default=0, verbose_name="写入航线月度统计行数")
+    route_removed = models.IntegerField(default=0, verbose_name="删除的过期航线月度统计行数")
+    error = models.TextField(null=True, blank=True, verbose_name="错误信息")
+
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="开始时间")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="完成时间")
+
+    class Meta:
+        verbose_name = "按月导入记录"
+        verbose_name_plural = "按月导入记录"
+        ordering = ["-year_month"]
+        indexes = [
+            models.Index(fields=["status", "year_month"]),
+        ]
+
+    def __str__(self):
+        return f"MonthlyIngestion {self.year_month} {self.status}"
+
+
+# 预测快照（正式训练后预先计算的标准预测期结果）
+class ForecastSnapshot(models.Model):
+    GRANULARITY_CHOICES = RouteModelInfo.GRANULARITY_CHOICES
+
+    # 查找键：航线|模型|配对模型|对齐方法|目标粒度|预测期数（见 predict.forecast_snapshots.snapshot_key）
+    snapshot_key = models.CharField(max_length=255, unique=True, verbose_name="快照键")
+
+    route_model = models.ForeignKey(
+        "RouteModelInfo",
+        on_delete=models.CASCADE,
+        related_name="forecast_snapshots",
+        help_text="预测使用的模型（层级对齐时为月度模型）"
+    )
+    paired_model = models.ForeignKey(
+        "RouteModelInfo",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="paired_forecast_snapshots",
+        help_text="层级对齐时的季度模型"
+    )
+
+    origin_airport = models.CharField(max_length=10, verbose_name="起点机场三字码")
+    destination_airport = models.CharField(max_length=10, verbose_name="终点机场三字码")
+    hierarchy_reconcile = models.BooleanField(default=False, verbose_name="是否层级对齐")
+    reconcile_method = models.CharField(max_length=16, blank=True, default="", verbose_name="对齐方法")
+    target_granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES, verbose_name="目标粒度")
+    prediction_periods = models.IntegerField(verbose_name="预测期数（目标粒度）")
+
+    # 与 forecast_route_view 单个任务的 data 结构一致
+    data = models.JSONField(encoder=DjangoJSONEncoder, verbose_name="预测结果")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+
+    class Meta:
+        verbose_name = "预测快照"
+        verbose_name_plural = "预测快照"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["origin_airport", "destination_airport"]),
+        ]
+
+    def __str__(self):
+        return f"ForecastSnapshot {self.snapshot_key}"
@@ -1,15 +1,359 @@
 import os
+import shutil
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
-import numpy as np
 from pathlib import Path
-from sklearn.linear_model import LinearRegression
+
+from predict.predictive_algorithm.economy_panel import load_economy_panel, attach_economy
+
+
+# ================== 单文件清洗（模块级函数，供进程池调用） ==================
+
+CAPACITY_SORT_COLUMNS = ['Time series', 'Route_Total_Flights', 'Route_Total_Seats', 'Route_Total_Flight_Time',
+                         'Route_Avg_Flight_Time', 'Equipment_Total_Flights', 'Equipment_Total_Seats']
+CAPACITY_SORT_ASCENDING = [True, False, False, False, False, False, False]
+
+CONNECTION_RAW_COLUMNS = [
+    'Origin', 'Connecting over', 'Connecting over (Name)', 'Destination',
+    'Total Est. Pax', 'First', 'Business', 'Premium', 'Full Y', 'Disc Y',
+    'Avg_yield', 'Avg First', 'Avg Business', 'Avg Premium', 'Avg Full Y', 'Avg Disc Y'
+]
+
+
+def international_flag(origin, destination, domestic_airports):
+    """两端都是国内机场为 0，否则为 1"""
+    return (~(origin.isin(domestic_airports) & destination.isin(domestic_airports))).astype(int)
+
+
+def elapsed_minutes(elapsed):
+    """'H:MM' 格式的飞行时间 -> 分钟数，格式不符时为 0"""
+    parts = elapsed.astype(str).str.strip().str.extract(r'^(\d+):(\d+)$')
+    minutes = pd.to_numeric(parts[0], errors='coerce') * 60 + pd.to_numeric(parts[1], errors='coerce')
+    return minutes.fillna(0).astype(int)
+
+
+def parse_region_month(file_path):
+    """connection / mix 文件名（x-REGION-YYYYMM_...）-> (地区, 'YYYY-MM')，格式不正确时返回 None"""
+    filename = os.path.basename(file_path)
+    parts = filename.split('-')
+    if len(parts) < 3:
+        return None
+    region = parts[1]  # 地区
+    yyyymm = parts[2].split('_')[0]  # 年月
+    try:
+        yyyy, mm = int(yyyymm[:4]), int(yyyymm[4:])
+    except ValueError:
+        return None
+    return region, f"{yyyy:04d}-{mm:02d}"
+
+
+def _filter_domestic(df, domestic_airports):
+    return df[df['Origin'].isin(domestic_airports) | df['Destination'].isin(domestic_airports)]
+
+
+def _aggregate_capacity_month(group):
+    """单月 capacity 数据按航线 / 机型统计"""
+    # 先计算每个航线的总数（不分机型）
+    route_totals = group.groupby(['Time series', 'Origin', 'Destination']).agg(
+        Route_Total_Flights=('Seats', 'count'),
+        Route_Total_Seats=('Seats', 'sum'),
+        Route_Total_Flight_Time=('flighting_time', 'sum'),
+        Route_Avg_Flight_Time=('flighting_time', 'mean')
+    ).reset_index()
+
+    # 分组统计（按机型）
+    result = group.groupby(['Time series', 'Origin', 'Destination', 'Service', 'Stops', 'Equipment', 'International Flights']).agg(
+        Equipment_Total_Flights=('Seats', 'count'),    #航班数量
+        Equipment_Total_Seats=('Seats', 'sum'),    #座位数量
+    ).reset_index()
+
+    # 合并总数到结果中
+    result = pd.merge(result, route_totals, on=['Time series', 'Origin', 'Destination'], how='left')
+    return result.sort_values(by=CAPACITY_SORT_COLUMNS, ascending=CAPACITY_SORT_ASCENDING)
+
+
+def clean_capacity_file(file_path, domestic_airports, columns_to_keep, chunksize=200_000):
+    """
+    清洗一个 capacity 文件（分块读取，先按国内机场过滤再拼接）
+
+    :return: ({'YYYY-MM': 该月统计结果}, {(Origin, Destination): 最小距离})
+    """
+    chunks = []
+    for chunk in pd.read_csv(file_path, usecols=columns_to_keep, chunksize=chunksize):
+        chunk = _filter_domestic(chunk[columns_to_keep], domestic_airports)
+        chunks.append(chunk.drop_duplicates())
+    if not chunks:
+        return {}, {}
+    df = pd.concat(chunks, ignore_index=True).drop_duplicates()
+
+    # 处理飞行时间
+    df['flighting_time'] = elapsed_minutes(df['Elapsed Time'])
+    # 转换日期格式并提取年月
+    df['Time series'] = pd.to_datetime(df['Time series'], errors='coerce')
+    df = df.dropna(subset=['Time series'])  # 删除无效日期
+    df['YearMonth'] = df['Time series'].dt.to_period('M')
+    df['Time series'] = df['Time series'].dt.strftime('%Y-%m-%d')
+    df['International Flights'] = international_flag(df['Origin'], df['Destination'], domestic_airports)
+
+    # 记录每个 Origin-Destination 对的最小 Distance
+    min_distances = df.groupby(['Origin', 'Destination'])['Distance (KM)'].min().to_dict()
+
+    months = {str(year_month): _aggregate_capacity_month(group) for year_month, group in df.groupby('YearMonth')}
+    return months, min_distances
+
+
+def _capacity_file_task(file_path, parts_folder, file_index, domestic_airports, columns_to_keep, chunksize):
+    """进程池任务：清洗一个 capacity 文件，各月份结果写为分片文件，返回 ({月份: 分片路径}, 最小距离)"""
+    print(f"Processing capacity file: {file_path}")
+    months, min_distances = clean_capacity_file(file_path, domestic_airports, columns_to_keep, chunksize)
+    parts = {}
+    for year_month, result in months.items():
+        part_path = os.path.join(parts_folder, f"cap_{year_month}.{file_index:05d}.csv")
+        result.to_csv(part_path, index=False)
+        parts[year_month] = part_path
+    return parts, min_distances
+
+
+def _capacity_month_task(year_month, part_paths, output_folder, min_distances_df):
+    """进程池任务：按文件顺序合并一个月份的分片，拼接最小距离后一次写出"""
+    frames = [pd.read_csv(p) for p in part_paths]
+    df = frames[0] if len(frames) == 1 else (
+        pd.concat(frames).drop_duplicates().sort_values(by=CAPACITY_SORT_COLUMNS, ascending=CAPACITY_SORT_ASCENDING)
+    )
+    df = pd.merge(df, min_distances_df, on=['Origin', 'Destination'], how='left')
+    output_file = os.path.join(output_folder, f"cap_{year_month}.csv")
+    df.to_csv(output_file, index=False)
+    return output_file
+
+
+def clean_connection_file(file_path, region, domestic_airports, output_columns, chunksize=200_000):
+    """清洗一个 connection 文件：按航线汇总客流，平均值按客流加权"""
+    # 筛选从 AM 到 BB 的列（索引范围 38 到 54）
+    columns_to_keep = list(pd.read_csv(file_path, index_col=False, nrows=0).columns[38:55])
+    chunks = []
+    for chunk in pd.read_csv(file_path, index_col=False, usecols=columns_to_keep, chunksize=chunksize):
+        chunk = chunk[columns_to_keep]
+        chunk.columns = CONNECTION_RAW_COLUMNS
+        # 删除 Origin 列为空的行
+        chunk = chunk.dropna(subset=['Origin'])
+        chunks.append(_filter_domestic(chunk, domestic_airports))
+    df = pd.concat(chunks, ignore_index=True)
+
+    # 标记是否为国际航班
+    df['International Flights'] = international_flag(df['Origin'], df['Destination'], domestic_airports)
+    df['Region'] = region
+
+    # 定义聚合函数（不再包含 Connecting over 相关列）
+    agg_funcs = {
+        'Total Est. Pax': 'sum',
+        'First': 'sum',
+        'Business': 'sum',
+        'Premium': 'sum',
+        'Full Y': 'sum',
+        'Disc Y': 'sum',
+        'International Flights': 'first',
+        'Region': 'first'
+    }
+
+    # 计算加权平均值
+    avg_columns = ['Avg_yield', 'Avg First', 'Avg Business', 'Avg Premium', 'Avg Full Y', 'Avg Disc Y']
+    for col in avg_columns:
+        # 获取对应的数量列名
+        count_col = col.replace('Avg ', '') if col != 'Avg_yield' else 'Total Est. Pax'
+        # 计算总价值
+        df[f'{col}_total'] = df[col] * df[count_col]
+        agg_funcs[f'{col}_total'] = 'sum'
+
+    # 执行分组聚合
+    result = df.groupby(['Origin', 'Destination']).agg(agg_funcs)
+
+    # 计算新的平均值
+    for col in avg_columns:
+        count_col = col.replace('Avg ', '') if col != 'Avg_yield' else 'Total Est. Pax'
+        result[col] = result[f'{col}_total'] / result[count_col]
+        result = result.drop(f'{col}_total', axis=1)
+
+    # 处理除零情况
+    result = result.fillna(0).reset_index()
+    # 恢复原来的列名
+    result = result.rename(columns={'Avg_yield': 'Avg yield'})
+    return result[output_columns]
+
+
+def clean_mix_file(file_path, region, domestic_airports, mix_columns, chunksize=200_000):
+    """清洗一个 mix 文件"""
+    # 筛选从 M 到 Y
+    columns_to_keep = list(pd.read_csv(file_path, index_col=False, nrows=0).columns[:11])
+    chunks = []
+    for chunk in pd.read_csv(file_path, index_col=False, on_bad_lines='skip', usecols=columns_to_keep, chunksize=chunksize):
+        chunk = chunk[columns_to_keep]
+        chunk.columns = mix_columns
+        # 删除 Market Pair 为空的行
+        chunk = chunk.dropna(subset=["Market Pair"]).copy()
+        # 只按第一个 '-' 拆分，并固定为两列（块内没有 '-' 或有多个 '-' 时列数不会变化）
+        pair = chunk['Market Pair'].astype(str).str.split('-', n=1, expand=True).reindex(columns=[0, 1])
+        chunk['Origin'] = pair[0]
+        chunk['Destination'] = pair[1]
+        chunk = chunk.drop(columns=['Market Pair'])
+        chunks.append(_filter_domestic(chunk, domestic_airports))
+    df = pd.concat(chunks, ignore_index=True)
+    df['International Flights'] = international_flag(df['Origin'], df['Destination'], domestic_airports)
+    df['Region'] = region
+    return df
+
+
+def _region_month_task(kind, year_month, file_paths, output_folder, domestic_airports, columns, chunksize):
+    """进程池任务：清洗一个月份的全部 connection / mix 文件（各地区），合并去重后一次写出"""
+    clean = clean_connection_file if kind == 'con' else clean_mix_file
+    frames = []
+    for file_path in file_paths:
+        print(f"Processing {kind} file: {file_path}")
+        try:
+            region, _ = parse_region_month(file_path)
+            frames.append(clean(file_path, region, domestic_airports, columns, chunksize))
+        except Exception as e:
+            print(f"处理文件 {file_path} 时出错: {str(e)}")
+    if not frames:
+        return None
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True).drop_duplicates()
+    output_path = os.path.join(output_folder, f"{kind}_{year_month}.csv")
+    df.to_csv(output_path, index=False)
+    return output_path
+
+
+# 拼接后各月份数据的列（逐月写出时统一列顺序，缺少 connection / mix 文件的月份对应列为空）
+OAG_BASE_COLUMNS = [
+    'YearMonth', 'Origin', 'Destination', 'Equipment', 'Distance (KM)', 'International Flight',
+    'Equipment_Total_Flights', 'Equipment_Total_Seats',
+    'Route_Total_Flights', 'Route_Total_Seats', 'Route_Total_Flight_Time', 'Route_Avg_Flight_Time'
+]
+OAG_CON_COLUMNS = [
+    'Con Total Est. Pax', 'First', 'Business', 'Premium', 'Full Y', 'Disc Y',
+    'Avg yield', 'Avg First', 'Avg Business', 'Avg Premium', 'Avg Full Y', 'Avg Disc Y',
+    'Region'
+]
+OAG_MIX_COLUMNS = [
+    'Total Est. Pax', 'Local Est. Pax', 'Behind Est. Pax', 'Bridge Est. Pax', 'Beyond Est. Pax',
+    'Avg Fare (USD)', 'Local Fare', 'Behind Fare', 'Bridge Fare', 'Beyond Fare'
+]
+OAG_COLUMNS = OAG_BASE_COLUMNS + OAG_CON_COLUMNS + OAG_MIX_COLUMNS
+OAG_SORT_COLUMNS = ['YearMonth', 'Origin', 'Destination']
+
+
+def build_monthly_oag(file_path, connection_folder, mix_folder):
+    """处理一个月的数据：capacity 统计结果拼接同月的 connection / mix 数据"""
+    df = pd.read_csv(file_path)
+
+    df = df[(df['Route_Total_Seats'] > 0)].copy()
+    df['YearMonth'] = df['Time series'].str[:7]
+    # 首先，计算每个月每个航线的总航班数和总座位数
+    route_data = df.drop(columns=['Equipment', 'Equipment_Total_Flights','Equipment_Total_Seats'])
+    route_data = route_data.drop_duplicates()
+    route_grouped = route_data.groupby(['YearMonth', 'Origin', 'Destination'])
+    route_summary = route_grouped.agg({
+        'Route_Total_Flights': 'sum',
+        'Route_Total_Seats': 'sum',
+        'Route_Total_Flight_Time':'sum',
+        'Route_Avg_Flight_Time':'mean'
+    }).reset_index()
+    route_summary.columns = ['YearMonth', 'Origin', 'Destination', 'Route_Total_Flights', 'Route_Total_Seats', 'Route_Total_Flight_Time', 'Route_Avg_Flight_Time']
+
+    # 然后，计算每个月每个航线每个机型的总航班数和总座位数
+    equipment_grouped = df.groupby(['YearMonth', 'Origin', 'Destination', 'Equipment', 'Distance (KM)', 'International Flights'])
+    equipment_summary = equipment_grouped.agg({
+        'Equipment_Total_Flights': 'sum',
+        'Equipment_Total_Seats': 'sum'
+    }).reset_index()
+    equipment_summary.columns = ['YearMonth', 'Origin', 'Destination', 'Equipment', 'Distance (KM)', 'International Flight',
+                                'Equipment_Total_Flights', 'Equipment_Total_Seats']
+
+    # 将航线总数据与机型数据合并（左连接）
+    df = pd.merge(equipment_summary, route_summary,
+                on=['YearMonth', 'Origin', 'Destination'],
+                how='left')
+
+    # 获取唯一的YearMonth（假设所有记录都是同一个月）
+    year_month = df['YearMonth'].iloc[0]  # 取第一条记录的YearMonth
+
+    # 构造con文件路径（例如：<connection_folder>/con_2023-01.csv）
+    con_file = os.path.join(connection_folder, f"con_{year_month}.csv")
+    # 定义需要从 con 文件中提取的列（必须包含 Origin 和 Destination 用于合并）
+    con_required_cols = [
+        'Origin', 'Destination',  # 必须包含的合并键
+        'Total Est. Pax', 'First', 'Business', 'Premium', 'Full Y', 'Disc Y',
+        'Avg yield', 'Avg First', 'Avg Business', 'Avg Premium', 'Avg Full Y', 'Avg Disc Y',
+        'Region'
+    ]
+
+    if os.path.exists(con_file):
+        con_data = pd.read_csv(con_file, usecols=con_required_cols)
+        # 重命名 Total Est. Pax 为 Con-Total Est. Pax
+        con_data = con_data.rename(columns={'Total Est. Pax': 'Con Total Est. Pax'})
+
+        # 按 Origin 和 Destination 左连接
+        df = pd.merge(
+            df,
+            con_data,
+            on=['Origin', 'Destination'],
+            how='left'  # 保留 df 的所有行
+        )
+    else:
+        print(f"错误：未找到文件 {con_file}")
+
+    # 构造mix文件路径（例如：<mix_folder>/mix_2023-01.csv）
+    mix_file = os.path.join(mix_folder, f"mix_{year_month}.csv")
+    # 定义需要从 mix 文件中提取的列（必须包含 Origin 和 Destination 用于合并）
+    mix_required_cols = [
+        'Origin', 'Destination',  # 必须包含的合并键
+        'Total Est. Pax','Local Est. Pax','Behind Est. Pax','Bridge Est. Pax','Beyond Est. Pax',
+        'Avg Fare (USD)','Local Fare','Behind Fare','Bridge Fare','Beyond Fare'
+    ]
+
+    if os.path.exists(mix_file):
+        mix_data = pd.read_csv(mix_file, usecols=mix_required_cols)
+
+        # 按 Origin 和 Destination 左连接
+        df = pd.merge(
+            df,
+            mix_data,
+            on=['Origin', 'Destination'],
+            how='left'  # 保留 df 的所有行
+        )
+    else:
+        print(f"错误：未找到文件 {mix_file}")
+
+    return df
+
+
+def _oag_month_task(file_path, connection_folder, mix_folder, parts_folder):
+    """进程池任务：拼接一个月的数据，按统一列顺序排序后写入分片文件，只把路径返回给主进程"""
+    df = build_monthly_oag(file_path, connection_folder, mix_folder)
+    if df.empty:
+        return None
+    df = df.reindex(columns=OAG_COLUMNS).sort_values(by=OAG_SORT_COLUMNS)
+    part_path = os.path.join(parts_folder, f"oag_{df['YearMonth'].iloc[0]}.csv")
+    df.to_csv(part_path, index=False)
+    return part_path
+
+
+def _is_csv(file_name):
+    return file_name.endswith('.CSV') or file_name.endswith('.csv')
+
 
 class DataCleaner:
     def __init__(self, airport_file, economy_file, capacity_input_folder, connection_input_folder, mix_input_folder, final_output_file,
                  capacity_output_folder="./Capacity_Processed_0614",
                  connection_output_folder="./Connection_Processed_0614",
                  mix_output_folder="./Mix_Processed_0614",
-                 start_year=2011):
+                 start_year=2011,
+                 workers=None,
+                 chunksize=200_000):
+        """
+        workers: 清洗进程数，默认 CPU 核数，1 表示在当前进程内串行处理
+        chunksize: 读取原始 CSV 时每块的行数
+        """
         self.airport_file = airport_file
         self.economy_file = economy_file
         self.capacity_input_folder = capacity_input_folder
@@ -20,6 +364,8 @@ class DataCleaner:
         self.mix_output_folder = mix_output_folder
         self.final_output_file = final_output_file
         self.start_year = start_year
+        self.workers = workers or os.cpu_count() or 1
+        self.chunksize = chunksize
         self.OAG_Capacity_columns_to_keep = [
             'Origin', 'Destination', 'Departure Time', 'Arrival Time',
             'Elapsed Time', 'Distance (KM)', 'Equipment', 'Service', 'Stops',
@@ -49,76 +395,61 @@ class DataCleaner:
             print(f"初始化国内机场三字码失败: {str(e)}")
             raise
 
-    def __process_capacity_and_save(self, file_path, output_folder):
-        columns_to_keep = self.OAG_Capacity_columns_to_keep
-        df = pd.read_csv(file_path)
-        df = df[columns_to_keep]
-        df = df.drop_duplicates()
-
-        # 处理飞行时间
-        df['flighting_time'] = df['Elapsed Time'].str.split(':').apply(
-            lambda x: int(x[0])*60 + int(x[1]) if isinstance(x, list) and len(x)==2 else 0
-        )
-        # 转换日期格式并提取年月
-        df['Time series'] = pd.to_datetime(df['Time series'], errors='coerce')
-        df = df.dropna(subset=['Time series'])  # 删除无效日期
-        df['YearMonth'] = df['Time series'].dt.to_period('M')
-        df['Time series'] = df['Time series'].dt.strftime('%Y-%m-%d')
-
-        # 筛选国内航线
-        df = df[
-            (df['Origin'].isin(self.domestic_airports)) | 
-            (df['Destination'].isin(self.domestic_airports))
-        ]
-        df['International Flights'] = df.apply(
-            lambda row: 0 if (row['Origin'] in self.domestic_airports and 
-                            row['Destination'] in self.domestic_airports) else 1,
-            axis=1
-        )
-        
-        # 记录每个 Origin-Destination 对的最小 Distance
-        self.min_origin_destinations.update(df.groupby(['Origin', 'Destination'])['Distance (KM)'].min().to_dict())
-
-        # 按年月分组处理
-        for (year_month), group in df.groupby('YearMonth'):
-            # 生成目标文件名 (格式: output_folder/YYYY-MM/YYYY-MM.csv)
-            ym_str = str(year_month)
-            output_file = os.path.join(output_folder, f"cap_{ym_str}.csv")
-
-            # 先计算每个航线的总数（不分机型）
-            route_totals = group.groupby(['Time series', 'Origin', 'Destination']).agg(
-                Route_Total_Flights=('Seats', 'count'),
-                Route_Total_Seats=('Seats', 'sum'),
-                Route_Total_Flight_Time=('flighting_time', 'sum'),
-                Route_Avg_Flight_Time=('flighting_time', 'mean') 
-            ).reset_index()
-            
-            # 分组统计（按机型）
-            result = group.groupby(['Time series','Origin', 'Destination', 'Service', 'Stops', 'Equipment', 'International Flights']).agg(
-                Equipment_Total_Flights=('Seats', 'count'),    #航班数量
-                Equipment_Total_Seats=('Seats', 'sum'),    #座位数量
-                # Equipment_Total_Flight_Time=('flighting_time', 'sum')    #飞行时间
-            ).reset_index()
-            
-            # 合并总数到结果中
-            result = pd.merge(result, route_totals, 
-                            on=['Time series', 'Origin', 'Destination'],
-                            how='left')
-            
-            result = result.sort_values(by=['Time series', 'Route_Total_Flights', 'Route_Total_Seats', 'Route_Total_Flight_Time', 'Route_Avg_Flight_Time', 'Equipment_Total_Flights', 'Equipment_Total_Seats'], 
-                                        ascending=[True, False, False, False, False, False, False])
-            
-            # 检查文件是否存在
-            if os.path.exists(output_file):
-                # 如果文件存在，读取现有数据并追加
-                existing_df = pd.read_csv(output_file)
-                combined_df = pd.concat([existing_df, result])
-                combined_df = combined_df.drop_duplicates().sort_values(by=['Time series', 'Route_Total_Flights', 
-                                                                            'Route_Total_Seats', 'Route_Total_Flight_Time', 'Route_Avg_Flight_Time', 'Equipment_Total_Flights', 'Equipment_Total_Seats'], 
-                                                                        ascending=[True, False, False, False, False, False, False])
-                combined_df.to_csv(output_file, index=False)
-            else:
-                result.to_csv(output_file, index=False)
+    def __run_tasks(self, func, tasks):
+        """在进程池中执行任务（按提交顺序返回结果），workers 为 1 或只有一个任务时串行执行"""
+        if self.workers <= 1 or len(tasks) <= 1:
+            return [func(*args) for args in tasks]
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks))) as pool:
+            futures = [pool.submit(func, *args) for args in tasks]
+            return [f.result() for f in futures]
+
+    def __clean_capacity_files(self, file_paths, output_folder):
+        """
+        清洗 capacity 文件并按月写出 cap_YYYY-MM.csv：
+        各文件并行清洗为按月分片，再按月份并行合并分片、拼接最小距离，每个月份文件只写一次
+        """
+        parts_folder = os.path.join(output_folder, '_parts')
+        Path(parts_folder).mkdir(parents=True, exist_ok=True)
+        try:
+            results = self.__run_tasks(_capacity_file_task, [
+                (file_path, parts_folder, i, self.domestic_airports, self.OAG_Capacity_columns_to_keep, self.chunksize)
+                for i, file_path in enumerate(file_paths)
+            ])
+
+            month_parts = defaultdict(list)
+            for parts, min_distances in results:
+                for year_month, part_path in parts.items():
+                    month_parts[year_month].append(part_path)
+                # 记录每个 Origin-Destination 对的最小 Distance（跨文件取最小）
+                for key, distance in min_distances.items():
+                    current = self.min_origin_destinations.get(key)
+                    if current is None or distance < current:
+                        self.min_origin_destinations[key] = distance
+
+            min_distances_df = pd.DataFrame(
+                [(o, d, dist) for (o, d), dist in self.min_origin_destinations.items()],
+                columns=['Origin', 'Destination', 'Distance (KM)']
+            )
+            return self.__run_tasks(_capacity_month_task, [
+                (year_month, part_paths, output_folder, min_distances_df)
+                for year_month, part_paths in sorted(month_parts.items())
+            ])
+        finally:
+            shutil.rmtree(parts_folder, ignore_errors=True)
+
+    def __clean_region_month_files(self, kind, file_paths, output_folder, columns):
+        """按文件名中的月份分组，每个月份一个任务，同月各地区文件合并后一次写出"""
+        by_month = defaultdict(list)
+        for file_path in file_paths:
+            parsed = parse_region_month(file_path)
+            if parsed is None:
+                print(f"警告：文件名 {os.path.basename(file_path)} 格式不正确。")
+                continue
+            by_month[parsed[1]].append(file_path)
+        return self.__run_tasks(_region_month_task, [
+            (kind, year_month, paths, output_folder, self.domestic_airports, columns, self.chunksize)
+            for year_month, paths in sorted(by_month.items())
+        ])
 
     def process_capacity(self):
         """处理oag的capacity数据"""
@@ -127,139 +458,12 @@ class DataCleaner:
         if os.path.exists(output_folder):
             print(f"输出目录 {output_folder} 已存在，跳过process_capacity")
             return
-        Path(output_folder).mkdir(parents=True, exist_ok=True) 
-        for file_name in os.listdir(input_folder):
-            if file_name.endswith('.CSV') or file_name.endswith('.csv'):
-                if int(file_name.split('_')[0]) < self.start_year:
-                    continue
-                file_path = os.path.join(input_folder, file_name)
-                print(f"Processing capacity file: {file_path}")
-                self.__process_capacity_and_save(file_path, output_folder)
-        # 将 min_distances 转换为 DataFrame
-        min_distances_df = pd.DataFrame(list(self.min_origin_destinations.items()), columns=['Origin-Destination', 'Distance (KM)'])
-
-        # 将 Origin-Destination 列格式化为字符串格式（如 AAT-AKU）
-        min_distances_df['Origin-Destination'] = min_distances_df['Origin-Destination'].apply(lambda x: f"{x[0]}-{x[1]}")
-
-        # 读取所有处理后的文件并拼接最小距离
-        for file_name in os.listdir(output_folder):
-            if file_name.endswith('.csv'):
-                file_path = os.path.join(output_folder, file_name)
-                # print(f"Updating file: {file_path}")
-                df = pd.read_csv(file_path)
-                df['Origin-Destination'] = df['Origin'] + '-' + df['Destination']
-                df = pd.merge(df, min_distances_df, on='Origin-Destination', how='left')
-                df.drop(columns=['Origin-Destination'], inplace=True)  # 删除辅助列
-                df.to_csv(file_path, index=False)
-    
-    def __process_connection_and_save(self, file_path, output_folder):
-        try:
-            # 解析文件名以提取年份和月份
-            filename = os.path.basename(file_path)
-            parts = filename.split('-')
-            if len(parts) < 3:
-                print(f"警告：文件名 {filename} 格式不正确。")
-                return
-            
-            region = parts[1]  # 地区
-            yyyymm = parts[2].split('_')[0]  # 年月
-            yyyy, mm = int(yyyymm[:4]), int(yyyymm[4:])
-            yyyymm_str = f"{yyyy:04d}-{mm:02d}"  # 格式化为 YYYY-MM
-
-            # 读取数据
-            df = pd.read_csv(file_path, index_col=False)
-            
-            # 筛选从 AM 到 BB 的列（索引范围 38 到 54）
-            columns_to_keep = df.columns[38:55]  # 包括 38 和 54
-            df = df[columns_to_keep]
-            
-            # 删除 Origin 列为空的行
-            df = df.dropna(subset=['Origin'])
-            
-            # 重新命名列名
-            new_column_names = [
-                'Origin', 'Connecting over', 'Connecting over (Name)', 'Destination',
-                'Total Est. Pax', 'First', 'Business', 'Premium', 'Full Y', 'Disc Y',
-                'Avg_yield', 'Avg First', 'Avg Business', 'Avg Premium', 'Avg Full Y', 'Avg Disc Y'
-            ]
-            df.columns = new_column_names
-            
-            # 筛选国内机场相关数据
-            df = df[
-                (df['Origin'].isin(self.domestic_airports)) | 
-                (df['Destination'].isin(self.domestic_airports))
-            ]
-            
-            # 标记是否为国际航班
-            df['International Flights'] = df.apply(
-                lambda row: 0 if (row['Origin'] in self.domestic_airports and 
-                                row['Destination'] in self.domestic_airports) else 1,
-                axis=1)
-            df['Region'] = region
-
-            # 分组处理 - 重命名 Avg yield 为 Avg_yield 避免关键字冲突
-            df = df.rename(columns={'Avg yield': 'Avg_yield'})
-            
-            # 定义聚合函数（不再包含 Connecting over 相关列）
-            agg_funcs = {
-                'Total Est. Pax': 'sum',
-                'First': 'sum',
-                'Business': 'sum',
-                'Premium': 'sum',
-                'Full Y': 'sum',
-                'Disc Y': 'sum',
-                'International Flights': 'first',
-                'Region': 'first'
-            }
-
-            # 计算加权平均值
-            avg_columns = ['Avg_yield', 'Avg First', 'Avg Business', 'Avg Premium', 'Avg Full Y', 'Avg Disc Y']
-            for col in avg_columns:
-                # 获取对应的数量列名
-                count_col = col.replace('Avg ', '') if col != 'Avg_yield' else 'Total Est. Pax'
-                
-                # 计算总价值
-                df[f'{col}_total'] = df[col] * df[count_col]
-                agg_funcs[f'{col}_total'] = 'sum'
-                agg_funcs[count_col] = 'sum'  # 确保数量列也被求和
-
-            # 执行分组聚合
-            grouped = df.groupby(['Origin', 'Destination'])
-            result = grouped.agg(agg_funcs)
-
-            # 计算新的平均值
-            for col in avg_columns:
-                count_col = col.replace('Avg ', '') if col != 'Avg_yield' else 'Total Est. Pax'
-                result[col] = result[f'{col}_total'] / result[count_col]
-                result = result.drop(f'{col}_total', axis=1)
-
-            # 处理除零情况
-            result = result.fillna(0)
-            
-            # 重置索引
-            result = result.reset_index()
-            
-            # 恢复原来的列名
-            result = result.rename(columns={'Avg_yield': 'Avg yield'})
-            
-            # 重新排列列顺序（不包含 Connecting over 相关列）
-            output_columns = self.OAG_Connection_columns
-            result = result[output_columns]
-
-            # 检查并保存结果
-            output_filename = f"con_{yyyymm_str}.csv"
-            output_path = os.path.join(output_folder, output_filename)
-            
-            if os.path.exists(output_path):
-                existing_df = pd.read_csv(output_path)
-                combined_df = pd.concat([existing_df, result], ignore_index=True)
-                combined_df.drop_duplicates(inplace=True)
-                combined_df.to_csv(output_path, index=False)
-            else:
-                result.to_csv(output_path, index=False)  
-            # print(f"成功处理并保存: {output_path}")    
-        except Exception as e:
-            print(f"处理文件 {file_path} 时出错: {str(e)}")
+        Path(output_folder).mkdir(parents=True, exist_ok=True)
+        file_paths = [
+            os.path.join(input_folder, file_name) for file_name in sorted(os.listdir(input_folder))
+            if _is_csv(file_name) and int(file_name.split('_')[0]) >= self.start_year
+        ]
+        self.__clean_capacity_files(file_paths, output_folder)
 
     def process_connection(self):
         """处理oag的connection数据"""
@@ -269,66 +473,9 @@ class DataCleaner:
             print(f"输出目录 {output_folder} 已存在，跳过process_connection")
             return
         Path(output_folder).mkdir(parents=True, exist_ok=True)
-        for filename in os.listdir(input_folder):
-            if filename.endswith('.CSV') or filename.endswith('.csv'):
-                file_path = os.path.join(input_folder, filename)
-                print(f"Processing connection file: {file_path}")
-                self.__process_connection_and_save(file_path, output_folder)
+        file_paths = [os.path.join(input_folder, f) for f in sorted(os.listdir(input_folder)) if _is_csv(f)]
+        self.__clean_region_month_files('con', file_paths, output_folder, self.OAG_Connection_columns)
 
-    def __process_mix_and_save(self, file_path, output_folder):
-        try:
-            # 解析文件名以提取年份和月份
-            filename = os.path.basename(file_path)
-            parts = filename.split('-')
-            if len(parts) < 3:
-                print(f"警告：文件名 {filename} 格式不正确。")
-                return
-            region = parts[1]  # 地区
-            yyyymm = parts[2].split('_')[0]  # 年月
-            yyyy, mm = int(yyyymm[:4]), int(yyyymm[4:])
-            yyyymm_str = f"{yyyy:04d}-{mm:02d}"  # 格式化为 YYYY-MM
-
-            df = pd.read_csv(file_path,index_col=False,on_bad_lines='skip')
-
-            # 筛选从 M 到 Y 
-            columns_to_keep = df.columns[:11]
-            df = df[columns_to_keep]
-            # 删除 Origin 列为空的行
-            df = df.dropna(subset=["Market Pair"])
-            # 重新命名列名
-            new_column_names = self.OAG_mix_columns
-            # 重新命名列名
-            df.columns = new_column_names
-            df[['Origin', 'Destination']] = df['Market Pair'].str.split('-', expand=True)
-            df = df.drop(columns=['Market Pair']) 
-            df = df[
-                (df['Origin'].isin(self.domestic_airports)) | 
-                (df['Destination'].isin(self.domestic_airports))
-            ]
-            df['International Flights'] = df.apply(
-                lambda row: 0 if (row['Origin'] in self.domestic_airports and 
-                                row['Destination'] in self.domestic_airports) else 1,
-                axis=1)
-            df['Region'] = region
-            
-            # 检查是否存在对应的 YYYY-MM.csv 文件
-            output_filename = f"mix_{yyyymm_str}.csv"
-            output_path = os.path.join(output_folder, output_filename)
-            
-            if os.path.exists(output_path):
-                # 如果文件存在，读取文件并拼接数据
-                existing_df = pd.read_csv(output_path)
-                combined_df = pd.concat([existing_df, df], ignore_index=True)
-                # 去重
-                combined_df.drop_duplicates(inplace=True)
-                # 保存更新后的文件
-                combined_df.to_csv(output_path, index=False)
-            else:
-                # 如果文件不存在，保存当前数据为新文件
-                df.to_csv(output_path, index=False)
-        except Exception as e:
-            print(f"处理文件 {file_path} 时出错: {str(e)}")
-    
     def process_mix(self):
         """处理oag的mix数据"""
         input_folder = self.mix_input_folder
@@ -337,123 +484,37 @@ class DataCleaner:
             print(f"输出目录 {output_folder} 已存在，跳过process_mix")
             return
         Path(output_folder).mkdir(parents=True, exist_ok=True)
-        for filename in os.listdir(input_folder):
-            if filename.endswith('.CSV') or filename.endswith('.csv'):
-                file_path = os.path.join(input_folder, filename)
-                print(f"Processing mix file: {file_path}")
-                self.__process_mix_and_save(file_path, output_folder)
-    
-    def __process_monthly_data(self, file_path):
-        """处理一个月的数据"""
-        df = pd.read_csv(file_path)
-
-        df = df[(df['Route_Total_Seats'] > 0)].copy()
-        df['YearMonth'] = df['Time series'].str[:7]
-        # 首先，计算每个月每个航线的总航班数和总座位数
-        route_data = df.drop(columns=['Equipment', 'Equipment_Total_Flights','Equipment_Total_Seats'])  
-        route_data = route_data.drop_duplicates()  
-        route_grouped = route_data.groupby(['YearMonth', 'Origin', 'Destination'])
-        route_summary = route_grouped.agg({
-            'Route_Total_Flights': 'sum',
-            'Route_Total_Seats': 'sum',
-            'Route_Total_Flight_Time':'sum',
-            'Route_Avg_Flight_Time':'mean'
-        }).reset_index()
-        route_summary.columns = ['YearMonth', 'Origin', 'Destination', 'Route_Total_Flights', 'Route_Total_Seats', 'Route_Total_Flight_Time', 'Route_Avg_Flight_Time']
-
-        # 然后，计算每个月每个航线每个机型的总航班数和总座位数
-        equipment_grouped = df.groupby(['YearMonth', 'Origin', 'Destination', 'Equipment', 'Distance (KM)', 'International Flights'])
-        equipment_summary = equipment_grouped.agg({
-            'Equipment_Total_Flights': 'sum',
-            'Equipment_Total_Seats': 'sum'
-        }).reset_index()
-        equipment_summary.columns = ['YearMonth', 'Origin', 'Destination', 'Equipment', 'Distance (KM)', 'International Flight', 
-                                    'Equipment_Total_Flights', 'Equipment_Total_Seats']
-
-        # 将航线总数据与机型数据合并（左连接）
-        df = pd.merge(equipment_summary, route_summary,
-                    on=['YearMonth', 'Origin', 'Destination'], 
-                    how='left')
-        
-        # 获取唯一的YearMonth（假设所有记录都是同一个月）
-        year_month = df['YearMonth'].iloc[0]  # 取第一条记录的YearMonth
-
-        # 构造con文件路径（例如：./Con_Processed/con_2023-01.csv）
-        con_file = f"./Con_Processed/con_{year_month}.csv"
-        # 定义需要从 con 文件中提取的列（必须包含 Origin 和 Destination 用于合并）
-        con_required_cols = [
-            'Origin', 'Destination',  # 必须包含的合并键
-            'Total Est. Pax', 'First', 'Business', 'Premium', 'Full Y', 'Disc Y',
-            'Avg yield', 'Avg First', 'Avg Business', 'Avg Premium', 'Avg Full Y', 'Avg Disc Y',
-            'Region'
-        ]
-
-        if os.path.exists(con_file):
-            # 读取 con 文件，并只选择需要的列（例如 Airline 和 Aircraft_Type）
-            con_data = pd.read_csv(con_file, usecols=con_required_cols)
-            # 重命名 Total Est. Pax 为 Con-Total Est. Pax
-            con_data = con_data.rename(columns={'Total Est. Pax': 'Con Total Est. Pax'})
-            
-            # 按 Origin 和 Destination 左连接
-            df = pd.merge(
-                df,
-                con_data,
-                on=['Origin', 'Destination'],
-                how='left'  # 保留 df 的所有行
-            )
-        else:
-            print(f"错误：未找到文件 {con_file}")
-
-        # 构造mix文件路径（例如：./Mix_Processed/mix_2023-01.csv）
-        mix_file = f"./Mix_Processed/mix_{year_month}.csv"
-        # 定义需要从 con 文件中提取的列（必须包含 Origin 和 Destination 用于合并）
-        mix_required_cols = [
-            'Origin', 'Destination',  # 必须包含的合并键
-            'Total Est. Pax','Local Est. Pax','Behind Est. Pax','Bridge Est. Pax','Beyond Est. Pax',
-            'Avg Fare (USD)','Local Fare','Behind Fare','Bridge Fare','Beyond Fare'
-        ]
-
-        if os.path.exists(mix_file):
-            # 读取 con 文件，并只选择需要的列（例如 Airline 和 Aircraft_Type）
-            mix_data = pd.read_csv(mix_file, usecols=mix_required_cols)        
-
-            # 按 Origin 和 Destination 左连接
-            df = pd.merge(
-                df,
-                mix_data,
-                on=['Origin', 'Destination'],
-                how='left'  # 保留 df 的所有行
-            )
-        else:
-            print(f"错误：未找到文件 {mix_file}")
-
-        return df
+        file_paths = [os.path.join(input_folder, f) for f in sorted(os.listdir(input_folder)) if _is_csv(f)]
+        self.__clean_region_month_files('mix', file_paths, output_folder, self.OAG_mix_columns)
+
+    def iter_monthly_oag(self):
+        """
+        按月份顺序逐月产出拼接好的 OAG 数据（各月份在进程池中并行拼接并写入临时分片文件，
+        主进程每次只读入一个月份，内存占用不随月份数增长）
+        """
+        folder_path = self.capacity_output_folder
+        # 获取文件夹中所有CSV文件（cap_YYYY-MM.csv，文件名顺序即月份顺序）
+        all_files = sorted(f for f in os.listdir(folder_path) if f.endswith('.csv'))
+        parts_folder = os.path.join(folder_path, '_oag_parts')
+        Path(parts_folder).mkdir(parents=True, exist_ok=True)
+        try:
+            part_paths = self.__run_tasks(_oag_month_task, [
+                (os.path.join(folder_path, file), self.connection_output_folder, self.mix_output_folder, parts_folder)
+                for file in all_files
+            ])
+            for part_path in part_paths:
+                if part_path is not None:
+                    yield pd.read_csv(part_path)
+        finally:
+            shutil.rmtree(parts_folder, ignore_errors=True)
 
     def process_all_oag(self):
-        """按照capacity数据,连接其他所有oag数据"""
-        folder_path = self.capacity_output_folder
-        # 获取文件夹中所有CSV文件
-        all_files = [f for f in os.listdir(folder_path) if f.endswith('.csv')]
-        # 存储所有处理后的DataFrame
-        all_dfs = []
-        
-        for file in all_files:
-            file_path = os.path.join(folder_path, file)
-            print(f"Processing oag all file: {file}")
-            # 处理单个文件
-            monthly_df = self.__process_monthly_data(file_path)
-            all_dfs.append(monthly_df)
-        
-        # 纵向合并所有DataFrame
-        if all_dfs:
-            final_df = pd.concat(all_dfs, axis=0, ignore_index=True)
-            # 按YearMonth, Origin, Destination排序
-            final_df = final_df.sort_values(by=['YearMonth', 'Origin', 'Destination'])
-            final_df = final_df.reset_index(drop=True)
-            
-            return final_df
-        else:
+        """按照capacity数据,连接其他所有oag数据，合并为一个 DataFrame（全部月份驻留内存，大数据量请用 iter_monthly_oag）"""
+        frames = list(self.iter_monthly_oag())
+        if not frames:
             return pd.DataFrame()
+        # 各月份已按 Origin, Destination 排序，按月份顺序拼接即为 YearMonth, Origin, Destination 顺序
+        return pd.concat(frames, axis=0, ignore_index=True)
 
     def __interpolate_city_data_bug(self,city_data):
         """定义一个函数，用于对每个城市的每年数据进行插值"""
@@ -514,168 +575,67 @@ class DataCleaner:
         # 将插值数据转换为DataFrame并返回
         return pd.DataFrame(interpolated_data)
 
-    def __interpolate_city_data(self, city_data):
-        """对每个城市的每年数据进行插值和预测，处理中间年份缺失问题"""
-        # 确保所有经济指标列为数值型
-        indicators = ['GDP（亿元）', '人口（万人）', '第三产业占比（%）', 
-                    '人均可支配收入（元）', '社会消费品零售总额(万元)', 
-                    '三大产业就业人员总和(万人)', '民用航空客运量(万人)']
-        
-        for indicator in indicators:
-            city_data[indicator] = pd.to_numeric(city_data[indicator], errors='coerce')
-        
-        # ==== 新增：处理中间年份缺失问题 ====
-        # 获取年份范围
-        years = sorted(city_data['年份'].unique())
-        min_year = min(years)
-        max_year = max(years)
-        
-        # 创建完整年份范围的数据框架
-        all_years = pd.DataFrame({
-            '年份': range(min_year, max_year + 1),
-            '三字码': city_data['三字码'].iloc[0]  # 保持城市代码一致
-        })
-        
-        # 合并原始数据，填充缺失年份
-        city_data = pd.merge(all_years, city_data, how='left', on=['年份', '三字码'])
-        
-        # 处理缺失值和0值
-        for indicator in indicators:
-            # 将0值视为缺失
-            city_data.loc[city_data[indicator] == 0, indicator] = np.nan
-            
-            # 使用线性插值填充中间年份
-            city_data[indicator] = city_data[indicator].interpolate(method='linear')
-            
-            # 如果两端有缺失，用最近值填充
-            city_data[indicator] = city_data[indicator].fillna(method='ffill').fillna(method='bfill')
+    def process_economy(self):
+        """城市经济数据 -> 以 (City, YearMonth) 为索引的月度面板（见 economy_panel，源文件未变化时使用缓存）"""
+        return load_economy_panel(self.economy_file)
 
-            if city_data[indicator].isna().any():
-                city_data[indicator] = city_data[indicator].fillna(0)
-        # ==== 修复完成 ====
-        
-        # 创建一个空的列表来存储插值结果
-        interpolated_data = []
-        
-        # 重新获取年份范围（已包含完整年份）
-        years = sorted(city_data['年份'].unique())
-        min_year = min(years)
-        max_year = max(years)
-        
-        # 预测下一年数据（用于月度插值）
-        next_year_data = {}
-        for indicator in indicators:
-            # 使用所有年份数据训练模型
-            X = city_data['年份'].values.reshape(-1, 1)
-            y = city_data[indicator].values
-
-            # 如果y包含NaN，使用简单平均值替代
-            if np.isnan(y).any():
-                mean_val = np.nanmean(y)
-                y = np.where(np.isnan(y), mean_val, y)
-
-                # 如果所有值都是NaN，使用0
-                if np.isnan(mean_val):
-                    y = np.zeros_like(y)
-            
-            model = LinearRegression()
-            model.fit(X, y)
-            next_year_value = model.predict([[max_year + 1]])[0]
-            next_year_data[indicator] = next_year_value
-        
-        # 对每个年份进行月度插值
-        for year in years:
-            current_data = city_data[city_data['年份'] == year].iloc[0]
-            
-            # 确定下一年数据
-            if year < max_year:
-                next_data = city_data[city_data['年份'] == year + 1].iloc[0]
-            else:
-                # 使用预测的下一年数据
-                next_data = {'年份': year + 1, '三字码': current_data['三字码']}
-                for indicator in indicators:
-                    next_data[indicator] = next_year_data[indicator]
-            
-            # 按月插值
-            for month in range(1, 13):
-                row = {'YearMonth': f'{year}-{month:02d}', 'City': current_data['三字码']}
-                
-                for indicator in indicators:
-                    # 线性插值公式
-                    ratio = (month - 1) / 12.0
-                    current_val = current_data[indicator]
-                    next_val = next_data[indicator]
-                    interpolated_val = current_val + ratio * (next_val - current_val)
-                    
-                    row[indicator] = interpolated_val
-                
-                interpolated_data.append(row)
-        
-        # 转换为DataFrame并重命名列
-        result = pd.DataFrame(interpolated_data)
-        col_mapping = {
-            'GDP（亿元）': 'GDP',
-            '人口（万人）': 'Population',
-            '第三产业占比（%）': 'Third_Industry',
-            '人均可支配收入（元）': 'Revenue',
-            '社会消费品零售总额(万元)': 'Retail',
-            '三大产业就业人员总和(万人)': 'Labor',
-            '民用航空客运量(万人)': 'Air_Traffic'
-        }
-        return result.rename(columns=col_mapping)
+    def __merge_economy(self, OAG_df, eco_panel):
+        """按 YearMonth + Origin / Destination 拼接经济数据（O_ / D_ 前缀，第三产业占比为 Third_Industry_x / _y）"""
+        OAG_df['YearMonth'] = OAG_df['YearMonth'].astype(str)  # 确保格式一致
+        return attach_economy(OAG_df, eco_panel)
 
-    def process_economy(self):
-        ecodata = pd.read_csv(self.economy_file)
-        # 对每个城市分别进行插值
-        eco_df = pd.DataFrame()
-        for city in ecodata['三字码'].unique():
-            city_data = ecodata[ecodata['三字码'] == city]
-            interpolated_data = self.__interpolate_city_data(city_data)
-            eco_df = pd.concat([eco_df, interpolated_data], ignore_index=True)
-        # 直接修改 eco_df 的列名
-        eco_df_origin = eco_df.rename(columns={
-            'City': 'Origin',
-            'GDP': 'O_GDP',
-            'Population': 'O_Population',
-            'Third_Indsutry': 'O_Third_Indsutry',
-            'Revenue': 'O_Revenue',
-            'Retail': 'O_Retail',
-            'Labor': 'O_Labor',
-            'Air_Traffic': 'O_Air_Traffic'
-        })
-        # Step 2: 按照 YearMonth 和 Destination 拼接
-        # 直接修改 eco_df 的列名
-        eco_df_destination = eco_df.rename(columns={
-            'City': 'Destination',
-            'GDP': 'D_GDP',
-            'Population': 'D_Population',
-            'Third_Indsutry': 'D_Third_Indsutry',
-            'Revenue': 'D_Revenue',
-            'Retail': 'D_Retail',
-            'Labor': 'D_Labor',
-            'Air_Traffic': 'D_Air_Traffic'
-        })
-
-        return eco_df_origin,eco_df_destination
+    def process_month(self, year_month, capacity_files, connection_files, mix_files):
+        """
+        增量处理单个月份：只清洗该月的 capacity / connection / mix 文件，返回该月的最终数据（列与 process_data 输出一致）
+
+        中间文件写入三个 *_output_folder，调用方应为每次处理指定新的空目录（已存在的月度文件会被追加合并）。
+        航线距离取本次 capacity 文件中的最小值。
+
+        :param year_month: 'YYYY-MM'
+        :return: DataFrame，该月没有 capacity 数据时抛出 FileNotFoundError
+        """
+        for folder in (self.capacity_output_folder, self.connection_output_folder, self.mix_output_folder):
+            Path(folder).mkdir(parents=True, exist_ok=True)
+
+        self.min_origin_destinations = {}
+        self.__clean_capacity_files(capacity_files, self.capacity_output_folder)
+        self.__clean_region_month_files('con', connection_files, self.connection_output_folder, self.OAG_Connection_columns)
+        self.__clean_region_month_files('mix', mix_files, self.mix_output_folder, self.OAG_mix_columns)
+
+        cap_file = os.path.join(self.capacity_output_folder, f"cap_{year_month}.csv")
+        if not os.path.exists(cap_file):
+            raise FileNotFoundError(f"capacity 文件中没有 {year_month} 的数据")
+
+        OAG_df = build_monthly_oag(cap_file, self.connection_output_folder, self.mix_output_folder)
+        OAG_df = OAG_df.sort_values(by=['YearMonth', 'Origin', 'Destination']).reset_index(drop=True)
+
+        return self.__merge_economy(OAG_df, self.process_economy())
 
     def process_data(self):
-        """主处理流程"""
+        """主处理流程：逐月拼接 OAG 与经济数据并追加写入最终文件，不在内存中合并全部月份"""
         # 处理所有OAG数据
         self.process_capacity()
         self.process_connection()
         self.process_mix()
-        OAG_df = self.process_all_oag()
         # 处理经济数据
-        eco_df_origin,eco_df_destination = self.process_economy()
-        # 对 Origin 进行合并，合并后的列名已加上 O_ 前缀
-        OAG_df['YearMonth'] = OAG_df['YearMonth'].apply(lambda x: str(x))  # 确保格式一致
-        eco_df_origin['YearMonth'] = eco_df_origin['YearMonth'].apply(lambda x: str(x))  # 确保格式一致
-        final_df = pd.merge(OAG_df, eco_df_origin, how='left', left_on=['YearMonth', 'Origin'], right_on=['YearMonth', 'Origin'])
+        eco_panel = self.process_economy()
 
-        eco_df_destination['YearMonth'] = eco_df_destination['YearMonth'].apply(lambda x: str(x))  # 确保格式一致
-        final_df = pd.merge(final_df, eco_df_destination, how='left', left_on=['YearMonth', 'Destination'], right_on=['YearMonth', 'Destination'])
-
-        final_df.to_csv(self.final_output_file,index=False)
+        tmp_path = f"{self.final_output_file}.tmp"
+        header = True
+        try:
+            for OAG_df in self.iter_monthly_oag():
+                # 对 Origin / Destination 进行合并，合并后的列名已加上 O_ / D_ 前缀
+                month_df = self.__merge_economy(OAG_df, eco_panel)
+                month_df.to_csv(tmp_path, mode='w' if header else 'a', header=header, index=False)
+                header = False
+            if header:
+                # 没有任何月份数据：写出空文件
+                pd.DataFrame().to_csv(tmp_path, index=False)
+            os.replace(tmp_path, self.final_output_file)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
 
 
 if __name__ == "__main__":
@@ -24,7 +24,9 @@ class DataPreprocessor(BaseEstimator, TransformerMixin):
                     'D_GDP','D_Population','Third_Industry_y','D_Revenue','D_Retail','D_Labor','D_Air_Traffic'
                  ),
                  economic_tail_method='linear',
-                 economic_growth_rate=0.02):
+                 economic_growth_rate=0.02,
+                 prefit_tail_models=False,
+                 prefit_columns=None):
         """
         Args:
             fill_method (str): 主填充方法 ['interp'|'zero'|'regression']
@@ -38,6 +40,9 @@ class DataPreprocessor(BaseEstimator, TransformerMixin):
             economic_prefixes (tuple): 经济数据列的前缀列表
             economic_tail_method (str): 经济数据列尾部填充方法 ['linear'|'growth_rate']，默认'linear'
             economic_growth_rate (float): 当使用'growth_rate'时的每期增长率（相对上一期），例如0.02表示+2%
+            prefit_tail_models (bool): fit 时是否额外为无尾部缺失的列预先拟合尾部外推模型，供预测时复用，默认关闭
+                （存在尾部缺失的列总会拟合，但预测时历史已被填充、签名无法匹配，只用于训练数据本身）
+            prefit_columns (list): 预先拟合的列（通常为模型实际使用的特征列），None 表示全部列
         """
         self.fill_method = fill_method
         self.max_invalid_ratio = max_invalid_ratio
@@ -50,10 +55,13 @@ class DataPreprocessor(BaseEstimator, TransformerMixin):
         self.forecast_horizon = forecast_horizon
         self.economic_tail_method = economic_tail_method
         self.economic_growth_rate = economic_growth_rate
+        self.prefit_tail_models = prefit_tail_models
+        self.prefit_columns = prefit_columns
         self.scaler = None
         self.binary_columns = []
         self.column_stats = {}
         self.economic_columns = []
+        self.tail_models = {}
         self.model_params={'auto': {'seasonal': True, 'seasonal_periods': 12},
                               'arima': {'order': (1,1,1)},
                               'sarima': {'order': (1,1,1), 'seasonal_order': (1,1,1,12)}}
@@ -82,9 +90,58 @@ class DataPreprocessor(BaseEstimator, TransformerMixin):
                         'min': non_zero.min(),
                         'max': non_zero.max()
                     }
+
+        # 拟合尾部外推模型（随预处理器一起保存，transform 时直接复用）
+        self._fit_tail_models(X, all_columns=getattr(self, 'prefit_tail_models', False))
         return self
         
     def transform(self, X):
+        """
+        按矩阵批量预处理：非 0-1 列组成一个 float64 二维数组，一次完成 0 值屏蔽、头部填充、
+        中间插值 / 回归填充和中位数后备填充；只有存在尾部缺失的列逐列调用尾部外推。
+        结果与逐列实现（_transform_by_column）逐位一致；非默认索引（尾部判断依赖位置）时退回逐列实现。
+        fill_method='regression' 的矩阵最小二乘与 scipy.stats.linregress 的运算顺序不同，结果不能逐位一致，
+        仍使用逐列实现。
+        """
+        if self.time_col not in X.columns:
+            raise ValueError(f"Time column '{self.time_col}' not found in data")
+
+        n = len(X)
+        if n == 0 or self.fill_method == 'regression' or not X.index.equals(pd.RangeIndex(n)):
+            return self._transform_by_column(X)
+
+        time_series = pd.to_datetime(X[self.time_col])
+        value_cols = [col for col in X.columns if col != self.time_col and col not in self.binary_columns]
+
+        # 数据类型转换：数值列 to_numeric 不改变取值，只转换 object（如 decimal.Decimal）列
+        converted = {}
+        for col in value_cols:
+            if not pd.api.types.is_numeric_dtype(X[col]):
+                converted[col] = pd.to_numeric(X[col], errors='coerce')
+
+        filled = {}
+        if value_cols:
+            M = pd.DataFrame({col: converted.get(col, X[col]) for col in value_cols}).to_numpy(
+                dtype=np.float64, na_value=np.nan
+            )
+            M[M == 0] = np.nan
+            # 没有缺失（含 0 值）的列原样保留（包括整数类型）
+            missing = np.isnan(M).any(axis=0)
+            if missing.any():
+                cols = [col for col, m in zip(value_cols, missing) if m]
+                values = self._fill_matrix(M[:, missing], cols, time_series)
+                for j, col in enumerate(cols):
+                    dtype = converted.get(col, X[col]).dtype
+                    filled[col] = values[:, j].astype(dtype) if dtype.kind == 'f' else values[:, j]
+
+        X_filled = pd.DataFrame({
+            col: filled[col] if col in filled else converted.get(col, X[col])
+            for col in X.columns
+        }, index=X.index)
+        return self._finish_transform(X, X_filled)
+
+    def _transform_by_column(self, X):
+        """逐列预处理（原实现，非默认索引时使用，也作为矩阵实现的对照）"""
         # 深拷贝数据并确保时间列存在
         if self.time_col not in X.columns:
             raise ValueError(f"Time column '{self.time_col}' not found in data")
@@ -108,42 +165,11 @@ class DataPreprocessor(BaseEstimator, TransformerMixin):
             if col in self.binary_columns or col == self.time_col:
                 continue
                 
-            ts = X_filled[col].copy()
-            original_na_count = ts.isna().sum()
-            
-            if ts.isna().mean() > self.max_invalid_ratio:
-                # 缺失过多，使用后备填充
-                if col in self.column_stats:
-                    ts.fillna(self.column_stats[col]['median'], inplace=True)
-                else:
-                    ts.fillna(0, inplace=True)
-                X_filled[col] = ts
-                continue
-                
-            # 处理头部缺失
-            first_valid_idx = ts.first_valid_index()
-            if first_valid_idx is not None:
-                # 使用第一个有效值向前填充头部
-                first_valid_value = ts.loc[first_valid_idx]
-                ts.loc[:first_valid_idx] = first_valid_value
-            else:
-                # 无有效值，使用列统计
-                if col in self.column_stats:
-                    ts.fillna(self.column_stats[col]['median'], inplace=True)
-                else:
-                    ts.fillna(0, inplace=True)
+            ts, finished = self._prepare_series(X_filled[col].copy(), time_series, col)
+            if finished:
                 X_filled[col] = ts
                 continue
-                
-            # 主填充方法
-            if self.fill_method == 'interp':
-                # 仅填充中间缺失，保留尾部缺失
-                ts = self._safe_interpolate(ts, time_series)
-            elif self.fill_method == 'regression':
-                ts = self._regression_fill(ts, time_series)
-            elif self.fill_method == 'zero':
-                ts.fillna(0, inplace=True)
-            
+
             # 专门处理尾部缺失 - 根据列类型使用不同策略
             ts = self._fill_tail_missing(ts, time_series, col)
                 
@@ -156,7 +182,11 @@ class DataPreprocessor(BaseEstimator, TransformerMixin):
                     ts.interpolate(method='linear', limit_direction='both', inplace=True)
             
             X_filled[col] = ts
-        
+
+        return self._finish_transform(X, X_filled)
+
+    def _finish_transform(self, X, X_filled):
+        """0-1 列众数填充和归一化"""
         # 0-1列特殊处理
         for col in self.binary_columns:
             if X_filled[col].isna().any():
@@ -175,6 +205,273 @@ class DataPreprocessor(BaseEstimator, TransformerMixin):
             
         return X_filled
 
+    def _column_fallback(self, cols):
+        """各列后备填充值：列统计中位数，无统计时为 0"""
+        return np.array([
+            float(self.column_stats[col]['median']) if col in self.column_stats else 0.0 for col in cols
+        ])
+
+    def _fill_matrix(self, M, cols, time_series):
+        """
+        矩阵版的逐列填充（_prepare_series + _fill_tail_missing + 后备填充）
+
+        Args:
+            M (np.ndarray): (行, 列) float64 数组，0 值已置为 NaN，会被原地修改
+            cols (list): 列名
+            time_series (pd.Series): 时间列（RangeIndex）
+        """
+        n = M.shape[0]
+        valid = ~np.isnan(M)
+        count = valid.sum(axis=0)
+        fallback = self._column_fallback(cols)
+
+        # 缺失过多或无有效值：后备填充后不再处理
+        finished = ((n - count) / n > self.max_invalid_ratio) | (count == 0)
+        if finished.any():
+            M[:, finished] = np.where(valid[:, finished], M[:, finished], fallback[finished])
+
+        active = np.flatnonzero(~finished)
+        if active.size == 0:
+            return M
+        A = M[:, active]
+        valid = valid[:, active]
+        rows = np.arange(n)[:, None]
+        first = valid.argmax(axis=0)
+        last = n - 1 - valid[::-1].argmax(axis=0)
+
+        # 头部缺失用第一个有效值填充
+        head = rows < first
+        A = np.where(head, A[first, np.arange(A.shape[1])], A)
+        valid |= head
+
+        # 主填充方法（'regression' 不走矩阵实现，见 transform）
+        if self.fill_method == 'interp':
+            A = self._interp_matrix(A, valid, last, keep_tail=True)
+        elif self.fill_method == 'zero':
+            A = np.nan_to_num(A, nan=0.0)
+
+        # 尾部缺失逐列外推（复用 fit 阶段的尾部模型），其余缺失用中位数 / 双向插值
+        for j in np.flatnonzero(np.isnan(A).any(axis=0)):
+            col = cols[active[j]]
+            ts = self._fill_tail_missing(pd.Series(A[:, j]), time_series, col)
+            if ts.isna().any():
+                if col in self.column_stats:
+                    ts = ts.fillna(self.column_stats[col]['median'])
+                else:
+                    ts = ts.interpolate(method='linear', limit_direction='both')
+            A[:, j] = ts.to_numpy(dtype=np.float64)
+
+        M[:, active] = A
+        return M
+
+    @staticmethod
+    def _interp_matrix(A, valid, last, keep_tail):
+        """
+        全部列一次线性插值（与 Series.interpolate(method='linear', limit_direction='forward') 逐列结果一致）
+
+        各列首尾相接展平后调用一次 np.interp：中间缺失的前后有效点总在同一列内，位置差与列内相同
+        keep_tail: True 时保留最后一个有效值之后的尾部缺失（_safe_interpolate），否则用最后一个有效值填充
+        """
+        n, k = A.shape
+        rows = np.arange(n)[:, None]
+        interior = ~valid & (rows < last)
+        if interior.any():
+            flat = A.T.ravel()
+            pos = np.arange(flat.size, dtype=np.float64)
+            valid_flat = valid.T.ravel()
+            interior_flat = interior.T.ravel()
+            flat[interior_flat] = np.interp(pos[interior_flat], pos[valid_flat], flat[valid_flat])
+            A = flat.reshape(k, n).T.copy()
+
+        # _safe_interpolate 在最后一个有效值位于首行（索引 0）时不恢复尾部缺失，尾部为该值
+        tail_value = (last == 0) if keep_tail else np.ones(k, dtype=bool)
+        if tail_value.any():
+            tail = (rows > last) & tail_value
+            A = np.where(tail, A[last, np.arange(k)], A)
+        return A
+
+    def _prepare_series(self, ts, time_series, col):
+        """
+        尾部填充之前的单列处理：缺失过多/无有效值时后备填充，否则头部填充 + 主填充
+
+        Returns:
+            (ts, finished): finished 为 True 表示该列已填充完毕，无需尾部处理
+        """
+        if ts.isna().mean() > self.max_invalid_ratio:
+            # 缺失过多，使用后备填充
+            if col in self.column_stats:
+                ts.fillna(self.column_stats[col]['median'], inplace=True)
+            else:
+                ts.fillna(0, inplace=True)
+            return ts, True
+
+        # 处理头部缺失
+        first_valid_idx = ts.first_valid_index()
+        if first_valid_idx is not None:
+            # 使用第一个有效值向前填充头部
+            first_valid_value = ts.loc[first_valid_idx]
+            ts.loc[:first_valid_idx] = first_valid_value
+        else:
+            # 无有效值，使用列统计
+            if col in self.column_stats:
+                ts.fillna(self.column_stats[col]['median'], inplace=True)
+            else:
+                ts.fillna(0, inplace=True)
+            return ts, True
+
+        # 主填充方法
+        if self.fill_method == 'interp':
+            # 仅填充中间缺失，保留尾部缺失
+            ts = self._safe_interpolate(ts, time_series)
+        elif self.fill_method == 'regression':
+            ts = self._regression_fill(ts, time_series)
+        elif self.fill_method == 'zero':
+            ts.fillna(0, inplace=True)
+
+        return ts, False
+
+    def _fit_tail_models(self, X, all_columns=False):
+        """
+        为各列拟合尾部外推模型并保存在 self.tail_models 中
+
+        Args:
+            X (pd.DataFrame): 训练数据
+            all_columns (bool): True 时额外为无尾部缺失的列预先拟合（限于 prefit_columns）；
+                否则只拟合存在尾部缺失的列
+        """
+        if self.time_col not in X.columns:
+            return
+
+        time_series = pd.to_datetime(X[self.time_col])
+        existing = getattr(self, 'tail_models', None) or {}
+        # 新建字典，避免修改可能被其它副本共享的旧字典
+        tail_models = dict(existing)
+        prefit_columns = getattr(self, 'prefit_columns', None)
+        prefit_columns = None if prefit_columns is None else set(prefit_columns)
+
+        for col in X.columns:
+            if col == self.time_col or col in self.binary_columns:
+                continue
+
+            ts = pd.to_numeric(X[col], errors='coerce')
+            ts = ts.where(ts != 0, np.nan)
+            ts, finished = self._prepare_series(ts, time_series, col)
+            if finished:
+                continue
+
+            last_valid_idx = ts.last_valid_index()
+            if last_valid_idx is None:
+                continue
+            # 无尾部缺失的列只在预先拟合时处理：预测时其历史不变，签名才能匹配复用
+            if last_valid_idx >= len(ts) - 1 and (
+                    not all_columns or (prefit_columns is not None and col not in prefit_columns)):
+                continue
+
+            fit_data = ts.loc[:last_valid_idx].dropna()
+            if len(fit_data) == 0:
+                continue
+
+            signature = self._tail_signature(col, fit_data, time_series)
+            if col in existing and existing[col].get('signature') == signature:
+                continue
+
+            if col in self.economic_columns:
+                tail_model = self._fit_economic_tail_model(fit_data, time_series)
+            else:
+                try:
+                    tail_model = self._fit_advanced_tail_model(fit_data)
+                except Exception as e:
+                    tail_model = {'failed': True, 'error': str(e)}
+            tail_model['signature'] = signature
+            tail_models[col] = tail_model
+
+        self.tail_models = tail_models
+
+    def _tail_signature(self, col, fit_data, time_series):
+        """尾部模型的拟合数据签名：模型类型、样本区间、首尾值和总和一致时才复用（不对全部取值做哈希）"""
+        kind = 'economic' if col in self.economic_columns else self.non_economic_model
+        values = fit_data.to_numpy(dtype=float)
+        return (
+            kind,
+            str(self.model_params.get(kind, '')),
+            len(values),
+            pd.Timestamp(time_series.loc[fit_data.index[0]]).value,
+            pd.Timestamp(time_series.loc[fit_data.index[-1]]).value,
+            round(float(values[0]), 6),
+            round(float(values[-1]), 6),
+            round(float(values.sum()), 6),
+        )
+
+    def _get_tail_model(self, col, fit_data, time_series):
+        """查找与当前拟合数据一致的已拟合尾部模型"""
+        tail_models = getattr(self, 'tail_models', None)
+        if not tail_models or col not in tail_models:
+            return None
+        tail_model = tail_models[col]
+        if tail_model.get('signature') != self._tail_signature(col, fit_data, time_series):
+            return None
+        return tail_model
+
+    def _fit_economic_tail_model(self, fit_data, time_series):
+        """拟合经济列的时间线性回归（有效点不足或失败时退化为最后一个有效值）"""
+        if len(fit_data) < self.min_fit_points:
+            return {'last_value': fit_data.iloc[-1]}
+        try:
+            time_values = time_series.astype('int64')
+            x_fit = time_values.loc[fit_data.index].values.astype(float)
+            y_fit = fit_data.values.astype(float)
+            slope, intercept, _r_value, _p_value, _std_err = stats.linregress(x_fit, y_fit)
+            return {'slope': slope, 'intercept': intercept}
+        except Exception as e:
+            warnings.warn(f"Regression failed: {str(e)}. Using last valid value.")
+            return {'last_value': fit_data.iloc[-1]}
+
+    def _fit_advanced_tail_model(self, fit_data):
+        """拟合非经济列的时间序列模型，返回可按任意步长预测的结果"""
+        # 确保数据类型为float，避免decimal.Decimal类型问题
+        fit_data_float = fit_data.astype(float)
+
+        # ARIMA模型
+        if self.non_economic_model == 'arima':
+            order = self.model_params.get('arima', {}).get('order', (1,1,1))
+            return {'result': ARIMA(fit_data.values, order=order).fit()}
+
+        # SARIMA模型（季节性ARIMA）
+        if self.non_economic_model == 'sarima':
+            order = self.model_params.get('sarima', {}).get('order', (1,1,1))
+            seasonal_order = self.model_params.get('sarima', {}).get('seasonal_order', (1,1,1,12))
+            model = SARIMAX(fit_data_float.values,
+                            order=order,
+                            seasonal_order=seasonal_order)
+            return {'result': model.fit(disp=False)}
+
+        # Holt-Winters三参数指数平滑
+        if self.non_economic_model == 'holt':
+            return {'result': Holt(fit_data_float.values).fit()}
+
+        # 简单指数平滑
+        if self.non_economic_model == 'ses':
+            return {'result': SimpleExpSmoothing(fit_data_float.values).fit()}
+
+        # 最后n个值加权平均（简单后备）
+        if self.non_economic_model == 'lastn':
+            n = min(6, len(fit_data))
+            weights = np.linspace(0.1, 1.0, n)
+            weights /= weights.sum()
+            last_values_float = fit_data.iloc[-n:].astype(float)
+            return {'value': np.average(last_values_float, weights=weights)}
+
+        raise ValueError(f"未知的尾部预测模型: {self.non_economic_model}")
+
+    @staticmethod
+    def _forecast_tail_model(tail_model, steps):
+        """用已拟合的尾部模型预测 steps 步"""
+        if tail_model.get('failed'):
+            raise RuntimeError(tail_model.get('error', 'tail model fit failed'))
+        if 'result' in tail_model:
+            return np.asarray(tail_model['result'].forecast(steps=steps))
+        return np.array([tail_model['value']] * steps)
+
     def _safe_interpolate(self, ts, time_series):
         """安全插值，避免填充尾部"""
         # 创建临时副本用于插值
@@ -216,14 +513,17 @@ class DataPreprocessor(BaseEstimator, TransformerMixin):
                 return ts.fillna(self.column_stats[col_name]['median'])
             return ts.fillna(0)
         
+        # fit 阶段已在相同历史上拟合过的尾部模型，直接复用
+        tail_model = self._get_tail_model(col_name, fit_data, time_series)
+
         # 判断列类型并选择填充策略
         if col_name in self.economic_columns:
             # 经济数据列 - 使用时间序列回归填充
-            return self._economic_tail_fill(ts, time_series, fit_data, tail_na)
+            return self._economic_tail_fill(ts, time_series, fit_data, tail_na, tail_model)
         else:
             # 非经济数据列 - 使用最后n个有效值均值填充
             # return self._non_economic_tail_fill(ts, time_series, fit_data, tail_na, col_name)
-            return self._advanced_tail_forecast(ts, time_series, fit_data, tail_na, col_name)
+            return self._advanced_tail_forecast(ts, time_series, fit_data, tail_na, col_name, tail_model)
     
     def _non_economic_tail_fill(self, ts, time_series, fit_data, tail_na, col_name):
         """非经济数据列的尾部填充 - 使用时间序列预测模型"""
@@ -288,7 +588,7 @@ class DataPreprocessor(BaseEstimator, TransformerMixin):
         
         return ts
 
-    def _economic_tail_fill(self, ts, time_series, fit_data, tail_na):
+    def _economic_tail_fill(self, ts, time_series, fit_data, tail_na, tail_model=None):
         """经济数据列的尾部填充 - 支持线性外推或按增长率递推"""
         num_missing = len(tail_na)
 
@@ -304,93 +604,33 @@ class DataPreprocessor(BaseEstimator, TransformerMixin):
             ts.loc[tail_na.index] = predicted
             return ts
 
-        # 默认：线性外推（基于时间戳做线性回归）
-        # 时间戳处理
-        time_values = time_series.astype('int64')
+        # 默认：线性外推（基于时间戳做线性回归），回归只在历史变化时重新拟合
+        if tail_model is None:
+            tail_model = self._fit_economic_tail_model(fit_data, time_series)
 
-        if len(fit_data) < self.min_fit_points:
-            # 有效点不足，使用最后一个有效值外推
-            last_value = fit_data.iloc[-1]
-            ts.loc[tail_na.index] = last_value
+        if 'last_value' in tail_model:
+            # 有效点不足或回归失败，使用最后一个有效值外推
+            ts.loc[tail_na.index] = tail_model['last_value']
             return ts
 
-        try:
-            x_fit = time_values.loc[fit_data.index].values.astype(float)
-            y_fit = fit_data.values.astype(float)
-
-            # 线性回归
-            slope, intercept, _r_value, _p_value, _std_err = stats.linregress(x_fit, y_fit)
-
-            # 预测尾部
-            x_predict = time_values.loc[tail_na.index].values.astype(float)
-            predicted = slope * x_predict + intercept
-
-            # 应用预测结果
-            ts.loc[tail_na.index] = predicted
-        except Exception as e:
-            # 回归失败时使用最后一个有效值
-            warnings.warn(f"Regression failed: {str(e)}. Using last valid value.")
-            last_value = fit_data.iloc[-1]
-            ts.loc[tail_na.index] = last_value
+        # 预测尾部
+        time_values = time_series.astype('int64')
+        x_predict = time_values.loc[tail_na.index].values.astype(float)
+        predicted = tail_model['slope'] * x_predict + tail_model['intercept']
 
+        # 应用预测结果
+        ts.loc[tail_na.index] = predicted
         return ts
     
-    def _advanced_tail_forecast(self, ts, time_series, fit_data, tail_na, col_name):
-        """使用高级时间序列模型预测尾部缺失值"""
+    def _advanced_tail_forecast(self, ts, time_series, fit_data, tail_na, col_name, tail_model=None):
+        """使用高级时间序列模型预测尾部缺失值（模型只在历史变化时重新拟合）"""
         num_missing = len(tail_na)
         forecast_steps = min(num_missing, self.forecast_horizon)
         
         try:
-            # ARIMA模型
-            if self.non_economic_model == 'arima':
-                order = self.model_params.get('arima', {}).get('order', (1,1,1))
-                model = ARIMA(fit_data.values, order=order)
-                model_fit = model.fit()
-                predicted = model_fit.forecast(steps=forecast_steps)
-            
-            # SARIMA模型（季节性ARIMA）
-            elif self.non_economic_model == 'sarima':
-                order = self.model_params.get('sarima', {}).get('order', (1,1,1))
-                seasonal_order = self.model_params.get('sarima', {}).get('seasonal_order', (1,1,1,12))
-                
-                # 确保数据类型为float，避免decimal.Decimal类型问题
-                fit_data_float = fit_data.astype(float)
-                
-                model = SARIMAX(fit_data_float.values, 
-                              order=order, 
-                              seasonal_order=seasonal_order)
-                model_fit = model.fit(disp=False)
-                predicted = model_fit.forecast(steps=forecast_steps)
-            
-            # Holt-Winters三参数指数平滑
-            elif self.non_economic_model == 'holt':
-                # 确保数据类型为float，避免decimal.Decimal类型问题
-                fit_data_float = fit_data.astype(float)
-                
-                model = Holt(fit_data_float.values)
-                model_fit = model.fit()
-                predicted = model_fit.forecast(steps=forecast_steps)
-            
-            # 简单指数平滑
-            elif self.non_economic_model == 'ses':
-                # 确保数据类型为float，避免decimal.Decimal类型问题
-                fit_data_float = fit_data.astype(float)
-                
-                model = SimpleExpSmoothing(fit_data_float.values)
-                model_fit = model.fit()
-                predicted = model_fit.forecast(forecast_steps)
-            
-            # 最后n个值加权平均（简单后备）
-            elif self.non_economic_model == 'lastn':
-                n = min(6, len(fit_data))
-                weights = np.linspace(0.1, 1.0, n)
-                weights /= weights.sum()
-                last_values = fit_data.iloc[-n:]
-                
-                # 确保数据类型为float，避免decimal.Decimal类型问题
-                last_values_float = last_values.astype(float)
-                
-                predicted = [np.average(last_values_float, weights=weights)] * forecast_steps
+            if tail_model is None:
+                tail_model = self._fit_advanced_tail_model(fit_data)
+            predicted = self._forecast_tail_model(tail_model, forecast_steps)
             
             # 应用预测结果
             if forecast_steps < num_missing:
@@ -489,33 +729,83 @@ class FeatureBuilder(BaseEstimator, TransformerMixin):
         # 如果需要添加时间序列预测特征，则训练时间序列模型
         # print(self.add_ts_forecast)
         if self.add_ts_forecast and self.ts_model is not None:
-            if not isinstance(X, pd.DataFrame):
-                X = pd.DataFrame(X)
-            
-            # 确保有日期列和目标列
-            if 'YearMonth' in X.columns and self.target_col in X.columns:
-                # 提取目标序列（按日期排序）
-                ts_series = X.set_index('YearMonth')[self.target_col].sort_index()
-
-                # # 转换索引为 DatetimeIndex
-                # if not isinstance(ts_series.index, pd.DatetimeIndex):
-                #     ts_series.index = pd.to_datetime(ts_series.index)
-                
-                # # 显式设置频率
-                # if self.granularity_controller.get_freq():
-                #     ts_series = ts_series.asfreq(self.granularity_controller.get_freq())
-
-                # 克隆模型并训练
-                self.fitted_ts_model = self.ts_model.__class__.__new__(self.ts_model.__class__)
-                self.fitted_ts_model.__dict__ = self.ts_model.__dict__.copy()
-                self.fitted_ts_model.fit(ts_series)
+            fitted_ts_model = self.fit_ts_model(X)
+            if fitted_ts_model is not None:
+                self.fitted_ts_model = fitted_ts_model
         return self
-        
-    def transform(self, X):
+
+    def fit_ts_model(self, X):
+        """
+        在 X 的目标序列上训练一个新的时间序列模型副本并返回（不修改 self）
+
+        Returns:
+            训练后的模型；未配置 ts_model 或 X 缺少时间列 / 目标列时返回 None
+        """
+        if self.ts_model is None:
+            return None
+        if not isinstance(X, pd.DataFrame):
+            X = pd.DataFrame(X)
+
+        # 确保有日期列和目标列
+        if 'YearMonth' not in X.columns or self.target_col not in X.columns:
+            return None
+        # 提取目标序列（按日期排序）
+        ts_series = X.set_index('YearMonth')[self.target_col].sort_index()
+
+        # # 转换索引为 DatetimeIndex
+        # if not isinstance(ts_series.index, pd.DatetimeIndex):
+        #     ts_series.index = pd.to_datetime(ts_series.index)
+
+        # # 显式设置频率
+        # if self.granularity_controller.get_freq():
+        #     ts_series = ts_series.asfreq(self.granularity_controller.get_freq())
+
+        # 克隆模型并训练
+        fitted_ts_model = self.ts_model.__class__.__new__(self.ts_model.__class__)
+        fitted_ts_model.__dict__ = self.ts_model.__dict__.copy()
+        fitted_ts_model.fit(ts_series)
+        return fitted_ts_model
+
+    def inference_ts_model(self, X, step, refit_every=None, current=None):
+        """
+        推理模式：递推预测第 step 步（从 0 开始）构建 TS_Forecast 特征使用的时间序列模型
+
+        - refit_every 为空或 0（默认）：冻结训练时拟合并随模型保存的 fitted_ts_model，
+          未来期只向后扩展其预测步数，特征定义与训练时一致
+        - refit_every=k：第 0、k、2k... 步在 X（已知 + 已预测的目标序列）上重新训练，其余步沿用上一次的结果；
+          k=1 即旧版每步重新训练
+
+        不修改 self（特征构建器在模型缓存中被多个预测请求共享），返回的模型通过 transform(X, ts_model=...) 传入
+
+        Args:
+            X (pd.DataFrame): 截至当前步之前的序列
+            step (int): 递推步序号
+            refit_every (int): 重新训练间隔步数
+            current: 上一步使用的模型
+        """
+        if not self.add_ts_forecast:
+            return None
+        if refit_every and step % refit_every == 0:
+            return self.fit_ts_model(X) or current
+        if current is not None:
+            return current
+        if self.fitted_ts_model is not None:
+            return self.fitted_ts_model
+        # 保存的特征构建器没有拟合结果时在已知序列上训练一次
+        return self.fit_ts_model(X)
+        
+    def transform(self, X, ts_model=None):
+        """
+        Args:
+            X (pd.DataFrame): 输入数据
+            ts_model: 构建 TS_Forecast 使用的时间序列模型，默认使用 fit 得到的 fitted_ts_model（见 inference_ts_model）
+        """
         if not isinstance(X, pd.DataFrame):
             X = pd.DataFrame(X)
             
         X = X.copy()
+        if ts_model is None:
+            ts_model = self.fitted_ts_model
         
         if self.granularity_controller.granularity != 'yearly':
             X['Year'] = X['YearMonth'].dt.year
@@ -524,19 +814,11 @@ class FeatureBuilder(BaseEstimator, TransformerMixin):
             X['Is_holiday'] = X['Month'].isin(self.holiday_months).astype(int)
 
         # 添加时间序列预测特征
-        if self.add_ts_forecast and self.fitted_ts_model is not None and 'YearMonth' in X.columns:
-            # 提取日期序列
-            dates = X['YearMonth'].sort_values().unique()
-            # 生成预测值
+        if self.add_ts_forecast and ts_model is not None and 'YearMonth' in X.columns:
+            # 时间序列模型按原生周期索引取值（拟合值 / 预测值已在模型中缓存），直接按行对齐
             try:
-                # print(dates)
-                ts_forecast = self.fitted_ts_model.predict(pd.DatetimeIndex(dates))
-                # 对齐回原始数据
-                # print(ts_forecast)
-                forecast_series = pd.Series(ts_forecast.values, index=dates)
-                # print(forecast_series)
-                X['TS_Forecast'] = X['YearMonth'].map(forecast_series)
-                # print(X['TS_Forecast'])
+                ts_forecast = ts_model.predict(pd.DatetimeIndex(X['YearMonth']))
+                X['TS_Forecast'] = ts_forecast.to_numpy(dtype=float)
             except Exception as e:
                 print(f"时间序列预测失败: {e}")
                 # 回退到使用滞后特征
@@ -561,9 +843,19 @@ class FeatureBuilder(BaseEstimator, TransformerMixin):
         # # 滑动特征
         # for window in self.windows:
         #     X[f'{self.target_col}_rollmean_{window}'] = X[self.target_col].rolling(window=window).mean()  # 这些都没必要
-        
+
         return X
 
+    def get_generated_columns(self):
+        """返回 transform 生成的特征列名（时间特征、时间序列预测特征、滞后特征）"""
+        cols = []
+        if self.granularity_controller.granularity != 'yearly':
+            cols += ['Year', 'Month', 'Quarter', 'Is_holiday']
+        if self.add_ts_forecast:
+            cols.append('TS_Forecast')
+        cols += [f'{self.target_col}_lag_{lag}' for lag in self.lags]
+        return cols
+
 class AirlineRouteModel:
     """航线数据处理管道"""
     def __init__(self, data, preprocessor=None, feature_builder=None, granularity='monthly'):
@@ -620,6 +912,11 @@ class AirlineRouteModel:
     
     def prepare_data(self, origin, destination, test_size=12):
         """准备训练/测试数据"""
+        data, data_preprocessed = self.preprocess_route(origin, destination)
+        return self.split_features(data, data_preprocessed, test_size)
+
+    def preprocess_route(self, origin, destination):
+        """获取航线数据并预处理，返回 (原始航线数据, 预处理结果)；超参数搜索中多组特征配置共用一次预处理"""
         # 获取航线数据
         data = self.get_route_data(origin, destination)
         # data.to_csv(f'./result/{origin}_{destination}_all_data.csv', index=False)
@@ -634,7 +931,10 @@ class AirlineRouteModel:
         # 数据预处理
         data_preprocessed = self.preprocessor.fit_transform(data)
         # data_preprocessed.to_csv(f'./result/{origin}_{destination}_data_preprocessed.csv', index=False)
-        
+        return data, data_preprocessed
+
+    def split_features(self, data, data_preprocessed, test_size=12):
+        """在预处理结果上构建特征并分割训练/测试集"""
         # 特征工程 - 先fit再transform
         self.feature_builder.fit(data_preprocessed)
         data_with_features = self.feature_builder.transform(data_preprocessed)
@@ -1,7 +1,18 @@
+import numpy as np
 import pandas as pd
 from statsmodels.tsa.arima.model import ARIMA
 from prophet import Prophet
 
+# 各时间频率一个周期对应的月数
+PERIOD_MONTHS = {'MS': 1, 'QS': 3, 'YS': 12}
+
+# TS_Forecast 特征版本：
+#   1 - 按日索引对齐，未来期只有第 1 步有值，其余步为 NaN；拟合值超出请求区间时失败
+#   2 - 原生周期索引，未来第 k 期取 k 步预测值
+# 版本号随模型对象保存并写入 metadata.json；没有版本号的旧模型按版本 1 预测，
+# 保证其特征取值与训练 / 上线时一致
+TS_FEATURE_VERSION = 2
+
 class BaseTSModel:
     """基础时间序列模型接口"""
     def fit(self, series):
@@ -13,14 +24,29 @@ class BaseTSModel:
         pass
 
 class ARIMAModel(BaseTSModel):
-    """ARIMA 时间序列模型实现"""
+    """
+    ARIMA 时间序列模型实现
+
+    预测直接在原生周期索引（MS/QS/YS）上进行：训练期内的日期取样本内拟合值，
+    训练期之后第 k 个周期取 k 步预测值。拟合值和预测值在 fit 后缓存，
+    FeatureBuilder.transform 的多次调用复用同一份结果，不再重复 forecast
+
+    feature_version < 2（包括没有该属性的旧模型对象）时沿用旧版取值，见 TS_FEATURE_VERSION
+    """
     def __init__(self, order=(1, 0, 0),  freq=None):
         self.order = order
         self.model = None
         self.last_training_date = None
         self.freq = freq  # 频率参数
-        
+        self.feature_version = TS_FEATURE_VERSION
+        self._reset_cache()
+
+    def _reset_cache(self):
+        self._fitted = None     # 样本内拟合值（按训练日期索引）
+        self._forecast = None   # 已计算的多步预测值
+
     def fit(self, series):
+        self._reset_cache()
         # 确保有足够的数据点
         if len(series) < max(self.order) * 2:
             return  # 数据不足，跳过训练
@@ -37,62 +63,80 @@ class ARIMAModel(BaseTSModel):
             print(f"ARIMA 训练失败: {e}")
             self.model = None
 
+    def _period_months(self):
+        """一个周期对应的月数"""
+        freq = self.freq if self.freq else 'MS'
+        return PERIOD_MONTHS.get(freq, 12)
+
+    def _fitted_values(self):
+        # 旧版本保存的模型对象没有缓存属性
+        if getattr(self, '_fitted', None) is None:
+            fitted = getattr(self.model, 'fittedvalues', None)
+            if not isinstance(fitted, pd.Series):
+                fitted = pd.Series(dtype=float)
+            fitted = pd.Series(fitted.to_numpy(dtype=float), index=pd.DatetimeIndex(fitted.index))
+            self._fitted = fitted[~fitted.index.duplicated(keep='last')]
+        return self._fitted
+
+    def _forecast_steps(self, steps):
+        """前 steps 步预测值；已缓存的步数不足时一次性重新预测到 steps 步"""
+        cached = getattr(self, '_forecast', None)
+        if cached is None or len(cached) < steps:
+            cached = np.asarray(self.model.forecast(steps=steps), dtype=float)
+            self._forecast = cached
+        return cached[:steps]
+
     def predict(self, dates):
+        dates = pd.DatetimeIndex(dates)
         if self.model is None:
             return pd.Series(index=dates, dtype=float)
-            
-        # 创建完整时间索引的序列
-        freq = self.freq if self.freq else'MS'
-        # print(freq)
-        full_index = pd.date_range(
-            start=dates.min(), 
-            end=dates.max(), 
-            freq='D'
-        )
-        # print(full_index)
-        full_series = pd.Series(index=full_index, dtype=float)
-        
-        # 填充历史拟合值
-        if hasattr(self.model, 'fittedvalues'):
-            fitted_values = self.model.fittedvalues
-            full_series.loc[fitted_values.index] = fitted_values
-        # print(full_series)
-        # 预测未来值
-        if dates.max() > self.last_training_date:
-            future_periods = len(dates[dates > self.last_training_date])
-            forecast = self.model.forecast(steps=future_periods)
-            if freq =='MS':
-                offset = pd.DateOffset(months=1)
-            elif freq == 'QS':
-                offset = pd.DateOffset(months=3)
-            else:  # YS
-                offset = pd.DateOffset(years=1)
-            forecast_index = pd.date_range(
-                start=self.last_training_date + offset,
-                periods=future_periods,
-                freq='D'
-            )
-            # print(full_series)
-            # 确保索引包含预测日期
-            missing_dates = forecast_index.difference(full_series.index)
-            if not missing_dates.empty:
-                full_series = full_series.reindex(full_series.index.union(missing_dates))
-            
-            # 进行预测
-            forecast = self.model.forecast(steps=future_periods)
-            full_series.loc[forecast_index] = forecast.values
-            
-        # 对齐到请求的日期
-        # print(full_series)
-        return full_series.reindex(dates)
+
+        if getattr(self, 'feature_version', 1) < 2:
+            return self._predict_legacy(dates)
+
+        # 历史拟合值
+        values = self._fitted_values().reindex(dates).to_numpy(dtype=float, copy=True)
+
+        # 未来值：与最后训练日期相隔整数个周期的日期取对应步数的预测
+        last = pd.Timestamp(self.last_training_date)
+        future = np.asarray(dates > last)
+        if future.any():
+            step = self._period_months()
+            months = (np.asarray(dates.year, dtype=float) - last.year) * 12 \
+                + (np.asarray(dates.month, dtype=float) - last.month)
+            aligned = future & (months % step == 0) & (np.asarray(dates.day) == last.day)
+            if aligned.any():
+                steps = (months[aligned] // step).astype(int)
+                forecast = self._forecast_steps(int(steps.max()))
+                values[aligned] = forecast[steps - 1]
+
+        return pd.Series(values, index=dates)
+
+    def _predict_legacy(self, dates):
+        """版本 1 的取值：拟合值必须落在请求区间内，未来期只填第 1 步"""
+        fitted = self._fitted_values()
+        if len(fitted) and len(dates) and (fitted.index.min() < dates.min() or fitted.index.max() > dates.max()):
+            # 旧实现按日索引赋值时在此处抛 KeyError，由调用方退回 shift(1)
+            raise KeyError("拟合值超出请求的日期区间")
+        values = fitted.reindex(dates).to_numpy(dtype=float, copy=True)
+
+        last = pd.Timestamp(self.last_training_date)
+        if len(dates) and dates.max() > last:
+            freq = self.freq if self.freq else 'MS'
+            first = last + pd.DateOffset(months=PERIOD_MONTHS.get(freq, 12))
+            values[np.asarray(dates == first)] = self._forecast_steps(1)[0]
+
+        return pd.Series(values, index=dates)
 
 class ProphetModel(BaseTSModel):
-    """Prophet 时间序列模型实现"""
+    """Prophet 时间序列模型实现（已预测的日期缓存复用，只对新日期调用 Prophet）"""
     def __init__(self, yearly_seasonality=True):
         self.model = None
         self.yearly_seasonality = yearly_seasonality
+        self._predictions = None
         
     def fit(self, series):
+        self._predictions = None
         if len(series) < 12:  # Prophet 需要至少1年数据
             return
             
@@ -110,10 +154,18 @@ class ProphetModel(BaseTSModel):
             self.model = None
 
     def predict(self, dates):
+        dates = pd.DatetimeIndex(dates)
         if self.model is None:
             return pd.Series(index=dates, dtype=float)
-            
-        # 创建预测数据框
-        future = pd.DataFrame({'ds': dates})
-        forecast = self.model.predict(future)
-        return pd.Series(forecast['yhat'].values, index=dates)
\ No newline at end of file
+
+        cached = getattr(self, '_predictions', None)
+        if cached is None:
+            cached = pd.Series(dtype=float, index=pd.DatetimeIndex([]))
+        missing = dates.dropna().unique().difference(cached.index)
+        if len(missing):
+            # 创建预测数据框
+            future = pd.DataFrame({'ds': missing})
+            forecast = self.model.predict(future)
+            cached = pd.concat([cached, pd.Series(forecast['yhat'].to_numpy(dtype=float), index=missing)])
+            self._predictions = cached
+        return pd.Series(cached.reindex(dates).to_numpy(dtype=float), index=dates)
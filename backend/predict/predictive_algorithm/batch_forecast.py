@@ -0,0 +1,291 @@
+"""
+多航线批量递推预测
+
+与逐条调用 predict_single_route 的结果一致，但按预测步（而不是按航线）推进：
+- 每条航线的外生列只预处理一次，特征矩阵（时间特征 + 外生列）一次性构建为 float 数组
+- 每一步只把各航线新预测出的目标值写入下一行的滞后特征列，不再对尾部窗口重复调用 FeatureBuilder.transform
+- 同一步中使用同一模型文件（同一路径、同一版本，与是否为同一个已加载对象无关）且特征列一致的航线，
+  特征行堆叠为一个矩阵只调用一次 predict，如同一模型被多个任务以不同外生参数引用
+- LightGBM / XGBoost 直接调用底层 Booster，绕开 sklearn 封装逐次的 DataFrame 校验；
+  特征列顺序在加入航线时与模型训练时的特征名核对一次，不一致的航线直接报错
+- 启用 TS_Forecast 特征的航线按原逐行路径构建特征（默认冻结训练时的时间序列模型，按配置每 k 步重新训练）
+
+不同模型文件是各自训练的树模型，无法合并为一次 predict，每步每个模型各调用一次；
+批量的收益主要来自特征构建向量化和去掉单行 DataFrame 预测的固定开销。
+"""
+import os
+import re
+import time
+import traceback
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from predict.predictive_algorithm.model_cache import file_signature
+from predict.predictive_algorithm.predict_single_route import load_forecast_context, build_forecast_response
+from predict.predictive_algorithm.recursive_forecast import RecursiveForecaster, ts_refit_every
+
+
+def _iteration_range(model):
+    """XGBoost 早停模型只使用最佳迭代之前的树（与 XGBRegressor.predict 一致）"""
+    try:
+        best = model.best_iteration
+    except AttributeError:
+        return (0, 0)
+    return (0, best + 1) if best is not None else (0, 0)
+
+
+def _model_feature_names(model):
+    """模型训练时的特征名；训练数据没有列名（自动命名为 Column_i）时返回 None"""
+    booster = getattr(model, 'booster_', None)
+    if booster is not None:
+        names = list(booster.feature_name())
+        if names and all(name == f'Column_{i}' for i, name in enumerate(names)):
+            return None
+        return names
+    get_booster = getattr(model, 'get_booster', None)
+    if get_booster is not None:
+        names = get_booster().feature_names
+        return list(names) if names else None
+    names = getattr(model, 'feature_names_in_', None)
+    return list(names) if names is not None else None
+
+
+def _normalize_feature_name(name):
+    return re.sub(r'[^\w]', '_', str(name))
+
+
+def check_feature_order(model, feature_cols):
+    """
+    核对特征矩阵的列顺序与模型训练时一致（predict_matrix 绕过了 sklearn 封装的特征名校验）
+
+    LightGBM 会把特征名中的特殊字符替换为下划线，比较前两边做同样的处理
+
+    Raises:
+        ValueError: 特征数或特征顺序不一致
+    """
+    names = _model_feature_names(model)
+    if names is None:
+        return
+    expected = [_normalize_feature_name(name) for name in names]
+    actual = [_normalize_feature_name(col) for col in feature_cols]
+    if len(expected) != len(actual):
+        raise ValueError(f"特征列数与模型不一致：模型 {len(expected)} 列，元数据 {len(actual)} 列")
+    for i, (a, b) in enumerate(zip(expected, actual)):
+        if a != b:
+            raise ValueError(f"特征列顺序与模型不一致：第 {i} 列模型为 {a}，元数据为 {b}")
+
+
+def predict_matrix(model, X, feature_cols):
+    """
+    对 N 行特征矩阵预测（列顺序须已通过 check_feature_order 核对）
+
+    - LightGBM sklearn 模型：booster_.predict（默认使用最佳迭代）
+    - XGBoost sklearn 模型：Booster.inplace_predict
+    - 其他模型：按特征列名构建 DataFrame 后调用 predict
+    """
+    if X.shape[1] != len(feature_cols):
+        raise ValueError(f"特征矩阵列数 {X.shape[1]} 与特征列数 {len(feature_cols)} 不一致")
+    booster = getattr(model, 'booster_', None)
+    if booster is not None:
+        return np.asarray(booster.predict(X), dtype=float)
+    get_booster = getattr(model, 'get_booster', None)
+    if get_booster is not None:
+        return np.asarray(
+            get_booster().inplace_predict(X, iteration_range=_iteration_range(model), validate_features=False),
+            dtype=float
+        )
+    return np.asarray(model.predict(pd.DataFrame(X, columns=feature_cols)), dtype=float)
+
+
+class _RouteState:
+    """单条航线的递推状态"""
+
+    def __init__(self, key, context):
+        self.key = key
+        self.context = context
+        self.model = context['model']
+        self.feature_builder = context['feature_builder']
+        self.feature_cols = context['feature_cols']
+        self.target_col = context['target_col']
+        self.date_col = context['date_col']
+        self.future_dates = context['future_dates']
+        self.predictions = []
+
+        check_feature_order(self.model, self.feature_cols)
+        self.group_key = self._group_key(context.get('model_files'))
+
+        # 复用 RecursiveForecaster 的外生列一次性外推
+        helper = RecursiveForecaster(
+            model=self.model,
+            preprocessor=context['preprocessor'],
+            feature_builder=self.feature_builder,
+            feature_cols=self.feature_cols,
+            target_col=self.target_col,
+            date_col=self.date_col,
+        )
+        history = context['latest_data'].sort_values(self.date_col).reset_index(drop=True)
+        self.n_hist = len(history)
+        frame = helper._extend_exogenous(history, self.future_dates)
+        frame[self.target_col] = np.concatenate([
+            pd.to_numeric(history[self.target_col], errors='coerce').to_numpy(dtype=float),
+            np.full(len(self.future_dates), np.nan)
+        ])
+        self.frame = frame
+
+        lags = getattr(self.feature_builder, 'lags', None) or [1]
+        self.window = max(lags) + 1
+        self.use_ts = bool(getattr(self.feature_builder, 'add_ts_forecast', False))
+        self.ts_refit_every = ts_refit_every()
+        self.ts_model = None
+
+        # 时间特征和外生列与目标值无关，整段构建一次；滞后列每步按目标序列更新
+        features = self.feature_builder.transform(frame)
+        self.matrix = features[self.feature_cols].to_numpy(dtype=float)
+        self.target = frame[self.target_col].to_numpy(dtype=float).copy()
+        prefix = f'{self.target_col}_lag_'
+        self.lag_positions = [
+            (j, int(col[len(prefix):])) for j, col in enumerate(self.feature_cols)
+            if col.startswith(prefix) and col[len(prefix):].isdigit()
+        ]
+
+    def _group_key(self, model_files):
+        """
+        可合并预测的分组键：模型类型 + 特征列 + 模型文件（路径和版本签名）
+
+        同一模型文件被分别加载为不同对象时仍归为一组；没有文件信息时退回按对象分组
+        """
+        schema = (type(self.model).__name__, tuple(self.feature_cols))
+        if not model_files:
+            return schema + (id(self.model),)
+        path = os.path.realpath(model_files[0])
+        return schema + (path, file_signature([path])[0])
+
+    @property
+    def steps(self):
+        return len(self.future_dates)
+
+    def feature_row(self, step):
+        """第 step 步（从 0 开始）的模型输入行"""
+        pos = self.n_hist + step
+        if self.use_ts:
+            # 时间序列预测特征：推理模式的模型（冻结或按间隔在已知 + 已预测序列上重新训练），按原逐行路径构建
+            self.frame[self.target_col] = self.target
+            self.ts_model = self.feature_builder.inference_ts_model(
+                self.frame.iloc[:pos], step, self.ts_refit_every, self.ts_model
+            )
+            tail = self.frame.iloc[max(0, pos - self.window + 1):pos + 1]
+            row = self.feature_builder.transform(tail, ts_model=self.ts_model)[self.feature_cols].iloc[-1]
+            return row.to_numpy(dtype=float)
+
+        row = self.matrix[pos].copy()
+        for j, lag in self.lag_positions:
+            row[j] = self.target[pos - lag] if pos - lag >= 0 else np.nan
+        return row
+
+    def record(self, step, value):
+        self.target[self.n_hist + step] = value
+        self.predictions.append(value)
+
+
+class BatchRecursiveForecaster:
+    """
+    多航线同步递推预测
+
+    用法：
+        forecaster = BatchRecursiveForecaster()
+        forecaster.add('CAN-PEK', context)   # context 为 load_forecast_context 的结果
+        predictions = forecaster.forecast()  # {key: [预测值, ...]}
+    """
+
+    def __init__(self):
+        self.routes = []
+        self.errors = {}
+
+    def add(self, key, context):
+        """加入一条航线；特征矩阵构建失败时记录错误，不影响其他航线"""
+        try:
+            self.routes.append(_RouteState(key, context))
+        except Exception as e:
+            self.errors[key] = e
+            traceback.print_exc()
+
+    def forecast(self):
+        """
+        按预测步推进全部航线
+
+        Returns:
+            dict: {key: 预测值列表}；失败的航线记录在 self.errors 中
+        """
+        active = list(self.routes)
+        max_steps = max((r.steps for r in active), default=0)
+        for step in range(max_steps):
+            # 按模型文件和特征列分组，同一模型的特征行堆叠为一个矩阵
+            groups = defaultdict(list)
+            for route in active:
+                if step >= route.steps:
+                    continue
+                try:
+                    groups[route.group_key].append((route, route.feature_row(step)))
+                except Exception as e:
+                    self.errors[route.key] = e
+                    traceback.print_exc()
+
+            for items in groups.values():
+                routes = [route for route, _ in items]
+                X = np.vstack([row for _, row in items])
+                try:
+                    values = predict_matrix(routes[0].model, X, routes[0].feature_cols)
+                except Exception as e:
+                    for route in routes:
+                        self.errors[route.key] = e
+                    traceback.print_exc()
+                    continue
+                for route, value in zip(routes, values):
+                    route.record(step, value)
+
+            active = [r for r in active if r.key not in self.errors]
+
+        return {r.key: r.predictions for r in self.routes if r.key not in self.errors}
+
+
+def predict_routes_batch(prediction_requests):
+    """
+    批量执行预测请求（请求格式与 predict_single_route 一致）
+
+    Returns:
+        list: 与请求顺序一致，成功为 {'success': True, 'data': 预测结果}，失败为 {'success': False, 'error': 错误信息}
+    """
+    start = time.perf_counter()
+    forecaster = BatchRecursiveForecaster()
+    contexts = {}
+    for i, req in enumerate(prediction_requests):
+        try:
+            contexts[i] = load_forecast_context(req)
+        except Exception as e:
+            forecaster.errors[i] = e
+            continue
+        forecaster.add(i, contexts[i])
+    loaded = time.perf_counter()
+
+    predictions = forecaster.forecast()
+
+    results = []
+    for i in range(len(prediction_requests)):
+        if i in predictions:
+            try:
+                results.append({'success': True, 'data': build_forecast_response(contexts[i], predictions[i])})
+                continue
+            except Exception as e:
+                forecaster.errors[i] = e
+        error = forecaster.errors.get(i)
+        results.append({
+            'success': False,
+            'error': str(error),
+            'error_type': type(error).__name__,
+        })
+
+    print(f"批量预测完成：{len(predictions)}/{len(prediction_requests)} 条航线成功，"
+          f"加载 {loaded - start:.2f}s，预测 {time.perf_counter() - loaded:.2f}s")
+    return results
@@ -0,0 +1,95 @@
+"""
+DataPreprocessor.transform 性能基准
+
+在合成的典型月度航线（历史 + 未来期外生列待外推，约 30 列）上对比逐列实现（_transform_by_column）
+与矩阵实现（transform）的单次耗时，并校验两者结果一致（逐位一致的断言见 predict/tests.py）。
+fill_method='regression' 时 transform 直接使用逐列实现。
+
+运行（在 backend 目录下）：
+    python -m predict.predictive_algorithm.benchmark_preprocessor --months 120 --future 12 --repeat 20
+"""
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from .FeatureEngineer import DataPreprocessor
+
+
+ECONOMIC_COLUMNS = [
+    'O_GDP', 'O_Population', 'Third_Industry_x', 'O_Revenue', 'O_Retail', 'O_Labor', 'O_Air_Traffic',
+    'D_GDP', 'D_Population', 'Third_Industry_y', 'D_Revenue', 'D_Retail', 'D_Labor', 'D_Air_Traffic',
+]
+
+
+def make_route_frame(n_months=120, n_future=12, n_other=12, seed=0):
+    """
+    合成单条月度航线：经济列（按年阶梯）、运力/票价等数值列（随机 0 值和中间缺失）、节假日 0-1 列，
+    最后 n_future 行为未来期（除时间列和 0-1 列外全部缺失，与 RecursiveForecaster 的外推输入一致）
+    """
+    rng = np.random.default_rng(seed)
+    n = n_months + n_future
+    dates = pd.date_range('2014-01-01', periods=n, freq='MS')
+    years = dates.year.to_numpy() - dates.year[0]
+
+    data = {'YearMonth': dates}
+    for col in ECONOMIC_COLUMNS:
+        base = rng.uniform(100, 10_000)
+        data[col] = base * (1 + rng.uniform(0.01, 0.08)) ** years
+    season = 1 + 0.15 * np.sin(np.arange(n) * 2 * np.pi / 12)
+    for i in range(n_other):
+        values = rng.uniform(1_000, 50_000) * season * rng.normal(1, 0.05, n)
+        values[rng.random(n) < 0.05] = 0          # 随机 0 值（视为缺失）
+        values[rng.random(n) < 0.03] = np.nan     # 随机中间缺失
+        data[f'Metric_{i}'] = values
+    data['Route_Total_Seats'] = rng.uniform(5_000, 50_000) * season
+    for i, months in enumerate(([1, 2], [10], [7, 8])):
+        data[f'Holiday_{i}'] = np.isin(dates.month, months).astype(int)
+
+    frame = pd.DataFrame(data)
+    future = frame.index >= n_months
+    value_cols = [c for c in frame.columns if c != 'YearMonth' and not c.startswith('Holiday_')]
+    frame.loc[future, value_cols] = np.nan
+    return frame
+
+
+def _timeit(fn, repeat):
+    result = fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def run_benchmark(n_months=120, n_future=12, repeat=20, fill_method='interp', non_economic_model='sarima'):
+    frame = make_route_frame(n_months, n_future)
+    preprocessor = DataPreprocessor(
+        fill_method=fill_method,
+        non_economic_model=non_economic_model,
+        non_economic_tail_window=6,
+        prefit_tail_models=True,
+    )
+    # 尾部外推模型在 fit 中拟合一次，两种实现复用同一组模型
+    preprocessor.fit(frame)
+    print(f"月度航线: 历史 {n_months} 行 + 未来 {n_future} 行，{frame.shape[1] - 1} 列，"
+          f"fill_method={fill_method}，尾部模型={non_economic_model}")
+
+    for label, X in (('仅历史', frame.iloc[:n_months].reset_index(drop=True)), ('历史 + 未来期', frame)):
+        legacy, t_legacy = _timeit(lambda: preprocessor._transform_by_column(X), repeat)
+        matrix, t_matrix = _timeit(lambda: preprocessor.transform(X), repeat)
+        pd.testing.assert_frame_equal(legacy, matrix, check_exact=True)
+        print(f"[{label}] 逐列 {t_legacy * 1000:.2f} ms，矩阵 {t_matrix * 1000:.2f} ms，"
+              f"加速 {t_legacy / t_matrix:.1f}x，结果一致")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DataPreprocessor.transform 性能基准")
+    parser.add_argument('--months', type=int, default=120)
+    parser.add_argument('--future', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--fill-method', default='interp', choices=['interp', 'regression', 'zero'])
+    parser.add_argument('--tail-model', default='sarima', choices=['sarima', 'arima', 'holt', 'ses', 'lastn'],
+                        help='非经济列尾部外推模型')
+    args = parser.parse_args()
+    run_benchmark(args.months, args.future, args.repeat, args.fill_method, args.tail_model)
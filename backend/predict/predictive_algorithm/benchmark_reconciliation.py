@@ -0,0 +1,176 @@
+"""
+层级对齐 / 年度聚合性能基准
+
+对比逐航线的原实现（apply / iterrows / LinearRegression）与批量向量化实现的单航线耗时，
+并校验两者结果一致。
+
+运行（在 backend 目录下）：
+    python -m predict.predictive_algorithm.benchmark_reconciliation --routes 1000 --months 120
+"""
+import re
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+
+from .reconciliation import (
+    linear_reconcile_batch,
+    mint_reconcile_batch,
+    aggregate_quarterly_to_year_batch,
+)
+
+
+# ================== 原实现（逐航线，仅用于对比） ==================
+
+_Q_PAT = re.compile(r'^(\d{4})-Q([1-4])$')
+
+
+def _q_to_ts(s):
+    m = _Q_PAT.match(str(s))
+    if m:
+        return pd.Timestamp(year=int(m.group(1)), month=int(m.group(2)) * 3, day=1)
+    return pd.to_datetime(s, errors='coerce')
+
+
+def legacy_linear_reconcile(result_monthly, result_quarterly):
+    rm = result_monthly.copy()
+    rq = result_quarterly.copy()
+    rm['YearMonth'] = pd.to_datetime(rm['YearMonth'], errors='coerce', format='%Y-%m')
+    rq['YearMonth'] = rq['YearMonth'].apply(_q_to_ts)
+    rm['quarter'] = rm['YearMonth'].dt.to_period('Q').dt.to_timestamp()
+    rq['quarter'] = rq['YearMonth'].dt.to_period('Q').dt.to_timestamp()
+    monthly_q = rm.groupby('quarter', as_index=False)['Predicted'].sum().rename(columns={'Predicted': 'monthly_sum'})
+    quarterly_q = rq.groupby('quarter', as_index=False)['Predicted'].sum().rename(columns={'Predicted': 'quarterly_sum'})
+    merged_q = pd.merge(monthly_q, quarterly_q, on='quarter', how='inner')
+    reg = LinearRegression().fit(merged_q[['monthly_sum']], merged_q['quarterly_sum'])
+    monthly_q['adjusted'] = reg.predict(monthly_q[['monthly_sum']]).astype(float)
+    rm = pd.merge(rm, monthly_q[['quarter', 'monthly_sum', 'adjusted']], on='quarter', how='left')
+    rm['adjust_ratio'] = (rm['adjusted'] / rm['monthly_sum']).replace([np.inf, -np.inf], 1.0).fillna(1.0)
+    rm['Predicted_Reconciled'] = rm.apply(
+        lambda row: row['Predicted'] * row['adjust_ratio'] if row.get('Set') == 'Future' else row['Predicted'], axis=1
+    )
+    return rm
+
+
+def legacy_aggregate_to_year(hist_q, fut_q):
+    def _parse(lst):
+        df = pd.DataFrame(lst).copy()
+        m = df['time_point'].astype(str).str.extract(r'^(\d{4})-Q([1-4])$')
+        df['year'] = pd.to_numeric(m[0], errors='coerce')
+        df['q'] = pd.to_numeric(m[1], errors='coerce')
+        df['value'] = pd.to_numeric(df['value'], errors='coerce')
+        return df.dropna(subset=['year', 'q'])
+
+    H, F = _parse(hist_q), _parse(fut_q)
+    keyF = set(zip(F['year'], F['q']))
+    H = H[~H.apply(lambda r: (r['year'], r['q']) in keyF, axis=1)]
+    ALL = pd.concat([H, F], ignore_index=True)
+    agg = ALL.groupby('year').agg(nq=('q', lambda s: len(pd.unique(s))), sumv=('value', 'sum')).reset_index()
+    full = agg[agg['nq'] == 4].sort_values('year')
+    K = len(F) // 4
+    fut_years = set(full['year'].tolist()[-K:]) if K > 0 else set()
+    hist, futu = [], []
+    for _, row in full.iterrows():
+        item = {'time_point': str(int(row['year'])), 'value': int(round(row['sumv']))}
+        (futu if int(row['year']) in fut_years else hist).append(item)
+    return hist, futu
+
+
+# ================== 合成数据 ==================
+
+def make_frames(n_routes, n_months, n_future, seed=0):
+    """生成 n_routes 条航线、每条 n_months 个月（最后 n_future 个月为未来）的月度/季度预测"""
+    rng = np.random.default_rng(seed)
+    months = pd.period_range('2015-01', periods=n_months, freq='M')
+    quarters = pd.period_range(months[0].asfreq('Q'), months[-1].asfreq('Q'), freq='Q')
+
+    route = np.repeat(np.arange(n_routes), n_months)
+    level = rng.uniform(5_000, 50_000, n_routes)
+    season = 1 + 0.1 * np.sin(np.arange(n_months) * 2 * np.pi / 12)
+    monthly = pd.DataFrame({
+        'route': route,
+        'YearMonth': np.tile(months.strftime('%Y-%m'), n_routes),
+        'Predicted': (level[:, None] * season[None, :] * rng.normal(1, 0.05, (n_routes, n_months))).ravel(),
+        'Set': np.tile(np.where(np.arange(n_months) >= n_months - n_future, 'Future', 'History'), n_routes),
+    })
+
+    q_labels = [f"{q.year}-Q{q.quarter}" for q in quarters]
+    quarterly = pd.DataFrame({
+        'route': np.repeat(np.arange(n_routes), len(quarters)),
+        'YearMonth': np.tile(q_labels, n_routes),
+        'Predicted': (3 * level[:, None] * rng.normal(1, 0.05, (n_routes, len(quarters)))).ravel(),
+    })
+    n_future_q = n_future // 3
+    quarterly['Set'] = np.tile(
+        np.where(np.arange(len(quarters)) >= len(quarters) - n_future_q, 'Future', 'History'), n_routes
+    )
+    return monthly, quarterly
+
+
+def _timeit(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run_benchmark(n_routes=1000, n_months=120, n_future=24, legacy_sample=50):
+    monthly, quarterly = make_frames(n_routes, n_months, n_future)
+    sample = min(legacy_sample, n_routes)
+    print(f"航线数: {n_routes}，每条月度点数: {n_months}（未来 {n_future}），原实现抽样 {sample} 条")
+
+    # ---- 线性对齐 ----
+    legacy_out = []
+    _, t_legacy = _timeit(lambda: [
+        legacy_out.append(legacy_linear_reconcile(
+            monthly[monthly['route'] == r].drop(columns=['route']),
+            quarterly[quarterly['route'] == r].drop(columns=['route', 'Set'])
+        )) for r in range(sample)
+    ])
+    batch, t_batch = _timeit(linear_reconcile_batch, monthly, quarterly, key_cols=('route',))
+    diff = max(
+        np.nanmax(np.abs(batch.loc[batch['route'] == r, 'Predicted_Reconciled'].to_numpy()
+                         - legacy_out[r]['Predicted_Reconciled'].to_numpy()))
+        for r in range(sample)
+    )
+    print(f"[线性对齐] 原实现 {t_legacy / sample * 1000:.2f} ms/航线，"
+          f"批量 {t_batch / n_routes * 1000:.3f} ms/航线（总 {t_batch:.2f}s），最大偏差 {diff:.2e}")
+
+    # ---- MinT 对齐 ----
+    _, t_mint = _timeit(mint_reconcile_batch, monthly, quarterly.drop(columns=['Set']), key_cols=('route',))
+    print(f"[MinT 对齐] 批量 {t_mint / n_routes * 1000:.3f} ms/航线（总 {t_mint:.2f}s）")
+
+    # ---- 年度聚合 ----
+    q_points = quarterly.rename(columns={'YearMonth': 'time_point', 'Predicted': 'value'})
+    hist_q = q_points[q_points['Set'] == 'History'].drop(columns=['Set'])
+    fut_q = q_points[q_points['Set'] == 'Future'].drop(columns=['Set'])
+
+    legacy_years = []
+    _, t_legacy = _timeit(lambda: [
+        legacy_years.append(legacy_aggregate_to_year(
+            hist_q[hist_q['route'] == r].to_dict('records'),
+            fut_q[fut_q['route'] == r].to_dict('records')
+        )) for r in range(sample)
+    ])
+    yearly, t_batch = _timeit(aggregate_quarterly_to_year_batch, hist_q, fut_q, key_cols=('route',))
+    mismatched = 0
+    for r in range(sample):
+        part = yearly[yearly['route'] == r]
+        hist = [{'time_point': str(y), 'value': int(v)} for y, v, f in
+                zip(part['year'], part['value'], part['is_future']) if not f]
+        futu = [{'time_point': str(y), 'value': int(v)} for y, v, f in
+                zip(part['year'], part['value'], part['is_future']) if f]
+        mismatched += (hist, futu) != legacy_years[r]
+    print(f"[年度聚合] 原实现 {t_legacy / sample * 1000:.2f} ms/航线，"
+          f"批量 {t_batch / n_routes * 1000:.3f} ms/航线（总 {t_batch:.2f}s），不一致航线 {mismatched}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="层级对齐 / 年度聚合性能基准")
+    parser.add_argument('--routes', type=int, default=1000)
+    parser.add_argument('--months', type=int, default=120)
+    parser.add_argument('--future', type=int, default=24)
+    parser.add_argument('--legacy-sample', type=int, default=50, help='原实现抽样航线数（逐条运行较慢）')
+    args = parser.parse_args()
+    run_benchmark(args.routes, args.months, args.future, args.legacy_sample)
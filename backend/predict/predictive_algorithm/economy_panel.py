@@ -0,0 +1,198 @@
+"""
+城市经济指标月度面板
+
+城市经济数据（每城市每年一行）-> 以 (City, YearMonth) 为键的月度表，一次性对全部城市向量化计算：
+- 补齐每个城市首末年份之间缺失的年份；0 视为缺失，年份间线性插值，两端用最近值填充，仍缺失的置 0
+- 按线性回归（年份 -> 指标）外推最后一年的下一年，用于最后一年的月度插值
+- 月度值 = 当年值 + (月份 - 1) / 12 × (下一年值 - 当年值)
+
+结果按源文件（路径 + 修改时间 + 大小）缓存在进程内和 <经济数据文件>.panel.pkl 中，
+清洗（DataCleaner）和训练时都可以通过 attach_economy 按 YearMonth + 三字码直接拼接到航线数据上。
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+# 经济数据源列名 -> 面板列名
+ECONOMY_INDICATORS = {
+    'GDP（亿元）': 'GDP',
+    '人口（万人）': 'Population',
+    '第三产业占比（%）': 'Third_Industry',
+    '人均可支配收入（元）': 'Revenue',
+    '社会消费品零售总额(万元)': 'Retail',
+    '三大产业就业人员总和(万人)': 'Labor',
+    '民用航空客运量(万人)': 'Air_Traffic',
+}
+PANEL_COLUMNS = list(ECONOMY_INDICATORS.values())
+
+# 拼接到航线数据时的列名（与历史最终数据 / FlightMarketRecord 导入列一致）
+ORIGIN_COLUMNS = {
+    'GDP': 'O_GDP', 'Population': 'O_Population', 'Third_Industry': 'Third_Industry_x',
+    'Revenue': 'O_Revenue', 'Retail': 'O_Retail', 'Labor': 'O_Labor', 'Air_Traffic': 'O_Air_Traffic',
+}
+DESTINATION_COLUMNS = {
+    'GDP': 'D_GDP', 'Population': 'D_Population', 'Third_Industry': 'Third_Industry_y',
+    'Revenue': 'D_Revenue', 'Retail': 'D_Retail', 'Labor': 'D_Labor', 'Air_Traffic': 'D_Air_Traffic',
+}
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _fill_years(values, years, city_codes):
+    """
+    城市内按年份线性插值（等价于逐城市 interpolate(method='linear') + ffill + bfill），全部缺失时为 0
+
+    values: (行, 指标) 数组，行按 (城市, 年份) 排序且年份连续
+    """
+    n, k = values.shape
+    filled = np.empty_like(values)
+    city_codes = pd.Series(city_codes)
+    for j in range(k):
+        col = pd.Series(values[:, j])
+        valid = col.notna()
+        year_valid = pd.Series(np.where(valid, years, np.nan))
+
+        prev_val = col.groupby(city_codes).ffill()
+        prev_year = year_valid.groupby(city_codes).ffill()
+        next_val = col.groupby(city_codes).bfill()
+        next_year = year_valid.groupby(city_codes).bfill()
+
+        span = (next_year - prev_year).to_numpy()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratio = np.where(span > 0, (years - prev_year.to_numpy()) / span, 0.0)
+        interp = prev_val.to_numpy() + ratio * (next_val.to_numpy() - prev_val.to_numpy())
+        # 首个有效值之前取后一个有效值，最后一个有效值之后取前一个有效值
+        interp = np.where(np.isnan(prev_val.to_numpy()), next_val.to_numpy(), interp)
+        interp = np.where(np.isnan(next_val.to_numpy()), prev_val.to_numpy(), interp)
+        filled[:, j] = np.nan_to_num(interp, nan=0.0)
+    return filled
+
+
+def build_economy_panel(ecodata):
+    """
+    年度经济数据 -> 月度面板
+
+    :param ecodata: 含 '三字码'、'年份' 及 ECONOMY_INDICATORS 各列的 DataFrame
+    :return: DataFrame，列为 YearMonth（'YYYY-MM'）、City 及 PANEL_COLUMNS，(City, YearMonth) 唯一
+    """
+    indicators = list(ECONOMY_INDICATORS)
+    df = ecodata[['三字码', '年份'] + indicators].copy()
+    df['年份'] = pd.to_numeric(df['年份'], errors='coerce')
+    df = df.dropna(subset=['三字码', '年份'])
+    df['年份'] = df['年份'].astype(int)
+    for col in indicators:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df = df.drop_duplicates(subset=['三字码', '年份'], keep='first')
+    if df.empty:
+        return pd.DataFrame(columns=['YearMonth', 'City'] + PANEL_COLUMNS)
+
+    # 补齐每个城市首末年份之间的所有年份（城市保持源数据中的出现顺序）
+    bounds = df.groupby('三字码', sort=False)['年份'].agg(['min', 'max'])
+    lengths = (bounds['max'] - bounds['min'] + 1).to_numpy()
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    years = np.repeat(bounds['min'].to_numpy(), lengths) + (np.arange(lengths.sum()) - starts)
+    grid = pd.DataFrame({'三字码': np.repeat(bounds.index.to_numpy(), lengths), '年份': years})
+    df = grid.merge(df, how='left', on=['三字码', '年份'])
+
+    # 0 视为缺失后按年份插值
+    values = df[indicators].to_numpy(dtype=np.float64)
+    values[values == 0] = np.nan
+    city_codes = df['三字码'].to_numpy()
+    year_arr = df['年份'].to_numpy(dtype=np.float64)
+    values = _fill_years(values, year_arr, city_codes)
+
+    # 线性回归外推下一年（闭式解，单一年份时斜率为 0）
+    group_ids = np.repeat(np.arange(len(lengths)), lengths)
+    counts = lengths.astype(np.float64)
+    mean_x = np.bincount(group_ids, weights=year_arr) / counts
+    dx = year_arr - mean_x[group_ids]
+    sxx = np.bincount(group_ids, weights=dx * dx)
+    last_year = bounds['max'].to_numpy(dtype=np.float64)
+    predicted = np.empty((len(lengths), values.shape[1]))
+    for j in range(values.shape[1]):
+        mean_y = np.bincount(group_ids, weights=values[:, j]) / counts
+        sxy = np.bincount(group_ids, weights=dx * (values[:, j] - mean_y[group_ids]))
+        slope = np.divide(sxy, sxx, out=np.zeros_like(sxy), where=sxx > 0)
+        predicted[:, j] = mean_y + slope * (last_year + 1 - mean_x)
+
+    # 每年的下一年值：同城市下一行，城市最后一年用外推值
+    next_values = np.empty_like(values)
+    next_values[:-1] = values[1:]
+    is_last = np.zeros(len(values), dtype=bool)
+    is_last[np.cumsum(lengths) - 1] = True
+    next_values[is_last] = predicted
+
+    # 展开为月度：每年 12 行
+    months = np.tile(np.arange(1, 13), len(values))
+    ratio = ((months - 1) / 12.0)[:, None]
+    current = np.repeat(values, 12, axis=0)
+    monthly = current + ratio * (np.repeat(next_values, 12, axis=0) - current)
+
+    panel = pd.DataFrame(monthly, columns=PANEL_COLUMNS)
+    year_str = pd.Series(np.repeat(df['年份'].to_numpy(), 12)).astype(str)
+    month_str = pd.Series(months).map('{:02d}'.format)
+    panel.insert(0, 'City', np.repeat(city_codes, 12))
+    panel.insert(0, 'YearMonth', (year_str + '-' + month_str).to_numpy())
+    return panel
+
+
+def _cache_key(economy_file):
+    stat = os.stat(economy_file)
+    return f"{os.path.abspath(economy_file)}|{stat.st_mtime_ns}|{stat.st_size}"
+
+
+def load_economy_panel(economy_file, use_disk_cache=True):
+    """
+    读取经济数据文件对应的月度面板（以 (City, YearMonth) 为索引），源文件未变化时直接使用缓存
+
+    :return: DataFrame，索引为 (City, YearMonth)，列为 PANEL_COLUMNS
+    """
+    economy_file = str(economy_file)
+    key = _cache_key(economy_file)
+    with _cache_lock:
+        panel = _cache.get(key)
+    if panel is not None:
+        return panel
+
+    cache_file = f"{economy_file}.panel.pkl"
+    if use_disk_cache and os.path.exists(cache_file):
+        try:
+            cached_key, cached_panel = pd.read_pickle(cache_file)
+            if cached_key == key:
+                panel = cached_panel
+        except Exception as e:
+            print(f"读取经济面板缓存失败，重新计算: {e}")
+
+    if panel is None:
+        panel = build_economy_panel(pd.read_csv(economy_file)).set_index(['City', 'YearMonth'])
+        if use_disk_cache:
+            try:
+                pd.to_pickle((key, panel), cache_file)
+            except OSError as e:
+                print(f"写入经济面板缓存失败: {e}")
+
+    with _cache_lock:
+        _cache.clear()
+        _cache[key] = panel
+    return panel
+
+
+def attach_economy(route_df, panel, year_month_col='YearMonth', origin_col='Origin', destination_col='Destination'):
+    """
+    按 (起点/终点三字码, YearMonth) 把经济指标拼接到航线数据上（左连接，缺失为 NaN）
+
+    :param panel: load_economy_panel 的结果
+    :return: 新 DataFrame，追加 ORIGIN_COLUMNS / DESTINATION_COLUMNS 中的列
+    """
+    out = route_df.copy()
+    year_month = out[year_month_col].astype(str).to_numpy()
+    for code_col, names in ((origin_col, ORIGIN_COLUMNS), (destination_col, DESTINATION_COLUMNS)):
+        keys = pd.MultiIndex.from_arrays([out[code_col].to_numpy(), year_month])
+        values = panel.reindex(keys)[PANEL_COLUMNS].to_numpy()
+        for j, col in enumerate(PANEL_COLUMNS):
+            out[names[col]] = values[:, j]
+    return out
@@ -9,10 +9,11 @@ import pickle
 import json
 
 from .time_granularity import TimeGranularityController
-from .TS_model import ARIMAModel
+from .TS_model import ARIMAModel, TS_FEATURE_VERSION
 from .FeatureEngineer import DataPreprocessor, FeatureBuilder, AirlineRouteModel
 from .create_model import get_model
-from .pretrain_single_route import load_data_from_database
+from .model_bundle import convert_model_dir, write_on_train
+from .pretrain_single_route import load_data_from_database, TrainingCancelled, report_progress
 
 import warnings
 warnings.filterwarnings("ignore")
@@ -21,7 +22,14 @@ plt.rcParams['font.sans-serif'] = ['SimHei']
 plt.rcParams['axes.unicode_minus'] = False
 
 
-def formal_train_single_route(origin, destination, time_granularity, pretrained_metadata_path):
+def prefit_tail_models_enabled():
+    """正式训练是否预先拟合尾部外推模型（settings.TAIL_MODEL_PREFIT['ENABLED']），默认关闭"""
+    from django.conf import settings
+    conf = getattr(settings, 'TAIL_MODEL_PREFIT', {}) or {}
+    return bool(conf.get('ENABLED', False))
+
+
+def formal_train_single_route(origin, destination, time_granularity, pretrained_metadata_path, progress_callback=None):
     """
     正式训练单条航线的完整流程，使用预训练模型的元数据参数
 
@@ -29,6 +37,7 @@ def formal_train_single_route(origin, destination, time_granularity, pretrained_
     :param destination: 目标机场代码 (如 'PEK')
     :param time_granularity: 时间粒度
     :param pretrained_metadata_path: 预训练模型元数据文件路径
+    :param progress_callback: 进度回调 callback(progress, message)，可抛出 TrainingCancelled 中止训练
     :return: 训练状态 (成功/失败) 和结果信息
     """
     current_dir = os.path.dirname(os.path.abspath(__file__))  # backend/predict/predictive_algorithm/
@@ -91,6 +100,7 @@ def formal_train_single_route(origin, destination, time_granularity, pretrained_
 
         # 从数据库加载数据
         # print("从数据库加载数据...")
+        report_progress(progress_callback, 10, "加载航线数据")
         domestic = load_data_from_database(origin, destination)
 
         if domestic is None:
@@ -110,10 +120,13 @@ def formal_train_single_route(origin, destination, time_granularity, pretrained_
         # print(f"创建输出目录: {route_dir}")
 
         # 初始化组件
+        # 开启 TAIL_MODEL_PREFIT 时，只为模型实际使用的特征列预先拟合尾部外推模型，随 preprocessor.pkl 保存供预测复用
         preprocessor = DataPreprocessor(
             fill_method='interp',
             normalize=False,
             non_economic_tail_window=6,
+            prefit_tail_models=prefit_tail_models_enabled(),
+            prefit_columns=pretrained_metadata.get("feature_columns") or [],
         )
 
         granularity_controller = TimeGranularityController(time_granularity)
@@ -140,6 +153,7 @@ def formal_train_single_route(origin, destination, time_granularity, pretrained_
 
         # 使用全部数据重新训练
         print("使用全部数据重新训练模型...")
+        report_progress(progress_callback, 30, "构建训练特征")
         X_full, y_full, _, _, data_with_features_full = route_processor.prepare_data(
             origin=origin,
             destination=destination,
@@ -152,11 +166,13 @@ def formal_train_single_route(origin, destination, time_granularity, pretrained_
         
         # 训练模型
         # print("开始训练模型...")
+        report_progress(progress_callback, 50, "训练模型")
         model_full.fit(X_full, y_full)
         # print("模型训练完成")
 
         # 保存模型文件
         # print("保存模型文件...")
+        report_progress(progress_callback, 80, "保存模型文件")
         with open(os.path.join(route_dir, "model.pkl"), "wb") as f:
             pickle.dump(model_full, f)
 
@@ -174,6 +190,7 @@ def formal_train_single_route(origin, destination, time_granularity, pretrained_
             "time_granularity": time_granularity,
             "model_type": model_type,
             "arima_order": arima_order,
+            "ts_feature_version": TS_FEATURE_VERSION,
             "add_ts_forecast": add_ts_forecast,
             "model_params": model_params,
             "last_complete_date": data_with_features_full[route_processor.date_col].max().strftime('%Y-%m-%d'),
@@ -189,6 +206,14 @@ def formal_train_single_route(origin, destination, time_granularity, pretrained_
         latest_data = data_with_features_full.copy()
         latest_data.to_csv(os.path.join(route_dir, "latest_data.csv"), index=False)
 
+        # 模型包：单文件保存全部组件，RouteModelInfo 指向模型包时预测优先读取（旧格式的五个文件保留，便于回退）
+        model_file = os.path.join(route_dir, "model.pkl")
+        if write_on_train():
+            try:
+                model_file = convert_model_dir(route_dir, overwrite=True) or model_file
+            except Exception as e:
+                print(f"! 写入模型包失败，使用旧格式模型文件: {e}")
+
         # 获取训练数据的日期范围
         train_start_date = data_with_features_full[route_processor.date_col].min()
         train_end_date = data_with_features_full[route_processor.date_col].max()
@@ -206,7 +231,7 @@ def formal_train_single_route(origin, destination, time_granularity, pretrained_
             
             # 文件路径（相对于EXISTING_MODEL_DIR的相对路径）
             "meta_file_path": os.path.relpath(os.path.join(route_dir, "metadata.json"), EXISTING_MODEL_DIR),
-            "model_file_path": os.path.relpath(os.path.join(route_dir, "model.pkl"), EXISTING_MODEL_DIR),
+            "model_file_path": os.path.relpath(model_file, EXISTING_MODEL_DIR),
             "raw_data_file_path": os.path.relpath(os.path.join(route_dir, "latest_data.csv"), EXISTING_MODEL_DIR),
             "preprocessor_file_path": os.path.relpath(os.path.join(route_dir, "preprocessor.pkl"), EXISTING_MODEL_DIR),
             "feature_builder_file_path": os.path.relpath(os.path.join(route_dir, "feature_builder.pkl"), EXISTING_MODEL_DIR),
@@ -215,6 +240,10 @@ def formal_train_single_route(origin, destination, time_granularity, pretrained_
         print(f"正式训练完成！模型保存在: {route_dir}")
         return True, result_info
 
+    except TrainingCancelled:
+        # 取消不视为训练失败，交由任务执行方处理
+        raise
+
     except Exception as e:
         print(f"! 航线 {origin}-{destination} 训练失败: {str(e)}")
         import traceback
@@ -0,0 +1,432 @@
+"""
+航线超参数搜索
+
+在 create_model 的参数空间上搜索 LightGBM / XGBoost 参数，以及 TS_Forecast 特征使用的 arima_order：
+- grid：参数空间中全部候选值的组合
+- random：在参数空间中随机采样 n_trials 组
+- halving：逐次减半，随机采样 n_trials 组后以 n_estimators 为资源，每轮只保留评估指标最好的 1/eta，资源乘以 eta
+
+每条航线只加载、预处理一次，每个 arima_order（或不使用 TS 特征）只构建一次特征矩阵；
+特征矩阵在进程池启动时传给每个工作进程一次（init_search_worker），之后各试验只传参数（run_trial）。
+本模块不访问数据库，试验记录由 predict.training_service.run_hyperparameter_search 写入 PretrainRecord。
+"""
+import os
+import json
+import copy
+import math
+import time
+import random
+import itertools
+from datetime import timedelta
+
+import numpy as np
+
+from .time_granularity import TimeGranularityController
+from .TS_model import ARIMAModel, TS_FEATURE_VERSION
+from .model_evaluation import ModelEvaluator
+from .FeatureEngineer import DataPreprocessor, FeatureBuilder, AirlineRouteModel
+from .create_model import get_model
+
+
+SEARCH_STRATEGIES = ('grid', 'random', 'halving')
+
+# 选择最佳配置的评估指标（有测试集时取测试集，否则取训练集）；r2 越大越好，其余越小越好
+SEARCH_METRICS = ('rmse', 'mae', 'mape', 'r2')
+
+# 默认参数空间：列表为候选值；random / halving 还支持区间 {'low', 'high', 'log'(可选), 'int'(可选)}
+# LightGBM 默认参数中 feature_fraction / bagging_fraction / min_data_in_leaf 会覆盖同义的
+# colsample_bytree / subsample / min_child_samples，因此直接搜索前者
+DEFAULT_SEARCH_SPACES = {
+    'lgb': {
+        'n_estimators': [100, 200, 400],
+        'learning_rate': {'low': 0.01, 'high': 0.2, 'log': True},
+        'max_depth': [3, 5, 7, -1],
+        'num_leaves': [7, 15, 31, 63],
+        'min_data_in_leaf': [2, 5, 10, 20],
+        'feature_fraction': [0.6, 0.8, 1.0],
+        'bagging_fraction': [0.6, 0.8, 1.0],
+        'reg_alpha': [0.0, 0.1, 1.0],
+        'reg_lambda': [0.0, 0.1, 1.0],
+    },
+    'xgb': {
+        'n_estimators': [100, 200, 400],
+        'learning_rate': {'low': 0.01, 'high': 0.2, 'log': True},
+        'max_depth': [2, 3, 5, 7],
+        'min_child_weight': [1, 3, 5],
+        'subsample': [0.6, 0.8, 1.0],
+        'colsample_bytree': [0.6, 0.8, 1.0],
+        'reg_alpha': [0.0, 0.1, 1.0],
+        'reg_lambda': [0.5, 1.0, 2.0],
+        'gamma': [0, 0.1, 1.0],
+    },
+}
+
+# 网格搜索的默认参数空间：只含少量离散候选值（lgb 32 组、xgb 48 组，乘以 arima_order 候选数），其余参数沿用默认配置
+DEFAULT_GRID_SPACES = {
+    'lgb': {
+        'n_estimators': [100, 300],
+        'learning_rate': [0.05, 0.1],
+        'max_depth': [3, 7],
+        'num_leaves': [15, 31],
+        'min_data_in_leaf': [5, 20],
+    },
+    'xgb': {
+        'n_estimators': [100, 300],
+        'learning_rate': [0.05, 0.1],
+        'max_depth': [2, 3, 5],
+        'min_child_weight': [1, 3],
+        'subsample': [0.8, 1.0],
+    },
+}
+
+# TS_Forecast 特征的 ARIMA order 候选（仅 add_ts_forecast 为 True 时搜索）
+DEFAULT_ARIMA_ORDERS = [(1, 1, 1), (1, 0, 0), (0, 1, 1), (2, 1, 2)]
+DEFAULT_GRID_ARIMA_ORDERS = [(1, 1, 1), (0, 1, 1)]
+
+# 逐次减半的最小 n_estimators
+MIN_HALVING_RESOURCE = 10
+
+current_dir = os.path.dirname(os.path.abspath(__file__))  # backend/predict/predictive_algorithm/
+PRE_TRAINED_MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(current_dir)), 'AirlineModels', 'Pre_trained_Models')
+
+
+def _is_range(values):
+    return isinstance(values, dict)
+
+
+def resolve_search_space(model_type, add_ts_forecast, space=None, strategy='random'):
+    """
+    最终参数空间：未指定时使用默认空间（grid 使用 DEFAULT_GRID_SPACES，其余使用 DEFAULT_SEARCH_SPACES）；
+    不使用 TS 特征时去掉 arima_order，使用时未指定则搜索默认候选
+
+    Args:
+        model_type (str): 'lgb' / 'xgb'
+        add_ts_forecast (bool): 配置是否添加 TS_Forecast 特征
+        space (dict): 用户指定的参数空间 {参数名: 候选值列表或区间}
+        strategy (str): 搜索策略
+    """
+    grid = strategy == 'grid'
+    if not space:
+        space = (DEFAULT_GRID_SPACES if grid else DEFAULT_SEARCH_SPACES)[model_type]
+    space = copy.deepcopy(space)
+    for name, values in space.items():
+        if _is_range(values):
+            if 'low' not in values or 'high' not in values:
+                raise ValueError(f"参数 {name} 的区间需要 low 和 high")
+        elif not isinstance(values, (list, tuple)) or not values:
+            raise ValueError(f"参数 {name} 需要非空的候选值列表或区间")
+
+    if not add_ts_forecast:
+        space.pop('arima_order', None)
+    elif 'arima_order' not in space:
+        space['arima_order'] = list(DEFAULT_GRID_ARIMA_ORDERS if grid else DEFAULT_ARIMA_ORDERS)
+    if 'arima_order' in space:
+        if _is_range(space['arima_order']):
+            raise ValueError("arima_order 需要给出候选值列表")
+        space['arima_order'] = [tuple(int(v) for v in order) for order in space['arima_order']]
+    return space
+
+
+def split_resource(space, base_params):
+    """
+    逐次减半以 n_estimators 为资源：从参数空间中取出 n_estimators，返回 (其余参数空间, 最大资源)
+    """
+    space = dict(space)
+    values = space.pop('n_estimators', None)
+    if values is None:
+        max_resource = base_params.get('n_estimators', 100)
+    elif _is_range(values):
+        max_resource = values['high']
+    else:
+        max_resource = max(values)
+    return space, int(max_resource)
+
+
+def grid_candidates(space, max_trials=None):
+    """参数空间中全部候选值的组合；组合数超过 max_trials 时报错"""
+    for name, values in space.items():
+        if _is_range(values):
+            raise ValueError(f"网格搜索的参数 {name} 需要给出候选值列表")
+    names = list(space)
+    total = math.prod(len(space[name]) for name in names)
+    if max_trials and total > max_trials:
+        raise ValueError(f"网格共 {total} 组参数，超过上限 {max_trials}，请缩小参数空间")
+    return [dict(zip(names, combo)) for combo in itertools.product(*(space[name] for name in names))]
+
+
+def _sample(values, rng):
+    if not _is_range(values):
+        return rng.choice(list(values))
+    low, high = values['low'], values['high']
+    if values.get('log'):
+        value = math.exp(rng.uniform(math.log(low), math.log(high)))
+    else:
+        value = rng.uniform(low, high)
+    return int(round(value)) if values.get('int') else value
+
+
+def random_candidates(space, n_trials, seed=42):
+    """随机采样 n_trials 组不重复的参数（离散空间组合数不足时返回全部可采到的组合）"""
+    rng = random.Random(seed)
+    candidates = []
+    seen = set()
+    for _ in range(n_trials * 20):
+        if len(candidates) >= n_trials:
+            break
+        candidate = {name: _sample(values, rng) for name, values in space.items()}
+        key = json.dumps(candidate, sort_keys=True, default=str)
+        if key not in seen:
+            seen.add(key)
+            candidates.append(candidate)
+    return candidates
+
+
+def build_candidates(strategy, space, n_trials=20, seed=42, max_grid_trials=500):
+    """按搜索策略生成候选参数组"""
+    if strategy not in SEARCH_STRATEGIES:
+        raise ValueError(f"未知的搜索策略: {strategy}")
+    if strategy == 'grid':
+        return grid_candidates(space, max_grid_trials)
+    return random_candidates(space, n_trials, seed)
+
+
+def halving_schedule(n_candidates, max_resource, min_resource=None, eta=3):
+    """
+    逐次减半各轮的 (候选数, n_estimators)
+
+    第 i 轮保留 ceil(n / eta^i) 个候选，资源为 min_resource * eta^i，最后一轮使用 max_resource。
+    未指定 min_resource 时按候选数减半到 1 所需的轮数推算（不低于 MIN_HALVING_RESOURCE）。
+    """
+    eta = max(2, int(eta))
+    if min_resource is None:
+        rounds = int(math.log(max(n_candidates, 1), eta) + 1e-9) + 1
+        min_resource = max(MIN_HALVING_RESOURCE, int(max_resource / eta ** (rounds - 1)))
+    min_resource = min(int(min_resource), max_resource)
+    rounds = int(math.log(max_resource / min_resource, eta) + 1e-9) + 1
+
+    schedule = []
+    for i in range(rounds):
+        n_keep = max(1, math.ceil(n_candidates / eta ** i))
+        resource = max_resource if i == rounds - 1 else int(min_resource * eta ** i)
+        schedule.append((n_keep, resource))
+    return schedule
+
+
+def trial_config(base_config, candidate, n_estimators=None):
+    """
+    试验的完整训练配置：在 merge_model_params 的结果上覆盖候选模型参数和 arima_order
+
+    Args:
+        base_config (dict): merge_model_params 合并后的配置
+        candidate (dict): 候选参数（可含 arima_order）
+        n_estimators (int): 逐次减半当前轮的资源
+    """
+    config = copy.deepcopy(base_config)
+    params_key = 'lgb_params' if config['model_type'] == 'lgb' else 'xgb_params'
+    params = {name: value for name, value in candidate.items() if name != 'arima_order'}
+    if n_estimators is not None:
+        params['n_estimators'] = int(n_estimators)
+    config[params_key] = {**config.get(params_key, {}), **params}
+    if 'arima_order' in candidate:
+        config['arima_order'] = tuple(candidate['arima_order'])
+    return config
+
+
+def feature_key(config):
+    """特征矩阵键：不使用 TS 特征时为 None，否则为 ARIMA order 元组"""
+    if not config.get('add_ts_forecast'):
+        return None
+    return tuple(int(v) for v in config.get('arima_order', (1, 1, 1)))
+
+
+def prepare_search_data(route_data, origin, destination, time_granularity, test_size, feature_keys):
+    """
+    航线数据只预处理一次，每个特征键只构建一次特征矩阵
+
+    Args:
+        route_data (pd.DataFrame): 已加载的航线数据
+        feature_keys: 需要的特征键（见 feature_key）
+    Returns:
+        dict: features {键: (X_train, y_train, X_test, y_test)} / train_start_date / train_end_date
+    """
+    # 与 pretrain_single_route 的预处理配置一致
+    preprocessor = DataPreprocessor(
+        fill_method='interp',
+        normalize=False,
+        non_economic_tail_window=6,
+    )
+    granularity_controller = TimeGranularityController(time_granularity)
+    route_processor = AirlineRouteModel(
+        data=route_data,
+        preprocessor=preprocessor,
+        granularity=time_granularity
+    )
+    data, data_preprocessed = route_processor.preprocess_route(origin, destination)
+
+    features = {}
+    data_with_features = None
+    for key in dict.fromkeys(feature_keys):
+        route_processor.feature_builder = FeatureBuilder(
+            granularity_controller=granularity_controller,
+            add_ts_forecast=key is not None,
+            ts_model=ARIMAModel(order=key, freq=granularity_controller.get_freq()) if key is not None else None
+        )
+        X_train, y_train, X_test, y_test, data_with_features = route_processor.split_features(
+            data, data_preprocessed, test_size
+        )
+        if X_train is None or X_train.empty:
+            raise ValueError("数据不足，无法训练")
+        features[key] = (X_train, y_train, X_test, y_test)
+
+    return {
+        'features': features,
+        'train_start_date': data_with_features[route_processor.date_col].min(),
+        'train_end_date': data_with_features[route_processor.date_col].max(),
+    }
+
+
+# 工作进程中的航线特征矩阵（进程启动时由 init_search_worker 设置）
+_worker_features = {}
+
+
+def init_search_worker(features):
+    """进程池初始化函数：保存航线特征矩阵，之后的试验只传参数"""
+    global _worker_features
+    _worker_features = features
+
+
+def _to_float_metrics(metrics):
+    return {name: float(value) for name, value in metrics.items()}
+
+
+def run_trial(trial, features=None):
+    """
+    执行一次试验：按参数训练模型并评估
+
+    Args:
+        trial (dict): trial_id / rung / model_type / time_granularity / params / feature_key
+        features (dict): 特征矩阵，默认使用进程初始化时传入的
+    Returns:
+        dict: trial 的字段 + train_metrics / test_metrics / feature_columns / training_samples /
+              test_samples / duration / error
+    """
+    features = features if features is not None else _worker_features
+    start = time.time()
+    result = dict(trial, train_metrics=None, test_metrics=None, error=None)
+    try:
+        X_train, y_train, X_test, y_test = features[trial['feature_key']]
+        params = dict(trial['params'])
+        if trial['model_type'] == 'xgb':
+            # 试验按进程并行，每个模型单线程训练，避免线程数超过核数
+            params.setdefault('n_jobs', 1)
+        model = get_model(trial['time_granularity'], trial['model_type'], params)
+        model.fit(X_train, y_train)
+
+        result['train_metrics'] = _to_float_metrics(
+            ModelEvaluator(y_train, model.predict(X_train)).calculate_metrics()
+        )
+        if trial['time_granularity'] != 'yearly' and X_test is not None and not X_test.empty:
+            result['test_metrics'] = _to_float_metrics(
+                ModelEvaluator(y_test, model.predict(X_test)).calculate_metrics()
+            )
+        result['feature_columns'] = X_train.columns.tolist()
+        result['training_samples'] = len(X_train)
+        result['test_samples'] = len(X_test) if X_test is not None else 0
+    except Exception as e:
+        result['error'] = str(e)
+    result['duration'] = time.time() - start
+    return result
+
+
+def trial_metric(result, metric='rmse'):
+    """试验的评估指标：有测试集时取测试集，否则取训练集；失败或无效时为 None"""
+    if result.get('error'):
+        return None
+    metrics = result.get('test_metrics') or result.get('train_metrics') or {}
+    value = metrics.get(metric)
+    if value is None or not np.isfinite(value):
+        return None
+    return value
+
+
+def trial_score(result, metric='rmse'):
+    """试验得分（越小越好，用于排序）；失败的试验为 inf"""
+    value = trial_metric(result, metric)
+    if value is None:
+        return math.inf
+    return -value if metric == 'r2' else value
+
+
+def select_best_trial(results, metric='rmse', rung=None):
+    """
+    最佳试验：只在指定轮次（逐次减半取最后一轮，其余策略为 0）的成功试验中按 trial_score 选取
+
+    Returns:
+        dict: 最佳试验结果；没有成功的试验时为 None
+    """
+    finals = [r for r in results if (rung is None or r['rung'] == rung) and r['error'] is None]
+    if not finals:
+        return None
+    return min(finals, key=lambda r: trial_score(r, metric))
+
+
+def write_trial_metadata(search_dir, result, config, search_info):
+    """
+    写入试验的 metadata.json（字段与 pretrain_single_route 一致，可直接用于正式训练）
+
+    Returns:
+        str: 相对 PRE_TRAINED_MODEL_DIR 的元数据路径
+    """
+    trial_dir = os.path.join(search_dir, f"trial_{result['trial_id']:03d}_r{result['rung']}")
+    os.makedirs(trial_dir, exist_ok=True)
+
+    train_metrics = result['train_metrics'] or {}
+    test_metrics = result['test_metrics'] or {}
+    metadata = {
+        "feature_columns": result['feature_columns'],
+        "date_column": 'YearMonth',
+        "target_column": 'Route_Total_Seats',
+        "time_granularity": config['time_granularity'],
+        "model_type": config['model_type'],
+        "arima_order": config.get('arima_order'),
+        "ts_feature_version": TS_FEATURE_VERSION,
+        "model_params": result['params'],
+        "feature_count": len(result['feature_columns']),
+        "training_samples": result['training_samples'],
+        "test_samples": result['test_samples'],
+        "train_mae": train_metrics.get('mae'),
+        "train_rmse": train_metrics.get('rmse'),
+        "train_mape": train_metrics.get('mape'),
+        "train_r2": train_metrics.get('r2'),
+        "test_mae": test_metrics.get('mae'),
+        "test_rmse": test_metrics.get('rmse'),
+        "test_mape": test_metrics.get('mape'),
+        "test_r2": test_metrics.get('r2'),
+        "complete_config": config,
+        "search": search_info,
+    }
+    path = os.path.join(trial_dir, "metadata.json")
+    with open(path, "w", encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    return os.path.relpath(path, PRE_TRAINED_MODEL_DIR)
+
+
+def trial_result_info(result, meta_file_path, train_start_date, train_end_date):
+    """试验结果 -> 与 pretrain_single_route 返回值相同结构的结果信息（用于构建 PretrainRecord）"""
+    train_metrics = result['train_metrics'] or {}
+    test_metrics = result['test_metrics'] or {}
+    return {
+        "meta_file_path": meta_file_path,
+        "train_start_date": train_start_date,
+        "train_end_date": train_end_date,
+        "train_duration": timedelta(seconds=result['duration']),
+        "train_mae": train_metrics.get('mae'),
+        "train_rmse": train_metrics.get('rmse'),
+        "train_mape": train_metrics.get('mape'),
+        "train_r2": train_metrics.get('r2'),
+        "test_mae": test_metrics.get('mae'),
+        "test_rmse": test_metrics.get('rmse'),
+        "test_mape": test_metrics.get('mape'),
+        "test_r2": test_metrics.get('r2'),
+        "report_pdf": '',
+    }
@@ -0,0 +1,368 @@
+"""
+模型包（单文件、带版本号）
+
+取代每个模型目录下的 model.pkl / preprocessor.pkl / feature_builder.pkl / metadata.json / latest_data.csv：
+一次打开、一次 mmap 即可得到预测所需的全部组件。
+
+文件布局（小端）：
+    [0:8]    魔数 b'AMBUNDLE'
+    [8:12]   uint32 格式版本
+    [12:20]  uint64 头部长度 H
+    [20:20+H] 头部 JSON：元数据、模型描述、预处理器/特征构建器状态、历史数据列描述、各数据段偏移
+    数据段（按 64 字节对齐，偏移相对于头部之后的第一个对齐位置）
+
+- 模型：LightGBM 为原生 Booster 文本，XGBoost 为原生 Booster 二进制（UBJSON），其他模型仍为 pickle
+- 预处理器 / 特征构建器：本包内的类展开为 JSON 状态字典，只有无法用 JSON 表示的对象
+  （statsmodels 拟合结果、StandardScaler 等）集中 pickle 到 objects 段
+- 历史数据：数值列和日期列为原始 NumPy 数组（读取时直接从 mmap 复制，无需 CSV 解析和日期重解析），
+  字符串列保存在头部 JSON 中
+- 读取完成即关闭映射，缓存中的模型不占用文件，可随时重写模型包
+"""
+import os
+import json
+import mmap
+import pickle
+import struct
+import importlib
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+
+BUNDLE_MAGIC = b'AMBUNDLE'
+BUNDLE_VERSION = 1
+BUNDLE_FILENAME = 'model.bundle'
+BUNDLE_SUFFIX = '.bundle'
+
+# 旧格式的五个文件（与 RouteModelInfo 的五个路径字段顺序一致）
+LEGACY_FILES = ('model.pkl', 'preprocessor.pkl', 'feature_builder.pkl', 'metadata.json', 'latest_data.csv')
+
+_PREFIX = struct.Struct('<8sIQ')
+_ALIGN = 64
+# 展开为 JSON 状态的类所在的包，其余对象 pickle
+_STATE_PACKAGE = 'predict.predictive_algorithm.'
+
+
+def write_on_train():
+    """正式训练是否同时写入模型包（settings.MODEL_BUNDLE['WRITE_ON_TRAIN']）"""
+    from django.conf import settings
+    conf = getattr(settings, 'MODEL_BUNDLE', {}) or {}
+    return conf.get('WRITE_ON_TRAIN', True)
+
+
+def is_bundle_path(path):
+    return str(path).endswith(BUNDLE_SUFFIX)
+
+
+def _align(n):
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+# ================== 模型封装 ==================
+
+class LightGBMBoosterModel:
+    """原生 LightGBM Booster 的预测封装，接口与 LGBMRegressor.predict 一致（batch_forecast 通过 booster_ 访问）"""
+
+    def __init__(self, booster):
+        self.booster_ = booster
+
+    def predict(self, X):
+        return self.booster_.predict(X)
+
+
+class XGBoostBoosterModel:
+    """原生 XGBoost Booster 的预测封装，接口与 XGBRegressor.predict 一致（早停模型只使用最佳迭代之前的树）"""
+
+    def __init__(self, booster, best_iteration=None):
+        self._booster = booster
+        self.best_iteration = best_iteration
+
+    def get_booster(self):
+        return self._booster
+
+    def predict(self, X):
+        iteration_range = (0, self.best_iteration + 1) if self.best_iteration is not None else (0, 0)
+        return self._booster.inplace_predict(X, iteration_range=iteration_range, validate_features=False)
+
+
+def _encode_model(model):
+    """模型 -> (描述, 数据段字节)"""
+    if isinstance(model, LightGBMBoosterModel):
+        return {'kind': 'lightgbm'}, model.booster_.model_to_string().encode('utf-8')
+    if isinstance(model, XGBoostBoosterModel):
+        return _encode_xgboost(model.get_booster(), model.best_iteration)
+
+    module = type(model).__module__
+    if module.startswith('lightgbm') and hasattr(model, 'booster_'):
+        # 未指定 num_iteration 时只保存最佳迭代（与 LGBMRegressor.predict 的默认行为一致）
+        return {'kind': 'lightgbm'}, model.booster_.model_to_string().encode('utf-8')
+    if module.startswith('xgboost') and hasattr(model, 'get_booster'):
+        try:
+            best_iteration = model.best_iteration
+        except AttributeError:
+            best_iteration = None
+        return _encode_xgboost(model.get_booster(), best_iteration)
+    return {'kind': 'pickle'}, pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _encode_xgboost(booster, best_iteration):
+    try:
+        raw, raw_format = booster.save_raw(raw_format='ubj'), 'ubj'
+    except TypeError:
+        # 旧版本 XGBoost 只支持默认二进制格式
+        raw, raw_format = booster.save_raw(), 'binary'
+    return {'kind': 'xgboost', 'format': raw_format, 'best_iteration': best_iteration}, bytes(raw)
+
+
+def _decode_model(desc, buf):
+    kind = desc['kind']
+    if kind == 'lightgbm':
+        import lightgbm as lgb
+        return LightGBMBoosterModel(lgb.Booster(model_str=bytes(buf).decode('utf-8')))
+    if kind == 'xgboost':
+        import xgboost as xgb
+        booster = xgb.Booster()
+        booster.load_model(bytearray(buf))
+        return XGBoostBoosterModel(booster, desc.get('best_iteration'))
+    if kind == 'pickle':
+        return pickle.loads(buf)
+    raise ValueError(f"未知的模型类型: {kind}")
+
+
+# ================== 对象状态 ==================
+
+def _encode_state(value, objects):
+    """对象 -> JSON 可表示的状态；无法表示的对象追加到 objects 并以 {'__pickle__': 下标} 引用"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic) and value.dtype.kind in 'biuf':
+        return value.item()
+    if isinstance(value, tuple):
+        return {'__tuple__': [_encode_state(v, objects) for v in value]}
+    if isinstance(value, list):
+        return [_encode_state(v, objects) for v in value]
+    if isinstance(value, dict) and all(isinstance(k, str) and not k.startswith('__') for k in value):
+        return {k: _encode_state(v, objects) for k, v in value.items()}
+    if isinstance(value, np.ndarray) and value.dtype.kind in 'biuf' and value.ndim == 1:
+        return {'__ndarray__': value.tolist(), 'dtype': value.dtype.str}
+
+    cls = type(value)
+    if cls.__module__.startswith(_STATE_PACKAGE) and hasattr(value, '__dict__'):
+        return {
+            '__object__': f"{cls.__module__}:{cls.__qualname__}",
+            'state': _encode_state(vars(value), objects),
+        }
+
+    objects.append(value)
+    return {'__pickle__': len(objects) - 1}
+
+
+def _decode_state(value, objects):
+    if isinstance(value, list):
+        return [_decode_state(v, objects) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if '__tuple__' in value:
+        return tuple(_decode_state(v, objects) for v in value['__tuple__'])
+    if '__pickle__' in value:
+        return objects[value['__pickle__']]
+    if '__ndarray__' in value:
+        return np.array(value['__ndarray__'], dtype=np.dtype(value['dtype']))
+    if '__object__' in value:
+        module_name, qualname = value['__object__'].split(':')
+        cls = getattr(importlib.import_module(module_name), qualname)
+        obj = cls.__new__(cls)
+        obj.__dict__.update(_decode_state(value['state'], objects))
+        return obj
+    return {k: _decode_state(v, objects) for k, v in value.items()}
+
+
+# ================== 历史数据 ==================
+
+def _json_value(v):
+    if v is None or (isinstance(v, float) and np.isnan(v)):
+        return None
+    if isinstance(v, np.generic):
+        return v.item()
+    if isinstance(v, (bool, int, float, str)):
+        return v
+    return str(v)
+
+
+def _encode_history(df, date_col, sections):
+    """历史数据 -> 列描述；数值列 / 日期列写入数据段"""
+    columns = []
+    for j, name in enumerate(df.columns):
+        s = df[name]
+        if name == date_col or pd.api.types.is_datetime64_any_dtype(s):
+            arr = pd.to_datetime(s).to_numpy(dtype='datetime64[ns]')
+        else:
+            arr = s.to_numpy()
+        if arr.dtype.kind in 'biufM':
+            key = f'history/{j}'
+            sections[key] = np.ascontiguousarray(arr).tobytes()
+            columns.append({'name': name, 'dtype': arr.dtype.str, 'section': key})
+        else:
+            columns.append({'name': name, 'values': [_json_value(v) for v in arr]})
+    return columns
+
+
+def _decode_history(columns, rows, read_array):
+    data = {}
+    for col in columns:
+        if 'section' in col:
+            data[col['name']] = read_array(col['section'], np.dtype(col['dtype']), rows)
+        else:
+            data[col['name']] = pd.Series(col['values'], dtype=object)
+    return pd.DataFrame(data, columns=[c['name'] for c in columns])
+
+
+# ================== 读写 ==================
+
+def write_bundle(path, model, preprocessor, feature_builder, metadata, latest_data):
+    """
+    写入模型包（先写临时文件再替换，读取方不会看到写了一半的文件）
+
+    Returns:
+        int: 文件大小（字节）
+    """
+    date_col = metadata.get('date_column', 'YearMonth')
+    sections = {}
+    objects = []
+
+    model_desc, sections['model'] = _encode_model(model)
+    header = {
+        'version': BUNDLE_VERSION,
+        'metadata': metadata,
+        'model': model_desc,
+        'preprocessor': _encode_state(preprocessor, objects),
+        'feature_builder': _encode_state(feature_builder, objects),
+        'history': {
+            'rows': len(latest_data),
+            'columns': _encode_history(latest_data, date_col, sections),
+        },
+    }
+    if objects:
+        sections['objects'] = pickle.dumps(objects, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # 数据段偏移（相对数据区起点）
+    offsets = {}
+    cursor = 0
+    for name, buf in sections.items():
+        offsets[name] = [cursor, len(buf)]
+        cursor = _align(cursor + len(buf))
+    header['sections'] = offsets
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    base = _align(_PREFIX.size + len(header_bytes))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.bundle-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_PREFIX.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            for name, buf in sections.items():
+                f.seek(base + offsets[name][0])
+                f.write(buf)
+            size = f.tell()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return size
+
+
+def read_bundle(path):
+    """
+    通过 mmap 读取模型包
+
+    数据段和历史数组都从映射中复制出来，返回前关闭映射：加载结果可长期留在模型缓存中，
+    不会占用文件映射（Windows 上打开的映射会使 write_bundle 的 os.replace 失败），
+    历史数据的数组也是可写的普通数组。
+
+    Returns:
+        dict: model / preprocessor / feature_builder / metadata / latest_data（与旧格式加载结果一致）
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        magic, version, header_len = _PREFIX.unpack_from(mm, 0)
+        if magic != BUNDLE_MAGIC:
+            raise ValueError(f"不是模型包文件: {path}")
+        if version > BUNDLE_VERSION:
+            raise ValueError(f"不支持的模型包版本 {version}（当前支持 {BUNDLE_VERSION}）: {path}")
+        header = json.loads(mm[_PREFIX.size:_PREFIX.size + header_len].decode('utf-8'))
+        base = _align(_PREFIX.size + header_len)
+
+        def section(name):
+            offset, length = header['sections'][name]
+            return mm[base + offset:base + offset + length]
+
+        def read_array(name, dtype, rows):
+            offset, _ = header['sections'][name]
+            # 复制出映射，临时视图随即释放，映射才能在退出 with 时关闭
+            return np.frombuffer(mm, dtype=dtype, count=rows, offset=base + offset).copy()
+
+        objects = pickle.loads(section('objects')) if 'objects' in header['sections'] else []
+        return {
+            'model': _decode_model(header['model'], section('model')),
+            'preprocessor': _decode_state(header['preprocessor'], objects),
+            'feature_builder': _decode_state(header['feature_builder'], objects),
+            'metadata': header['metadata'],
+            'latest_data': _decode_history(header['history']['columns'], header['history']['rows'], read_array),
+        }
+
+
+def read_legacy(paths):
+    """读取旧格式的五个文件：[模型, 预处理器, 特征构建器, 元数据, 原始数据]"""
+    model_path, preprocessor_path, feature_builder_path, meta_path, raw_data_path = paths
+
+    with open(model_path, "rb") as f:
+        model = pickle.load(f)
+
+    with open(preprocessor_path, "rb") as f:
+        preprocessor = pickle.load(f)
+
+    with open(feature_builder_path, "rb") as f:
+        feature_builder = pickle.load(f)
+
+    with open(meta_path, "r", encoding='utf-8') as f:
+        metadata = json.load(f)
+
+    latest_data = pd.read_csv(raw_data_path)
+    date_col = metadata.get('date_column', 'YearMonth')
+    latest_data[date_col] = pd.to_datetime(latest_data[date_col])
+
+    return {
+        'model': model,
+        'preprocessor': preprocessor,
+        'feature_builder': feature_builder,
+        'metadata': metadata,
+        'latest_data': latest_data,
+    }
+
+
+def load_artifacts(paths):
+    """按路径读取模型组件：单个 .bundle 路径为模型包，五个路径为旧格式"""
+    if len(paths) == 1 and is_bundle_path(paths[0]):
+        return read_bundle(paths[0])
+    return read_legacy(paths)
+
+
+def convert_model_dir(route_dir, overwrite=False):
+    """
+    把旧格式模型目录转换为模型包（写入 <route_dir>/model.bundle，旧文件保留）
+
+    Returns:
+        str|None: 模型包路径；目录不完整或已转换（overwrite=False）时返回 None
+    """
+    legacy = [os.path.join(route_dir, name) for name in LEGACY_FILES]
+    if not all(os.path.exists(p) for p in legacy):
+        return None
+    bundle_path = os.path.join(route_dir, BUNDLE_FILENAME)
+    if os.path.exists(bundle_path) and not overwrite:
+        return None
+
+    artifacts = read_legacy(legacy)
+    write_bundle(bundle_path, **artifacts)
+    return bundle_path
@@ -0,0 +1,167 @@
+import os
+import copy
+import threading
+from collections import OrderedDict
+
+from predict.predictive_algorithm.model_bundle import load_artifacts
+
+
+def file_signature(paths):
+    """返回文件版本签名 ((mtime_ns, size), ...) 和总大小，文件被重写后签名随之变化"""
+    signature = []
+    total = 0
+    for path in paths:
+        st = os.stat(path)
+        signature.append((st.st_mtime_ns, st.st_size))
+        total += st.st_size
+    return tuple(signature), total
+
+
+class ModelArtifactCache:
+    """
+    进程内模型文件缓存（LRU）
+
+    - 键：model_id；版本：模型包或五个文件的 (mtime, size)，文件被重写后自动失效
+    - 同时受条目数和字节数（按磁盘文件大小估算）两个上限约束
+    - 命中时直接返回内存中的对象，跳过磁盘读取和反序列化
+    """
+    def __init__(self, max_entries=256, max_bytes=512 * 1024 * 1024):
+        """
+        Args:
+            max_entries (int): 最多缓存的模型数
+            max_bytes (int): 缓存文件总大小上限（字节），<=0 表示不限制
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # model_id -> entry
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _load_from_disk(paths):
+        """从磁盘加载模型组件（单个 .bundle 模型包或旧格式的五个文件）"""
+        return load_artifacts(paths)
+
+    @staticmethod
+    def _checkout(artifacts):
+        """
+        返回可供单次预测使用的副本：
+        预测过程会修改预处理器/特征构建器的状态和历史数据，只有模型本身可以共享
+        """
+        # 已拟合的尾部外推模型只读，各副本共享，避免每次深拷贝 statsmodels 结果
+        preprocessor = artifacts['preprocessor']
+        tail_models = getattr(preprocessor, 'tail_models', None)
+        memo = {id(tail_models): tail_models} if tail_models is not None else {}
+        return {
+            'model': artifacts['model'],
+            'preprocessor': copy.deepcopy(preprocessor, memo),
+            'feature_builder': copy.copy(artifacts['feature_builder']),
+            'metadata': copy.deepcopy(artifacts['metadata']),
+            'latest_data': artifacts['latest_data'].copy(),
+        }
+
+    def get(self, model_id, paths):
+        """
+        获取模型组件（命中缓存则不读磁盘）
+
+        Args:
+            model_id (str): 模型ID
+            paths (list): [模型, 预处理器, 特征构建器, 元数据, 原始数据] 文件绝对路径
+        Returns:
+            dict: model / preprocessor / feature_builder / metadata / latest_data
+        """
+        signature, nbytes = file_signature(paths)
+
+        with self._lock:
+            entry = self._entries.get(model_id)
+            if entry is not None and entry['signature'] == signature:
+                self._entries.move_to_end(model_id)
+                self.hits += 1
+                return self._checkout(entry['artifacts'])
+            self.misses += 1
+
+        artifacts = self._load_from_disk(paths)
+
+        with self._lock:
+            old = self._entries.pop(model_id, None)
+            if old is not None:
+                self._total_bytes -= old['nbytes']
+            # 超过单条字节上限的模型不进入缓存
+            if self.max_bytes <= 0 or nbytes <= self.max_bytes:
+                self._entries[model_id] = {
+                    'signature': signature,
+                    'nbytes': nbytes,
+                    'artifacts': artifacts,
+                }
+                self._total_bytes += nbytes
+                self._evict()
+
+        return self._checkout(artifacts)
+
+    def _evict(self):
+        """按 LRU 顺序淘汰，直到满足条目数和字节数上限（调用方持有锁）"""
+        while self._entries and (
+                len(self._entries) > self.max_entries or
+                (self.max_bytes > 0 and self._total_bytes > self.max_bytes)):
+            _, entry = self._entries.popitem(last=False)
+            self._total_bytes -= entry['nbytes']
+            self.evictions += 1
+
+    def invalidate(self, model_id=None):
+        """
+        使缓存失效
+
+        Args:
+            model_id (str): 指定模型ID；为 None 时清空全部
+        Returns:
+            int: 被移除的条目数
+        """
+        with self._lock:
+            if model_id is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._total_bytes = 0
+                return removed
+            entry = self._entries.pop(model_id, None)
+            if entry is None:
+                return 0
+            self._total_bytes -= entry['nbytes']
+            return 1
+
+    def stats(self):
+        """返回缓存统计信息"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'total_bytes': self._total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'model_ids': list(self._entries.keys()),
+            }
+
+
+_artifact_cache = None
+_artifact_cache_lock = threading.Lock()
+
+
+def get_artifact_cache():
+    """获取进程级模型缓存单例，容量读取 settings.MODEL_ARTIFACT_CACHE"""
+    global _artifact_cache
+    if _artifact_cache is None:
+        with _artifact_cache_lock:
+            if _artifact_cache is None:
+                from django.conf import settings
+                conf = getattr(settings, 'MODEL_ARTIFACT_CACHE', {}) or {}
+                _artifact_cache = ModelArtifactCache(
+                    max_entries=conf.get('MAX_ENTRIES', 256),
+                    max_bytes=conf.get('MAX_BYTES', 512 * 1024 * 1024),
+                )
+    return _artifact_cache
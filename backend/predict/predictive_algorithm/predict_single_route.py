@@ -1,10 +1,11 @@
 import os
-import pickle
-import json
 import pandas as pd
 import numpy as np
 
 from predict.models import RouteModelInfo
+from predict.predictive_algorithm.model_cache import get_artifact_cache
+from predict.predictive_algorithm.model_bundle import is_bundle_path
+from predict.predictive_algorithm.recursive_forecast import RecursiveForecaster, ts_refit_every
 
 import warnings
 warnings.filterwarnings("ignore")
@@ -30,15 +31,40 @@ def _fmt_label(dt_like, granularity: str) -> str:
         return f"{d.year}-Q{q}"
     return d.strftime("%Y-%m")
 
-def predict_single_route(prediction_request):
+def existing_models_dir():
+    """正式模型根目录（RouteModelInfo 中的文件路径相对于该目录）"""
+    # 构建根目录路径 - 使用更可靠的路径构建方法
+    current_dir = os.path.dirname(os.path.abspath(__file__))  # backend/predict/predictive_algorithm/
+    return os.path.join(os.path.dirname(os.path.dirname(current_dir)),'AirlineModels', 'Existing_Models')
+
+
+def model_file_paths(model_info):
     """
-    执行单个预测请求
+    模型文件绝对路径：model_file_path 为模型包（.bundle）时只有该文件，
+    否则为旧格式的五个文件 [模型, 预处理器, 特征构建器, 元数据, 原始数据]
+    """
+    base_dir = existing_models_dir()
+    if is_bundle_path(model_info.model_file_path):
+        return [os.path.join(base_dir, model_info.model_file_path)]
+    return [
+        os.path.join(base_dir, model_info.model_file_path),
+        os.path.join(base_dir, model_info.preprocessor_file_path),
+        os.path.join(base_dir, model_info.feature_builder_file_path),
+        os.path.join(base_dir, model_info.meta_file_path),
+        os.path.join(base_dir, model_info.raw_data_file_path),
+    ]
+
+
+def load_forecast_context(prediction_request):
+    """
+    校验预测请求并加载模型组件，计算未来时间点
 
     Args:
         prediction_request: 包含预测参数的字典
 
     Returns:
-        包含模型信息和预测结果的字典
+        dict: model_info / model_files / model / preprocessor / feature_builder / metadata / latest_data /
+              date_col / feature_cols / target_col / time_granularity / future_dates
     """
 
     origin_airport = prediction_request['origin_airport'].upper()
@@ -47,11 +73,13 @@ def predict_single_route(prediction_request):
     prediction_periods = prediction_request['prediction_periods']
     model_id = prediction_request['model_id']
 
-    # 从数据库获取模型信息
-    try:
-        model_info = RouteModelInfo.objects.get(model_id=model_id)
-    except RouteModelInfo.DoesNotExist:
-        raise Exception(f"未找到模型ID: {model_id}")
+    # 从数据库获取模型信息（批量预测时可直接传入已查询的记录）
+    model_info = prediction_request.get('model_info')
+    if model_info is None:
+        try:
+            model_info = RouteModelInfo.objects.get(model_id=model_id)
+        except RouteModelInfo.DoesNotExist:
+            raise Exception(f"未找到模型ID: {model_id}")
 
     # 验证模型是否匹配请求的航线和时间粒度
     if (model_info.origin_airport != origin_airport or
@@ -59,42 +87,23 @@ def predict_single_route(prediction_request):
             model_info.time_granularity != time_granularity):
         raise Exception(f"模型 {model_id} 与请求的航线或时间粒度不匹配")
 
-    # 构建根目录路径 - 使用更可靠的路径构建方法
-    current_dir = os.path.dirname(os.path.abspath(__file__))  # backend/predict/predictive_algorithm/
-    base_dir = os.path.join(os.path.dirname(os.path.dirname(current_dir)),'AirlineModels', 'Existing_Models')
-
     # 加载模型文件
-    model_file_path = os.path.join(base_dir, model_info.model_file_path)
-    preprocessor_file_path = os.path.join(base_dir, model_info.preprocessor_file_path)
-    feature_builder_file_path = os.path.join(base_dir, model_info.feature_builder_file_path)
-    meta_file_path = os.path.join(base_dir, model_info.meta_file_path)
-    raw_data_file_path = os.path.join(base_dir, model_info.raw_data_file_path)
+    required_files = model_file_paths(model_info)
 
     # 检查文件是否存在
-    required_files = [model_file_path, preprocessor_file_path, feature_builder_file_path,
-                      meta_file_path, raw_data_file_path]
     for file_path in required_files:
         if not os.path.exists(file_path):
             raise Exception(f"文件不存在: {file_path}")
 
     try:
-        # 加载模型组件
-        with open(model_file_path, "rb") as f:
-            model = pickle.load(f)
-
-        with open(preprocessor_file_path, "rb") as f:
-            preprocessor = pickle.load(f)
-
-        with open(feature_builder_file_path, "rb") as f:
-            feature_builder = pickle.load(f)
-
-        with open(meta_file_path, "r", encoding='utf-8') as f:
-            metadata = json.load(f)
-
-        # 加载原始数据
-        latest_data = pd.read_csv(raw_data_file_path)
+        # 加载模型组件（优先走进程内缓存，文件变化时自动重新加载）
+        artifacts = get_artifact_cache().get(model_id, required_files)
+        model = artifacts['model']
+        preprocessor = artifacts['preprocessor']
+        feature_builder = artifacts['feature_builder']
+        metadata = artifacts['metadata']
+        latest_data = artifacts['latest_data']
         date_col = metadata.get('date_column', 'YearMonth')
-        latest_data[date_col] = pd.to_datetime(latest_data[date_col])
 
     except Exception as e:
         import traceback
@@ -135,10 +144,8 @@ def predict_single_route(prediction_request):
         while last_complete_date.month != 12:
             last_complete_date -= pd.DateOffset(months=1)
 
-    # 执行预测
-    future_preds = []
-    current_data = latest_data.copy()
-
+    # 生成未来时间点
+    future_dates = []
     for i in range(adjusted_periods):
         # 计算下一个时间点
         if time_granularity == 'monthly':
@@ -149,35 +156,46 @@ def predict_single_route(prediction_request):
             offset = pd.DateOffset(years=1)
 
         next_date = last_complete_date + offset
+        future_dates.append(next_date)
+        last_complete_date = next_date
 
-        # 创建新的数据行
-        next_row = {date_col: next_date}
-        for col in current_data.columns:
-            if col != date_col:
-                next_row[col] = np.nan
-
-        # 添加新行并处理
-        current_data = pd.concat([current_data, pd.DataFrame([next_row])], ignore_index=True)
-        current_data = preprocessor.fit_transform(current_data)
-        current_data = feature_builder.fit_transform(current_data)
-
-        # 预测
-        latest_input = current_data.iloc[[-1]][feature_cols]
-        # print(latest_input["O_GDP"])
-        # print(latest_input["D_GDP"])
-        # print(prediction_request.get('economic_tail_method'))
-        # print(prediction_request.get('economic_growth_rate'))
-        next_pred = model.predict(latest_input)[0]
-
-        # 更新数据
-        current_data.loc[current_data.index[-1], target_col] = next_pred
-
-        future_preds.append({
-            'YearMonth': next_date,
-            'Predicted': next_pred
-        })
+    return {
+        'model_info': model_info,
+        'model_files': required_files,
+        'model': model,
+        'preprocessor': preprocessor,
+        'feature_builder': feature_builder,
+        'metadata': metadata,
+        'latest_data': latest_data,
+        'date_col': date_col,
+        'feature_cols': feature_cols,
+        'target_col': target_col,
+        'time_granularity': time_granularity,
+        'future_dates': future_dates,
+    }
 
-        last_complete_date = next_date
+
+def build_forecast_response(context, predictions):
+    """
+    组装预测返回结果（模型信息 + 历史数据 + 未来预测）
+
+    Args:
+        context: load_forecast_context 的结果
+        predictions: 与 context['future_dates'] 对应的预测值
+    """
+    model_info = context['model_info']
+    metadata = context['metadata']
+    latest_data = context['latest_data']
+    date_col = context['date_col']
+    feature_cols = context['feature_cols']
+    target_col = context['target_col']
+    time_granularity = context['time_granularity']
+    future_dates = context['future_dates']
+
+    future_preds = [
+        {'YearMonth': d, 'Predicted': p}
+        for d, p in zip(future_dates, predictions)
+    ]
 
     future_df = pd.DataFrame(future_preds)
 
@@ -227,4 +245,30 @@ def predict_single_route(prediction_request):
             'historical_data': historical_data,
             'future_predictions': future_predictions
         }
-    }
\ No newline at end of file
+    }
+
+
+def predict_single_route(prediction_request):
+    """
+    执行单个预测请求
+
+    Args:
+        prediction_request: 包含预测参数的字典
+
+    Returns:
+        包含模型信息和预测结果的字典
+    """
+    context = load_forecast_context(prediction_request)
+
+    # 执行预测：历史只预处理一次，每步只扩展尾部行和滞后特征；TS_Forecast 默认冻结训练时的时间序列模型
+    forecaster = RecursiveForecaster(
+        model=context['model'],
+        preprocessor=context['preprocessor'],
+        feature_builder=context['feature_builder'],
+        feature_cols=context['feature_cols'],
+        target_col=context['target_col'],
+        date_col=context['date_col'],
+        ts_refit_every=ts_refit_every()
+    )
+    predictions = forecaster.forecast(context['latest_data'], context['future_dates'])
+    return build_forecast_response(context, predictions)
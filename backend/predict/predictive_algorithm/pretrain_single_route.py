@@ -14,11 +14,12 @@ from reportlab.lib.units import inch
 from reportlab.lib import colors
 
 from .time_granularity import TimeGranularityController
-from .TS_model import ARIMAModel
+from .TS_model import ARIMAModel, TS_FEATURE_VERSION
 from .model_evaluation import ModelEvaluator
 from .FeatureEngineer import DataPreprocessor, FeatureBuilder, AirlineRouteModel
 from .create_model import get_model, get_default_config, merge_model_params
 from .field_mapping import get_field_mapping, get_special_fields
+from .route_store import market_records_to_dataframe, load_route, store_enabled
 
 # Django相关导入
 import django
@@ -29,6 +30,23 @@ django.setup()
 
 from predict.models import FlightMarketRecord
 
+
+class TrainingCancelled(Exception):
+    """训练任务被请求取消（由进度回调抛出，训练函数不吞掉该异常）"""
+    pass
+
+
+def report_progress(progress_callback, progress, message):
+    """
+    上报训练进度
+
+    :param progress_callback: 回调函数 callback(progress, message)，为 None 时忽略
+    :param progress: 进度（0-100）
+    :param message: 当前阶段说明
+    """
+    if progress_callback is not None:
+        progress_callback(progress, message)
+
 import warnings
 
 warnings.filterwarnings("ignore")
@@ -46,6 +64,13 @@ def load_data_from_database(origin, destination):
     :return: DataFrame，列名为原CSV的列名
     """
     try:
+        # 优先读取列式存储（无 ORM / Decimal 转换开销），缺失时回退到数据库
+        if store_enabled():
+            df = load_route(origin, destination)
+            if df is not None and not df.empty:
+                print(f"从列式存储加载了 {len(df)} 条记录")
+                return df
+
         print("从数据库加载数据...")
         
         # 从数据库查询数据
@@ -59,42 +84,13 @@ def load_data_from_database(origin, destination):
             return None
         
         # 转换为DataFrame
-        df = pd.DataFrame(list(queryset))
+        df = market_records_to_dataframe(list(queryset))
         
         if df.empty:
             print(f"! 航线 {origin}-{destination} 数据为空")
             return None
         
         print(f"从数据库加载了 {len(df)} 条记录")
-        
-        # 从配置文件获取字段名映射
-        field_to_csv_mapping = get_field_mapping()
-        special_fields = get_special_fields()
-        
-        # 重命名列
-        df = df.rename(columns=field_to_csv_mapping)
-        
-        # 处理特殊字段
-        for field_name, field_config in special_fields.items():
-            if field_config['type'] == 'boolean_to_int':
-                csv_column = field_to_csv_mapping.get(field_name)
-                if csv_column in df.columns:
-                    df[csv_column] = df[csv_column].astype(int)
-                    print(f"处理特殊字段: {field_name} -> {csv_column} (布尔转整数)")
-        
-        # 数据类型转换：确保数值字段为float类型，避免decimal.Decimal类型问题
-        numeric_columns = []
-        for col in df.columns:
-            if col not in ['YearMonth', 'Origin', 'Destination', 'Equipment', 'International Flight', 'Region']:
-                try:
-                    # 尝试转换为数值类型
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-                    numeric_columns.append(col)
-                except:
-                    # 如果转换失败，保持原类型
-                    pass
-        
-        print(f"数据类型转换完成，转换了 {len(numeric_columns)} 个数值列")
         print("数据字段名映射完成")
         return df
         
@@ -105,6 +101,46 @@ def load_data_from_database(origin, destination):
         return None
 
 
+def load_routes_from_database(routes, chunk_size=200):
+    """
+    批量加载多条航线的数据（每 chunk_size 条航线一次查询）
+
+    :param routes: [(origin, destination), ...]
+    :param chunk_size: 每次查询包含的航线数
+    :return: {(origin, destination): DataFrame}，无数据的航线不出现在结果中
+    """
+    from django.db.models import Q
+
+    routes = list(dict.fromkeys(routes))
+    total = len(routes)
+    route_frames = {}
+
+    # 列式存储中已有的航线直接读取，其余从数据库批量查询
+    if store_enabled():
+        for origin, destination in routes:
+            df = load_route(origin, destination)
+            if df is not None and not df.empty:
+                route_frames[(origin, destination)] = df
+        routes = [r for r in routes if r not in route_frames]
+
+    for i in range(0, len(routes), chunk_size):
+        chunk = routes[i:i + chunk_size]
+        condition = Q()
+        for origin, destination in chunk:
+            condition |= Q(origin=origin, destination=destination)
+
+        records = list(FlightMarketRecord.objects.filter(condition).values())
+        if not records:
+            continue
+
+        df = market_records_to_dataframe(records)
+        for (origin, destination), group in df.groupby(['Origin', 'Destination'], sort=False):
+            route_frames[(origin, destination)] = group.reset_index(drop=True)
+
+    print(f"批量加载 {total} 条航线，其中 {len(route_frames)} 条有数据")
+    return route_frames
+
+
 def generate_model_report(route_dir, origin, destination, time_granularity, model_type, 
                          train_metrics, test_metrics, training_samples, test_samples, 
                          feature_count, train_start_date, train_end_date, train_duration):
@@ -248,13 +284,15 @@ def generate_model_report(route_dir, origin, destination, time_granularity, mode
         return None
 
 
-def pretrain_single_route(origin, destination, config):
+def pretrain_single_route(origin, destination, config, progress_callback=None, route_data=None):
     """
     训练单条航线的完整流程
 
     :param origin: 起始机场代码 (如 'CAN')
     :param destination: 目标机场代码 (如 'PEK')
     :param config: 配置字典
+    :param progress_callback: 进度回调 callback(progress, message)，可抛出 TrainingCancelled 中止训练
+    :param route_data: 已加载的航线数据（批量训练时传入，避免逐条查询数据库）
     :return: 训练状态 (成功/失败) 和结果信息
     """
 
@@ -310,7 +348,11 @@ def pretrain_single_route(origin, destination, config):
     try:
         # 从数据库加载数据
         # print("从数据库加载数据...")
-        domestic = load_data_from_database(origin, destination)
+        report_progress(progress_callback, 10, "加载航线数据")
+        if route_data is not None:
+            domestic = route_data
+        else:
+            domestic = load_data_from_database(origin, destination)
         
         if domestic is None:
             print(f"! 无法从数据库加载航线 {origin}-{destination} 的数据")
@@ -357,6 +399,7 @@ def pretrain_single_route(origin, destination, config):
 
         # 准备数据
         # print("准备训练和测试数据...")
+        report_progress(progress_callback, 30, "构建训练特征")
         X_train, y_train, X_test, y_test, data_with_features = route_processor.prepare_data(
             origin=origin,
             destination=destination,
@@ -378,6 +421,7 @@ def pretrain_single_route(origin, destination, config):
 
         # 训练模型
         print(f"训练 {model_type.upper()} 模型...")
+        report_progress(progress_callback, 50, "训练模型")
         
         # 根据模型类型选择相应的参数
         if model_type == "lgb":
@@ -389,6 +433,7 @@ def pretrain_single_route(origin, destination, config):
         model.fit(X_train, y_train)
 
         # 评估模型性能...")
+        report_progress(progress_callback, 70, "评估模型")
         train_preds = model.predict(X_train)
         train_evaluator = ModelEvaluator(y_train, train_preds)
 
@@ -425,6 +470,7 @@ def pretrain_single_route(origin, destination, config):
             "time_granularity": time_granularity,
             "model_type": model_type,
             "arima_order": arima_order,
+            "ts_feature_version": TS_FEATURE_VERSION,
             "model_params": model_params,
             # "last_complete_date": data_with_features_full[route_processor.date_col].max().strftime('%Y-%m-%d'),
             "feature_count": len(X_train.columns),
@@ -451,6 +497,7 @@ def pretrain_single_route(origin, destination, config):
         
         # 生成PDF报告
         print("生成PDF报告...")
+        report_progress(progress_callback, 90, "生成PDF报告")
         report_pdf_path = generate_model_report(
             route_dir=route_dir,
             origin=origin,
@@ -497,6 +544,10 @@ def pretrain_single_route(origin, destination, config):
 
         return True, result_info
 
+    except TrainingCancelled:
+        # 取消不视为训练失败，交由任务执行方处理
+        raise
+
     except Exception as e:
         print(f"! 航线 {origin}-{destination} 训练失败: {str(e)}")
         import traceback
@@ -0,0 +1,319 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+# ================== 时间键解析（向量化） ==================
+
+def quarter_periods(values):
+    """'YYYY-Qn' / 日期 → 季度 Period 序列（无法解析为 NaT，保留原索引）"""
+    s = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.dt.to_period('Q')
+    text = s.astype(str)
+    m = text.str.extract(r'^(\d{4})-Q([1-4])$')
+    # 与 _q_to_ts 一致：'YYYY-Qn' 取该季度末月的1号
+    end_month = (pd.to_numeric(m[1], errors='coerce') * 3).astype('Int64').astype(str)
+    ts = pd.to_datetime(m[0] + '-' + end_month + '-01', errors='coerce', format='%Y-%m-%d')
+    # 非 'YYYY-Qn' 格式按日期解析
+    others = m[0].isna() & s.notna()
+    if others.any():
+        ts[others] = pd.to_datetime(text[others], errors='coerce')
+    return ts.dt.to_period('Q')
+
+
+# ================== MinT 块结构求解 ==================
+
+def build_summing_matrix(group_codes, n_groups):
+    """
+    构建稀疏汇总矩阵 S（n_groups × n_bottom）：S[g, j] = 1 表示底层序列 j 属于上层节点 g
+
+    Args:
+        group_codes (np.ndarray): 每个底层值所属上层节点编号，-1 表示不属于任何节点
+        n_groups (int): 上层节点数
+    """
+    group_codes = np.asarray(group_codes)
+    cols = np.flatnonzero(group_codes >= 0)
+    return sparse.csr_matrix(
+        (np.ones(len(cols)), (group_codes[cols], cols)),
+        shape=(n_groups, len(group_codes))
+    )
+
+
+def mint_block_reconcile(y_bottom, group_codes, y_top, bottom_weights=None, top_weights=None):
+    """
+    块结构（每个底层值只属于一个上层节点）下 MinT 的闭式解
+
+    对角权重 Λ 下，每个上层节点 g 的调整量只依赖本节点：
+        b_j = y_j + w_j / (λ_g + Σ_{k∈g} w_k) · (y_g - Σ_{k∈g} y_k)
+    - λ_g = 0：上层预测视为硬约束（OLS / WLS 投影）
+    - λ_g > 0：上层预测也参与加权（结构缩放 λ_g = 节点包含的底层数）
+
+    Args:
+        y_bottom (np.ndarray): 底层预测（n_bottom）
+        group_codes (np.ndarray): 底层值所属上层节点编号（-1 不调整）
+        y_top (np.ndarray): 上层预测（n_groups）
+        bottom_weights (np.ndarray): 底层方差权重，默认全 1
+        top_weights (np.ndarray): 上层方差权重，默认全 0
+    Returns:
+        np.ndarray: 对齐后的底层值
+    """
+    y_bottom = np.asarray(y_bottom, dtype=float)
+    y_top = np.asarray(y_top, dtype=float)
+    group_codes = np.asarray(group_codes)
+    n_groups = len(y_top)
+
+    w = np.ones_like(y_bottom) if bottom_weights is None else np.asarray(bottom_weights, dtype=float)
+    lam = np.zeros(n_groups) if top_weights is None else np.asarray(top_weights, dtype=float)
+
+    S = build_summing_matrix(group_codes, n_groups)
+    gap = y_top - S @ y_bottom
+    denom = lam + S @ w
+    with np.errstate(divide='ignore', invalid='ignore'):
+        share = np.where(denom > 0, gap / denom, 0.0)
+
+    valid = group_codes >= 0
+    y_rec = y_bottom.copy()
+    y_rec[valid] += w[valid] * share[group_codes[valid]]
+    return y_rec
+
+
+def mint_dense_reconcile(y_bottom, group_codes, y_top, W):
+    """
+    一般协方差 W（非对角）下的 MinT 投影：b = y + W Sᵀ (S W Sᵀ)⁺ (y_top - S y)
+
+    S 为稀疏矩阵，只需对 n_groups × n_groups 的矩阵求伪逆
+    """
+    y_bottom = np.asarray(y_bottom, dtype=float)
+    y_top = np.asarray(y_top, dtype=float)
+    S = build_summing_matrix(group_codes, len(y_top))
+    SW = S @ np.asarray(W, dtype=float)          # n_groups × n_bottom
+    SWS = S @ SW.T                               # W 对称：S (S W)ᵀ = S W Sᵀ
+    return y_bottom + SW.T @ (np.linalg.pinv(SWS) @ (y_top - S @ y_bottom))
+
+
+# ================== 多航线批量对齐 ==================
+
+MINT_METHODS = ('ols', 'wls', 'structural')
+
+
+def mint_reconcile_batch(monthly, quarterly, key_cols=(), method='ols', variance_col=None,
+                         adjust_sets=('Future', 'Test')):
+    """
+    多航线月度 → 季度 MinT 批量对齐（一次向量化计算）
+
+    Args:
+        monthly (pd.DataFrame): key_cols + YearMonth('YYYY-MM'/日期) + Predicted + Set
+        quarterly (pd.DataFrame): key_cols + YearMonth('YYYY-Qn'/日期) + Predicted
+        key_cols (tuple): 航线键列（如 ('Origin', 'Destination') 或 ('task_index',)），为空表示单条航线
+        method (str): ols（等权） / wls（按 variance_col 方差加权） / structural（结构缩放，季度预测也参与加权）
+        variance_col (str): method='wls' 时月度表中的方差列
+        adjust_sets (tuple): 需要调整的 Set 取值，其余行保持原值
+    Returns:
+        pd.DataFrame: monthly 副本，YearMonth 转为日期，新增 quarter、Predicted_Reconciled 列
+    """
+    if method not in MINT_METHODS:
+        raise ValueError(f"method 必须是 {', '.join(MINT_METHODS)} 之一")
+    key_cols = list(key_cols)
+
+    rm = monthly.copy()
+    rm['YearMonth'] = pd.to_datetime(rm['YearMonth'], errors='coerce', format='%Y-%m') \
+        if not pd.api.types.is_datetime64_any_dtype(rm['YearMonth']) else rm['YearMonth']
+    month_q = rm['YearMonth'].dt.to_period('Q')
+    rm['quarter'] = month_q.dt.to_timestamp()
+
+    rq = quarterly[key_cols + ['YearMonth', 'Predicted']].copy()
+    rq['quarter_p'] = quarter_periods(rq['YearMonth'])
+    rq['Predicted'] = pd.to_numeric(rq['Predicted'], errors='coerce')
+    rq = rq.dropna(subset=['quarter_p'])
+
+    predicted = pd.to_numeric(rm['Predicted'], errors='coerce')
+    if rq.empty or rm.empty:
+        rm['Predicted_Reconciled'] = predicted
+        return rm
+
+    # 上层节点：(航线键, 季度)
+    q_total = rq.groupby(key_cols + ['quarter_p'], sort=False)['Predicted'].sum()
+    if key_cols:
+        month_keys = pd.MultiIndex.from_frame(
+            rm[key_cols].reset_index(drop=True).assign(quarter_p=month_q.array)
+        )
+    else:
+        month_keys = pd.Index(month_q)
+    codes = q_total.index.get_indexer(month_keys)
+
+    y_bottom = predicted.fillna(0.0).to_numpy(dtype=float)
+    y_top = q_total.to_numpy(dtype=float)
+
+    bottom_weights = None
+    top_weights = None
+    if method == 'wls':
+        if not variance_col or variance_col not in rm.columns:
+            raise ValueError("method='wls' 需要提供 variance_col")
+        bottom_weights = pd.to_numeric(rm[variance_col], errors='coerce').to_numpy(dtype=float)
+        bottom_weights = np.where(np.isfinite(bottom_weights) & (bottom_weights > 0), bottom_weights, 1.0)
+    elif method == 'structural':
+        # 结构缩放：λ_g = 节点包含的月份数，底层月份 λ = 1
+        top_weights = np.bincount(codes[codes >= 0], minlength=len(y_top)).astype(float)
+
+    y_rec = mint_block_reconcile(y_bottom, codes, y_top, bottom_weights, top_weights)
+
+    mask = (codes >= 0) & rm['Set'].isin(list(adjust_sets)).to_numpy()
+    rm['Predicted_Reconciled'] = np.where(mask, y_rec, predicted.to_numpy(dtype=float))
+    return rm
+
+
+# ================== 线性对齐（批量） ==================
+
+def linear_reconcile_batch(monthly, quarterly, key_cols=(), adjust_sets=('Future',)):
+    """
+    多航线月度 → 季度线性校准（一次 groupby 完成）
+
+    每条航线在公共季度上拟合 quarterly_sum = a + b · monthly_sum（与 LinearRegression 等价的闭式解），
+    再按 adjusted / monthly_sum 的比例缩放 adjust_sets 中的月度预测，历史不动。
+
+    Args:
+        monthly (pd.DataFrame): key_cols + YearMonth + Predicted + Set
+        quarterly (pd.DataFrame): key_cols + YearMonth('YYYY-Qn'/日期) + Predicted
+        key_cols (tuple): 航线键列，为空表示单条航线
+        adjust_sets (tuple): 需要调整的 Set 取值
+    Returns:
+        pd.DataFrame: monthly 副本，新增 quarter / monthly_sum / adjusted / adjust_ratio / Predicted_Reconciled
+    """
+    key_cols = list(key_cols)
+    rm = monthly.copy()
+    rm['YearMonth'] = pd.to_datetime(rm['YearMonth'], errors='coerce', format='%Y-%m') \
+        if not pd.api.types.is_datetime64_any_dtype(rm['YearMonth']) else rm['YearMonth']
+    rm['Predicted'] = pd.to_numeric(rm['Predicted'], errors='coerce')
+    rm['quarter_p'] = rm['YearMonth'].dt.to_period('Q')
+    rm['quarter'] = rm['quarter_p'].dt.to_timestamp()
+
+    rq = quarterly[key_cols + ['YearMonth', 'Predicted']].copy()
+    rq['quarter_p'] = quarter_periods(rq['YearMonth'])
+    rq['Predicted'] = pd.to_numeric(rq['Predicted'], errors='coerce')
+
+    group_keys = key_cols + ['quarter_p']
+    monthly_q = rm.groupby(group_keys)['Predicted'].sum().rename('monthly_sum').reset_index()
+    quarterly_q = rq.groupby(group_keys)['Predicted'].sum().rename('quarterly_sum').reset_index()
+    merged = monthly_q.merge(quarterly_q, on=group_keys, how='inner')
+
+    if merged.empty:
+        # 无公共季度 -> 不调整
+        rm['Predicted_Reconciled'] = rm['Predicted']
+        return rm.drop(columns=['quarter_p'])
+
+    # 每条航线的一元线性回归闭式解：b = Sxy / Sxx（Sxx=0 时 b=0），a = ȳ - b·x̄
+    if key_cols:
+        grouped = merged.groupby(key_cols)
+        x_mean = grouped['monthly_sum'].transform('mean')
+        y_mean = grouped['quarterly_sum'].transform('mean')
+    else:
+        x_mean = merged['monthly_sum'].mean()
+        y_mean = merged['quarterly_sum'].mean()
+    merged['_xc'] = merged['monthly_sum'] - x_mean
+    merged['_sxy'] = merged['_xc'] * (merged['quarterly_sum'] - y_mean)
+    merged['_sxx'] = merged['_xc'] ** 2
+    merged['_xm'] = x_mean
+    merged['_ym'] = y_mean
+
+    if key_cols:
+        coef = merged.groupby(key_cols).agg(
+            sxy=('_sxy', 'sum'), sxx=('_sxx', 'sum'), x_mean=('_xm', 'first'), y_mean=('_ym', 'first')
+        ).reset_index()
+    else:
+        coef = pd.DataFrame({
+            'sxy': [merged['_sxy'].sum()], 'sxx': [merged['_sxx'].sum()],
+            'x_mean': [x_mean], 'y_mean': [y_mean]
+        })
+    sxx = coef['sxx'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(sxx > 1e-12 * np.maximum(1.0, coef['x_mean'].to_numpy(dtype=float) ** 2),
+                         coef['sxy'].to_numpy(dtype=float) / sxx, 0.0)
+    coef['slope'] = slope
+    coef['intercept'] = coef['y_mean'] - coef['slope'] * coef['x_mean']
+
+    # 对航线的全部月度季度求校准值
+    if key_cols:
+        monthly_q = monthly_q.merge(coef[key_cols + ['slope', 'intercept']], on=key_cols, how='left')
+    else:
+        monthly_q['slope'] = coef['slope'].iloc[0]
+        monthly_q['intercept'] = coef['intercept'].iloc[0]
+    monthly_q['adjusted'] = monthly_q['intercept'] + monthly_q['slope'] * monthly_q['monthly_sum']
+
+    rm = rm.merge(monthly_q[group_keys + ['monthly_sum', 'adjusted']], on=group_keys, how='left')
+
+    # 防零/NaN
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = rm['adjusted'].to_numpy(dtype=float) / rm['monthly_sum'].to_numpy(dtype=float)
+    ratio[~np.isfinite(ratio)] = 1.0
+    rm['adjust_ratio'] = ratio
+
+    mask = rm['Set'].isin(list(adjust_sets)).to_numpy()
+    predicted = rm['Predicted'].to_numpy(dtype=float)
+    rm['Predicted_Reconciled'] = np.where(mask, predicted * ratio, predicted)
+    return rm.drop(columns=['quarter_p'])
+
+
+# ================== 季度 → 年度聚合（批量） ==================
+
+def _parse_quarter_points(df, key_cols):
+    """解析 time_point('YYYY-Qn') 为 year / q 两列，丢弃无法解析的行"""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=key_cols + ['year', 'q', 'value'])
+    m = df['time_point'].astype(str).str.extract(r'^(\d{4})-Q([1-4])$')
+    out = df[key_cols].copy()
+    out['year'] = pd.to_numeric(m[0], errors='coerce')
+    out['q'] = pd.to_numeric(m[1], errors='coerce')
+    out['value'] = pd.to_numeric(df['value'], errors='coerce')
+    return out.dropna(subset=['year', 'q'])
+
+
+def aggregate_quarterly_to_year_batch(hist_q, fut_q, key_cols=()):
+    """
+    多航线季度 → 年度聚合（规则同 aggregate_quarterly_to_year_by_blocks）
+
+    1) 合并历史与未来季度，同一季度以未来为准
+    2) 仅保留 4 个季度齐全的年份
+    3) 每条航线最后 K 年为预测年，K = floor(该航线未来季度数 / 4)
+
+    Args:
+        hist_q (pd.DataFrame): key_cols + time_point('YYYY-Qn') + value
+        fut_q (pd.DataFrame): 同上
+        key_cols (tuple): 航线键列
+    Returns:
+        pd.DataFrame: key_cols + year(int) + value(int) + is_future(bool)，按航线、年份排序
+    """
+    key_cols = list(key_cols)
+    H = _parse_quarter_points(hist_q, key_cols)
+    F = _parse_quarter_points(fut_q, key_cols)
+    empty = pd.DataFrame(columns=key_cols + ['year', 'value', 'is_future'])
+
+    # 去掉 H 中与 F 重叠的季度（反连接）
+    if not H.empty and not F.empty:
+        overlap = H.merge(F[key_cols + ['year', 'q']].drop_duplicates(), on=key_cols + ['year', 'q'],
+                          how='left', indicator=True)['_merge'].to_numpy() == 'both'
+        H = H[~overlap]
+    ALL = pd.concat([H, F], ignore_index=True)
+    if ALL.empty:
+        return empty
+
+    year_keys = key_cols + ['year']
+    agg = ALL.groupby(year_keys).agg(nq=('q', 'nunique'), sumv=('value', 'sum')).reset_index()
+    full = agg[agg['nq'] == 4].copy()
+    if full.empty:
+        return empty
+
+    # 每条航线的 K，按年份倒序排名，排名 <= K 的为预测年
+    if key_cols:
+        k = F.groupby(key_cols).size().rename('K').reset_index()
+        full = full.merge(k, on=key_cols, how='left')
+        full['K'] = full['K'].fillna(0).astype(int) // 4
+        rank = full.groupby(key_cols)['year'].rank(method='first', ascending=False)
+    else:
+        full['K'] = len(F) // 4
+        rank = full['year'].rank(method='first', ascending=False)
+    full['is_future'] = rank.to_numpy() <= full['K'].to_numpy()
+
+    full['year'] = full['year'].astype(int)
+    full['value'] = np.round(full['sumv'].to_numpy(dtype=float)).astype(int)
+    return full.sort_values(year_keys)[key_cols + ['year', 'value', 'is_future']].reset_index(drop=True)
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+
+def ts_refit_every():
+    """TS_Forecast 时间序列模型的重新训练间隔（settings.TS_FORECAST_FEATURE['REFIT_EVERY']），默认不重新训练"""
+    from django.conf import settings
+    conf = getattr(settings, 'TS_FORECAST_FEATURE', {}) or {}
+    return conf.get('REFIT_EVERY') or None
+
+
+class RecursiveForecaster:
+    """
+    增量递推预测引擎
+
+    - 外生列（经济、票价等）只做一次预处理：历史 + 全部未来期一次性尾部外推
+    - 每一步只为新增的一行构建时间/滞后特征并预测目标值，不再对整段历史重复 fit_transform
+    - TS_Forecast 特征默认冻结训练时拟合的时间序列模型（推理模式），可按 ts_refit_every 每 k 步重新训练
+    """
+    def __init__(self, model, preprocessor, feature_builder, feature_cols,
+                 target_col='Route_Total_Seats', date_col='YearMonth', ts_refit_every=None):
+        """
+        Args:
+            model: 已训练的回归模型（LGBMRegressor / XGBRegressor）
+            preprocessor (DataPreprocessor): 数据预处理器
+            feature_builder (FeatureBuilder): 特征构建器
+            feature_cols (list): 模型输入特征列（顺序与训练一致）
+            target_col (str): 目标列
+            date_col (str): 时间列
+            ts_refit_every (int): TS_Forecast 时间序列模型重新训练间隔步数，为空或 0 时不重新训练
+        """
+        self.model = model
+        self.preprocessor = preprocessor
+        self.feature_builder = feature_builder
+        self.feature_cols = feature_cols
+        self.target_col = target_col
+        self.date_col = date_col
+        self.ts_refit_every = ts_refit_every
+
+    def _exogenous_columns(self, history):
+        """历史数据中需要外推的原始列（排除时间列、目标列和特征构建器生成的列）"""
+        generated = set(self.feature_builder.get_generated_columns())
+        return [
+            col for col in history.columns
+            if col not in generated and col not in (self.date_col, self.target_col)
+        ]
+
+    def _extend_exogenous(self, history, future_dates):
+        """一次性填充全部未来期的外生列取值"""
+        exog_cols = self._exogenous_columns(history)
+        future = pd.DataFrame({self.date_col: pd.to_datetime(pd.Series(future_dates))})
+        for col in exog_cols:
+            future[col] = np.nan
+        frame = pd.concat([history[[self.date_col] + exog_cols], future], ignore_index=True)
+        return self.preprocessor.fit_transform(frame)
+
+    def forecast(self, history, future_dates):
+        """
+        递推预测
+
+        Args:
+            history (pd.DataFrame): 历史数据（含时间列、目标列及外生列）
+            future_dates (list): 需要预测的日期序列（按时间升序）
+        Returns:
+            list: 与 future_dates 对应的预测值
+        """
+        if not future_dates:
+            return []
+
+        history = history.sort_values(self.date_col).reset_index(drop=True)
+        n_hist = len(history)
+
+        frame = self._extend_exogenous(history, future_dates)
+        frame[self.target_col] = np.concatenate([
+            pd.to_numeric(history[self.target_col], errors='coerce').to_numpy(dtype=float),
+            np.full(len(future_dates), np.nan)
+        ])
+
+        # 构建最后一行的滞后特征所需的窗口长度
+        lags = getattr(self.feature_builder, 'lags', None) or [1]
+        window = max(lags) + 1
+
+        use_ts = getattr(self.feature_builder, 'add_ts_forecast', False)
+        ts_model = None
+
+        preds = []
+        for i in range(len(future_dates)):
+            pos = n_hist + i
+
+            # 时间序列预测特征：推理模式的模型（冻结或按间隔在已知 + 已预测序列上重新训练）
+            if use_ts:
+                ts_model = self.feature_builder.inference_ts_model(
+                    frame.iloc[:pos], i, self.ts_refit_every, ts_model
+                )
+
+            # 只对尾部窗口构建特征
+            tail = frame.iloc[max(0, pos - window + 1):pos + 1]
+            features = self.feature_builder.transform(tail, ts_model=ts_model)
+            latest_input = features.iloc[[-1]][self.feature_cols]
+
+            next_pred = self.model.predict(latest_input)[0]
+            frame.at[pos, self.target_col] = next_pred
+            preds.append(next_pred)
+
+        return preds
+
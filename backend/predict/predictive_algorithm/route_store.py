@@ -0,0 +1,243 @@
+"""
+航线数据列式存储（按航线分区的 NumPy 文件）
+
+训练加载航线数据时直接读取 float64 矩阵，跳过 ORM 逐行实例化和 Decimal 转换：
+
+    <ROOT>/<ORIGIN>_<DESTINATION>/
+        meta.json             列名、行数、当前版本号
+        numeric.<版本>.npy     float64 矩阵（行 × 数值列），以 mmap 方式读取
+        text.<版本>.npy        定长 Unicode 矩阵（行 × 文本列）
+
+- 导入脚本写入 FlightMarketRecord 后调用 refresh_routes(受影响航线) 刷新
+- 写入时先落新版本文件再原子替换 meta.json，读取方不会读到写了一半的数据
+- 存储缺失时 load_route 返回 None，调用方回退到数据库查询
+"""
+import os
+import json
+import uuid
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .field_mapping import get_field_mapping, get_special_fields
+
+
+# 文本列（CSV 列名），其余映射列均按数值存储
+TEXT_COLUMNS = ['YearMonth', 'Origin', 'Destination', 'Equipment', 'Region']
+# 不进入存储的技术字段
+SKIP_FIELDS = ('id', 'created_at', 'updated_at')
+
+_write_lock = threading.Lock()
+
+
+def get_store_root():
+    """存储根目录：settings.ROUTE_DATA_STORE['ROOT']，未配置时位于 AirlineModels/route_store"""
+    from django.conf import settings
+    conf = getattr(settings, 'ROUTE_DATA_STORE', {}) or {}
+    root = conf.get('ROOT')
+    if not root:
+        backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        root = os.path.join(backend_dir, 'AirlineModels', 'route_store')
+    return str(root)
+
+
+def store_enabled():
+    from django.conf import settings
+    conf = getattr(settings, 'ROUTE_DATA_STORE', {}) or {}
+    return conf.get('ENABLED', True)
+
+
+def _route_dir(origin, destination, root=None):
+    return os.path.join(root or get_store_root(), f"{origin}_{destination}")
+
+
+def market_records_to_dataframe(records):
+    """
+    将 FlightMarketRecord.values() 结果转换为 DataFrame 并映射为原CSV列名
+
+    :param records: 字典列表
+    :return: DataFrame
+    """
+    df = pd.DataFrame(records)
+
+    # 从配置文件获取字段名映射
+    field_to_csv_mapping = get_field_mapping()
+    special_fields = get_special_fields()
+
+    # 重命名列
+    df = df.rename(columns=field_to_csv_mapping)
+
+    # 处理特殊字段
+    for field_name, field_config in special_fields.items():
+        if field_config['type'] == 'boolean_to_int':
+            csv_column = field_to_csv_mapping.get(field_name)
+            if csv_column in df.columns:
+                df[csv_column] = df[csv_column].astype(int)
+
+    # 数据类型转换：确保数值字段为float类型，避免decimal.Decimal类型问题
+    for col in df.columns:
+        if col not in ['YearMonth', 'Origin', 'Destination', 'Equipment', 'International Flight', 'Region']:
+            try:
+                # 尝试转换为数值类型
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+            except:
+                # 如果转换失败，保持原类型
+                pass
+
+    return df
+
+
+def _store_columns():
+    """(数值列, 文本列)，均为 CSV 列名，顺序固定"""
+    mapping = get_field_mapping()
+    csv_columns = [csv for field, csv in mapping.items() if field not in SKIP_FIELDS]
+    numeric = [c for c in csv_columns if c not in TEXT_COLUMNS]
+    return numeric, [c for c in csv_columns if c in TEXT_COLUMNS]
+
+
+def _int_columns():
+    """存储为浮点、读取时还原为整数的列（boolean_to_int 特殊字段）"""
+    mapping = get_field_mapping()
+    return [mapping[f] for f, conf in get_special_fields().items() if conf['type'] == 'boolean_to_int']
+
+
+def write_route(origin, destination, df, root=None):
+    """
+    写入一条航线的数据（整条航线替换）
+
+    :param df: market_records_to_dataframe 的结果（CSV 列名）；为空时删除该航线的存储
+    """
+    route_dir = _route_dir(origin, destination, root)
+    if df is None or df.empty:
+        remove_route(origin, destination, root)
+        return 0
+
+    numeric_cols, text_cols = _store_columns()
+    numeric = np.empty((len(df), len(numeric_cols)), dtype=np.float64)
+    for j, col in enumerate(numeric_cols):
+        if col in df.columns:
+            numeric[:, j] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            numeric[:, j] = np.nan
+    text = np.column_stack([
+        df[col].fillna('').astype(str).to_numpy() if col in df.columns else np.full(len(df), '')
+        for col in text_cols
+    ]).astype(np.str_)
+
+    version = uuid.uuid4().hex[:12]
+    os.makedirs(route_dir, exist_ok=True)
+    np.save(os.path.join(route_dir, f"numeric.{version}.npy"), numeric)
+    np.save(os.path.join(route_dir, f"text.{version}.npy"), text)
+
+    meta = {
+        'origin': origin,
+        'destination': destination,
+        'version': version,
+        'rows': int(len(df)),
+        'numeric_columns': numeric_cols,
+        'text_columns': text_cols,
+    }
+    meta_path = os.path.join(route_dir, 'meta.json')
+    tmp_path = f"{meta_path}.{version}.tmp"
+    with _write_lock:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+        _cleanup_old_versions(route_dir, version)
+    return len(df)
+
+
+def _cleanup_old_versions(route_dir, keep_version):
+    for name in os.listdir(route_dir):
+        if name.endswith('.npy') and f".{keep_version}." not in name:
+            try:
+                os.remove(os.path.join(route_dir, name))
+            except OSError:
+                # Windows 下正被其他进程 mmap 的文件无法删除，下次刷新时再清理
+                pass
+
+
+def remove_route(origin, destination, root=None):
+    meta_path = os.path.join(_route_dir(origin, destination, root), 'meta.json')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+
+def load_route(origin, destination, root=None):
+    """
+    读取一条航线的数据
+
+    :return: DataFrame（列名与 load_data_from_database 一致，不含 id/created_at/updated_at），存储缺失时返回 None
+    """
+    route_dir = _route_dir(origin, destination, root)
+    meta_path = os.path.join(route_dir, 'meta.json')
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        numeric = np.load(os.path.join(route_dir, f"numeric.{meta['version']}.npy"), mmap_mode='r')
+        text = np.load(os.path.join(route_dir, f"text.{meta['version']}.npy"))
+    except (OSError, ValueError, KeyError):
+        return None
+
+    data = {col: text[:, j].astype(object) for j, col in enumerate(meta['text_columns'])}
+    # 与数据库路径保持一致：空字符串还原为 None
+    if 'Region' in data:
+        data['Region'] = np.where(data['Region'] == '', None, data['Region'])
+    df = pd.DataFrame(data)
+    numeric_df = pd.DataFrame(np.array(numeric), columns=meta['numeric_columns'])
+    df = pd.concat([df, numeric_df], axis=1)
+
+    for col in _int_columns():
+        if col in df.columns:
+            df[col] = df[col].fillna(0).astype(int)
+
+    # 恢复映射表中的列顺序
+    ordered = [c for c in get_field_mapping().values() if c in df.columns]
+    return df[ordered]
+
+
+def refresh_routes(routes, chunk_size=200, root=None):
+    """
+    从数据库重建指定航线的列式存储（每 chunk_size 条航线一次查询）
+
+    :param routes: [(origin, destination), ...]
+    :return: {'routes': 航线数, 'rows': 写入行数, 'removed': 数据库中已无数据而删除的航线数}
+    """
+    from django.db.models import Q
+    from predict.models import FlightMarketRecord
+
+    fields = [f for f in get_field_mapping() if f not in SKIP_FIELDS]
+    routes = list(dict.fromkeys(routes))
+    stats = {'routes': 0, 'rows': 0, 'removed': 0}
+    for i in range(0, len(routes), chunk_size):
+        chunk = routes[i:i + chunk_size]
+        condition = Q()
+        for origin, destination in chunk:
+            condition |= Q(origin=origin, destination=destination)
+
+        records = list(FlightMarketRecord.objects.filter(condition).values(*fields))
+        frames = {}
+        if records:
+            df = market_records_to_dataframe(records)
+            frames = {key: group.reset_index(drop=True)
+                      for key, group in df.groupby(['Origin', 'Destination'], sort=False)}
+
+        for origin, destination in chunk:
+            group = frames.get((origin, destination))
+            if group is None:
+                remove_route(origin, destination, root)
+                stats['removed'] += 1
+                continue
+            stats['rows'] += write_route(origin, destination, group, root)
+            stats['routes'] += 1
+        print(f"航线数据存储已刷新: {min(i + chunk_size, len(routes))}/{len(routes)} 条航线")
+    return stats
+
+
+def rebuild_store(chunk_size=200, root=None):
+    """按数据库中现有的全部航线重建列式存储"""
+    from predict.models import FlightMarketRecord
+
+    routes = list(FlightMarketRecord.objects.values_list('origin', 'destination').distinct())
+    return refresh_routes(routes, chunk_size=chunk_size, root=root)
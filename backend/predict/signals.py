@@ -0,0 +1,26 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import RouteModelInfo, ForecastSnapshot
+from .forecast_cache import invalidate_model
+from .predictive_algorithm.model_cache import get_artifact_cache
+
+
+# 模型重新训练（保存）或删除时，使该模型的预测结果缓存和本进程的模型文件缓存失效
+@receiver(post_save, sender=RouteModelInfo)
+@receiver(post_delete, sender=RouteModelInfo)
+def invalidate_model_caches(sender, instance, **kwargs):
+    try:
+        # 同步内存中的实例，避免之后再次 save() 时写回旧代数
+        instance.cache_generation = invalidate_model(instance.model_id)
+    except Exception as e:
+        print(f"⚠️ 预测结果缓存失效失败: {e}")
+    get_artifact_cache().invalidate(instance.model_id)
+
+
+# 已有模型被修改时，其预测快照不再可信（删除模型时快照由外键级联删除）
+@receiver(post_save, sender=RouteModelInfo)
+def invalidate_model_snapshots(sender, instance, created, **kwargs):
+    if not created:
+        ForecastSnapshot.objects.filter(route_model=instance).delete()
+        ForecastSnapshot.objects.filter(paired_model=instance).delete()
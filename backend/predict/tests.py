@@ -1,3 +1,391 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from decimal import Decimal
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from show.models import RouteMonthlyStat
+from .models import RouteModelInfo, FlightMarketRecord
+from .forecast_cache import cached_forecast
+from .ingestion import upsert_route_stats
+from .market_loader import USECOLS, normalize_frame, upsert_market_frame
+from .predictive_algorithm.FeatureEngineer import DataPreprocessor, FeatureBuilder
+from .predictive_algorithm.TS_model import ARIMAModel
+from .predictive_algorithm.time_granularity import TimeGranularityController
+from .predictive_algorithm.model_bundle import write_bundle, read_bundle
+from .predictive_algorithm.reconciliation import mint_reconcile_batch, mint_block_reconcile, mint_dense_reconcile
+from .predictive_algorithm import hyperparameter_search as search
+
+
+def make_route_frame(n_months=48, n_future=6, seed=0):
+    """合成月度航线：经济列、带 0 值和中间 / 头部缺失的数值列、0-1 列，最后 n_future 行为待外推的未来期"""
+    rng = np.random.default_rng(seed)
+    n = n_months + n_future
+    dates = pd.date_range('2018-01-01', periods=n, freq='MS')
+    years = dates.year.to_numpy() - dates.year[0]
+
+    data = {'YearMonth': dates}
+    for col in ('O_GDP', 'D_GDP', 'D_Population'):
+        data[col] = rng.uniform(100, 10_000) * 1.05 ** years
+    for i in range(4):
+        values = rng.uniform(1_000, 50_000) * rng.normal(1, 0.05, n)
+        values[rng.random(n) < 0.1] = 0
+        values[rng.random(n) < 0.1] = np.nan
+        data[f'Metric_{i}'] = values
+    data['Metric_0'][:3] = np.nan                  # 头部缺失
+    data['Sparse'] = np.where(rng.random(n) < 0.8, np.nan, 1.0)  # 缺失过多，走后备填充
+    data['Holiday'] = np.isin(dates.month, [1, 2]).astype(int)
+
+    frame = pd.DataFrame(data)
+    value_cols = [c for c in frame.columns if c not in ('YearMonth', 'Holiday')]
+    frame.loc[frame.index >= n_months, value_cols] = np.nan
+    return frame
+
+
+class PreprocessorMatrixTransformTests(SimpleTestCase):
+    """矩阵实现（transform）与逐列实现（_transform_by_column）的结果必须逐位一致"""
+
+    def _assert_paths_equal(self, fill_method):
+        frame = make_route_frame()
+        preprocessor = DataPreprocessor(fill_method=fill_method, non_economic_model='lastn')
+        preprocessor.fit(frame)
+        for X in (frame.iloc[:48].reset_index(drop=True), frame):
+            pd.testing.assert_frame_equal(
+                preprocessor._transform_by_column(X), preprocessor.transform(X), check_exact=True
+            )
+
+    def test_interp_matches_column_path(self):
+        self._assert_paths_equal('interp')
+
+    def test_zero_matches_column_path(self):
+        self._assert_paths_equal('zero')
+
+    def test_regression_uses_column_path(self):
+        self._assert_paths_equal('regression')
+
+
+class ARIMAFeatureVersionTests(SimpleTestCase):
+    """TS_Forecast 特征版本：新模型填满未来各期，没有版本号的旧模型保持旧取值"""
+
+    def setUp(self):
+        dates = pd.date_range('2018-01-01', periods=36, freq='MS')
+        rng = np.random.default_rng(0)
+        self.series = pd.Series(1_000 + rng.normal(0, 50, len(dates)).cumsum(), index=dates)
+        self.dates = pd.date_range('2018-01-01', periods=40, freq='MS')
+
+    def _fit(self):
+        model = ARIMAModel(order=(1, 0, 0), freq='MS')
+        model.fit(self.series)
+        return model
+
+    def test_current_version_fills_every_future_step(self):
+        values = self._fit().predict(self.dates)
+        self.assertFalse(values.iloc[36:].isna().any())
+        np.testing.assert_array_equal(values.iloc[36:].to_numpy(), self._fit().model.forecast(steps=4).to_numpy())
+
+    def test_artifact_without_version_keeps_single_step(self):
+        current = self._fit()
+        legacy = self._fit()
+        del legacy.feature_version
+        values = legacy.predict(self.dates)
+        pd.testing.assert_series_equal(values.iloc[:37], current.predict(self.dates).iloc[:37])
+        self.assertTrue(values.iloc[37:].isna().all())
+
+    def test_legacy_short_window_raises_for_fallback(self):
+        legacy = self._fit()
+        legacy.feature_version = 1
+        with self.assertRaises(KeyError):
+            legacy.predict(self.dates[30:])
+
+
+def make_reconcile_frames(seed=0):
+    """两条航线（task_index 0 / 1）一年的月度、季度预测；月度前 3 个月为训练期"""
+    rng = np.random.default_rng(seed)
+    months = pd.date_range('2024-01-01', periods=12, freq='MS').strftime('%Y-%m')
+    monthly, quarterly = [], []
+    for task in (0, 1):
+        predicted = rng.uniform(1_000, 2_000, 12)
+        monthly.append(pd.DataFrame({
+            'task_index': task,
+            'YearMonth': months,
+            'Predicted': predicted,
+            'Set': ['Train'] * 3 + ['Future'] * 9,
+            'Variance': rng.uniform(0.5, 2.0, 12),
+        }))
+        quarterly.append(pd.DataFrame({
+            'task_index': task,
+            'YearMonth': [f'2024-Q{q}' for q in range(1, 5)],
+            'Predicted': predicted.reshape(4, 3).sum(axis=1) * rng.uniform(0.9, 1.1, 4),
+        }))
+    return pd.concat(monthly, ignore_index=True), pd.concat(quarterly, ignore_index=True)
+
+
+class MinTReconciliationTests(SimpleTestCase):
+    """MinT 对齐：调整后的月度之和与季度预测一致，未调整的行保持原值"""
+
+    def _quarter_sums(self, reconciled):
+        return reconciled.groupby(['task_index', 'quarter'])['Predicted_Reconciled'].sum().to_numpy()
+
+    def _assert_coherent(self, method, variance_col=None):
+        monthly, quarterly = make_reconcile_frames()
+        reconciled = mint_reconcile_batch(
+            monthly, quarterly, key_cols=('task_index',), method=method, variance_col=variance_col
+        )
+        future = reconciled['Set'] == 'Future'
+        # 第 2-4 季度全部为预测期，调整后严格等于季度预测
+        sums = reconciled[future].groupby(['task_index', 'quarter'])['Predicted_Reconciled'].sum()
+        targets = quarterly.set_index(['task_index', 'YearMonth'])['Predicted']
+        for (task, quarter), value in sums.items():
+            self.assertAlmostEqual(value, targets[(task, f'{quarter.year}-Q{quarter.quarter}')], places=6)
+        # 训练期不调整
+        np.testing.assert_array_equal(
+            reconciled.loc[~future, 'Predicted_Reconciled'].to_numpy(), monthly.loc[~future, 'Predicted'].to_numpy()
+        )
+
+    def test_ols_is_coherent(self):
+        self._assert_coherent('ols')
+
+    def test_wls_is_coherent(self):
+        self._assert_coherent('wls', variance_col='Variance')
+
+    def test_structural_splits_gap_with_quarter(self):
+        monthly, quarterly = make_reconcile_frames()
+        monthly['Set'] = 'Future'
+        reconciled = mint_reconcile_batch(monthly, quarterly, key_cols=('task_index',), method='structural')
+        # 季度权重 3、各月权重 1：调整后的季度合计为月度合计与季度预测的中点
+        monthly_sums = monthly['Predicted'].to_numpy().reshape(-1, 3).sum(axis=1)
+        np.testing.assert_allclose(
+            self._quarter_sums(reconciled), (monthly_sums + quarterly['Predicted'].to_numpy()) / 2, rtol=1e-12
+        )
+
+    def test_dense_projection_matches_block_solution(self):
+        rng = np.random.default_rng(1)
+        y_bottom = rng.uniform(10, 20, 6)
+        codes = np.array([0, 0, 0, 1, 1, 1])
+        y_top = np.array([50.0, 48.0])
+        weights = rng.uniform(0.5, 2.0, 6)
+        np.testing.assert_allclose(
+            mint_dense_reconcile(y_bottom, codes, y_top, np.diag(weights)),
+            mint_block_reconcile(y_bottom, codes, y_top, bottom_weights=weights),
+            rtol=1e-12
+        )
+        # 非对角协方差同样满足汇总约束
+        A = rng.normal(size=(6, 6))
+        reconciled = mint_dense_reconcile(y_bottom, codes, y_top, A @ A.T + np.eye(6))
+        np.testing.assert_allclose([reconciled[:3].sum(), reconciled[3:].sum()], y_top, rtol=1e-12)
+
+
+class HyperparameterSearchTests(SimpleTestCase):
+    """逐次减半的轮次安排和最佳试验选择"""
+
+    def test_halving_schedule_shrinks_by_eta(self):
+        self.assertEqual(
+            search.halving_schedule(27, 270, eta=3),
+            [(27, 10), (9, 30), (3, 90), (1, 270)]
+        )
+
+    def test_halving_schedule_caps_min_resource(self):
+        self.assertEqual(search.halving_schedule(10, 50, min_resource=100, eta=3), [(10, 50)])
+
+    def test_halving_schedule_ends_at_max_resource(self):
+        for n, max_resource, eta in ((20, 300, 3), (7, 100, 2), (1, 40, 4)):
+            schedule = search.halving_schedule(n, max_resource, eta=eta)
+            keeps = [n_keep for n_keep, _ in schedule]
+            self.assertEqual(schedule[-1][1], max_resource)
+            self.assertEqual(keeps, sorted(keeps, reverse=True))
+            self.assertGreaterEqual(keeps[-1], 1)
+
+    def _result(self, trial_id, rung, value, metric='rmse', error=None):
+        return {
+            'trial_id': trial_id, 'rung': rung, 'error': error,
+            'train_metrics': {metric: value}, 'test_metrics': {metric: value},
+        }
+
+    def test_best_trial_uses_final_rung_and_skips_failures(self):
+        results = [
+            self._result(0, 0, 1.0),                      # 早期轮次更好，但不参与选择
+            self._result(1, 1, 5.0),
+            self._result(2, 1, 3.0),
+            self._result(3, 1, None, error='boom'),
+            self._result(4, 1, float('nan')),
+        ]
+        self.assertEqual(search.select_best_trial(results, 'rmse', rung=1)['trial_id'], 2)
+
+    def test_best_trial_maximizes_r2(self):
+        results = [self._result(0, 0, 0.7, 'r2'), self._result(1, 0, 0.9, 'r2')]
+        self.assertEqual(search.select_best_trial(results, 'r2', rung=0)['trial_id'], 1)
+
+    def test_best_trial_none_when_all_failed(self):
+        self.assertIsNone(search.select_best_trial([self._result(0, 0, None, error='boom')], 'rmse', rung=0))
+
+
+class ModelBundleRoundTripTests(SimpleTestCase):
+    """模型包写入后读取，各组件的预测 / 变换结果与写入前一致"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+
+    def test_round_trip(self):
+        import lightgbm as lgb
+
+        route = make_route_frame(n_future=0)
+        route['Route_Total_Seats'] = np.linspace(10_000, 20_000, len(route))
+        history = route.assign(Origin='CAN')     # 含字符串列，写入头部 JSON
+
+        preprocessor = DataPreprocessor(fill_method='interp', non_economic_model='lastn')
+        preprocessor.fit(route)
+        processed = preprocessor.transform(route)
+        feature_builder = FeatureBuilder(
+            TimeGranularityController('monthly'), add_ts_forecast=True, ts_model=ARIMAModel(order=(1, 0, 0), freq='MS')
+        ).fit(processed)
+        features = feature_builder.transform(processed)
+        feature_cols = [c for c in features.columns if c not in ('YearMonth', 'Route_Total_Seats')]
+        model = lgb.LGBMRegressor(n_estimators=20, verbose=-1).fit(features[feature_cols], processed['Route_Total_Seats'])
+        metadata = {'date_column': 'YearMonth', 'feature_columns': feature_cols, 'model_type': 'lgb'}
+
+        path = os.path.join(self.tmpdir, 'model.bundle')
+        write_bundle(path, model, preprocessor, feature_builder, metadata, history)
+        loaded = read_bundle(path)
+
+        self.assertEqual(loaded['metadata'], metadata)
+        pd.testing.assert_frame_equal(loaded['latest_data'], history)
+        self.assertTrue(loaded['latest_data']['Metric_1'].to_numpy().flags.writeable)
+
+        reprocessed = loaded['preprocessor'].transform(route)
+        pd.testing.assert_frame_equal(reprocessed, processed)
+        refeatured = loaded['feature_builder'].transform(reprocessed)
+        pd.testing.assert_frame_equal(refeatured, features)
+        np.testing.assert_allclose(
+            loaded['model'].predict(refeatured[feature_cols].to_numpy(dtype=float)),
+            model.predict(features[feature_cols]),
+            rtol=1e-12
+        )
+
+
+@override_settings(FORECAST_RESULT_CACHE={'ENABLED': True, 'ALIAS': 'default', 'TIMEOUT': None})
+class ForecastCacheInvalidationTests(TestCase):
+    """重新训练（保存模型记录）或模型文件被重写后，旧的预测结果不再命中"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        paths = {}
+        for field in ('model_file_path', 'preprocessor_file_path', 'feature_builder_file_path',
+                      'meta_file_path', 'raw_data_file_path'):
+            paths[field] = os.path.join(self.tmpdir, f'{field}.bin')
+            with open(paths[field], 'wb') as f:
+                f.write(b'v1')
+        self.info = RouteModelInfo.objects.create(
+            model_id='CAN_PEK_20240101000000',
+            origin_airport='CAN',
+            destination_airport='PEK',
+            train_start_time='2018-01-01',
+            train_end_time='2023-12-01',
+            time_granularity='monthly',
+            train_datetime=timezone.now(),
+            **paths
+        )
+        self.request = {
+            'model_id': self.info.model_id,
+            'origin_airport': 'CAN',
+            'destination_airport': 'PEK',
+            'time_granularity': 'monthly',
+            'prediction_periods': 12,
+        }
+        self.calls = 0
+
+    def compute(self, request):
+        self.calls += 1
+        return {'run': self.calls}
+
+    def test_hit_until_retrained(self):
+        self.assertEqual(cached_forecast(self.request, self.compute), ({'run': 1}, False))
+        self.assertEqual(cached_forecast(self.request, self.compute), ({'run': 1}, True))
+
+        # 重新训练后更新模型记录
+        self.info.remark = 'retrained'
+        self.info.save()
+        self.assertEqual(cached_forecast(self.request, self.compute), ({'run': 2}, False))
+        self.assertEqual(cached_forecast(self.request, self.compute), ({'run': 2}, True))
+
+    def test_rewritten_model_file_misses(self):
+        cached_forecast(self.request, self.compute)
+        with open(self.info.model_file_path, 'wb') as f:
+            f.write(b'version-2')
+        self.assertEqual(cached_forecast(self.request, self.compute), ({'run': 2}, False))
+
+    def test_other_parameters_do_not_share_results(self):
+        cached_forecast(self.request, self.compute)
+        other = dict(self.request, prediction_periods=24)
+        self.assertEqual(cached_forecast(other, self.compute), ({'run': 2}, False))
+
+
+class IngestionUpsertTests(TestCase):
+    """按月导入的覆盖写入：重复执行结果不变，修正后的数据覆盖旧值，缺失的旧记录被删除"""
+
+    def _stats_frame(self, seats):
+        return pd.DataFrame({
+            'Origin': ['CAN', 'CAN', 'SHA'],
+            'Destination': ['PEK', 'PEK', 'CTU'],       # 同一航线多行时取第一行
+            'Con Total Est. Pax': [1_000.0, 9_999.0, 500.0],
+            'Route_Total_Seats': [seats, 0.0, 800.0],
+            'Route_Total_Flights': [10, 0, 5],
+        })
+
+    def _stats(self):
+        return sorted(RouteMonthlyStat.objects.filter(year=2024, month=3).values_list(
+            'id', 'origin_code', 'destination_code', 'passenger_volume', 'Route_Total_Seats', 'Route_Total_Flights'
+        ))
+
+    def test_route_stats_upsert_is_idempotent(self):
+        self.assertEqual(upsert_route_stats(2024, 3, self._stats_frame(1_500.0)), (2, 0))
+        first = self._stats()
+        self.assertEqual(upsert_route_stats(2024, 3, self._stats_frame(1_500.0)), (2, 0))
+        self.assertEqual(self._stats(), first)
+        self.assertEqual([row[1:] for row in first], [
+            ('CAN', 'PEK', 1_000.0, 1_500.0, 10),
+            ('SHA', 'CTU', 500.0, 800.0, 5),
+        ])
+
+    def test_route_stats_upsert_overwrites_and_removes_stale(self):
+        upsert_route_stats(2024, 3, self._stats_frame(1_500.0))
+        corrected = self._stats_frame(1_600.0).iloc[:2]
+        self.assertEqual(upsert_route_stats(2024, 3, corrected), (1, 1))
+        self.assertEqual([row[1:] for row in self._stats()], [('CAN', 'PEK', 1_000.0, 1_600.0, 10)])
+
+    def _market_frame(self, seats):
+        raw = pd.DataFrame({col: [''] * 2 for col in USECOLS})
+        raw['YearMonth'] = '2024/3/1'
+        raw['Origin'] = ['CAN', 'CAN']
+        raw['Destination'] = ['PEK', 'PEK']
+        raw['Equipment'] = ['73G', '32A']
+        raw['International Flight'] = '0'
+        raw['Region'] = 'China'
+        raw['Route_Total_Seats'] = seats
+        raw['Distance (KM)'] = '1,967.25'
+        return normalize_frame(raw)
+
+    def _market(self):
+        return sorted(FlightMarketRecord.objects.filter(year_month='2024-03').values_list(
+            'origin', 'destination', 'equipment', 'route_total_seats', 'distance_km', 'international_flight'
+        ))
+
+    def test_market_upsert_is_idempotent(self):
+        upsert_market_frame(self._market_frame('31,200.50'))
+        first = self._market()
+        upsert_market_frame(self._market_frame('31,200.50'))
+        self.assertEqual(self._market(), first)
+        self.assertEqual(first, [
+            ('CAN', 'PEK', '32A', Decimal('31200.50'), Decimal('1967.25'), False),
+            ('CAN', 'PEK', '73G', Decimal('31200.50'), Decimal('1967.25'), False),
+        ])
+
+        upsert_market_frame(self._market_frame('30,000'))
+        self.assertEqual([row[3] for row in self._market()], [Decimal('30000.00')] * 2)
@@ -0,0 +1,505 @@
+import os
+from datetime import datetime
+from concurrent.futures import wait, FIRST_COMPLETED, ALL_COMPLETED
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count
+
+from .models import RouteModelInfo, PretrainRecord, FlightMarketRecord
+from .worker import create_process_pool
+from .predictive_algorithm.pretrain_single_route import (
+    pretrain_single_route, load_routes_from_database, load_data_from_database
+)
+from .predictive_algorithm.fromal_train_single_route import formal_train_single_route
+from .predictive_algorithm.create_model import merge_model_params
+from .predictive_algorithm import hyperparameter_search as search
+
+
+def clean_nan_values(data_dict):
+    """
+    清理字典中的nan值，将nan替换为None，并确保所有数值都是JSON兼容的
+    """
+    cleaned_data = {}
+    for key, value in data_dict.items():
+        if value is None:
+            cleaned_data[key] = None
+        elif isinstance(value, (int, float)):
+            # 检查是否为nan或inf
+            if hasattr(np, 'isnan') and np.isnan(value):
+                cleaned_data[key] = None
+            elif hasattr(np, 'isinf') and np.isinf(value):
+                cleaned_data[key] = None
+            else:
+                # 确保数值在JSON范围内
+                if value > 1e308 or value < -1e308:
+                    cleaned_data[key] = None
+                else:
+                    cleaned_data[key] = float(value)
+        elif isinstance(value, np.floating):
+            # 处理numpy浮点数
+            if np.isnan(value) or np.isinf(value):
+                cleaned_data[key] = None
+            else:
+                # 转换为Python float并检查范围
+                float_val = float(value)
+                if float_val > 1e308 or float_val < -1e308:
+                    cleaned_data[key] = None
+                else:
+                    cleaned_data[key] = float_val
+        elif isinstance(value, np.integer):
+            # 处理numpy整数
+            cleaned_data[key] = int(value)
+        else:
+            cleaned_data[key] = value
+    return cleaned_data
+
+
+def build_pretrain_record_data(origin, destination, config, success, result):
+    """根据预训练结果构建 PretrainRecord 字段"""
+    record_data = {
+        'origin': origin,
+        'destination': destination,
+        'time_granularity': config.get('time_granularity', 'monthly'),
+        'step_size': config.get('test_size'),
+        'train_datetime': datetime.now(),
+        'success': success,
+        'use_pretrain': False
+    }
+
+    # 如果训练成功，添加成功相关的数据
+    if success and isinstance(result, dict):
+        record_data.update({
+            'meta_file_path': result.get('meta_file_path', ''),
+            'train_start_date': result.get('train_start_date'),
+            'train_end_date': result.get('train_end_date'),
+            'train_duration': result.get('train_duration'),
+            'train_mae': result.get('train_mae'),
+            'train_rmse': result.get('train_rmse'),
+            'train_mape': result.get('train_mape'),
+            'train_r2': result.get('train_r2'),
+            'test_mae': result.get('test_mae'),
+            'test_rmse': result.get('test_rmse'),
+            'test_mape': result.get('test_mape'),
+            'test_r2': result.get('test_r2'),
+            'report_pdf': result.get('report_pdf', '')
+        })
+    else:
+        # 训练失败，设置默认值
+        record_data.update({
+            'meta_file_path': '',
+            'train_start_date': datetime.now().date(),
+            'train_end_date': datetime.now().date(),
+            'train_duration': None,
+            'train_mae': None,
+            'train_rmse': None,
+            'train_mape': None,
+            'train_r2': None,
+            'test_mae': None,
+            'test_rmse': None,
+            'test_mape': None,
+            'test_r2': None,
+            'report_pdf': ''
+        })
+
+    # 清理数据中的nan值
+    return clean_nan_values(record_data)
+
+
+def run_pretrain(origin, destination, config, progress_callback=None):
+    """
+    执行单条航线预训练并写入 PretrainRecord
+
+    Returns:
+        (pretrain_record, success, result)
+    """
+    success, result = pretrain_single_route(origin, destination, config, progress_callback=progress_callback)
+    record_data = build_pretrain_record_data(origin, destination, config, success, result)
+    pretrain_record = PretrainRecord.objects.create(**record_data)
+    return pretrain_record, success, result
+
+
+def create_route_model_info(pretrain_record, remark, result):
+    """根据正式训练结果创建 RouteModelInfo，并标记预训练记录已被采用"""
+    route_model_data = {
+        'model_id': result["model_id"],
+        'origin_airport': pretrain_record.origin,
+        'destination_airport': pretrain_record.destination,
+        'time_granularity': pretrain_record.time_granularity,
+        'train_start_time': result['train_start_time'],
+        'train_end_time': result['train_end_time'],
+        'train_datetime': result['train_datetime'],
+        'meta_file_path': result['meta_file_path'],
+        'model_file_path': result['model_file_path'],
+        'raw_data_file_path': result['raw_data_file_path'],
+        'preprocessor_file_path': result['preprocessor_file_path'],
+        'feature_builder_file_path': result['feature_builder_file_path'],
+        # 8个评估指标
+        'train_mae': pretrain_record.train_mae,
+        'train_rmse': pretrain_record.train_rmse,
+        'train_mape': pretrain_record.train_mape,
+        'train_r2': pretrain_record.train_r2,
+        'test_mae': pretrain_record.test_mae,
+        'test_rmse': pretrain_record.test_rmse,
+        'test_mape': pretrain_record.test_mape,
+        'test_r2': pretrain_record.test_r2,
+        'remark': remark,
+        'pretrain_record': pretrain_record
+    }
+
+    # 清理数据中的nan值
+    route_model_data = clean_nan_values(route_model_data)
+
+    route_model_info = RouteModelInfo.objects.create(**route_model_data)
+
+    # 更新PretrainRecord的use_pretrain为True
+    pretrain_record.use_pretrain = True
+    pretrain_record.save()
+    return route_model_info
+
+
+def run_formal_train(pretrain_record, progress_callback=None):
+    """
+    使用预训练记录的参数执行正式训练
+
+    Returns:
+        (success, result)：成功时 result 为训练结果字典，失败时为错误信息
+    """
+    return formal_train_single_route(
+        origin=pretrain_record.origin,
+        destination=pretrain_record.destination,
+        time_granularity=pretrain_record.time_granularity,
+        pretrained_metadata_path=pretrain_record.meta_file_path,
+        progress_callback=progress_callback
+    )
+
+
+def resolve_bulk_routes(routes=None, route_filter=None, default_config=None):
+    """
+    解析批量预训练的航线列表
+
+    Args:
+        routes (list): [{"origin", "destination", "config"(可选)}, ...]
+        route_filter (dict): 按 FlightMarketRecord 筛选航线，支持
+            origins / destinations（三字码列表）、min_records（最少记录数）
+        default_config (dict): 未单独指定 config 的航线使用的配置
+    Returns:
+        list: [(origin, destination, config), ...]（去重，保持顺序）
+    """
+    default_config = default_config or {}
+    tasks = []
+
+    for item in routes or []:
+        origin = str(item.get('origin', '')).upper()
+        destination = str(item.get('destination', '')).upper()
+        if origin and destination:
+            config = dict(default_config)
+            config.update(item.get('config') or {})
+            tasks.append((origin, destination, config))
+
+    if route_filter:
+        queryset = FlightMarketRecord.objects.all()
+        origins = route_filter.get('origins')
+        destinations = route_filter.get('destinations')
+        if origins:
+            queryset = queryset.filter(origin__in=[code.upper() for code in origins])
+        if destinations:
+            queryset = queryset.filter(destination__in=[code.upper() for code in destinations])
+
+        route_counts = queryset.values('origin', 'destination').annotate(record_count=Count('id'))
+        min_records = route_filter.get('min_records')
+        if min_records:
+            route_counts = route_counts.filter(record_count__gte=int(min_records))
+
+        for row in route_counts.order_by('origin', 'destination'):
+            tasks.append((row['origin'], row['destination'], dict(default_config)))
+
+    seen = set()
+    unique_tasks = []
+    for origin, destination, config in tasks:
+        key = (origin, destination, config.get('time_granularity', 'monthly'))
+        if key not in seen:
+            seen.add(key)
+            unique_tasks.append((origin, destination, config))
+    return unique_tasks
+
+
+def _bulk_pretrain_worker(origin, destination, config, route_data):
+    """进程池中执行的单条航线预训练（只训练，不写数据库）"""
+    try:
+        success, result = pretrain_single_route(origin, destination, config, route_data=route_data)
+    except Exception as e:
+        success, result = False, str(e)
+    return origin, destination, config, success, result
+
+
+def bulk_pretrain(tasks, workers=2, batch_size=200, load_chunk_size=200, max_in_flight=None, log=print):
+    """
+    多航线批量预训练
+
+    - 航线数据按 load_chunk_size 条航线一次查询批量加载，上一批提交完再加载下一批
+    - 训练分发到进程池并行执行，同时在途的任务不超过 max_in_flight 个（默认 workers * 2），
+      内存中的航线数据最多为一批加载的航线加上在途任务，不随航线总数增长
+    - PretrainRecord 每累积 batch_size 条 bulk_create 一次（中途中断时已完成的结果不丢失）
+
+    Args:
+        tasks (list): [(origin, destination, config), ...]
+        workers (int): 并行进程数
+        batch_size (int): 批量写入记录数
+        load_chunk_size (int): 每次数据库查询加载的航线数
+        max_in_flight (int): 同时提交到进程池的最大任务数
+        log (callable): 日志输出函数
+    Returns:
+        dict: total / success / failed / no_data / records_created
+    """
+    summary = {'total': len(tasks), 'success': 0, 'failed': 0, 'no_data': 0, 'records_created': 0}
+    if not tasks:
+        return summary
+    if max_in_flight is None:
+        max_in_flight = max(1, workers * 2)
+
+    pending_records = []
+    in_flight = {}
+    done = 0
+
+    def flush():
+        if pending_records:
+            PretrainRecord.objects.bulk_create(pending_records, batch_size=batch_size)
+            summary['records_created'] += len(pending_records)
+            pending_records.clear()
+
+    def collect(return_when):
+        nonlocal done
+        finished, _ = wait(in_flight, return_when=return_when)
+        for future in finished:
+            origin, destination = in_flight.pop(future)
+            done += 1
+            try:
+                _, _, config, success, result = future.result()
+            except Exception as e:
+                # 执行进程异常退出等情况，不写入记录
+                summary['failed'] += 1
+                log(f"× [{done}/{len(tasks)}] 航线 {origin}-{destination} 执行异常: {str(e)}")
+                continue
+
+            record_data = build_pretrain_record_data(origin, destination, config, success, result)
+            pending_records.append(PretrainRecord(**record_data))
+            if success:
+                summary['success'] += 1
+                log(f"√ [{done}/{len(tasks)}] 航线 {origin}-{destination} 预训练成功")
+            else:
+                summary['failed'] += 1
+                log(f"! [{done}/{len(tasks)}] 航线 {origin}-{destination} 预训练失败")
+
+            if len(pending_records) >= batch_size:
+                flush()
+
+    log(f"开始预训练 {len(tasks)} 条航线（并行进程: {workers}，在途任务上限: {max_in_flight}）")
+    pool = create_process_pool(workers)
+    try:
+        for i in range(0, len(tasks), load_chunk_size):
+            chunk = tasks[i:i + load_chunk_size]
+            route_frames = load_routes_from_database(
+                [(origin, destination) for origin, destination, _ in chunk],
+                chunk_size=load_chunk_size
+            )
+            for origin, destination, config in chunk:
+                # 取出后不再由本批字典持有，提交的任务完成后即可释放
+                route_data = route_frames.pop((origin, destination), None)
+                if route_data is None:
+                    summary['no_data'] += 1
+                    done += 1
+                    log(f"! 航线 {origin}-{destination} 无数据，跳过")
+                    continue
+                while len(in_flight) >= max_in_flight:
+                    collect(FIRST_COMPLETED)
+                future = pool.submit(_bulk_pretrain_worker, origin, destination, config, route_data)
+                in_flight[future] = (origin, destination)
+            del route_frames
+
+        while in_flight:
+            collect(ALL_COMPLETED)
+    finally:
+        flush()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    return summary
+
+
+def run_hyperparameter_search(origin, destination, config, strategy='random', space=None, n_trials=20,
+                              workers=2, eta=3, min_resource=None, metric='rmse', seed=42,
+                              max_grid_trials=500, log=print, progress_callback=None):
+    """
+    单条航线超参数搜索（网格 / 随机 / 逐次减半），每次试验和最佳配置都写入 PretrainRecord
+
+    - 航线数据只加载一次、预处理一次，每个 arima_order 只构建一次特征矩阵
+    - 试验分发到进程池并行执行，特征矩阵在进程启动时传入一次
+    - 每次试验写入 metadata.json 和 PretrainRecord（无 PDF 报告），可直接用于正式训练
+    - 最佳配置按 pretrain_single_route 完整预训练一次（含报告），作为推荐的预训练记录
+
+    Args:
+        origin / destination (str): 航线
+        config (dict): 基础训练配置（time_granularity / model_type / test_size / add_ts_forecast 等）
+        strategy (str): grid / random / halving
+        space (dict): 参数空间 {参数名: 候选值列表或区间}，可含 arima_order；
+            默认见 DEFAULT_SEARCH_SPACES（grid 为 DEFAULT_GRID_SPACES）
+        n_trials (int): random / halving 的候选组数
+        workers (int): 并行进程数
+        eta (int): 逐次减半每轮保留 1/eta
+        min_resource (int): 逐次减半第一轮的 n_estimators
+        metric (str): 选择最佳配置的指标（rmse / mae / mape / r2）
+        seed (int): 随机种子
+        max_grid_trials (int): 网格组合数上限
+        log (callable): 日志输出函数
+        progress_callback (callable): 可选，每完成一次试验调用 progress_callback(进度, 说明)；
+            作为训练任务运行时用于写进度，抛出 TrainingCancelled 时中止搜索
+    Returns:
+        dict: strategy / metric / evaluations / failed / best / best_record_id / trial_record_ids / search_dir
+    """
+    if strategy not in search.SEARCH_STRATEGIES:
+        raise ValueError(f"strategy 必须是 {', '.join(search.SEARCH_STRATEGIES)} 之一")
+    if metric not in search.SEARCH_METRICS:
+        raise ValueError(f"metric 必须是 {', '.join(search.SEARCH_METRICS)} 之一")
+
+    config = {'time_granularity': 'monthly', 'model_type': 'lgb', **(config or {})}
+    base_config = merge_model_params(
+        granularity=config['time_granularity'],
+        model_type=config['model_type'],
+        custom_params=config
+    )
+    time_granularity = base_config['time_granularity']
+    model_type = base_config['model_type']
+    params_key = 'lgb_params' if model_type == 'lgb' else 'xgb_params'
+
+    # 1. 参数空间和候选
+    space = search.resolve_search_space(model_type, base_config['add_ts_forecast'], space, strategy)
+    max_resource = None
+    if strategy == 'halving':
+        space, max_resource = search.split_resource(space, base_config.get(params_key, {}))
+    candidates = search.build_candidates(strategy, space, n_trials, seed, max_grid_trials)
+    if not candidates:
+        raise ValueError("参数空间为空")
+    configs = [search.trial_config(base_config, candidate) for candidate in candidates]
+
+    # 2. 加载一次数据，每个特征配置构建一次特征矩阵
+    domestic = load_data_from_database(origin, destination)
+    if domestic is None or domestic[(domestic['Origin'] == origin) & (domestic['Destination'] == destination)].empty:
+        raise ValueError(f"航线 {origin}-{destination} 无数据")
+    prepared = search.prepare_search_data(
+        domestic, origin, destination, time_granularity, base_config['test_size'],
+        [search.feature_key(c) for c in configs]
+    )
+    log(f"航线 {origin}-{destination} 特征矩阵 {len(prepared['features'])} 组，候选参数 {len(configs)} 组，"
+        f"搜索策略 {strategy}，并行进程 {workers}")
+
+    def make_trial(i, rung, n_estimators=None):
+        trial_conf = search.trial_config(base_config, candidates[i], n_estimators)
+        return {
+            'trial_id': i,
+            'rung': rung,
+            'model_type': model_type,
+            'time_granularity': time_granularity,
+            'params': trial_conf[params_key],
+            'feature_key': search.feature_key(trial_conf),
+        }
+
+    # 3. 并行执行试验
+    schedule = search.halving_schedule(len(configs), max_resource, min_resource, eta) if strategy == 'halving' else None
+    total = max(1, sum(n_keep for n_keep, _ in schedule) if schedule is not None else len(configs))
+    results = []
+
+    def run_trials(trials, stage):
+        done = []
+        for result in pool.map(search.run_trial, trials):
+            done.append(result)
+            if progress_callback:
+                progress_callback(int((len(results) + len(done)) * 90 / total), f"{stage}：已完成 {len(done)}/{len(trials)} 组")
+        return done
+
+    pool = create_process_pool(workers, search.init_search_worker, (prepared['features'],))
+    try:
+        if strategy == 'halving':
+            alive = list(range(len(configs)))
+            scores = {}
+            for rung, (n_keep, n_estimators) in enumerate(schedule):
+                alive = sorted(alive, key=lambda i: scores.get(i, 0))[:n_keep]
+                rung_results = run_trials([make_trial(i, rung, n_estimators) for i in alive],
+                                          f"第 {rung + 1}/{len(schedule)} 轮")
+                for result in rung_results:
+                    scores[result['trial_id']] = search.trial_score(result, metric)
+                results.extend(rung_results)
+                best_value = search.trial_metric(min(rung_results, key=lambda r: search.trial_score(r, metric)), metric)
+                log(f"第 {rung + 1}/{len(schedule)} 轮: {len(alive)} 组，n_estimators={n_estimators}，"
+                    f"最佳 {metric}={best_value}")
+            final_rung = len(schedule) - 1
+        else:
+            results = run_trials([make_trial(i, 0) for i in range(len(configs))], "试验")
+            final_rung = 0
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    # 4. 写入试验记录
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    search_dir = os.path.join(
+        search.PRE_TRAINED_MODEL_DIR, f"{time_granularity}_{model_type}",
+        f"{origin}_{destination}_{timestamp}_search"
+    )
+    record_data = []
+    failed = 0
+    for result in results:
+        trial_conf = search.trial_config(base_config, candidates[result['trial_id']], result['params'].get('n_estimators'))
+        success = result['error'] is None
+        if success:
+            meta_file_path = search.write_trial_metadata(search_dir, result, trial_conf, {
+                'strategy': strategy,
+                'trial_id': result['trial_id'],
+                'rung': result['rung'],
+                'metric': metric,
+                'value': search.trial_metric(result, metric),
+            })
+            info = search.trial_result_info(
+                result, meta_file_path, prepared['train_start_date'], prepared['train_end_date']
+            )
+        else:
+            failed += 1
+            info = result['error']
+        record_data.append(build_pretrain_record_data(origin, destination, trial_conf, success, info))
+    # 逐条创建以取得记录 ID（MySQL 的 bulk_create 不回填主键）
+    with transaction.atomic():
+        records = [PretrainRecord.objects.create(**data) for data in record_data]
+
+    summary = {
+        'strategy': strategy,
+        'metric': metric,
+        'evaluations': len(results),
+        'failed': failed,
+        'best': None,
+        'best_record_id': None,
+        'trial_record_ids': [record.id for record in records],
+        'search_dir': os.path.relpath(search_dir, search.PRE_TRAINED_MODEL_DIR),
+    }
+
+    # 5. 最佳配置：完整预训练一次（复用已加载的数据）
+    best = search.select_best_trial(results, metric, final_rung)
+    if best is None:
+        log(f"! 航线 {origin}-{destination} 全部试验失败")
+        return summary
+    best_config = search.trial_config(base_config, candidates[best['trial_id']], best['params'].get('n_estimators'))
+    if progress_callback:
+        progress_callback(95, f"最佳配置 trial {best['trial_id']} 完整预训练")
+    summary['best'] = {
+        'trial_id': best['trial_id'],
+        'value': search.trial_metric(best, metric),
+        'params': best['params'],
+        'arima_order': best_config.get('arima_order') if best_config.get('add_ts_forecast') else None,
+        'train_metrics': best['train_metrics'],
+        'test_metrics': best['test_metrics'],
+    }
+
+    success, result = pretrain_single_route(origin, destination, best_config, route_data=domestic)
+    record = PretrainRecord.objects.create(
+        **build_pretrain_record_data(origin, destination, best_config, success, result)
+    )
+    summary['best_record_id'] = record.id
+    log(f"{'√' if success else '!'} 最佳配置 trial {best['trial_id']}（{metric}）已预训练，记录 ID {record.id}")
+    return summary
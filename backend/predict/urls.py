@@ -21,8 +21,16 @@ from . import views
 urlpatterns = [
     path('forecast/models/', views.get_forecast_models, name='get_forecast_models'),
     path('forecast/run/', views.forecast_route_view, name='forecast_route_view'),
+    path('forecast/batch/', views.forecast_batch_view, name='forecast_batch_view'),
     path('pretrain/model/', views.pretrain_model_request, name='pretrain_model_request'),
+    path('pretrain/bulk/', views.bulk_pretrain_request, name='bulk_pretrain_request'),
+    path('pretrain/search/', views.hyperparameter_search_request, name='hyperparameter_search_request'),
     path('formal/train/', views.formal_train_model, name='formal_train_model'),
     path('pretrain/models/', views.get_pretrain_models, name='get_pretrain_models'),
     path('data/get_flightdata/', views.query_flight_market, name='query_flight_market'),
+    path('data/export_flightdata/', views.export_flight_market, name='export_flight_market'),
+    path('cache/models/', views.model_cache_view, name='model_cache_view'),
+    path('jobs/', views.list_training_jobs, name='list_training_jobs'),
+    path('jobs/<int:job_id>/', views.get_training_job, name='get_training_job'),
+    path('jobs/<int:job_id>/cancel/', views.cancel_training_job, name='cancel_training_job'),
 ]
\ No newline at end of file
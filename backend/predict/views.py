@@ -4,22 +4,31 @@ import pandas as pd
 import numpy as np
 import math
 from datetime import datetime
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_GET, require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
 from typing import Optional
 import copy
 
-from .models import RouteModelInfo, PretrainRecord, FlightMarketRecord
-from show.models import AirportInfo
-from .predictive_algorithm.pretrain_single_route import pretrain_single_route
-from .predictive_algorithm.predict_single_route import predict_single_route
-from predict.predictive_algorithm.hierarchical_alignment import aggregate_quarterly_to_year_by_blocks,linear_reconcile_monthly_to_quarterly,mint_reconcile_monthly_to_quarterly
-from .predictive_algorithm.fromal_train_single_route import formal_train_single_route
+from .models import RouteModelInfo, PretrainRecord, FlightMarketRecord, TrainingJob
+from show.airport_directory import build_info, get_codes_by_city
+from .forecast_service import run_forecast_tasks, run_batch_forecast
+from .training_service import clean_nan_values, run_pretrain, run_formal_train, create_route_model_info, resolve_bulk_routes
+from .jobs import submit_job, cancel_job, job_to_dict, SEARCH_OPTIONS
+from .predictive_algorithm.hyperparameter_search import SEARCH_STRATEGIES, SEARCH_METRICS
+from .market_export import (
+    MAX_PAGE_SIZE, parse_fields, build_market_queryset, decode_cursor, fetch_page,
+    attach_airport_info, stream_ndjson, stream_csv,
+)
+from .predictive_algorithm.model_cache import get_artifact_cache
+from .forecast_cache import invalidate_model as invalidate_forecasts, clear_all as clear_forecasts
+from .forecast_snapshots import precompute_after_training
 
 import warnings
 warnings.filterwarnings("ignore")
@@ -43,58 +52,6 @@ def _to_bool(s: str, default=True):
         return default
     return str(s).lower() in ("1", "true", "t", "yes", "y")
 
-# --- 工具：城市 -> 机场三字码列表（来自 show.AirportInfo）---
-def get_codes_by_city(city_name: str):
-    return list(
-        AirportInfo.objects.filter(city=city_name).values_list("code", flat=True)
-    )
-
-# --- 工具：三字码 -> 城市/机场信息（来自 show.AirportInfo）---
-def build_info(iata_code: str):
-    try:
-        a = AirportInfo.objects.get(code=iata_code.upper())
-        return {"code": a.code, "city": a.city, "province": a.province, "airport": a.airport}
-    except ObjectDoesNotExist:
-        return {"code": iata_code, "city": None, "province": None, "airport": None}
-
-def clean_nan_values(data_dict):
-    """
-    清理字典中的nan值，将nan替换为None，并确保所有数值都是JSON兼容的
-    """
-    cleaned_data = {}
-    for key, value in data_dict.items():
-        if value is None:
-            cleaned_data[key] = None
-        elif isinstance(value, (int, float)):
-            # 检查是否为nan或inf
-            if hasattr(np, 'isnan') and np.isnan(value):
-                cleaned_data[key] = None
-            elif hasattr(np, 'isinf') and np.isinf(value):
-                cleaned_data[key] = None
-            else:
-                # 确保数值在JSON范围内
-                if value > 1e308 or value < -1e308:
-                    cleaned_data[key] = None
-                else:
-                    cleaned_data[key] = float(value)
-        elif isinstance(value, np.floating):
-            # 处理numpy浮点数
-            if np.isnan(value) or np.isinf(value):
-                cleaned_data[key] = None
-            else:
-                # 转换为Python float并检查范围
-                float_val = float(value)
-                if float_val > 1e308 or float_val < -1e308:
-                    cleaned_data[key] = None
-                else:
-                    cleaned_data[key] = float_val
-        elif isinstance(value, np.integer):
-            # 处理numpy整数
-            cleaned_data[key] = int(value)
-        else:
-            cleaned_data[key] = value
-    return cleaned_data
-
 # 获取预测模型函数
 @require_GET
 def get_forecast_models(request):
@@ -220,7 +177,7 @@ def get_forecast_models(request):
 @require_POST
 def forecast_route_view(request):
     """
-       批量预测航线座位数
+       批量预测航线座位数（参数与正式训练后预计算的预测快照一致的任务直接返回快照）
 
        请求体格式：
       {
@@ -295,7 +252,6 @@ def forecast_route_view(request):
         if not predictions:
             return JsonResponse({'error': '缺少预测请求', 'message': '请提供 predictions 数组'}, status=400)
 
-        results = []
         # 获得预测时间长度
         target_granularity = predictions[0].get('time_granularity')
         prediction_periods = predictions[0].get('prediction_periods')
@@ -313,174 +269,87 @@ def forecast_route_view(request):
 
         q_periods = max(1, math.ceil(months / 3))
 
-        for i, pred in enumerate(predictions):
-            try:
-                hierarchy_reconcile = int(pred.get('hierarchy_reconcile', 0))
-
-                if hierarchy_reconcile == 0:
-                    # === 非对齐预测逻辑 ===
-                    required_fields = ['origin_airport', 'destination_airport', 'time_granularity', 'prediction_periods', 'model_id']
-                    missing_fields = [field for field in required_fields if field not in pred]
-                    if missing_fields:
-                        raise ValueError(f'缺少字段: {", ".join(missing_fields)}')
-
-                    if pred['time_granularity'] not in ['yearly', 'quarterly', 'monthly']:
-                        raise ValueError('time_granularity 必须是 yearly, quarterly 或 monthly 之一')
-
-                    if not isinstance(pred['prediction_periods'], int) or pred['prediction_periods'] <= 0:
-                        raise ValueError('prediction_periods 必须是正整数')
-
-                    result = predict_single_route(pred)
-
-                    results.append({
-                        'task_index': i,
-                        'hierarchy_reconcile': 0,
-                        'data': result
-                    })
-
-                else:
-                    # === 层级对齐逻辑 ===
-                    algo = (pred.get('reconcile_algo') or 'linear').lower()
-                    recon_fn = linear_reconcile_monthly_to_quarterly if algo != 'mint' else mint_reconcile_monthly_to_quarterly
-
-                    for f in ['origin_airport', 'destination_airport', 'prediction_periods', 'monthly_model_id', 'quarterly_model_id']:
-                        if f not in pred:
-                            raise ValueError(f'缺少字段: {f}（hierarchy_reconcile=1 时必填）')
-
-                    if not isinstance(pred['prediction_periods'], int) or pred['prediction_periods'] <= 0:
-                        raise ValueError('prediction_periods 必须是正整数')
-
-
-                    base = {
-                        'origin_airport': pred['origin_airport'],
-                        'destination_airport': pred['destination_airport'],
-                    }
-
-                    monthly_req = {
-                        **base,
-                        'time_granularity': 'monthly',
-                        'prediction_periods': months,
-                        'model_id': pred['monthly_model_id'],
-                        # 透传经济尾部处理参数（可选）
-                        'economic_tail_method': pred.get('economic_tail_method'),
-                        'economic_growth_rate': pred.get('economic_growth_rate'),
-                    }
-                    quarterly_req = {
-                        **base,
-                        'time_granularity': 'quarterly',
-                        'prediction_periods': q_periods,
-                        'model_id': pred['quarterly_model_id'],
-                        # 透传经济尾部处理参数（可选）
-                        'economic_tail_method': pred.get('economic_tail_method'),
-                        'economic_growth_rate': pred.get('economic_growth_rate'),
-                    }
-
-                    # 1. 执行两套模型预测
-                    monthly_resp = predict_single_route(monthly_req)
-                    quarterly_resp = predict_single_route(quarterly_req)
-
-                    # 2. 转为DataFrame
-                    pm = monthly_resp.get('prediction_results', {})
-                    hist_m = pm.get('historical_data', []) or []
-                    futu_m = pm.get('future_predictions', []) or []
-                    df_m = pd.DataFrame(
-                        [{'YearMonth': h['time_point'], 'Predicted': h['value'], 'Set': 'History'} for h in hist_m] +
-                        [{'YearMonth': f['time_point'], 'Predicted': f['value'], 'Set': 'Future'} for f in futu_m],
-                        columns=['YearMonth', 'Predicted', 'Set']
-                    )
-
-                    pq = quarterly_resp.get('prediction_results', {})
-                    q_hist = pq.get('historical_data', []) or []
-                    q_futu = pq.get('future_predictions', []) or []
-                    q_all = q_hist + q_futu
-                    df_q = pd.DataFrame(
-                        [{'YearMonth': r['time_point'], 'Predicted': r['value']} for r in q_all],
-                        columns=['YearMonth', 'Predicted']
-                    )
-
-                    # 3. 对齐
-                    df_m_rec = recon_fn(df_m, df_q)
-
-                    # 4. 拆分历史和未来（月度）
-                    df_m_rec['YearMonth'] = pd.to_datetime(df_m_rec['YearMonth'], errors='coerce', format='%Y-%m')
-                    hist_out_m = [
-                        {'time_point': t.strftime('%Y-%m'), 'value': int(v) if pd.notna(v) else None}
-                        for t, v in zip(
-                            df_m_rec.loc[df_m_rec['Set'] == 'History', 'YearMonth'],
-                            df_m_rec.loc[df_m_rec['Set'] == 'History', 'Predicted']
-                        ) if pd.notna(t)
-                    ]
-                    futu_out_m = [
-                        {'time_point': t.strftime('%Y-%m'), 'value': int(round(v)) if pd.notna(v) else None}
-                        for t, v in zip(
-                            df_m_rec.loc[df_m_rec['Set'] == 'Future', 'YearMonth'],
-                            df_m_rec.loc[df_m_rec['Set'] == 'Future', 'Predicted_Reconciled']
-                        ) if pd.notna(t)
-                    ]
-
-                    # 5. 年度聚合（基于季度）
-                    yearly_hist, yearly_futu = aggregate_quarterly_to_year_by_blocks(q_hist, q_futu)
-
-                    # 6. 构造结构 —— 只返回目标粒度
-                    if target_granularity == 'monthly':
-                        selected_item = {
-                            'model_info': {
-                                **(monthly_resp.get('model_info') or {}),
-                                'time_granularity': 'monthly',
-                                'model_id': pred['monthly_model_id']
-                            },
-                            'prediction_results': {
-                                'historical_data': hist_out_m,
-                                'future_predictions': futu_out_m
-                            }
-                        }
-
-                    elif target_granularity == 'quarterly':
-                        selected_item = {
-                            'model_info': {
-                                **(quarterly_resp.get('model_info') or {}),
-                                'time_granularity': 'quarterly',
-                                'model_id': pred['quarterly_model_id']
-                            },
-                            'prediction_results': {
-                                'historical_data': q_hist,
-                                'future_predictions': q_futu
-                            }
-                        }
-
-                    elif target_granularity == 'yearly':
-                        selected_item = {
-                            'model_info': {
-                                **(quarterly_resp.get('model_info') or {}),
-                                'time_granularity': 'yearly',
-                                'model_id': pred['quarterly_model_id']  # 因为年是从季聚合来的
-                            },
-                            'prediction_results': {
-                                'historical_data': yearly_hist,
-                                'future_predictions': yearly_futu
-                            }
-                        }
-
-                    # 添加到最终统一结果中
-                    results.append({
-                        'task_index': i,
-                        'hierarchy_reconcile': 1,
-                        'data': selected_item
-                    })
-
-
-            except Exception as e:
-                import traceback
-                results.append({
-                    'task_index': i,
-                    'error_message': str(e),
-                    'error_type': type(e).__name__,
-                    'traceback': traceback.format_exc(),
-                    'request': pred
-                })
+        # 各任务并发执行，结果按 task_index 顺序返回
+        results = run_forecast_tasks(predictions, target_granularity, months, q_periods)
+
+        return JsonResponse({
+            'success': True,
+            'data': results
+        })
+
+    except json.JSONDecodeError:
+        return JsonResponse({'error': '无效的JSON格式', 'message': '请求体必须是有效的JSON格式'}, status=400)
+    except Exception as e:
+        import traceback
+        return JsonResponse({
+            'error': '服务器内部错误',
+            'message': str(e),
+            'error_type': type(e).__name__,
+            'traceback': traceback.format_exc()
+        }, status=500)
+
+
+@csrf_exempt
+@require_POST
+def forecast_batch_view(request):
+    """
+       多航线批量预测（全网展望）：所有航线按预测步同步推进
+
+       请求体格式：
+      {
+         "time_granularity": "monthly",
+         "prediction_periods": 12,
+         "routes": [                                    // 可选，不传时预测该粒度下所有已有模型的航线
+           {"origin_airport": "CAN", "destination_airport": "PEK"},                      // 使用最新模型
+           {"origin_airport": "CAN", "destination_airport": "PVG", "model_id": "CAN_PVG_20250813233021"}
+         ]
+       }
+
+       返回格式：
+       {
+           "success": true,
+           "count": 2,
+           "failed": 0,
+           "elapsed": 1.23,
+           "data": [
+               {"route": {"origin_airport": "CAN", "destination_airport": "PEK"}, "success": true,
+                "data": {"model_info": {...}, "prediction_results": {...}}},   // 与 forecast/run/ 单任务结果一致
+               {"route": {...}, "success": false, "error": "..."}
+           ]
+       }
+    """
+    try:
+        data = json.loads(request.body)
+        time_granularity = data.get('time_granularity', 'monthly')
+        prediction_periods = data.get('prediction_periods')
+        routes = data.get('routes')
+
+        if time_granularity not in ['yearly', 'quarterly', 'monthly']:
+            return JsonResponse({
+                'error': '不支持的时间粒度',
+                'message': 'time_granularity 必须为 monthly, quarterly 或 yearly'
+            }, status=400)
+        if not isinstance(prediction_periods, int) or prediction_periods <= 0:
+            return JsonResponse({'error': '参数错误', 'message': 'prediction_periods 必须是正整数'}, status=400)
+        if routes is not None:
+            if not isinstance(routes, list) or not routes:
+                return JsonResponse({'error': '参数错误', 'message': 'routes 必须是非空数组'}, status=400)
+            for r in routes:
+                if not isinstance(r, dict) or not r.get('origin_airport') or not r.get('destination_airport'):
+                    return JsonResponse({
+                        'error': '参数错误',
+                        'message': 'routes 中每项都需要 origin_airport 和 destination_airport'
+                    }, status=400)
+
+        start = datetime.now()
+        results = run_batch_forecast(routes, time_granularity, prediction_periods)
+        elapsed = (datetime.now() - start).total_seconds()
 
         return JsonResponse({
             'success': True,
+            'count': len(results),
+            'failed': sum(1 for r in results if not r['success']),
+            'elapsed': round(elapsed, 3),
             'data': results
         })
 
@@ -496,6 +365,24 @@ def forecast_route_view(request):
         }, status=500)
 
 
+def _validate_train_config(config):
+    """校验训练配置中的时间粒度和模型类型，返回错误信息字典或 None"""
+    time_granularity = config.get('time_granularity', 'monthly')
+    if time_granularity not in ['yearly', 'quarterly', 'monthly']:
+        return {
+            'error': '无效的时间粒度',
+            'message': 'time_granularity 必须是 yearly, quarterly 或 monthly 之一'
+        }
+
+    model_type = config.get('model_type', 'lgb')
+    if model_type not in ['lgb', 'xgb']:
+        return {
+            'error': '无效的模型类型',
+            'message': 'model_type 必须是 lgb 或 xgb 之一'
+        }
+    return None
+
+
 # 模型训练请求处理
 @api_view(['POST'])
 @csrf_exempt
@@ -513,6 +400,7 @@ def pretrain_model_request(request):
       - add_ts_forecast: 是否添加时间序列预测
       - arima_order: ARIMA参数 (可选)
       - 其他模型特定参数
+    - async: 为 true 时只创建后台训练任务并立即返回 job_id（可选，默认同步训练）
     
     返回：
     - 成功：训练结果和创建的数据库记录信息
@@ -539,78 +427,30 @@ def pretrain_model_request(request):
                 'message': '请提供训练配置 config'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # 验证时间粒度
-        time_granularity = config.get('time_granularity', 'monthly')
-        if time_granularity not in ['yearly', 'quarterly', 'monthly']:
-            return Response({
-                'error': '无效的时间粒度',
-                'message': 'time_granularity 必须是 yearly, quarterly 或 monthly 之一'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # 验证模型类型
-        model_type = config.get('model_type', 'lgb')
-        if model_type not in ['lgb', 'xgb']:
-            return Response({
-                'error': '无效的模型类型',
-                'message': 'model_type 必须是 lgb 或 xgb 之一'
-            }, status=status.HTTP_400_BAD_REQUEST)
+        # 验证时间粒度和模型类型
+        config_error = _validate_train_config(config)
+        if config_error:
+            return Response(config_error, status=status.HTTP_400_BAD_REQUEST)
         
         print(f"收到训练请求: {origin} -> {destination}")
         # print(f"配置: {config}")
         
-        # 执行模型训练
-        success, result = pretrain_single_route(origin, destination, config)
-        
-        # 准备创建数据库记录的数据
-        record_data = {
-            'origin': origin,
-            'destination': destination,
-            'time_granularity': time_granularity,
-            'step_size': config.get('test_size'),
-            'train_datetime': datetime.now(),
-            'success': success,
-            'use_pretrain': False
-        }
-        
-        # 如果训练成功，添加成功相关的数据
-        if success and isinstance(result, dict):
-            record_data.update({
-                'meta_file_path': result.get('meta_file_path', ''),
-                'train_start_date': result.get('train_start_date'),
-                'train_end_date': result.get('train_end_date'),
-                'train_duration': result.get('train_duration'),
-                'train_mae': result.get('train_mae'),
-                'train_rmse': result.get('train_rmse'),
-                'train_mape': result.get('train_mape'),
-                'train_r2': result.get('train_r2'),
-                'test_mae': result.get('test_mae'),
-                'test_rmse': result.get('test_rmse'),
-                'test_mape': result.get('test_mape'),
-                'test_r2': result.get('test_r2'),
-                'report_pdf': result.get('report_pdf', '')
+        # 异步模式：仅创建训练任务，由 run_training_jobs 后台进程执行
+        if _to_bool(data.get('async'), default=False):
+            job = submit_job(TrainingJob.JOB_PRETRAIN, {
+                'origin': origin,
+                'destination': destination,
+                'config': config
             })
-        else:
-            # 训练失败，设置默认值
-            record_data.update({
-                'meta_file_path': '',
-                'train_start_date': datetime.now().date(),
-                'train_end_date': datetime.now().date(),
-                'train_duration': None,
-                'train_mae': None,
-                'train_rmse': None,
-                'train_mape': None,
-                'train_r2': None,
-                'test_mae': None,
-                'test_rmse': None,
-                'test_mape': None,
-                'test_r2': None,
-                'report_pdf': ''
-            })
-        
-        # 清理数据中的nan值
-        record_data = clean_nan_values(record_data)
-        # print(record_data)
-        pretrain_record = PretrainRecord.objects.create(**record_data)
+            return Response({
+                'message': f'航线 {origin}-{destination} 预训练任务已提交',
+                'job_id': job.id,
+                'status': job.status,
+                'success': True
+            }, status=status.HTTP_202_ACCEPTED)
+
+        # 执行模型训练并写入预训练记录
+        pretrain_record, success, result = run_pretrain(origin, destination, config)
         
         # 构建响应数据
         response_data = {
@@ -688,6 +528,155 @@ def pretrain_model_request(request):
 
 
 
+@api_view(['POST'])
+@csrf_exempt
+def bulk_pretrain_request(request):
+    """
+    多航线批量预训练接口：每条航线创建一个预训练任务，由 run_training_jobs 进程池并行执行
+
+    请求体参数：
+    - routes: 航线列表 [{"origin": "CAN", "destination": "PEK", "config": {...}}, ...]（可选）
+    - filter: 按航线市场数据筛选航线（可选）
+      - origins / destinations: 三字码列表
+      - min_records: 最少记录数
+    - config: 默认训练配置（航线未单独指定 config 时使用）
+    - skip_existing: 跳过已有相同粒度成功预训练记录的航线（默认 false）
+
+    大规模全网刷新请使用 python manage.py bulk_pretrain（批量加载数据、批量写入记录）。
+    """
+    try:
+        data = request.data
+        routes = data.get('routes') or []
+        route_filter = data.get('filter') or None
+        default_config = data.get('config') or {}
+
+        if not routes and not route_filter:
+            return Response({
+                'error': '缺少必要参数',
+                'message': '请提供 routes 或 filter 参数'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        tasks = resolve_bulk_routes(routes=routes, route_filter=route_filter, default_config=default_config)
+
+        for origin, destination, config in tasks:
+            config_error = _validate_train_config(config)
+            if config_error:
+                config_error['message'] = f"航线 {origin}-{destination}: {config_error['message']}"
+                return Response(config_error, status=status.HTTP_400_BAD_REQUEST)
+
+        if _to_bool(data.get('skip_existing'), default=False):
+            existing = set(PretrainRecord.objects.filter(success=True).values_list(
+                'origin', 'destination', 'time_granularity'
+            ))
+            tasks = [
+                (origin, destination, config) for origin, destination, config in tasks
+                if (origin, destination, config.get('time_granularity', 'monthly')) not in existing
+            ]
+
+        with transaction.atomic():
+            jobs = [
+                submit_job(TrainingJob.JOB_PRETRAIN, {
+                    'origin': origin,
+                    'destination': destination,
+                    'config': config
+                })
+                for origin, destination, config in tasks
+            ]
+
+        print(f"收到批量预训练请求: {len(jobs)} 条航线")
+        return Response({
+            'success': True,
+            'message': f'已提交 {len(jobs)} 条航线的预训练任务',
+            'count': len(jobs),
+            'job_ids': [job.id for job in jobs]
+        }, status=status.HTTP_202_ACCEPTED)
+
+    except Exception as e:
+        print(f"处理批量预训练请求时发生错误: {str(e)}")
+        import traceback
+        traceback.print_exc()
+
+        return Response({
+            'error': '系统异常',
+            'message': f'处理批量预训练请求时发生系统异常: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['POST'])
+@csrf_exempt
+def hyperparameter_search_request(request):
+    """
+    单条航线超参数搜索接口：创建超参数搜索任务，由 run_training_jobs 后台进程执行
+
+    请求体参数：
+    - origin / destination: 航线
+    - config: 基础训练配置（time_granularity / model_type / test_size / add_ts_forecast 等，可选）
+    - strategy: grid / random / halving（可选，默认 random）
+    - space: 参数空间 {参数名: 候选值列表或区间}，可含 arima_order（可选，默认内置空间）
+    - n_trials: random / halving 的候选组数（可选，默认 20）
+    - eta / min_resource: 逐次减半参数（可选）
+    - metric: rmse / mae / mape / r2（可选，默认 rmse）
+    - seed / max_grid_trials / workers（可选）
+
+    返回 job_id，通过 jobs/<job_id>/ 查询进度；完成后 result 为搜索摘要，
+    pretrain_record_id 为最佳配置的预训练记录（可直接用于正式训练）
+    """
+    data = request.data
+    origin = str(data.get('origin', '')).upper()
+    destination = str(data.get('destination', '')).upper()
+    config = data.get('config') or {}
+    if not origin or not destination:
+        return Response({
+            'error': '缺少必要参数',
+            'message': '请提供 origin 和 destination 参数'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if not isinstance(config, dict):
+        return Response({'error': '参数错误', 'message': 'config 必须是对象'}, status=status.HTTP_400_BAD_REQUEST)
+    config_error = _validate_train_config(config)
+    if config_error:
+        return Response(config_error, status=status.HTTP_400_BAD_REQUEST)
+
+    options = {key: data.get(key) for key in SEARCH_OPTIONS if data.get(key) is not None}
+    if options.get('strategy', 'random') not in SEARCH_STRATEGIES:
+        return Response({
+            'error': '参数错误',
+            'message': f"strategy 必须是 {', '.join(SEARCH_STRATEGIES)} 之一"
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if options.get('metric', 'rmse') not in SEARCH_METRICS:
+        return Response({
+            'error': '参数错误',
+            'message': f"metric 必须是 {', '.join(SEARCH_METRICS)} 之一"
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if 'space' in options and not isinstance(options['space'], dict):
+        return Response({'error': '参数错误', 'message': 'space 必须是对象'}, status=status.HTTP_400_BAD_REQUEST)
+    for key in ('n_trials', 'workers', 'eta', 'min_resource', 'seed', 'max_grid_trials'):
+        if key not in options:
+            continue
+        try:
+            options[key] = int(options[key])
+        except (TypeError, ValueError):
+            options[key] = None
+        if options[key] is None or (key != 'seed' and options[key] <= 0):
+            return Response({
+                'error': '参数错误',
+                'message': f'{key} 必须是正整数'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+    job = submit_job(TrainingJob.JOB_SEARCH, {
+        'origin': origin,
+        'destination': destination,
+        'config': config,
+        **options
+    })
+    print(f"收到超参数搜索请求: {origin} -> {destination}, 任务 #{job.id}")
+    return Response({
+        'success': True,
+        'message': f'航线 {origin}-{destination} 超参数搜索任务已提交',
+        'job_id': job.id,
+        'status': job.status
+    }, status=status.HTTP_202_ACCEPTED)
+
+
 @api_view(['POST'])
 @csrf_exempt
 def formal_train_model(request):
@@ -697,6 +686,7 @@ def formal_train_model(request):
     请求参数：
     - pretrain_record_id: 预训练模型记录ID
     - remark: 备注信息（可选）
+    - async: 为 true 时只创建后台训练任务并立即返回 job_id（可选，默认同步训练）
     
     流程：
     1. 根据预训练模型ID查找PretrainRecord
@@ -733,75 +723,33 @@ def formal_train_model(request):
                 'message': f'预训练记录 {pretrain_record_id} 训练状态为失败，无法用于正式训练'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # 提取预训练记录中的参数
         origin = pretrain_record.origin
         destination = pretrain_record.destination
-        meta_file_path = pretrain_record.meta_file_path
-        time_granularity = pretrain_record.time_granularity
-        
-        # 提取8个评估指标
-        train_metrics = {
-            'train_mae': pretrain_record.train_mae,
-            'train_rmse': pretrain_record.train_rmse,
-            'train_mape': pretrain_record.train_mape,
-            'train_r2': pretrain_record.train_r2,
-            'test_mae': pretrain_record.test_mae,
-            'test_rmse': pretrain_record.test_rmse,
-            'test_mape': pretrain_record.test_mape,
-            'test_r2': pretrain_record.test_r2,
-        }
-        
-        print(f"开始正式训练模型: {origin}-{destination}, 时间粒度: {time_granularity}")
-        # print(f"使用预训练元数据: {meta_file_path}")
-        
-        success, result = formal_train_single_route(
-            origin=origin,
-            destination=destination,
-            time_granularity=time_granularity,
-            pretrained_metadata_path=meta_file_path
-        )
+
+        # 异步模式：仅创建训练任务，由 run_training_jobs 后台进程执行
+        if _to_bool(request.data.get('async'), default=False):
+            job = submit_job(TrainingJob.JOB_FORMAL, {
+                'pretrain_record_id': pretrain_record.id,
+                'remark': remark
+            }, pretrain_record=pretrain_record)
+            return Response({
+                'success': True,
+                'message': f'航线 {origin}-{destination} 正式训练任务已提交',
+                'job_id': job.id,
+                'status': job.status
+            }, status=status.HTTP_202_ACCEPTED)
+
+        print(f"开始正式训练模型: {origin}-{destination}, 时间粒度: {pretrain_record.time_granularity}")
+
+        success, result = run_formal_train(pretrain_record)
         
         if success:
             # 训练成功，创建RouteModelInfo记录
             try:
-                # 创建RouteModelInfo记录
                 model_id = result["model_id"]
-                
-                # 准备创建记录的数据
-                route_model_data = {
-                    'model_id': model_id,
-                    'origin_airport': origin,
-                    'destination_airport': destination,
-                    'time_granularity': time_granularity,
-                    'train_start_time': result['train_start_time'],
-                    'train_end_time': result['train_end_time'],
-                    'train_datetime': result['train_datetime'],
-                    'meta_file_path': result['meta_file_path'],
-                    'model_file_path': result['model_file_path'],
-                    'raw_data_file_path': result['raw_data_file_path'],
-                    'preprocessor_file_path': result['preprocessor_file_path'],
-                    'feature_builder_file_path': result['feature_builder_file_path'],
-                    # 8个评估指标
-                    'train_mae': train_metrics['train_mae'],
-                    'train_rmse': train_metrics['train_rmse'],
-                    'train_mape': train_metrics['train_mape'],
-                    'train_r2': train_metrics['train_r2'],
-                    'test_mae': train_metrics['test_mae'],
-                    'test_rmse': train_metrics['test_rmse'],
-                    'test_mape': train_metrics['test_mape'],
-                    'test_r2': train_metrics['test_r2'],
-                    'remark': remark,
-                    'pretrain_record': pretrain_record
-                }
-                
-                # 清理数据中的nan值
-                route_model_data = clean_nan_values(route_model_data)
-                
-                route_model_info = RouteModelInfo.objects.create(**route_model_data)
-                
-                # 更新PretrainRecord的use_pretrain为True
-                pretrain_record.use_pretrain = True
-                pretrain_record.save()
+                route_model_info = create_route_model_info(pretrain_record, remark, result)
+                # 可选：提交预测快照任务，由 run_training_jobs 执行器计算
+                snapshot_job = precompute_after_training(route_model_info)
                 
                 # print(f"正式训练成功！创建RouteModelInfo记录: {model_id}")
                 
@@ -810,7 +758,8 @@ def formal_train_model(request):
                     'message': f'航线 {origin}-{destination} 正式训练成功',
                     'model_id': model_id,
                     'route_model_info_id': route_model_info.model_id,
-                    'pretrain_record_updated': True
+                    'pretrain_record_updated': True,
+                    'snapshot_job_id': snapshot_job.id if snapshot_job else None
                 }, status=status.HTTP_200_OK)
                 
             except Exception as create_error:
@@ -961,66 +910,51 @@ def get_pretrain_models(request):
 
 def query_flight_market(request):
     """
-    查询航线市场数据（直接查表，不做聚合，返回前1000条，按 year_month 升序）
+    查询航线市场数据
 
     参数（可选，未传则全选）:
     - origin: 起点机场三字码，支持逗号分隔
     - destination: 终点机场三字码，支持逗号分隔
     - start_date: 开始日期 (YYYY-MM 或 YYYY-MM-DD)
     - end_date: 结束日期 (YYYY-MM 或 YYYY-MM-DD)
+    - region: 区域
+    - fields: 返回列，逗号分隔（默认返回全部常用列）
+
+    分页（传 page_size 或 cursor 时启用键集分页，按 year_month, id 升序）:
+    - page_size: 每页条数（最大 5000，默认 1000）
+    - cursor: 上一页返回的 next_cursor
+
+    未传分页参数时保持原行为：直接查表去重，返回前1000条，按 year_month 升序
     """
     try:
-        qs = FlightMarketRecord.objects.all()
-
-        # 参数
-        origin = request.GET.get("origin")
-        destination = request.GET.get("destination")
-        start_date = request.GET.get("start_date")
-        end_date = request.GET.get("end_date")
-
-        if origin:
-            qs = qs.filter(origin__in=[x.strip().upper() for x in origin.split(",") if x.strip()])
-        if destination:
-            qs = qs.filter(destination__in=[x.strip().upper() for x in destination.split(",") if x.strip()])
-
-        start_month = _to_year_month(start_date)
-        end_month = _to_year_month(end_date)
-        if start_month and end_month:
-            qs = qs.filter(year_month__gte=start_month, year_month__lte=end_month)
-        elif start_month:
-            qs = qs.filter(year_month__gte=start_month)
-        elif end_month:
-            qs = qs.filter(year_month__lte=end_month)
+        try:
+            fields = parse_fields(request.GET.get("fields"))
+        except ValueError as e:
+            return JsonResponse({"success": False, "error": "参数错误", "message": str(e)}, status=400)
+
+        qs = build_market_queryset(request.GET)
+
+        if request.GET.get("page_size") or request.GET.get("cursor"):
+            try:
+                page_size = min(max(int(request.GET.get("page_size", 1000)), 1), MAX_PAGE_SIZE)
+                cursor = decode_cursor(request.GET["cursor"]) if request.GET.get("cursor") else None
+            except ValueError as e:
+                return JsonResponse({"success": False, "error": "参数错误", "message": str(e)}, status=400)
+
+            rows, next_cursor = fetch_page(qs, fields, cursor=cursor, page_size=page_size)
+            data = [attach_airport_info(r) for r in rows]
+            return JsonResponse({
+                "success": True,
+                "count": len(data),
+                "data": data,
+                "next_cursor": next_cursor,
+            }, status=200)
 
         # 排序 + 限制
-        records = qs.values(
-            "year_month",
-            "origin", "destination",
-            "distance_km",
-            "route_total_flights", "route_total_seats",
-            "route_total_flight_time", "route_avg_flight_time",
-            "con_total_est_pax", "first", "business", "premium",
-            "full_y", "disc_y",
-            "avg_yield", "avg_first", "avg_business", "avg_premium",
-            "avg_full_y", "avg_disc_y",
-            "region",
-            "total_est_pax", "local_est_pax", "behind_est_pax",
-            "bridge_est_pax", "beyond_est_pax",
-            "avg_fare_usd", "local_fare", "behind_fare",
-            "bridge_fare", "beyond_fare",
-            "o_gdp", "o_population", "third_industry_x",
-            "o_revenue", "o_retail", "o_labor", "o_air_traffic",
-            "d_gdp", "d_population", "third_industry_y",
-            "d_revenue", "d_retail", "d_labor", "d_air_traffic",
-        ).distinct().order_by("year_month")[:1000]
+        records = qs.values(*fields).distinct().order_by("year_month")[:1000]
 
         # 转换 origin / destination 三字码 -> 机场信息
-        data = []
-        for r in records:
-            r = dict(r)  # values() 返回的是 dict-like
-            r["origin"] = build_info(r["origin"])
-            r["destination"] = build_info(r["destination"])
-            data.append(r)
+        data = [attach_airport_info(dict(r)) for r in records]
 
         return JsonResponse({
             "success": True,
@@ -1038,5 +972,147 @@ def query_flight_market(request):
         }, status=500)
 
 
+@require_GET
+def export_flight_market(request):
+    """
+    流式导出航线市场数据（不限条数）
+
+    参数：
+    - format: ndjson（默认）或 csv
+    - origin / destination / start_date / end_date / region / fields: 同 query_flight_market
+    - airport_info: 是否附带机场信息（默认 true；ndjson 替换为机场信息对象，csv 追加城市/机场名列）
+    - batch_size: 每批查询条数（默认 2000，最大 5000）
+    """
+    export_format = request.GET.get("format", "ndjson").lower()
+    if export_format not in ("ndjson", "csv"):
+        return JsonResponse({"error": "参数错误", "message": "format 必须是 ndjson 或 csv"}, status=400)
+
+    try:
+        fields = parse_fields(request.GET.get("fields"))
+        batch_size = min(max(int(request.GET.get("batch_size", 2000)), 1), MAX_PAGE_SIZE)
+    except ValueError as e:
+        return JsonResponse({"error": "参数错误", "message": str(e)}, status=400)
+
+    qs = build_market_queryset(request.GET)
+    airport_info = _to_bool(request.GET.get("airport_info"), default=True)
+
+    if export_format == "csv":
+        response = StreamingHttpResponse(
+            stream_csv(qs, fields, airport_info=airport_info, batch_size=batch_size),
+            content_type="text/csv; charset=utf-8",
+        )
+        response["Content-Disposition"] = 'attachment; filename="flight_market.csv"'
+    else:
+        response = StreamingHttpResponse(
+            stream_ndjson(qs, fields, airport_info=airport_info, batch_size=batch_size),
+            content_type="application/x-ndjson; charset=utf-8",
+        )
+    return response
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAdminUser])
+def model_cache_view(request):
+    """
+    模型文件缓存管理接口（仅限管理员 is_staff 用户）
+
+    - GET: 返回缓存统计（条目数、字节数、命中/未命中次数等）
+    - POST: 使缓存失效（同时使该模型的预测结果缓存失效），请求体 {"model_id": "CAN_PEK_20250813233020"}；
+      不传 model_id 则清空全部
+    """
+    cache = get_artifact_cache()
+    try:
+        if request.method == 'GET':
+            return Response({'success': True, 'data': cache.stats()})
+
+        model_id = request.data.get('model_id')
+        removed = cache.invalidate(model_id)
+        if model_id:
+            invalidate_forecasts(model_id)
+        else:
+            clear_forecasts()
+        return Response({
+            'success': True,
+            'message': f'已移除 {removed} 个缓存条目',
+            'removed': removed,
+            'data': cache.stats()
+        })
+
+    except Exception as e:
+        return Response({
+            'error': '服务器内部错误',
+            'message': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@require_GET
+def list_training_jobs(request):
+    """
+    训练任务列表
+
+    参数：
+    - status: 任务状态（可选）
+    - job_type: pretrain / formal / snapshot / search（可选）
+    - limit: 返回条数，默认 50，最大 500
+    """
+    try:
+        jobs = TrainingJob.objects.all()
+        job_status = request.GET.get('status')
+        job_type = request.GET.get('job_type')
+        if job_status:
+            jobs = jobs.filter(status=job_status)
+        if job_type:
+            jobs = jobs.filter(job_type=job_type)
+
+        try:
+            limit = min(max(int(request.GET.get('limit', 50)), 1), 500)
+        except ValueError:
+            limit = 50
+
+        jobs_data = [job_to_dict(job) for job in jobs.order_by('-created_at')[:limit]]
+        return JsonResponse({'success': True, 'jobs': jobs_data, 'count': len(jobs_data)})
+
+    except Exception as e:
+        return JsonResponse({
+            'error': '服务器内部错误',
+            'message': str(e)
+        }, status=500)
+
+
+@require_GET
+def get_training_job(request, job_id):
+    """查询单个训练任务的状态、进度和结果"""
+    try:
+        job = TrainingJob.objects.get(id=job_id)
+    except TrainingJob.DoesNotExist:
+        return JsonResponse({
+            'error': '训练任务不存在',
+            'message': f'ID为 {job_id} 的训练任务不存在'
+        }, status=404)
+    return JsonResponse({'success': True, 'data': job_to_dict(job)})
+
 
+@csrf_exempt
+@require_POST
+def cancel_training_job(request, job_id):
+    """取消训练任务：排队中的任务立即取消，运行中的任务在下一个阶段检查点中止"""
+    try:
+        job = TrainingJob.objects.get(id=job_id)
+    except TrainingJob.DoesNotExist:
+        return JsonResponse({
+            'error': '训练任务不存在',
+            'message': f'ID为 {job_id} 的训练任务不存在'
+        }, status=404)
 
+    if job.status in TrainingJob.FINISHED_STATUSES:
+        return JsonResponse({
+            'error': '任务已结束',
+            'message': f'训练任务 {job_id} 已处于 {job.status} 状态，无法取消'
+        }, status=400)
+
+    job = cancel_job(job)
+    return JsonResponse({
+        'success': True,
+        'message': '任务已取消' if job.status == TrainingJob.STATUS_CANCELLED else '已请求取消，任务将在当前阶段结束后停止',
+        'data': job_to_dict(job)
+    })
@@ -0,0 +1,45 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections
+
+
+def init_worker(initializer=None, initargs=()):
+    """执行进程初始化（spawn 方式启动，需要重新加载 Django），随后执行调用方的初始化函数"""
+    import django
+    django.setup()
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def create_process_pool(workers, initializer=None, initargs=()):
+    """
+    创建训练用进程池
+
+    使用 spawn 启动：子进程不继承父进程的数据库连接和 OpenMP 线程状态。
+    本模块不导入任何 model，可以在 Django 初始化之前被子进程加载。
+
+    Args:
+        workers (int): 进程数
+        initializer / initargs: 每个进程启动时执行一次（如超参数搜索把航线特征矩阵传给进程，各试验只传参数）
+    """
+    connections.close_all()
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_worker,
+        initargs=(initializer, initargs)
+    )
+
+
+def terminate_process_pool(executor):
+    """
+    立即关闭进程池：取消排队中的任务并终止全部子进程（用于回收被超时任务占满的预测进程池）
+
+    ProcessPoolExecutor 没有公开终止子进程的接口，这里读取其 _processes；接口变化时退化为只关闭不终止
+    """
+    processes = list((getattr(executor, '_processes', None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
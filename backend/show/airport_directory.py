@@ -0,0 +1,118 @@
+"""
+机场目录：进程内缓存的 AirportInfo 索引（三字码 -> 机场信息，城市 -> 三字码列表）
+
+- show / predict 的城市、机场查询函数统一走这里，请求内不再逐条查询 AirportInfo
+- 首次使用时才加载（不在 AppConfig.ready() 中访问数据库，migrate 等管理命令、进程池 worker 不会触发查询）
+- 本进程内 AirportInfo 保存 / 删除时通过信号立即失效（见 show.signals）
+- 其他进程（导入脚本、其他 worker）的修改依赖 TTL 过期后重新加载
+"""
+import time
+import threading
+
+from django.conf import settings
+
+
+class AirportDirectory:
+    """AirportInfo 的只读内存索引，整表加载，失效后下次访问时重新加载"""
+
+    def __init__(self, ttl=300):
+        """
+        Args:
+            ttl (float): 缓存有效期（秒），<=0 表示只依赖信号失效
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._by_code = {}
+        self._by_city = {}
+        self._loaded_at = None
+
+    def _expired(self):
+        if self._loaded_at is None:
+            return True
+        return self.ttl > 0 and time.monotonic() - self._loaded_at > self.ttl
+
+    def load(self):
+        """从数据库整表加载并替换索引"""
+        from .models import AirportInfo
+
+        by_code, by_city = {}, {}
+        for code, city, airport, province in AirportInfo.objects.values_list("code", "city", "airport", "province"):
+            by_code[code.upper()] = {"code": code, "city": city, "province": province, "airport": airport}
+            by_city.setdefault(city, []).append(code)
+
+        with self._lock:
+            self._by_code, self._by_city = by_code, by_city
+            self._loaded_at = time.monotonic()
+        print(f"🗂️ 机场目录已加载: {len(by_code)} 个机场，{len(by_city)} 个城市")
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_loaded(self):
+        if self._expired():
+            with self._lock:
+                need_load = self._expired()
+            if need_load:
+                self.load()
+
+    def info(self, iata_code):
+        """三字码 -> {"code", "city", "province", "airport"}，未知三字码时城市/机场为 None"""
+        self._ensure_loaded()
+        info = self._by_code.get(str(iata_code).upper()) if iata_code else None
+        if info is None:
+            return {"code": iata_code, "city": None, "province": None, "airport": None}
+        return dict(info)
+
+    def codes_for_city(self, city_name):
+        """城市 -> 机场三字码列表"""
+        self._ensure_loaded()
+        return list(self._by_city.get(city_name, []))
+
+    def codes_for_cities(self, city_names):
+        """多个城市 -> 机场三字码列表（按城市顺序拼接）"""
+        self._ensure_loaded()
+        codes = []
+        for city in city_names:
+            codes.extend(self._by_city.get(city, []))
+        return codes
+
+
+_directory = None
+_directory_lock = threading.Lock()
+
+
+def get_airport_directory():
+    """获取进程级机场目录（参数取自 settings.AIRPORT_DIRECTORY）"""
+    global _directory
+    if _directory is None:
+        with _directory_lock:
+            if _directory is None:
+                conf = getattr(settings, 'AIRPORT_DIRECTORY', {}) or {}
+                _directory = AirportDirectory(ttl=conf.get('TTL', 300))
+    return _directory
+
+
+# ---- 城市 / 机场查询函数（show 与 predict 共用）----
+
+# 根据 IATA 三字码构建映射信息
+def build_info(iata_code):
+    return get_airport_directory().info(iata_code)
+
+
+# 获取城市下的所有机场的三字码
+def get_codes_by_city(city_name):
+    return get_airport_directory().codes_for_city(city_name)
+
+
+# 获取城市名
+def get_city_name(code):
+    return get_airport_directory().info(code)["city"]
+
+
+# 根据机场三字码返回城市名和机场名（未知三字码时均返回三字码本身）
+def get_city_airport(iata_code):
+    info = get_airport_directory().info(iata_code)
+    if info["city"] is None:
+        return iata_code, iata_code
+    return info["city"], info["airport"]
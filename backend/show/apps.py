@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ShowConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'show'
+
+    def ready(self):
+        from . import signals  # noqa: F401  注册 AirportInfo 变更信号
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "重建看板汇总表（CityMonthlyStat / NationalMonthlyStat）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--periods', nargs='*', default=None,
+                            help='仅重算指定年月（YYYY-MM），默认重建全部')
+
+    def handle(self, *args, **options):
+        from show.rollups import refresh_monthly_rollups, rebuild_all_rollups
+
+        if options['periods']:
+            periods = []
+            for value in options['periods']:
+                try:
+                    year_str, month_str = value.split('-')
+                    periods.append((int(year_str), int(month_str)))
+                except ValueError:
+                    raise CommandError(f"年月格式应为 YYYY-MM: {value}")
+            stats = refresh_monthly_rollups(periods)
+        else:
+            stats = rebuild_all_rollups()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"汇总表重建完成: {stats['months']} 个月，城市对 {stats['city_rows']} 行，全国 {stats['national_rows']} 行"
+        ))
@@ -0,0 +1,54 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('show', '0007_airportinfo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CityMonthlyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField(help_text='年份')),
+                ('month', models.IntegerField(help_text='月份')),
+                ('origin_city', models.CharField(blank=True, help_text='出发城市（机场信息缺失时为空）', max_length=100, null=True)),
+                ('destination_city', models.CharField(blank=True, help_text='到达城市（机场信息缺失时为空）', max_length=100, null=True)),
+                ('passenger_volume', models.FloatField(default=0, help_text='城市对总客运量')),
+                ('Route_Total_Seats', models.FloatField(default=0, help_text='城市对总座位数')),
+                ('Route_Total_Flights', models.BigIntegerField(default=0, help_text='城市对总航班数量')),
+                ('route_count', models.IntegerField(default=0, help_text='参与汇总的机场对航线数')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': '城市对月度汇总',
+                'verbose_name_plural': '城市对月度汇总',
+                'unique_together': {('year', 'month', 'origin_city', 'destination_city')},
+                'indexes': [
+                    models.Index(fields=['year', 'month', 'origin_city'], name='show_citymo_year_d666b8_idx'),
+                    models.Index(fields=['year', 'month', 'destination_city'], name='show_citymo_year_5a74fc_idx'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='NationalMonthlyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField(help_text='年份')),
+                ('month', models.IntegerField(help_text='月份')),
+                ('passenger_volume', models.FloatField(default=0, help_text='全国总客运量')),
+                ('Route_Total_Seats', models.FloatField(default=0, help_text='全国总座位数')),
+                ('Route_Total_Flights', models.BigIntegerField(default=0, help_text='全国总航班数量')),
+                ('route_count', models.IntegerField(default=0, help_text='参与汇总的机场对航线数')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': '全国月度汇总',
+                'verbose_name_plural': '全国月度汇总',
+                'ordering': ['year', 'month'],
+                'unique_together': {('year', 'month')},
+            },
+        ),
+    ]
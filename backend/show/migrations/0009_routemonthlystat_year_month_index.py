@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('show', '0008_citymonthlystat_nationalmonthlystat'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='routemonthlystat',
+            index=models.Index(fields=['year', 'month'], name='show_routem_year_3f155e_idx'),
+        ),
+    ]
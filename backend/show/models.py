@@ -19,6 +19,10 @@ class RouteMonthlyStat(models.Model):
 
     class Meta:
         unique_together = ("origin_code", "destination_code", "year", "month")
+        indexes = [
+            # 看板按年月范围查询 / 聚合（唯一约束以航线开头，无法用于年月范围）
+            models.Index(fields=["year", "month"]),
+        ]
         ordering = ["-year", "-month"]
         verbose_name = "航线月度统计"
         verbose_name_plural = "航线月度统计"
@@ -33,4 +37,51 @@ class AirportInfo(models.Model):
     province = models.CharField(max_length=100)
 
     def __str__(self):
-        return f"{self.city} - {self.airport} ({self.code})"
\ No newline at end of file
+        return f"{self.city} - {self.airport} ({self.code})"
+
+# 看板汇总表（由 show.rollups 从 RouteMonthlyStat 增量刷新，看板接口直接读取）
+class CityMonthlyStat(models.Model):
+    year = models.IntegerField(help_text="年份")
+    month = models.IntegerField(help_text="月份")
+    origin_city = models.CharField(max_length=100, null=True, blank=True, help_text="出发城市（机场信息缺失时为空）")
+    destination_city = models.CharField(max_length=100, null=True, blank=True, help_text="到达城市（机场信息缺失时为空）")
+
+    passenger_volume = models.FloatField(default=0, help_text="城市对总客运量")
+    Route_Total_Seats = models.FloatField(default=0, help_text="城市对总座位数")
+    Route_Total_Flights = models.BigIntegerField(default=0, help_text="城市对总航班数量")
+    route_count = models.IntegerField(default=0, help_text="参与汇总的机场对航线数")
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("year", "month", "origin_city", "destination_city")
+        indexes = [
+            models.Index(fields=["year", "month", "origin_city"]),
+            models.Index(fields=["year", "month", "destination_city"]),
+        ]
+        verbose_name = "城市对月度汇总"
+        verbose_name_plural = "城市对月度汇总"
+
+    def __str__(self):
+        return f"{self.origin_city} → {self.destination_city} - {self.year}-{self.month:02d}"
+
+
+class NationalMonthlyStat(models.Model):
+    year = models.IntegerField(help_text="年份")
+    month = models.IntegerField(help_text="月份")
+
+    passenger_volume = models.FloatField(default=0, help_text="全国总客运量")
+    Route_Total_Seats = models.FloatField(default=0, help_text="全国总座位数")
+    Route_Total_Flights = models.BigIntegerField(default=0, help_text="全国总航班数量")
+    route_count = models.IntegerField(default=0, help_text="参与汇总的机场对航线数")
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("year", "month")
+        ordering = ["year", "month"]
+        verbose_name = "全国月度汇总"
+        verbose_name_plural = "全国月度汇总"
+
+    def __str__(self):
+        return f"全国 - {self.year}-{self.month:02d}"
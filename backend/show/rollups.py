@@ -0,0 +1,155 @@
+"""
+看板汇总表刷新
+
+CityMonthlyStat / NationalMonthlyStat 由 RouteMonthlyStat 按 (年, 月) 整月重算：
+- 导入脚本写入原始数据后调用 refresh_monthly_rollups(受影响的年月)
+- AirportInfo 城市映射变化后调用 rebuild_all_rollups()
+
+看板接口按月份判断是否使用汇总表（has_rollup / rollup_periods / missing_periods），尚未生成汇总的月份读原始表，
+部署后未执行 rebuild_show_rollups 时，增量导入只刷新的个别月份不会遮蔽其余历史月份
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Sum, Count, OuterRef, Subquery, Q
+
+from .models import RouteMonthlyStat, AirportInfo, CityMonthlyStat, NationalMonthlyStat
+
+
+def _city_of(code_field):
+    """机场三字码 -> 城市（数据库子查询，机场信息缺失时为 NULL）"""
+    return Subquery(AirportInfo.objects.filter(code=OuterRef(code_field)).values('city')[:1])
+
+
+_SUMS = {
+    'volume': Sum('passenger_volume'),
+    'seats': Sum('Route_Total_Seats'),
+    'flights': Sum('Route_Total_Flights'),
+    'routes': Count('id'),
+}
+
+
+def has_rollup(year, month):
+    """
+    指定年月的汇总是否已生成
+
+    汇总表按月刷新（增量导入只刷新导入的月份），看板接口按月判断：
+    已生成汇总的月份读汇总表，其余月份回退到原始表聚合
+    """
+    return NationalMonthlyStat.objects.filter(year=year, month=month).exists()
+
+
+def rollup_periods():
+    """已生成汇总的 (year, month) 集合（全国汇总每月一行）"""
+    return set(NationalMonthlyStat.objects.values_list('year', 'month'))
+
+
+def missing_periods(end, start=None, covered=None):
+    """
+    [start, end] 范围内尚未生成汇总的 (year, month) 集合
+
+    按月份序列直接计算，不再对原始表做 DISTINCT (year, month) 扫描；
+    start 为 None（全部历史）时从原始表最早的年月开始（(year, month) 索引上取一行）
+
+    :param end: (year, month) 截止年月（含）
+    :param start: (year, month) 起始年月（含），None 表示全部历史
+    :param covered: 已生成汇总的年月集合，默认读取 rollup_periods()
+    """
+    if covered is None:
+        covered = rollup_periods()
+    earliest = RouteMonthlyStat.objects.order_by('year', 'month').values_list('year', 'month').first()
+    if earliest is None:
+        return set()
+    if start is None or tuple(start) < tuple(earliest):
+        start = earliest
+
+    missing = set()
+    end_index = end[0] * 12 + end[1] - 1
+    for index in range(start[0] * 12 + start[1] - 1, end_index + 1):
+        period = (index // 12, index % 12 + 1)
+        if period not in covered:
+            missing.add(period)
+    return missing
+
+
+def periods_q(periods, year_field='year', month_field='month'):
+    """(year, month) 集合 -> Q 条件（同一年份合并为 month__in）"""
+    by_year = defaultdict(set)
+    for year, month in periods:
+        by_year[year].add(month)
+    q = Q(pk__in=[])
+    for year in sorted(by_year):
+        q |= Q(**{year_field: year, f"{month_field}__in": sorted(by_year[year])})
+    return q
+
+
+def refresh_monthly_rollups(periods, batch_size=1000):
+    """
+    重算指定年月的城市对汇总与全国汇总（整月删除后重建，同一年份在一个事务内完成）
+
+    :param periods: 可迭代的 (year, month)
+    :return: {'months': 月份数, 'city_rows': 城市对汇总行数, 'national_rows': 全国汇总行数}
+    """
+    by_year = defaultdict(set)
+    for year, month in periods:
+        by_year[int(year)].add(int(month))
+
+    stats = {'months': 0, 'city_rows': 0, 'national_rows': 0}
+    for year in sorted(by_year):
+        months = sorted(by_year[year])
+        base = RouteMonthlyStat.objects.filter(year=year, month__in=months)
+
+        city_rows = (
+            base.annotate(o_city=_city_of('origin_code'), d_city=_city_of('destination_code'))
+            .values('month', 'o_city', 'd_city')
+            .annotate(**_SUMS)
+            .order_by()
+        )
+        city_objs = [
+            CityMonthlyStat(
+                year=year,
+                month=r['month'],
+                origin_city=r['o_city'],
+                destination_city=r['d_city'],
+                passenger_volume=r['volume'] or 0,
+                Route_Total_Seats=r['seats'] or 0,
+                Route_Total_Flights=r['flights'] or 0,
+                route_count=r['routes'],
+            )
+            for r in city_rows
+        ]
+        national_objs = [
+            NationalMonthlyStat(
+                year=year,
+                month=r['month'],
+                passenger_volume=r['volume'] or 0,
+                Route_Total_Seats=r['seats'] or 0,
+                Route_Total_Flights=r['flights'] or 0,
+                route_count=r['routes'],
+            )
+            for r in base.values('month').annotate(**_SUMS).order_by()
+        ]
+
+        with transaction.atomic():
+            CityMonthlyStat.objects.filter(year=year, month__in=months).delete()
+            NationalMonthlyStat.objects.filter(year=year, month__in=months).delete()
+            CityMonthlyStat.objects.bulk_create(city_objs, batch_size=batch_size)
+            NationalMonthlyStat.objects.bulk_create(national_objs, batch_size=batch_size)
+
+        stats['months'] += len(months)
+        stats['city_rows'] += len(city_objs)
+        stats['national_rows'] += len(national_objs)
+        print(f"📊 汇总表已刷新: {year} 年 {months} 月，城市对 {len(city_objs)} 行")
+
+    return stats
+
+
+def rebuild_all_rollups(batch_size=1000):
+    """按原始表现有的全部年月重建汇总表，并清理原始表中已不存在的年月"""
+    periods = set(RouteMonthlyStat.objects.values_list('year', 'month').distinct())
+    stale = set(NationalMonthlyStat.objects.values_list('year', 'month')) | \
+        set(CityMonthlyStat.objects.values_list('year', 'month').distinct())
+    for year, month in stale - periods:
+        CityMonthlyStat.objects.filter(year=year, month=month).delete()
+        NationalMonthlyStat.objects.filter(year=year, month=month).delete()
+    return refresh_monthly_rollups(periods, batch_size=batch_size)
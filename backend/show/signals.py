@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import AirportInfo
+from .airport_directory import get_airport_directory
+
+
+# AirportInfo 变化时使本进程的机场目录失效，下次访问时重新加载
+@receiver(post_save, sender=AirportInfo)
+@receiver(post_delete, sender=AirportInfo)
+def invalidate_airport_directory(sender, **kwargs):
+    get_airport_directory().invalidate()
@@ -1,3 +1,30 @@
 from django.test import TestCase
 
-# Create your tests here.
+from .models import RouteMonthlyStat
+from .rollups import missing_periods
+
+
+class MissingPeriodsTests(TestCase):
+    """看板汇总缺失月份：按月份序列计算，不早于原始数据的最早年月"""
+
+    def setUp(self):
+        for year, month in ((2023, 11), (2024, 2)):
+            RouteMonthlyStat.objects.create(origin_code='CAN', destination_code='PEK', year=year, month=month)
+
+    def test_spans_year_boundary(self):
+        self.assertEqual(
+            missing_periods((2024, 2), start=(2023, 11), covered={(2023, 12)}),
+            {(2023, 11), (2024, 1), (2024, 2)}
+        )
+
+    def test_all_history_starts_at_earliest_month(self):
+        self.assertEqual(
+            missing_periods((2024, 1), covered=set()),
+            {(2023, 11), (2023, 12), (2024, 1)}
+        )
+        self.assertEqual(missing_periods((2024, 1), start=(2020, 1), covered=set()),
+                         {(2023, 11), (2023, 12), (2024, 1)})
+
+    def test_empty_table_has_nothing_missing(self):
+        RouteMonthlyStat.objects.all().delete()
+        self.assertEqual(missing_periods((2024, 1), covered=set()), set())
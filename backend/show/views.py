@@ -2,57 +2,115 @@ from django.shortcuts import render
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from .models import RouteMonthlyStat, AirportInfo
+from .models import RouteMonthlyStat, AirportInfo, CityMonthlyStat, NationalMonthlyStat
 from .serializers import  RouteMonthlyStatSerializer
+from .rollups import has_rollup, rollup_periods, missing_periods, periods_q
+from .airport_directory import build_info, get_codes_by_city, get_city_name, get_city_airport
 from django.db.models import Sum, Q, Count
 from django.core.exceptions import ObjectDoesNotExist
 import os
 import json
 from collections import defaultdict
 
-# 公共：根据 IATA 三字码构建映射信息（从数据库获取）
-def build_info(iata_code):
-    try:
-        info = AirportInfo.objects.get(code=iata_code.upper())
-        return {
-            "code": info.code,
-            "city": info.city,
-            "province": info.province,
-            "airport": info.airport
-        }
-    except ObjectDoesNotExist:
-        return {
-            "code": iata_code,
-            "city": None,
-            "province": None,
-            "airport": None
-        }
 
-# 获取城市下的所有机场的三字码
-def get_codes_by_city(city_name):
-    codes = list(
-        AirportInfo.objects.filter(city=city_name).values_list("code", flat=True)
-    )
-    print(f"🔍 查找城市 '{city_name}' 的机场代码，找到: {codes}")
-    return codes
+"""下面是看板部分所需的函数"""
+# 城市列表 -> 机场三字码过滤条件（子查询；城市为 None 表示机场信息表中不存在的三字码）
+def _codes_of_cities_q(field, cities):
+    known = [c for c in cities if c is not None]
+    q = Q(**{f"{field}__in": AirportInfo.objects.filter(city__in=known).values("code")})
+    if None in cities:
+        q |= ~Q(**{f"{field}__in": AirportInfo.objects.values("code")})
+    return q
+
+# 机场对航线 -> 城市对总航班量 & 机场对明细
+def _aggregate_city_pairs(route_rows):
+    city_pair_total = defaultdict(int)
+    city_pair_detail = defaultdict(list)
 
-# 获取城市名
-def get_city_name(code):
-    try:
-        return AirportInfo.objects.get(code=code.upper()).city
-    except ObjectDoesNotExist:
-        return None
+    for r in route_rows:
+        o = build_info(r["origin_code"])
+        d = build_info(r["destination_code"])
+        flights = r["Route_Total_Flights"] or 0
+        if flights <= 0:
+            continue
 
-# 根据机场三字码返回城市名和机场名
-def get_city_airport(iata_code):
-    try:
-        info = AirportInfo.objects.get(code=iata_code.upper())
-        return info.city, info.airport
-    except ObjectDoesNotExist:
-        return iata_code, iata_code
+        key = (o["city"], d["city"])
+        city_pair_total[key] += flights
+        city_pair_detail[key].append({
+            "from_airport": o["airport"],
+            "to_airport": d["airport"],
+            "flights": flights
+        })
+    return city_pair_total, city_pair_detail
+
+# 航线分布：按总航班量倒序取前100城市对，并附机场对明细
+def _route_distribution(year, month, filters, origin_cities=None, dest_cities=None):
+    """
+    - 当月汇总已生成时：城市对排名直接读 CityMonthlyStat，原始表只查询前100城市对涉及城市的机场航线作为明细
+    - 当月汇总未生成时：读取当月全部符合条件的原始航线，在内存中聚合
+    filters 为原始表上的三字码过滤条件，origin_cities / dest_cities 为对应的城市列表（None 表示不限制）
+    """
+    if not has_rollup(year, month):
+        route_rows = list(
+            RouteMonthlyStat.objects
+            .filter(**filters)
+            .values("origin_code", "destination_code", "Route_Total_Flights")
+        )
+        print(f"📦 取到有效航线条数: {len(route_rows)}")
+        city_pair_total, city_pair_detail = _aggregate_city_pairs(route_rows)
+        sorted_pairs = sorted(city_pair_total.items(), key=lambda x: x[1], reverse=True)[:100]
+    else:
+        top_qs = CityMonthlyStat.objects.filter(year=year, month=month, Route_Total_Flights__gt=0)
+        if origin_cities is not None:
+            top_qs = top_qs.filter(origin_city__in=origin_cities)
+        if dest_cities is not None:
+            top_qs = top_qs.filter(destination_city__in=dest_cities)
+        top = list(
+            top_qs.order_by("-Route_Total_Flights")
+            .values_list("origin_city", "destination_city", "Route_Total_Flights")[:100]
+        )
+        print(f"📦 汇总表取到城市对: {len(top)}")
+        if not top:
+            return []
+
+        route_rows = list(
+            RouteMonthlyStat.objects
+            .filter(**filters)
+            .filter(_codes_of_cities_q("origin_code", {fc for fc, _, _ in top}))
+            .filter(_codes_of_cities_q("destination_code", {tc for _, tc, _ in top}))
+            .values("origin_code", "destination_code", "Route_Total_Flights")
+        )
+        _, city_pair_detail = _aggregate_city_pairs(route_rows)
+        sorted_pairs = [((fc, tc), int(total)) for fc, tc, total in top]
+
+    return [
+        {
+            "from": fc,
+            "to": tc,
+            "flights": total,
+            "detail": sorted(city_pair_detail[(fc, tc)], key=lambda x: x["flights"], reverse=True)
+        }
+        for (fc, tc), total in sorted_pairs
+    ]
 
+# 看板统计数据源：rollup 为 True 时读全国 / 城市对汇总表，否则读原始航线表（调用方按月份判断汇总是否已生成）
+def _stat_queryset(start_city=None, end_city=None, origin_codes=None, destination_codes=None, rollup=True):
+    if not rollup:
+        qs = RouteMonthlyStat.objects.all()
+        if origin_codes:
+            qs = qs.filter(origin_code__in=origin_codes)
+        if destination_codes:
+            qs = qs.filter(destination_code__in=destination_codes)
+        return qs
+    if not start_city and not end_city:
+        return NationalMonthlyStat.objects.all()
+    qs = CityMonthlyStat.objects.all()
+    if start_city:
+        qs = qs.filter(origin_city=start_city)
+    if end_city:
+        qs = qs.filter(destination_city=end_city)
+    return qs
 
-"""下面是看板部分所需的函数"""
 # 获取航线分布数据
 @api_view(['GET'])
 def route_distribution_view(request):
@@ -91,6 +149,8 @@ def route_distribution_view(request):
 
     # ---- 组装过滤条件 ----
     filters = {"year": year, "month": month, "Route_Total_Flights__gt": 0}
+    origin_cities = None if origin_city == "全国" else [origin_city]
+    dest_cities = None if dest_city == "全国" else [dest_city]
 
     # 处理起始城市过滤
     if origin_city != "全国":
@@ -108,54 +168,7 @@ def route_distribution_view(request):
 
     print(f"🔎 最终查询条件: {filters}")
 
-    # 仅取必要字段，减少内存
-    route_rows = list(
-        RouteMonthlyStat.objects
-        .filter(**filters)
-        .values("origin_code", "destination_code", "Route_Total_Flights")
-    )
-    print(f"📦 取到有效航线条数: {len(route_rows)}")
-    if not route_rows:
-        return Response([])
-
-    # 批量拿机场信息（避免 N+1）
-    codes = {r["origin_code"] for r in route_rows} | {r["destination_code"] for r in route_rows}
-    info_map = {}
-    if codes:
-        for a in AirportInfo.objects.filter(code__in=codes):
-            info_map[a.code] = {"code": a.code, "city": a.city, "province": a.province, "airport": a.airport}
-
-    # 聚合：城市对总航班量 & 机场对明细
-    city_pair_total = defaultdict(int)
-    city_pair_detail = defaultdict(list)
-
-    for r in route_rows:
-        o = info_map.get(r["origin_code"], {"code": r["origin_code"], "city": None, "province": None, "airport": None})
-        d = info_map.get(r["destination_code"], {"code": r["destination_code"], "city": None, "province": None, "airport": None})
-        flights = r["Route_Total_Flights"] or 0
-        if flights <= 0:
-            continue
-
-        key = (o["city"], d["city"])
-        city_pair_total[key] += flights
-        city_pair_detail[key].append({
-            "from_airport": o["airport"],
-            "to_airport": d["airport"],
-            "flights": flights
-        })
-
-    # 构建结果：按总航班量倒序取前100
-    sorted_pairs = sorted(city_pair_total.items(), key=lambda x: x[1], reverse=True)[:100]
-    result = [
-        {
-            "from": fc,
-            "to": tc,
-            "flights": total,
-            "detail": sorted(city_pair_detail[(fc, tc)], key=lambda x: x["flights"], reverse=True)
-        }
-        for (fc, tc), total in sorted_pairs
-    ]
-
+    result = _route_distribution(year, month, filters, origin_cities, dest_cities)
     print(f"✅ 返回航线数据: {len(result)} 条")
     return Response(result)
 
@@ -207,6 +220,7 @@ def route_distribution_advanced_view(request):
 
     # ---- 组装过滤条件 ----
     filters = {"year": year, "month": month, "Route_Total_Flights__gt": 0}
+    origin_cities = dest_cities = None  # 与 filters 对应的城市列表，供汇总表查询使用
 
     # 情况1：仅选择城市筛选（无起点/终点）
     if not origin_city and not dest_city and not is_national:
@@ -224,6 +238,7 @@ def route_distribution_advanced_view(request):
         
         filters["origin_code__in"] = origin_codes
         filters["destination_code__in"] = dest_codes
+        origin_cities = dest_cities = selected_cities
     
     # 情况2：城市筛选为"全国"
     elif is_national:
@@ -234,6 +249,7 @@ def route_distribution_advanced_view(request):
             if not origin_codes:
                 return Response({"error": f"找不到起始城市 {origin_city} 的三字码"}, status=404)
             filters["origin_code__in"] = origin_codes
+            origin_cities = [origin_city]
         
         # 处理终点城市
         if dest_city and dest_city != "全国":
@@ -241,6 +257,7 @@ def route_distribution_advanced_view(request):
             if not dest_codes:
                 return Response({"error": f"找不到到达城市 {dest_city} 的三字码"}, status=404)
             filters["destination_code__in"] = dest_codes
+            dest_cities = [dest_city]
     
     # 情况3：城市筛选不是"全国" + 有起点筛选
     elif origin_city and not dest_city:
@@ -250,6 +267,7 @@ def route_distribution_advanced_view(request):
         if not origin_codes:
             return Response({"error": f"找不到起始城市 {origin_city} 的三字码"}, status=404)
         filters["origin_code__in"] = origin_codes
+        origin_cities = [origin_city]
         
         # 终点限制在所选城市中
         dest_codes = []
@@ -260,6 +278,7 @@ def route_distribution_advanced_view(request):
         if not dest_codes:
             return Response({"error": f"找不到所选城市的三字码"}, status=404)
         filters["destination_code__in"] = dest_codes
+        dest_cities = selected_cities
     
     # 情况4：城市筛选不是"全国" + 有终点筛选
     elif not origin_city and dest_city:
@@ -273,12 +292,14 @@ def route_distribution_advanced_view(request):
         if not origin_codes:
             return Response({"error": f"找不到所选城市的三字码"}, status=404)
         filters["origin_code__in"] = origin_codes
+        origin_cities = selected_cities
         
         # 终点城市
         dest_codes = get_codes_by_city(dest_city)
         if not dest_codes:
             return Response({"error": f"找不到到达城市 {dest_city} 的三字码"}, status=404)
         filters["destination_code__in"] = dest_codes
+        dest_cities = [dest_city]
     
     # 情况5：城市筛选不是"全国" + 有起点和终点筛选
     elif origin_city and dest_city:
@@ -288,12 +309,14 @@ def route_distribution_advanced_view(request):
         if not origin_codes:
             return Response({"error": f"找不到起始城市 {origin_city} 的三字码"}, status=404)
         filters["origin_code__in"] = origin_codes
+        origin_cities = [origin_city]
         
         # 终点城市
         dest_codes = get_codes_by_city(dest_city)
         if not dest_codes:
             return Response({"error": f"找不到到达城市 {dest_city} 的三字码"}, status=404)
         filters["destination_code__in"] = dest_codes
+        dest_cities = [dest_city]
     
     # 默认情况：展示全国航线
     else:
@@ -301,54 +324,7 @@ def route_distribution_advanced_view(request):
 
     print(f"🔎 最终查询条件: {filters}")
 
-    # 仅取必要字段，减少内存
-    route_rows = list(
-        RouteMonthlyStat.objects
-        .filter(**filters)
-        .values("origin_code", "destination_code", "Route_Total_Flights")
-    )
-    print(f"📦 取到有效航线条数: {len(route_rows)}")
-    if not route_rows:
-        return Response([])
-
-    # 批量拿机场信息（避免 N+1）
-    codes = {r["origin_code"] for r in route_rows} | {r["destination_code"] for r in route_rows}
-    info_map = {}
-    if codes:
-        for a in AirportInfo.objects.filter(code__in=codes):
-            info_map[a.code] = {"code": a.code, "city": a.city, "province": a.province, "airport": a.airport}
-
-    # 聚合：城市对总航班量 & 机场对明细
-    city_pair_total = defaultdict(int)
-    city_pair_detail = defaultdict(list)
-
-    for r in route_rows:
-        o = info_map.get(r["origin_code"], {"code": r["origin_code"], "city": None, "province": None, "airport": None})
-        d = info_map.get(r["destination_code"], {"code": r["destination_code"], "city": None, "province": None, "airport": None})
-        flights = r["Route_Total_Flights"] or 0
-        if flights <= 0:
-            continue
-
-        key = (o["city"], d["city"])
-        city_pair_total[key] += flights
-        city_pair_detail[key].append({
-            "from_airport": o["airport"],
-            "to_airport": d["airport"],
-            "flights": flights
-        })
-
-    # 构建结果：按总航班量倒序取前100
-    sorted_pairs = sorted(city_pair_total.items(), key=lambda x: x[1], reverse=True)[:100]
-    result = [
-        {
-            "from": fc,
-            "to": tc,
-            "flights": total,
-            "detail": sorted(city_pair_detail[(fc, tc)], key=lambda x: x["flights"], reverse=True)
-        }
-        for (fc, tc), total in sorted_pairs
-    ]
-
+    result = _route_distribution(year, month, filters, origin_cities, dest_cities)
     print(f"✅ 返回航线数据: {len(result)} 条")
     return Response(result)
 
@@ -384,16 +360,14 @@ def statistics_summary_view(request):
         print(f"❌ 时间参数解析失败: {e}")
         return Response({"error": "year_month 格式应为 YYYY-MM，如 2024-06"}, status=400)
 
-    # 初始查询
-    qs = RouteMonthlyStat.objects.filter(year=year, month=month)
-    print(f"🔍 查询条件: year={year}, month={month}, 查询结果数量: {qs.count()}")
+    print(f"🔍 查询条件: year={year}, month={month}")
 
     # 起始城市筛选
+    origin_codes = destination_codes = None
     if start_city:
         origin_codes = get_codes_by_city(start_city)
         if not origin_codes:
             return Response({"error": f"未找到起始城市 {start_city} 的三字码"}, status=404)
-        qs = qs.filter(origin_code__in=origin_codes)
         print(f"🔍 筛选起始城市 {start_city}，机场代码: {origin_codes}")
 
     # 终点城市筛选
@@ -401,9 +375,13 @@ def statistics_summary_view(request):
         destination_codes = get_codes_by_city(end_city)
         if not destination_codes:
             return Response({"error": f"未找到终点城市 {end_city} 的三字码"}, status=404)
-        qs = qs.filter(destination_code__in=destination_codes)
         print(f"🔍 筛选终点城市 {end_city}，机场代码: {destination_codes}")
 
+    # 当月汇总已生成时读全国 / 城市对月度汇总，否则回退到原始航线表
+    qs = _stat_queryset(
+        start_city, end_city, origin_codes, destination_codes, rollup=has_rollup(year, month)
+    ).filter(year=year, month=month)
+
     # 聚合数据
     summary = qs.aggregate(
         capacity=Sum("Route_Total_Seats"),
@@ -426,7 +404,7 @@ def statistics_trend_view(request):
     year_month = request.GET.get("year_month")
     start_city = request.GET.get("start_city")
     end_city = request.GET.get("end_city")
-    months_param = request.GET.get("months", "12")  # 默认12个月
+    months_param = request.GET.get("months", "12")  # 默认12个月，"all" 表示全部历史
 
     print(f"🔍 接收到的参数 - year_month: {year_month}, start_city: {start_city}, end_city: {end_city}, months: {months_param}")
 
@@ -442,10 +420,10 @@ def statistics_trend_view(request):
         year = int(year_str)
         month = int(month_str)
         
-        # 解析月份参数
-        months_count = int(months_param)
-        if months_count < 1 or months_count > 24:
-            return Response({"error": "months 参数必须在1-24之间"}, status=400)
+        # 解析月份参数（不设上限，"all" 表示截至 year_month 的全部历史）
+        months_count = None if months_param == "all" else int(months_param)
+        if months_count is not None and months_count < 1:
+            return Response({"error": "months 参数必须为正整数或 all"}, status=400)
         
         print(f"🔍 解析后的时间参数 - year: {year}, month: {month}, months_count: {months_count}")
         
@@ -457,65 +435,65 @@ def statistics_trend_view(request):
         print(f"❌ 时间参数解析失败: {e}")
         return Response({"error": "year_month 格式应为 YYYY-MM，如 2024-06"}, status=400)
 
-    qs = RouteMonthlyStat.objects.all()
-    
-    # 检查数据库中是否有数据
-    total_count = RouteMonthlyStat.objects.count()
-    print(f"🔍 数据库中总记录数: {total_count}")
-    
-    # 检查2024年6月的数据
-    june_2024_count = RouteMonthlyStat.objects.filter(year=2024, month=6).count()
-    print(f"🔍 2024年6月数据数量: {june_2024_count}")
-
     # 城市筛选
+    origin_codes = dest_codes = None
     if start_city:
         origin_codes = get_codes_by_city(start_city)
         if not origin_codes:
             return Response({"error": f"找不到城市 {start_city} 的三字码"}, status=404)
-        qs = qs.filter(origin_code__in=origin_codes)
         print(f"🔍 筛选起始城市 {start_city}，机场代码: {origin_codes}")
 
     if end_city:
         dest_codes = get_codes_by_city(end_city)
         if not dest_codes:
             return Response({"error": f"找不到城市 {end_city} 的三字码"}, status=404)
-        qs = qs.filter(destination_code__in=dest_codes)
         print(f"🔍 筛选终点城市 {end_city}，机场代码: {dest_codes}")
 
-    # 计算起始年月（往前months_count个月）
-    start_year = year
-    start_month = month - (months_count - 1)
-    if start_month <= 0:
-        start_year -= 1
-        start_month += 12
-
-    # 筛选指定时间范围内的数据
-    qs = qs.filter(
-        (Q(year__gt=start_year) | 
-        Q(year=start_year, month__gte=start_month)) &
-        (Q(year__lt=year) | 
-        Q(year=year, month__lte=month))
-    )
-
-    # 按年月排序
-    qs = qs.order_by("year", "month")
-    
-    print(f"🔍 时间范围: {start_year}-{start_month:02d} 到 {year}-{month:02d} (共{months_count}个月)")
-    print(f"🔍 查询结果数量: {qs.count()}")
-
-    # 聚合按月
+    # 筛选指定时间范围内的数据（(year, month) 组合索引上的范围查询）
+    time_filter = Q(year__lt=year) | Q(year=year, month__lte=month)
+    start_period = None
+    if months_count is not None:
+        # 计算起始年月（往前months_count个月，可跨多年）
+        start_index = year * 12 + (month - 1) - (months_count - 1)
+        start_year, start_month = start_index // 12, start_index % 12 + 1
+        start_period = (start_year, start_month)
+        time_filter &= Q(year__gt=start_year) | Q(year=start_year, month__gte=start_month)
+        print(f"🔍 时间范围: {start_year}-{start_month:02d} 到 {year}-{month:02d} (共{months_count}个月)")
+    else:
+        print(f"🔍 时间范围: 全部历史 到 {year}-{month:02d}")
+
+    # 已生成汇总的月份读全国 / 城市对月度汇总（汇总表中只有这些月份），其余月份读原始航线表
+    # 未覆盖的月份按月份序列计算，不扫描原始表
+    covered = rollup_periods()
+    raw_periods = missing_periods((year, month), start_period, covered)
+    sources = []
+    if covered:
+        sources.append(_stat_queryset(start_city, end_city, origin_codes, dest_codes).filter(time_filter))
+    if raw_periods:
+        print(f"🔍 {len(raw_periods)} 个月份尚未生成汇总，读取原始航线表")
+        sources.append(
+            _stat_queryset(start_city, end_city, origin_codes, dest_codes, rollup=False)
+            .filter(time_filter).filter(periods_q(raw_periods))
+        )
+
+    # 聚合按月：数据库内 GROUP BY year, month 求和，不再逐行实例化 ORM 对象
     monthly_data = {}
-    for q in qs:
-        key = f"{q.year}-{q.month:02d}"
-        if key not in monthly_data:
-            monthly_data[key] = {
-                "capacity": 0,
-                "volume": 0,
-                "flights": 0
+    for qs in sources:
+        rows = (
+            qs.values("year", "month")
+            .annotate(
+                capacity=Sum("Route_Total_Seats"),
+                volume=Sum("passenger_volume"),
+                flights=Sum("Route_Total_Flights"),
+            )
+            .order_by("year", "month")
+        )
+        for r in rows:
+            monthly_data[f"{r['year']}-{r['month']:02d}"] = {
+                "capacity": r["capacity"] or 0,
+                "volume": r["volume"] or 0,
+                "flights": int(r["flights"] or 0),
             }
-        monthly_data[key]["capacity"] += int(q.Route_Total_Seats or 0)
-        monthly_data[key]["volume"] += int(q.passenger_volume or 0)
-        monthly_data[key]["flights"] += int(q.Route_Total_Flights or 0)
 
     # 构造返回结构，人次数据转换为万人次
     months = []